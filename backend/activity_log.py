@@ -0,0 +1,318 @@
+"""
+Append-only activity ingestion for profile_service.
+
+log() is O(1) on the request thread: it appends to a per-user ring buffer
+(last 50 events), bumps in-memory stat counters and hands the event to a
+writer thread. The writer appends events to activity_log.jsonl in batches and
+periodically hands the aggregated stat deltas to a flush callback (which
+merges them into the profile store) instead of rewriting files per event.
+
+With a `store` (see persistence.ActivityStore) batches go to the database
+instead, and a user's ring buffer is filled lazily from an indexed
+"last 50 events" query the first time that user is seen. Several workers
+share that store, so a cached ring is re-read after ACTIVITY_RING_TTL seconds
+once this worker's own events for the user have been written.
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+
+ACTIVITY_LOG_PATH = Path(os.getenv("ACTIVITY_LOG_PATH", str(BASE_DIR / "activity_log.jsonl")))
+LEGACY_ACTIVITY_DB = BASE_DIR / "activity_db.json"
+ACTIVITY_RING_SIZE = 50
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "5"))
+ACTIVITY_BATCH_SIZE = 500
+# Rewrite the log from the ring buffers once it grows past this size
+ACTIVITY_LOG_MAX_BYTES = int(os.getenv("ACTIVITY_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+# With a store, ring buffers are a cache and can be evicted (LRU)
+ACTIVITY_MAX_CACHED_USERS = int(os.getenv("ACTIVITY_MAX_CACHED_USERS", "10000"))
+# With a store, other workers write the same users' events; re-read a cached
+# ring (that has nothing of ours left to write) once it is this old
+ACTIVITY_RING_TTL = float(os.getenv("ACTIVITY_RING_TTL", "2"))
+
+# activity type -> stats field
+STAT_FIELDS = {
+    "login": "total_logins",
+    "ocr": "ocr_scans",
+    "chatbot": "chat_messages",
+    "scam_report": "scam_reports",
+    "scheme_view": "schemes_viewed",
+}
+
+# First line of a compacted log (it has no "email", so replay skips it as an event)
+COMPACTED_MARKER = "compacted"
+
+_STOP = object()
+
+
+class ActivityLog:
+    def __init__(
+        self,
+        log_path: Path = ACTIVITY_LOG_PATH,
+        on_flush: Optional[Callable[[Dict[str, Dict]], None]] = None,
+        flush_interval: float = ACTIVITY_FLUSH_INTERVAL,
+        legacy_path: Optional[Path] = LEGACY_ACTIVITY_DB,
+        store=None,
+    ):
+        self.log_path = Path(log_path)
+        self.store = store
+        self.legacy_path = legacy_path
+        self.on_flush = on_flush
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._recent: "OrderedDict[str, deque]" = OrderedDict()
+        # email -> {"counts": {field: delta}, "last_active": iso}
+        self._pending: Dict[str, Dict] = {}
+        # email -> events queued for the writer; those rings are never evicted
+        self._unwritten: Dict[str, int] = {}
+        # email -> monotonic time its ring was read from the store / sequence number of its last log()
+        self._fetched: Dict[str, float] = {}
+        self._appended: Dict[str, int] = {}
+        self._seq = 0
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._loaded = False
+        self.metrics = {"logged": 0, "written": 0, "flushes": 0, "compactions": 0}
+
+    # ---------- startup ----------
+
+    def _ensure_started(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if self.store is None:
+                self._replay()
+            self._writer = threading.Thread(target=self._run, name="activity-writer", daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+            self._loaded = True
+
+    def _replay(self):
+        """Rebuild ring buffers from the legacy JSON file and the event log"""
+        events = []
+        if self.log_path.exists():
+            with self.log_path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        events.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue  # torn last line after a crash
+        # A compacted log already holds whatever was imported from the legacy file
+        compacted = bool(events) and COMPACTED_MARKER in events[0]
+        if not compacted and self.legacy_path is not None and self.legacy_path.exists():
+            try:
+                with self.legacy_path.open("r", encoding="utf-8") as f:
+                    legacy = json.load(f)
+                for email, items in legacy.items():
+                    self._ring(email).extend(items)
+            except Exception as e:
+                print(f"⚠️ Could not read legacy activity db: {e}")
+        for event in events:
+            email = event.pop("email", None)
+            if email:
+                self._ring(email).append(event)
+
+    def _ring(self, email: str, loaded: Optional[Tuple[int, List[Dict]]] = None) -> deque:
+        """Ring buffer for a user (caller holds the lock); `loaded` comes from _load()"""
+        ring = self._recent.get(email)
+        if ring is None:
+            ring = self._recent[email] = deque(maxlen=ACTIVITY_RING_SIZE)
+            if self.store is not None:
+                self._evict(keep=email)
+        elif self.store is not None:
+            self._recent.move_to_end(email)
+        if loaded is not None:
+            seq, rows = loaded
+            # Events logged here after the read started are not in `rows`; keep the ring until the next read
+            if self._appended.get(email, 0) <= seq:
+                ring.clear()
+                ring.extend(rows)
+                self._fetched[email] = time.monotonic()
+        return ring
+
+    def _evict(self, keep: str):
+        """Drop least recently used rings, keeping any with events not yet written"""
+        excess = len(self._recent) - ACTIVITY_MAX_CACHED_USERS
+        if excess <= 0:
+            return
+        evictable = []
+        for email in self._recent:
+            if email != keep and not self._unwritten.get(email):
+                evictable.append(email)
+                if len(evictable) == excess:
+                    break
+        for email in evictable:
+            del self._recent[email]
+            self._fetched.pop(email, None)
+            self._appended.pop(email, None)
+
+    def _load(self, email: str) -> Optional[Tuple[int, List[Dict]]]:
+        """
+        (sequence number, stored events) for a user whose ring is missing or
+        stale, else None (called without the lock). A ring with unwritten events
+        is never stale: the store does not have all of it yet.
+        """
+        if self.store is None:
+            return None
+        with self._lock:
+            if email in self._recent and (
+                self._unwritten.get(email) or time.monotonic() - self._fetched.get(email, 0.0) < ACTIVITY_RING_TTL
+            ):
+                return None
+            seq = self._seq
+        return seq, self.store.recent(email, ACTIVITY_RING_SIZE)
+
+    # ---------- ingestion ----------
+
+    def log(self, email: str, activity_type: str, description: str):
+        self._ensure_started()
+        loaded = self._load(email)
+        now = datetime.now().isoformat()
+        event = {"type": activity_type, "description": description, "timestamp": now}
+        with self._lock:
+            self._ring(email, loaded).append(event)
+            if self.store is not None:
+                self._seq += 1
+                self._appended[email] = self._seq
+            self._unwritten[email] = self._unwritten.get(email, 0) + 1
+            pending = self._pending.get(email)
+            if pending is None:
+                pending = self._pending[email] = {"counts": defaultdict(int), "last_active": now}
+            field = STAT_FIELDS.get(activity_type)
+            if field:
+                pending["counts"][field] += 1
+            pending["last_active"] = now
+            self.metrics["logged"] += 1
+        self._queue.put({"email": email, **event})
+
+    # ---------- reads ----------
+
+    def recent(self, email: str, limit: int = 10) -> List[Dict]:
+        """Most recent activities first"""
+        self._ensure_started()
+        loaded = self._load(email)
+        with self._lock:
+            ring = self._ring(email, loaded) if self.store is not None else self._recent.get(email)
+            if not ring:
+                return []
+            items = list(ring)[-limit:]
+        items.reverse()
+        return items
+
+    def pending_stats(self, email: str) -> Dict:
+        """Stat deltas not yet flushed to the profile store"""
+        with self._lock:
+            pending = self._pending.get(email)
+            if pending is None:
+                return {"counts": {}, "last_active": None}
+            return {"counts": dict(pending["counts"]), "last_active": pending["last_active"]}
+
+    # ---------- writer thread ----------
+
+    def _run(self):
+        last_flush = time.monotonic()
+        stop = False
+        while not stop:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                while True:
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= ACTIVITY_BATCH_SIZE:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            if batch:
+                self._append(batch)
+            if stop or time.monotonic() - last_flush >= self.flush_interval:
+                self.flush()
+                last_flush = time.monotonic()
+
+    def _append(self, batch: List[Dict]):
+        try:
+            self._write(batch)
+        finally:
+            with self._lock:
+                for event in batch:
+                    left = self._unwritten.get(event["email"], 0) - 1
+                    if left > 0:
+                        self._unwritten[event["email"]] = left
+                    else:
+                        self._unwritten.pop(event["email"], None)
+
+    def _write(self, batch: List[Dict]):
+        if self.store is not None:
+            try:
+                self.store.append(batch)
+                self.metrics["written"] += len(batch)
+            except Exception as e:
+                print(f"❌ Error writing activity events: {e}")
+            return
+        try:
+            with self.log_path.open("a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in batch))
+            self.metrics["written"] += len(batch)
+            if self.log_path.stat().st_size > ACTIVITY_LOG_MAX_BYTES:
+                self.compact()
+        except Exception as e:
+            print(f"❌ Error writing activity log: {e}")
+
+    def compact(self):
+        """Rewrite the log so it holds only what the ring buffers hold"""
+        with self._lock:
+            lines = [json.dumps({COMPACTED_MARKER: datetime.now().isoformat()}) + "\n"]
+            lines += [
+                json.dumps({"email": email, **event}, ensure_ascii=False) + "\n"
+                for email, ring in self._recent.items()
+                for event in ring
+            ]
+        tmp = self.log_path.with_suffix(".jsonl.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            f.write("".join(lines))
+        os.replace(tmp, self.log_path)
+        self.metrics["compactions"] += 1
+
+    def flush(self):
+        """Hand aggregated stat deltas to the flush callback"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending or self.on_flush is None:
+            return
+        try:
+            self.on_flush({
+                email: {"counts": dict(p["counts"]), "last_active": p["last_active"]}
+                for email, p in pending.items()
+            })
+            self.metrics["flushes"] += 1
+        except Exception as e:
+            print(f"❌ Error flushing activity stats: {e}")
+            # Put the deltas back so they are retried on the next flush
+            with self._lock:
+                for email, p in pending.items():
+                    current = self._pending.setdefault(email, {"counts": defaultdict(int), "last_active": p["last_active"]})
+                    for field, n in p["counts"].items():
+                        current["counts"][field] += n
+
+    def close(self):
+        """Drain queued events and flush stats (called at exit)"""
+        if self._writer is None or not self._writer.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._writer.join(timeout=5)
@@ -6,9 +6,19 @@ import random
 import re
 import os
 from jose import jwt
+from starlette.concurrency import run_in_threadpool
 from hashlib import sha256
 from dotenv import load_dotenv
 
+from metrics import Gauge
+from profiling import TimedRoute
+from otp_store import (
+    get_otp_store,
+    VERIFY_EXPIRED,
+    VERIFY_INVALID,
+    VERIFY_LOCKED,
+)
+
 # Load environment variables
 load_dotenv()
 
@@ -28,13 +38,17 @@ if not JWT_SECRET:
 JWT_ALGO = os.getenv("JWT_ALGO", "HS256")
 OTP_EXPIRY_MINUTES = int(os.getenv("OTP_EXPIRY_MINUTES", "5"))
 
-router = APIRouter()
-
-# Store OTPs temporarily in-memory (hashed for security)
-otp_store = {}  # { email: { otp_hash: str, expires_at: datetime, attempts: int } }
+router = APIRouter(route_class=TimedRoute)
 
-# Track first-time users for welcome email
-first_time_users = set()
+# Hashed OTPs live in a pluggable store (in-memory or shared SQLite, see otp_store.py).
+# get_otp_store() is called per use: under gunicorn's preload each forked worker
+# opens its own store instead of inheriting the master's connection and reaper.
+Gauge(
+    "ruralassist_otp_events",
+    "OTP store counters (issued/verified/failed/locked/expired/evicted) and active OTPs",
+    ("event",),
+    func=lambda: {(k,): v for k, v in get_otp_store().stats().items()},
+)
 
 
 class SendOtpRequest(BaseModel):
@@ -69,25 +83,15 @@ def hash_otp(otp: str) -> str:
 
 
 from fastapi import Request
-
-# --- Lightweight Rate Limiting ---
 import time
-RATE_LIMIT = {}  # (ip, endpoint): [timestamps]
-def check_rate_limit(ip, endpoint, max_req=3, window=10):
-    now = time.time()
-    key = (ip, endpoint)
-    timestamps = RATE_LIMIT.get(key, [])
-    # Remove old timestamps
-    timestamps = [t for t in timestamps if now - t < window]
-    if len(timestamps) >= max_req:
-        raise HTTPException(status_code=429, detail="Too many requests. Please slow down.")
-    timestamps.append(now)
-    RATE_LIMIT[key] = timestamps
+
+# --- Rate Limiting (shared across workers with RATE_LIMIT_STORE=sqlite) ---
+from rate_limit import check_rate_limit
 
 @router.post("/send-email-otp", response_model=AuthResponse)
 async def send_email_otp_endpoint(req: SendOtpRequest, request: Request):
     client_ip = request.client.host
-    check_rate_limit(client_ip, 'send-otp')
+    await run_in_threadpool(check_rate_limit, client_ip, 'send-otp')
     """Send OTP via email using Brevo"""
     email = req.email.lower().strip()
 
@@ -97,22 +101,17 @@ async def send_email_otp_endpoint(req: SendOtpRequest, request: Request):
     # Generate OTP
     otp = generate_otp()
     otp_hashed = hash_otp(otp)
-    expiry = datetime.utcnow() + timedelta(minutes=OTP_EXPIRY_MINUTES)
 
     # Store hashed OTP with expiry and attempt counter
-    otp_store[email] = {
-        "otp_hash": otp_hashed,
-        "expires_at": expiry,
-        "attempts": 0
-    }
+    otp_store = get_otp_store()
+    await run_in_threadpool(otp_store.put, email, otp_hashed, OTP_EXPIRY_MINUTES * 60)
 
     # Send email via Brevo
     if EMAIL_ENABLED:
         try:
             await send_otp_email(email, otp)
-            # Track if this is first login
-            if email not in first_time_users:
-                first_time_users.add(email)
+            # Flag the pending OTP so a successful verify sends the welcome email
+            await run_in_threadpool(otp_store.mark_welcome, email)
             return AuthResponse(
                 success=True,
                 message=f"✅ OTP sent to {email}. Check your inbox!",
@@ -138,44 +137,24 @@ async def send_email_otp_endpoint(req: SendOtpRequest, request: Request):
 @router.post("/verify-email-otp", response_model=AuthResponse)
 async def verify_email_otp_endpoint(req: VerifyOtpRequest, request: Request):
     client_ip = request.client.host
-    check_rate_limit(client_ip, 'verify-otp')
+    await run_in_threadpool(check_rate_limit, client_ip, 'verify-otp')
     """Verify OTP and issue JWT token"""
     email = req.email.lower().strip()
 
-    if email not in otp_store:
-        raise HTTPException(status_code=400, detail="OTP expired. Please request a new one.")
+    status, record = await run_in_threadpool(get_otp_store().verify, email, hash_otp(req.otp.strip()))
 
-    record = otp_store[email]
-    
-    # Check expiry
-    if datetime.utcnow() > record["expires_at"]:
-        del otp_store[email]
+    if status == VERIFY_EXPIRED:
         raise HTTPException(status_code=400, detail="OTP expired. Please request a new one.")
-    
-    # Check attempts (max 3 attempts)
-    if record["attempts"] >= 3:
-        del otp_store[email]
+    if status == VERIFY_LOCKED:
         raise HTTPException(
             status_code=400, 
             detail="Too many failed attempts. Please request a new OTP."
         )
-    
-    # Verify OTP (compare hashed values)
-    entered_otp_hash = hash_otp(req.otp.strip())
-    if entered_otp_hash != record["otp_hash"]:
-        record["attempts"] += 1
-        remaining_attempts = 3 - record["attempts"]
-        if remaining_attempts > 0:
-            raise HTTPException(
-                status_code=400, 
-                detail="Invalid OTP. Please try again."
-            )
-        else:
-            del otp_store[email]
-            raise HTTPException(
-                status_code=400, 
-                detail="Too many failed attempts. Please request a new OTP."
-            )
+    if status == VERIFY_INVALID:
+        raise HTTPException(
+            status_code=400, 
+            detail="Invalid OTP. Please try again."
+        )
 
     # OTP correct → generate JWT
     token = jwt.encode(
@@ -188,14 +167,10 @@ async def verify_email_otp_endpoint(req: VerifyOtpRequest, request: Request):
         algorithm=JWT_ALGO,
     )
 
-    # Clean up used OTP
-    del otp_store[email]
-    
-    # Send welcome email for first-time users (async, don't block)
-    if EMAIL_ENABLED and email in first_time_users:
+    # Queue welcome email for first-time users (outbox delivers it in the background)
+    if EMAIL_ENABLED and record.get("welcome"):
         try:
             await send_welcome_email(email)
-            first_time_users.remove(email)
         except Exception as e:
             print(f"⚠️ Welcome email failed for {email}: {str(e)}")
 
@@ -212,9 +187,10 @@ async def resend_otp(req: SendOtpRequest, request: Request):
     email = req.email.lower().strip()
     
     # Check if there's an active OTP
-    if email in otp_store:
-        time_since_last = datetime.utcnow() - (otp_store[email]["expires_at"] - timedelta(minutes=OTP_EXPIRY_MINUTES))
-        if time_since_last < timedelta(seconds=30):
+    record = await run_in_threadpool(get_otp_store().get, email)
+    if record:
+        time_since_last = time.time() - record["created_at"]
+        if time_since_last < 30:
             raise HTTPException(
                 status_code=429, 
                 detail="Please wait 30 seconds before requesting a new OTP."
@@ -0,0 +1,325 @@
+"""
+Microbenchmarks for the pure search and scoring kernels.
+
+    python bench.py                        # 1x and 10x, compared with bench_baseline.json
+    python bench.py --scale 100 --kernel search_schemes_fuzzy
+    python bench.py --save                 # record a new baseline (merged into the existing one)
+
+Each kernel runs on a synthetic corpus (schemes, FAQs, intents, scam
+keywords) generated from a fixed seed. A scale of N means N times the base
+size. The *_snapshot kernels search the same schemes compiled into a data
+snapshot (Record rows, as the app serves them). Queries come in three sets: English, Hindi and mixed script. For every
+(kernel, scale, language) case the run records:
+- the per-query time: best and median of --repeat rounds;
+- a digest of the kernel's outputs.
+
+Against the baseline, the speedup is baseline median / current median. A
+changed digest means a rewrite changed the results. It always fails the run,
+because a rewrite must be output-equivalent. A slowdown fails the run only
+when --max-slowdown is given, since timings depend on the machine.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent
+BASELINE_PATH = BASE_DIR / "bench_baseline.json"
+
+BASE_SCHEMES = 200
+BASE_FAQS = 60
+BASE_INTENTS = 20
+BASE_SCAM_KEYWORDS = 40
+
+EN_WORDS = [
+    "farmer", "kisan", "income", "support", "pension", "widow", "scholarship", "student", "housing", "loan",
+    "health", "insurance", "hospital", "ration", "card", "aadhaar", "bank", "account", "subsidy", "gas",
+    "employment", "rural", "women", "girl", "education", "skill", "training", "crop", "irrigation", "solar",
+    "disability", "senior", "citizen", "water", "toilet", "road", "village", "apply", "documents", "benefit",
+]
+HI_WORDS = [
+    "किसान", "आय", "सहायता", "पेंशन", "विधवा", "छात्रवृत्ति", "छात्र", "आवास", "ऋण", "स्वास्थ्य",
+    "बीमा", "अस्पताल", "राशन", "कार्ड", "आधार", "बैंक", "खाता", "सब्सिडी", "रोजगार", "ग्रामीण",
+    "महिला", "शिक्षा", "फसल", "सिंचाई", "योजना", "लाभ", "आवेदन", "दस्तावेज", "गांव", "पानी",
+]
+SCAM_WORDS = [
+    "otp", "lottery", "prize", "kyc", "blocked", "urgent", "refund", "cashback", "winner", "password",
+    "पुरस्कार", "लॉटरी", "इनाम", "तुरंत", "ओटीपी", "बंद", "रिफंड",
+]
+CATEGORIES = ["agriculture", "education", "health", "housing", "pension", "employment", "women", "finance"]
+STATES = ["central", "bihar", "uttar pradesh", "maharashtra", "tamil nadu", "rajasthan"]
+
+QUERIES = {
+    "en": ["farmer income support", "pension", "scholarship for girl student", "housing loan", "kisan",
+           "health insurance hospital", "how to apply for ration card", "solar irrigation subsidy", "xyz"],
+    "hi": ["किसान", "पेंशन योजना", "छात्रवृत्ति", "आवास ऋण", "स्वास्थ्य बीमा", "राशन कार्ड कैसे बनाएं",
+           "महिला रोजगार", "फसल बीमा योजना"],
+    "mixed": ["PM किसान", "kisan सम्मान निधि", "loan के लिए apply", "aadhaar अपडेट", "pension योजना",
+              "girl शिक्षा scholarship", "ration कार्ड", "solar पंप subsidy"],
+}
+MESSAGES = {
+    "en": ["Your bank account is blocked, share the OTP immediately to unblock it at http://kyc-update.in",
+           "Congratulations! You won a lottery prize of Rs 25,00,000. Pay a processing fee to claim.",
+           "Meeting at the panchayat office tomorrow at 10 am",
+           "Official notice: your ration card application is verified"],
+    "hi": ["आपका बैंक खाता बंद हो गया है, तुरंत ओटीपी बताएं",
+           "बधाई हो! आपने लॉटरी में 25 लाख का इनाम जीता है",
+           "कल सुबह 10 बजे पंचायत कार्यालय में बैठक है"],
+    "mixed": ["आपका KYC pending है, link पर click करके OTP डालें http://bank-kyc.com",
+              "Urgent: आपका refund ready है, अपना password share करें",
+              "Ration कार्ड की list gram panchayat में लगी है"],
+}
+
+
+# ---------- synthetic corpus ----------
+
+def _words(rng: random.Random, n: int, hindi: float) -> str:
+    return " ".join(rng.choice(HI_WORDS if rng.random() < hindi else EN_WORDS) for _ in range(n))
+
+
+def make_corpus(scale: int, seed: int = 11) -> Dict[str, Any]:
+    """Deterministic schemes/FAQs/intents/scam keywords at `scale` x the base size"""
+    rng = random.Random(seed)
+    schemes = [{
+        "id": f"scheme_{i}",
+        "title": _words(rng, 4, 0.2).title(),
+        "category": rng.choice(CATEGORIES),
+        "state": rng.choice(STATES),
+        "description": _words(rng, 25, 0.2),
+        "keywords": [_words(rng, rng.randint(1, 2), 0.3) for _ in range(4)],
+    } for i in range(BASE_SCHEMES * scale)]
+    faqs = [{
+        "id": f"faq_{i}",
+        "category": rng.choice(CATEGORIES),
+        "question": _words(rng, 7, 0.25) + "?",
+        "answer": _words(rng, 30, 0.25),
+        "keywords": [_words(rng, rng.randint(1, 2), 0.3) for _ in range(3)],
+        "helpful_count": rng.randint(0, 30),
+        "unhelpful_count": rng.randint(0, 10),
+    } for i in range(BASE_FAQS * scale)]
+    intents = {"intents": {
+        f"intent_{i}": {"keywords": [_words(rng, rng.randint(1, 3), 0.3) for _ in range(10)], "response": "..."}
+        for i in range(BASE_INTENTS * scale)
+    }}
+    scam_keywords = {level: [] for level in ("high_risk", "medium_risk", "low_risk")}
+    for i in range(BASE_SCAM_KEYWORDS * scale):
+        word = rng.choice(SCAM_WORDS) + ("" if i < len(SCAM_WORDS) else str(i))
+        level = rng.choice(list(scam_keywords))
+        scam_keywords[level].append({"keyword": word, "patterns": [f".*{word}.*", word], "risk_score": rng.randint(30, 95)})
+    # Remote records for merge_schemes: half update local ids, half are new
+    online = [{
+        "id": f"scheme_{rng.randrange(len(schemes))}" if i % 2 else f"remote_{i}",
+        "title_en": _words(rng, 4, 0.1).title(),
+        "sector": rng.choice(CATEGORIES),
+        "description_en": _words(rng, 20, 0.1),
+        "keywords": [rng.choice(EN_WORDS)],
+    } for i in range(BASE_SCHEMES * scale // 2)]
+    return {"schemes": schemes, "faqs": faqs, "intents": intents, "scam_keywords": scam_keywords, "online": online}
+
+
+# ---------- kernels ----------
+# Each factory takes the corpus and returns (query sets, run(query) -> comparable output)
+
+def _ids(schemes: List[dict]) -> List[str]:
+    return [s["id"] for s in schemes]
+
+
+def _fuzzy(corpus):
+    from schemes_service import search_schemes_fuzzy
+    return QUERIES, lambda q: _ids(search_schemes_fuzzy(q, corpus["schemes"]))
+
+
+def _keyword(corpus):
+    from schemes_service import search_schemes_keyword
+    return QUERIES, lambda q: _ids(search_schemes_keyword(q, corpus["schemes"]))
+
+
+# The same kernels over snapshot records (RecordTable rows), which is what the app serves
+
+
+def _fuzzy_snapshot(corpus):
+    from schemes_service import search_schemes_fuzzy
+    return QUERIES, lambda q: _ids(search_schemes_fuzzy(q, corpus["schemes_snapshot"]))
+
+
+def _keyword_snapshot(corpus):
+    from schemes_service import search_schemes_keyword
+    return QUERIES, lambda q: _ids(search_schemes_keyword(q, corpus["schemes_snapshot"]))
+
+
+def _faq_score(corpus):
+    from faq_service import advanced_match_score
+    return QUERIES, lambda q: [advanced_match_score(q, faq) for faq in corpus["faqs"]]
+
+
+def _intent(corpus):
+    from chatbot_service import match_intent
+    return QUERIES, lambda q: match_intent(q, corpus["intents"])
+
+
+def _risk(corpus):
+    from scam_service import calculate_risk_score
+
+    def run(message):
+        level, score, detected, _ = calculate_risk_score(message)
+        return [level, score, sorted(detected)]  # detected comes back in set order
+
+    return MESSAGES, run
+
+
+def _merge(corpus):
+    from schemes_service import merge_schemes
+
+    def run(_):
+        with contextlib.redirect_stdout(io.StringIO()):
+            merged, added, updated = merge_schemes(corpus["schemes"], corpus["online"])
+        # updated_at is the wall clock; everything else must match
+        return [added, updated, [{k: v for k, v in s.items() if k != "updated_at"} for s in merged]]
+
+    return {"-": [None]}, run
+
+
+KERNELS: Dict[str, Callable] = {
+    "search_schemes_fuzzy": _fuzzy,
+    "search_schemes_keyword": _keyword,
+    "search_schemes_fuzzy_snapshot": _fuzzy_snapshot,
+    "search_schemes_keyword_snapshot": _keyword_snapshot,
+    "advanced_match_score": _faq_score,
+    "match_intent": _intent,
+    "calculate_risk_score": _risk,
+    "merge_schemes": _merge,
+}
+
+
+# ---------- running ----------
+
+def digest(outputs: List[Any]) -> str:
+    return hashlib.sha256(json.dumps(outputs, ensure_ascii=False, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def time_case(run: Callable[[Any], Any], queries: List[Any], repeat: int) -> Dict[str, Any]:
+    outputs = [run(q) for q in queries]  # also warms caches/imports
+    rounds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for q in queries:
+            run(q)
+        rounds.append((time.perf_counter() - started) / len(queries))
+    return {
+        "queries": len(queries),
+        "us_min": min(rounds) * 1e6,
+        "us_median": statistics.median(rounds) * 1e6,
+        "digest": digest(outputs),
+    }
+
+
+@contextlib.contextmanager
+def _serve_corpus(corpus: Dict[str, Any]):
+    # calculate_risk_score reads scam_keywords.json through its DataFile
+    from data_snapshot import compile_snapshot, open_snapshot
+    from loadtest import serve_catalogs
+
+    with tempfile.TemporaryDirectory(prefix="ruralassist-bench-") as directory:
+        directory = Path(directory)
+        (directory / "scam_keywords.json").write_text(json.dumps(corpus["scam_keywords"], ensure_ascii=False), encoding="utf-8")
+        compile_snapshot(corpus["schemes"], None, directory / "schemes_db.snap")
+        corpus["schemes_snapshot"] = open_snapshot(directory / "schemes_db.snap").value()
+        with serve_catalogs(directory):
+            yield
+
+
+def run_benchmarks(scales: List[int], kernels: Optional[List[str]] = None, repeat: int = 5) -> Dict[str, Dict[str, Any]]:
+    """{"kernel[scale x,lang]": timing + output digest} for every case"""
+    results = {}
+    for scale in scales:
+        corpus = make_corpus(scale)
+        with _serve_corpus(corpus):
+            for name in kernels or KERNELS:
+                query_sets, run = KERNELS[name](corpus)
+                for lang, queries in query_sets.items():
+                    results[f"{name}[{scale}x,{lang}]"] = time_case(run, queries, repeat)
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            max_slowdown: Optional[float] = None) -> List[str]:
+    """Failures against `baseline`: changed outputs, and slowdowns past max_slowdown"""
+    failures = []
+    for case, current in results.items():
+        before = baseline.get(case)
+        if before is None:
+            continue
+        if current["digest"] != before["digest"]:
+            failures.append(f"{case}: output changed ({before['digest']} -> {current['digest']})")
+        speedup = before["us_median"] / current["us_median"] if current["us_median"] else float("inf")
+        current["speedup"] = speedup
+        if max_slowdown and speedup < 1 / max_slowdown:
+            failures.append(f"{case}: {1 / speedup:.2f}x slower than the baseline")
+    return failures
+
+
+def format_results(results: Dict[str, Dict[str, Any]]) -> str:
+    lines = [f"{'case':<44} {'n':>3} {'best':>11} {'median':>11} {'vs base':>8}  digest"]
+    for case, r in results.items():
+        speedup = f"{r['speedup']:.2f}x" if "speedup" in r else "-"
+        lines.append(f"{case:<44} {r['queries']:>3} {r['us_min']:>9.1f}us {r['us_median']:>9.1f}us {speedup:>8}  {r['digest']}")
+    return "\n".join(lines)
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["results"]
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(results: Dict[str, Dict[str, Any]], meta: Dict[str, Any], path: Path = BASELINE_PATH):
+    """Merge `results` into the baseline at `path`; cases that were not run keep their recorded values"""
+    merged = load_baseline(path)
+    for case, r in results.items():
+        merged[case] = {k: v for k, v in r.items() if k != "speedup"}  # speedup is relative to the old baseline
+    path.write_text(json.dumps({"meta": meta, "results": merged}, indent=2) + "\n", encoding="utf-8")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", type=int, action="append", help="corpus size multiple (repeatable; default 1 and 10)")
+    parser.add_argument("--kernel", action="append", choices=list(KERNELS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--max-slowdown", type=float, help="fail when a case is this many times slower than the baseline")
+    parser.add_argument("--save", action="store_true", help="record the results in the baseline (other cases are kept)")
+    parser.add_argument("--json", type=Path, help="also write the results here")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scale or [1, 10], args.kernel, args.repeat)
+    failures = compare(results, load_baseline(args.baseline), args.max_slowdown)
+    print(format_results(results))
+    for failure in failures:
+        print(f"FAILED {failure}")
+    document = {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(), "repeat": args.repeat},
+        "results": results,
+    }
+    if args.json:
+        args.json.write_text(json.dumps(document, indent=2), encoding="utf-8")
+    if args.save:
+        save_baseline(results, document["meta"], args.baseline)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
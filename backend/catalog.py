@@ -0,0 +1,378 @@
+"""
+Pre-encoded responses for read-mostly catalogs (schemes, FAQs, common scams).
+
+A catalog is encoded once per *generation*: the JSON bytes (orjson when
+installed), a gzip variant, a brotli variant when `brotli` is installed, and a
+strong ETag per variant (the identity tag with "-gzip" / "-br" appended, since
+the encoded bytes differ). Catalogs rewritten by in-process writes on the
+request path (`live=True`, e.g. FAQ votes) use cheaper compression levels.
+Requests are then answered straight from those bytes, with
+`If-None-Match` -> 304 handling, and never reach jsonable_encoder or
+GZipMiddleware (which skips responses that already carry Content-Encoding).
+
+    schemes_catalog = CatalogCache("schemes", build=lambda: load_local_schemes(),
+                                   generation=file_generation(SCHEMES_DB_PATH))
+
+    @router.get("")
+    async def list_schemes(request: Request):
+        return schemes_catalog.response(request)
+
+`generation()` is called on every request and must be cheap (a stat() is);
+call `invalidate()` after in-process writes that the generation cannot see.
+
+Catalogs over hot-reloaded files (data_files.DataFile.add_catalog) are rebuilt
+by the file watcher instead: `prepare()` encodes the next generation, which
+only the preparing thread sees through current(), `warm()` rebuilds the
+derived indexes registered with `warm_with()` that were in use, and
+`publish()` swaps it in.
+
+`page()` serves limit/cursor pages in stable (id, position) order with
+optional field projection, under a weak ETag (pages are compressed, if at
+all, by GZipMiddleware after the tag is set); the cursor is an opaque keyset token, so pages do
+not shift when rows are added elsewhere in the catalog.
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+from bisect import bisect_right
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request, Response
+
+from data_snapshot import Record, plain
+from metrics import CACHE_REQUESTS
+from profiling import stage
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# Bodies smaller than this are not worth a compressed variant (matches GZipMiddleware)
+MIN_COMPRESS_SIZE = 500
+# Compression levels: best for file-backed catalogs, cheaper for live ones
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+LIVE_GZIP_LEVEL = int(os.getenv("CATALOG_LIVE_GZIP_LEVEL", "6"))
+LIVE_BROTLI_QUALITY = int(os.getenv("CATALOG_LIVE_BROTLI_QUALITY", "5"))
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def _dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=plain, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=plain).encode("utf-8")
+
+
+def _holds_records(obj: Any, depth: int = 3) -> bool:
+    if isinstance(obj, Record):
+        return True
+    if depth == 0:
+        return False
+    if isinstance(obj, dict):
+        values = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        values = obj[:1]  # payload lists are homogeneous
+    else:
+        return False
+    return any(_holds_records(v, depth - 1) for v in values)
+
+
+def _encode(obj: Any, out: List[bytes]):
+    if isinstance(obj, Record):
+        out.append(obj.to_json())
+    elif isinstance(obj, dict) and _holds_records(obj):
+        out.append(b"{")
+        for i, (key, value) in enumerate(obj.items()):
+            if i:
+                out.append(b",")
+            out.append(_dumps(key if isinstance(key, str) else str(key)))
+            out.append(b":")
+            _encode(value, out)
+        out.append(b"}")
+    elif isinstance(obj, (list, tuple)) and _holds_records(obj):
+        out.append(b"[")
+        for i, value in enumerate(obj):
+            if i:
+                out.append(b",")
+            _encode(value, out)
+        out.append(b"]")
+    else:
+        out.append(_dumps(obj))
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serialize to compact UTF-8 JSON bytes. Snapshot records are written from
+    their mapped bytes, without building (or keeping) a dict per record.
+    """
+    if not _holds_records(obj):
+        return _dumps(obj)
+    out: List[bytes] = []
+    _encode(obj, out)
+    return b"".join(out)
+
+
+def file_generation(path: Path) -> Callable[[], Hashable]:
+    """Generation function that changes whenever `path` is rewritten"""
+    def generation():
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+    return generation
+
+
+class _Encoded:
+    __slots__ = ("generation", "payload", "etag", "identity", "gzip", "br", "_derived", "_lock")
+
+    def __init__(self, generation: Hashable, payload: Any, live: bool = False):
+        body = dumps(payload)
+        self.generation = generation
+        self.payload = payload
+        self.identity = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        compress = len(body) >= MIN_COMPRESS_SIZE
+        gzip_level, brotli_quality = (LIVE_GZIP_LEVEL, LIVE_BROTLI_QUALITY) if live else (GZIP_LEVEL, BROTLI_QUALITY)
+        self.gzip = gzip.compress(body, compresslevel=gzip_level) if compress else None
+        self.br = brotli.compress(body, quality=brotli_quality) if compress and brotli is not None else None
+        self._derived: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def derived(self, name: str, factory: Callable[[], Any]) -> Any:
+        """Structure built once from this generation (indexes), dropped with it"""
+        value = self._derived.get(name)
+        if value is None:
+            with self._lock:
+                value = self._derived.get(name)
+                if value is None:
+                    value = self._derived[name] = factory()
+        return value
+
+    def index(self, items: Callable[[Any], List[dict]]) -> "_PageIndex":
+        return self.derived("page_index", lambda: _PageIndex(items(self.payload)))
+
+    def variant(self, accepted: set) -> Tuple[bytes, Optional[str], str]:
+        """(body, Content-Encoding, ETag) of the representation for these accepted codings"""
+        if self.br is not None and "br" in accepted:
+            return self.br, "br", self.etag[:-1] + '-br"'
+        if self.gzip is not None and "gzip" in accepted:
+            return self.gzip, "gzip", self.etag[:-1] + '-gzip"'
+        return self.identity, None, self.etag
+
+
+class _PageIndex:
+    """Rows in stable (id, position) order, for keyset pagination"""
+
+    def __init__(self, rows: List[dict]):
+        order = getattr(rows, "id_order", None)  # prebuilt by data_snapshot
+        if order is not None:
+            keyed = [((str(rows[pos].get("id", "")), pos), rows[pos]) for pos in order]
+        else:
+            keyed = sorted(((str(row.get("id", "")), pos), row) for pos, row in enumerate(rows))
+        self.keys = [k for k, _ in keyed]
+        self.rows = [r for _, r in keyed]
+
+    def page(self, after: Optional[Tuple[str, int]], limit: int,
+             predicate: Optional[Callable[[dict], bool]] = None) -> Tuple[List[dict], Optional[Tuple[str, int]], int]:
+        """Returns (rows, key of the last row if more remain, total matching rows)"""
+        start = bisect_right(self.keys, after) if after is not None else 0
+        if predicate is None:
+            end = min(start + limit, len(self.rows))
+            more = end < len(self.rows)
+            return self.rows[start:end], (self.keys[end - 1] if more else None), len(self.rows)
+
+        total = 0
+        picked: List[dict] = []
+        last = None
+        more = False
+        for pos, row in enumerate(self.rows):
+            if not predicate(row):
+                continue
+            total += 1
+            if pos < start:
+                continue
+            if len(picked) < limit:
+                picked.append(row)
+                last = self.keys[pos]
+            else:
+                more = True
+        return picked, (last if more else None), total
+
+
+class CatalogCache:
+    def __init__(self, name: str, build: Callable[[], Any],
+                 generation: Optional[Callable[[], Hashable]] = None,
+                 items: Optional[Callable[[Any], List[dict]]] = None,
+                 summary_fields: Sequence[str] = (), live: bool = False):
+        self.name = name
+        self.live = live
+        self.build = build
+        self.generation = generation or (lambda: None)
+        # payload -> the list that page() paginates (default: the payload itself)
+        self.items = items or (lambda payload: payload)
+        self.summary_fields = tuple(summary_fields)
+        self._version = 0  # bumped by invalidate()
+        self._encoded: Optional[_Encoded] = None
+        self._lock = threading.Lock()
+        # (thread ident, next generation) while a reload is being prepared
+        self._staged: Optional[Tuple[int, _Encoded]] = None
+        self._warmers: Dict[str, Callable[[], Any]] = {}
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+
+    def current(self) -> _Encoded:
+        staged = self._staged
+        if staged is not None and staged[0] == threading.get_ident():
+            return staged[1]
+        gen = (self._version, self.generation())
+        encoded = self._encoded
+        if encoded is not None and encoded.generation == gen:
+            CACHE_REQUESTS.labels(f"catalog_{self.name}", "hit").inc()
+            return encoded
+        with self._lock:
+            # A reload may have been published since `gen` was read
+            gen = (self._version, self.generation())
+            encoded = self._encoded
+            if encoded is None or encoded.generation != gen:
+                CACHE_REQUESTS.labels(f"catalog_{self.name}", "miss").inc()
+                with stage("encode"):
+                    encoded = self._encoded = _Encoded(gen, self.build(), self.live)
+        return encoded
+
+    def warm_with(self, name: str, warm: Callable[[], Any]):
+        """Have prepared generations rebuild derived structure `name` by calling warm()"""
+        self._warmers[name] = warm
+
+    def prepare(self) -> _Encoded:
+        """Encode the next generation without publishing it; current() returns it in this thread"""
+        with stage("encode"):
+            encoded = _Encoded((self._version, self.generation()), self.build(), self.live)
+        encoded.index(self.items)
+        self._staged = (threading.get_ident(), encoded)
+        return encoded
+
+    def warm(self):
+        """Rebuild the derived structures the published generation had built, on the staged one"""
+        published = self._encoded
+        in_use = set(published._derived) if published is not None else set()
+        for name, warm in self._warmers.items():
+            if name in in_use:
+                warm()
+
+    def publish(self, encoded: _Encoded):
+        """Make a prepared generation current (the caller holds self._lock)"""
+        self._encoded = encoded
+
+    def discard_staged(self):
+        self._staged = None
+
+    def response(self, request: Request) -> Response:
+        encoded = self.current()
+        body, coding, etag = encoded.variant(_accepted_encodings(request.headers.get("accept-encoding", "")))
+        headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if coding is not None:
+            headers["Content-Encoding"] = coding
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def page(self, request: Request, limit: Optional[int] = None, cursor: Optional[str] = None,
+             fields: Optional[str] = None, view: Optional[str] = None,
+             predicate: Optional[Callable[[dict], bool]] = None,
+             wrap: Optional[Callable[[List[dict], int, Optional[str], Any], Any]] = None) -> Response:
+        """
+        One page of the catalog in stable id order. `fields` ("id,title") or
+        `view=summary` project each row; `wrap(rows, total, next_cursor, payload)`
+        shapes the body (default: the bare list). Totals and the next cursor are
+        also returned as X-Total-Count / X-Next-Cursor headers.
+        """
+        encoded = self.current()
+        # Weak: GZipMiddleware may compress this body afterwards, and each coding's bytes differ
+        etag = 'W/"' + hashlib.blake2b(
+            (encoded.etag + "?" + request.url.query).encode(), digest_size=16
+        ).hexdigest() + '"'
+        headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        projection = projection_fields(fields, view, self.summary_fields)
+        after = decode_cursor(cursor) if cursor else None
+        limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        with stage("index"):
+            rows, last, total = encoded.index(self.items).page(after, limit, predicate)
+        if projection:
+            rows = [{f: row[f] for f in projection if f in row} for row in rows]
+        next_cursor = encode_cursor(last) if last is not None else None
+
+        headers["X-Total-Count"] = str(total)
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        body = wrap(rows, total, next_cursor, encoded.payload) if wrap else rows
+        with stage("encode"):
+            content = dumps(body)
+        return Response(content=content, media_type="application/json", headers=headers)
+
+
+def encode_cursor(key: Tuple[str, int]) -> str:
+    return base64.urlsafe_b64encode(dumps(list(key))).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key, pos = json.loads(raw)
+        return (str(key), int(pos))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def projection_fields(fields: Optional[str], view: Optional[str], summary_fields: Tuple[str, ...]) -> Tuple[str, ...]:
+    if fields:
+        return tuple(f.strip() for f in fields.split(",") if f.strip())
+    if view is None or view == "full":
+        return ()
+    if view == "summary":
+        return summary_fields
+    raise HTTPException(status_code=400, detail="view must be 'summary' or 'full'")
+
+
+def is_paged(*params) -> bool:
+    """True if any pagination/projection query parameter was supplied"""
+    return any(p is not None for p in params)
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    etag = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "").lower() in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if coding:
+            accepted.add(coding.lower())
+    return accepted
@@ -0,0 +1,76 @@
+"""
+Per-session chatbot context for the streaming chat channels.
+
+A session remembers only what follow-up questions need: the reply language,
+the last few intents and the current topic (the scheme the conversation is
+about), so "how to apply?" can be answered for the scheme discussed before.
+
+SessionStore is process-local and bounded: sessions expire after
+CHAT_SESSION_TTL seconds without a message, and beyond CHAT_SESSION_MAX the
+least recently used session is dropped. Session ids are always minted here
+(secrets.token_urlsafe); an id the store does not know gets a new session
+under a new id, so clients cannot choose ids. Entries are kept in last-use order,
+so expiry only ever looks at the front of the OrderedDict.
+"""
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from metrics import CHAT_SESSIONS
+
+CHAT_SESSION_TTL = int(os.getenv("CHAT_SESSION_TTL", "1800"))
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", "10000"))
+RECENT_INTENTS = 5
+
+
+class ChatSession:
+    __slots__ = ("id", "lang", "intents", "topic", "last_seen")
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.lang = "en"
+        self.intents = deque(maxlen=RECENT_INTENTS)
+        self.topic: Optional[str] = None  # scheme id
+        self.last_seen = time.monotonic()
+
+
+class SessionStore:
+    def __init__(self, max_sessions: int = CHAT_SESSION_MAX, ttl: float = CHAT_SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+
+    def get(self, session_id: Optional[str] = None) -> ChatSession:
+        """The live session for `session_id`, or a new one under a fresh server-chosen id"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire_locked(now)
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session_id = secrets.token_urlsafe(16)
+                session = self._sessions[session_id] = ChatSession(session_id)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_seen = now
+            CHAT_SESSIONS.set(len(self._sessions))
+        return session
+
+    def _expire_locked(self, now: float):
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_seen < self.ttl:
+                break
+            self._sessions.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+sessions = SessionStore()
@@ -1,30 +1,34 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+import asyncio
 import json
+import os
 from pathlib import Path
 import re
+import threading
 import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
-router = APIRouter()
+from chat_sessions import ChatSession, sessions
+from faq_service import faq_catalog, faq_vectors
+from data_files import data_file
+from metrics import CHAT_RETRIEVAL_SECONDS, cache_lookup
+from profiling import TimedRoute, stage
+from schemes_service import scheme_vectors, schemes_catalog
 
+router = APIRouter(route_class=TimedRoute)
 
-# --- In-memory cache for intents ---
+
+# --- Intents (hot-reloaded, see data_files.py) ---
 BASE_DIR = Path(__file__).resolve().parent / "chatbot_language"
 EN_PATH = BASE_DIR / "en.json"
 HI_PATH = BASE_DIR / "hi.json"
-_INTENT_CACHE = {}
-_INTENT_CACHE_TS = {}
-def load_language(lang: str, ttl=1800):
-    now = time.time()
-    path = HI_PATH if lang == "hi" else EN_PATH
-    cache_key = str(path)
-    if cache_key in _INTENT_CACHE and now - _INTENT_CACHE_TS[cache_key] < ttl:
-        return _INTENT_CACHE[cache_key]
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        _INTENT_CACHE[cache_key] = data
-        _INTENT_CACHE_TS[cache_key] = now
-        return data
+INTENT_FILES = {"en": data_file(EN_PATH), "hi": data_file(HI_PATH)}
+def load_language(lang: str):
+    return INTENT_FILES["hi" if lang == "hi" else "en"].value
 
 
 class ChatRequest(BaseModel):
@@ -34,6 +38,8 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     reply: str
     intent: str
+    # FAQ/scheme entries the reply was built from (empty for intent replies)
+    sources: List[Dict] = []
 
 
 def detect_language(text: str) -> str:
@@ -45,6 +51,11 @@ def detect_language(text: str) -> str:
 
 
 def match_intent(query: str, intents: dict) -> str:
+    return score_intent(query, intents)[0]
+
+
+def score_intent(query: str, intents: dict) -> Tuple[str, int]:
+    """Best intent and its keyword score ("unknown", 0 when nothing matches)"""
     q = query.lower().strip()
     best_intent = "unknown"
     best_score = 0
@@ -72,18 +83,269 @@ def match_intent(query: str, intents: dict) -> str:
             best_score = score
             best_intent = intent
 
-    return best_intent
+    return best_intent, best_score
+
+
+# --- Grounded replies ---
+# Intent keyword score at which the curated intent reply wins over retrieval
+# (an exact keyword, or a whole-word keyword plus another match)
+STRONG_INTENT_SCORE = 5
+# Minimum cosine similarity for an FAQ/scheme to ground a reply
+MIN_FAQ_SCORE = 0.25
+MIN_SCHEME_SCORE = 0.35
+# An FAQ answers the question directly, so it wins unless a scheme is clearly closer
+FAQ_PREFERENCE = 0.05
+MAX_SCHEMES_IN_REPLY = 3
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "1024"))
+
+_REPLIES: "OrderedDict[tuple, ChatResponse]" = OrderedDict()  # (query, faq etag, schemes etag, intents versions) -> reply
+_REPLIES_LOCK = threading.Lock()
+
+TEMPLATES = {
+    "en": {"schemes": "Here are schemes that may help:", "related": "Related schemes:",
+           "benefits": "Benefits", "apply": "Apply"},
+    "hi": {"schemes": "ये योजनाएं आपकी मदद कर सकती हैं:", "related": "संबंधित योजनाएं:",
+           "benefits": "लाभ", "apply": "आवेदन"},
+}
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(re.findall(r"[\w\u0900-\u097F]+", text.lower()))
+
+
+def retrieve(query: str, k: int = MAX_SCHEMES_IN_REPLY) -> Tuple[List[Tuple[dict, float]], List[Tuple[dict, float]]]:
+    """Top-k (faq, score) and (scheme, score) above the grounding thresholds"""
+    started = time.perf_counter()
+    with stage("retrieval"):
+        faq_rows, faqs = faq_vectors()
+        scheme_rows, schemes = scheme_vectors()
+        # Both indexes share the process embedder, so the query is embedded once
+        q = faqs.embedder.embed([query])
+        faq_hits = [(faq_rows[r], sim) for r, sim in faqs.search_vectors(q, k, MIN_FAQ_SCORE)[0]]
+        scheme_hits = [(scheme_rows[r], sim) for r, sim in schemes.search_vectors(q, k, MIN_SCHEME_SCORE)[0]]
+    CHAT_RETRIEVAL_SECONDS.observe(time.perf_counter() - started)
+    return faq_hits, scheme_hits
+
+
+def _snippet(text: str, limit: int = 160) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def _scheme_lines(schemes: List[dict], labels: Dict[str, str]) -> List[str]:
+    lines = []
+    for i, scheme in enumerate(schemes):
+        lines.append(f"• {scheme.get('title', '')} - {_snippet(scheme.get('description', ''))}")
+        if i == 0 and scheme.get("benefits"):
+            lines.append(f"  {labels['benefits']}: {_snippet(scheme['benefits'])}")
+        if i == 0 and scheme.get("apply_link"):
+            lines.append(f"  {labels['apply']}: {scheme['apply_link']}")
+    return lines
+
+
+def grounded_reply(query: str, lang: str) -> Optional[ChatResponse]:
+    """Reply templated from the best FAQ/scheme hits, or None if nothing is close enough"""
+    faq_hits, scheme_hits = retrieve(query)
+    if not faq_hits and not scheme_hits:
+        return None
+    labels = TEMPLATES.get(lang, TEMPLATES["en"])
+    best_faq = faq_hits[0][1] if faq_hits else 0.0
+    best_scheme = scheme_hits[0][1] if scheme_hits else 0.0
+    schemes = [scheme for scheme, _ in scheme_hits]
+
+    if faq_hits and best_faq + FAQ_PREFERENCE >= best_scheme:
+        faq = faq_hits[0][0]
+        lines = [faq.get("answer", "")]
+        if schemes:
+            lines += ["", labels["related"]] + [f"• {scheme.get('title', '')}" for scheme in schemes]
+        intent = "faq"
+        sources = [{"type": "faq", "id": faq.get("id"), "title": faq.get("question", ""), "score": round(best_faq, 4)}]
+    else:
+        lines = [labels["schemes"]] + _scheme_lines(schemes, labels)
+        intent = "schemes_search"
+        sources = []
+    sources += [
+        {"type": "scheme", "id": scheme.get("id"), "title": scheme.get("title", ""), "score": round(score, 4)}
+        for scheme, score in scheme_hits
+    ]
+    return ChatResponse(reply="\n".join(lines), intent=intent, sources=sources)
+
+
+def answer(query: str) -> ChatResponse:
+    lang = detect_language(query)
+    data = load_language(lang)
+    intent, score = score_intent(query, data)
+    if intent != "unknown" and score >= STRONG_INTENT_SCORE:
+        return ChatResponse(reply=data["intents"][intent]["response"], intent=intent)
+
+    grounded = grounded_reply(query, lang) if normalize_query(query) else None
+    if grounded is not None:
+        return grounded
+    # Weak intent match (or none at all) when retrieval found nothing either
+    return ChatResponse(reply=data["intents"].get(intent, data["intents"]["unknown"])["response"], intent=intent)
+
+
+def cached_answer(query: str) -> ChatResponse:
+    key = (
+        normalize_query(query) or query.strip(), faq_catalog.current().etag, schemes_catalog.current().etag,
+        tuple(f.generation() for f in INTENT_FILES.values()),
+    )
+    with _REPLIES_LOCK:
+        reply = _REPLIES.get(key)
+        if reply is not None:
+            _REPLIES.move_to_end(key)
+    cache_lookup("chatbot", reply)
+    if reply is None:
+        reply = answer(query)
+        with _REPLIES_LOCK:
+            _REPLIES[key] = reply
+            if len(_REPLIES) > CHAT_CACHE_SIZE:
+                _REPLIES.popitem(last=False)
+    return reply
 
 
 @router.post("/message", response_model=ChatResponse)
 def chatbot_message(req: ChatRequest):
-    lang = detect_language(req.query)
-    data = load_language(lang)
+    """
+    Curated intent reply when the question clearly matches an intent, otherwise a
+    reply built from the closest FAQ and schemes (precomputed vector indexes).
+    Replies are cached per normalized query and FAQ/scheme catalog version.
+    """
+    return cached_answer(req.query)
+
+
+# --- Session chat (WebSocket / SSE) ---
+MAX_QUERY_CHARS = 500
+
+# Follow-up questions about the scheme under discussion ("how to apply?", "कौन पात्र है?")
+FOLLOW_UPS = {
+    "apply": re.compile(r"\b(apply|application|register|registration|avedan|link|website)\b|आवेदन|पंजीकरण"),
+    "eligibility": re.compile(r"\b(eligib\w*|qualify|criteria|patrata|yogyata)\b|पात्र|योग्य"),
+    "benefits": re.compile(r"\b(benefits?|amount|much|kitna|labh|milega)\b|लाभ|कितना|मिलेगा"),
+}
+# Words that refer back to the topic instead of naming a new one
+FOLLOW_UP_FILLERS = frozenset(
+    "how what who where when can i am are we my me you do does is it this that scheme yojana for to the a "
+    "of get much tell more about "
+    "kaise kya kaun kahan iske uske liye karen kare hai me mein "
+    "कैसे क्या कौन कहाँ इसके उसके लिए करें है में योजना".split()
+)
+# Curated intents that are about one scheme
+INTENT_TOPICS = {"pmkisan": "pm_kisan", "ayushman": "ayushman_bharat"}
+FOLLOW_UP_LABELS = {
+    "en": {"apply": "How to apply", "eligibility": "Eligibility", "benefits": "Benefits"},
+    "hi": {"apply": "आवेदन कैसे करें", "eligibility": "पात्रता", "benefits": "लाभ"},
+}
+SCHEME_FIELDS = {"apply": "apply_link", "eligibility": "eligibility", "benefits": "benefits"}
+
+
+def follow_up_kind(query: str) -> Optional[str]:
+    """Kind of follow-up if `query` asks about the current topic without naming a new one"""
+    q = query.lower()
+    for kind, pattern in FOLLOW_UPS.items():
+        if pattern.search(q):
+            words = normalize_query(pattern.sub(" ", q)).split()
+            if all(w in FOLLOW_UP_FILLERS for w in words):
+                return kind
+    return None
+
+
+def scheme_by_id(scheme_id: str) -> Optional[dict]:
+    encoded = schemes_catalog.current()
+    rows = encoded.index(schemes_catalog.items).rows
+    # First occurrence wins for the few ids listed twice
+    by_id = encoded.derived("by_id", lambda: {s.get("id"): s for s in reversed(rows)})
+    return by_id.get(scheme_id)
+
+
+schemes_catalog.warm_with("by_id", lambda: scheme_by_id(""))
+
+
+def session_answer(session: ChatSession, query: str) -> ChatResponse:
+    """Answer `query` in the context of `session` and update the session"""
+    session.lang = detect_language(query)
+    kind = follow_up_kind(query)
+    scheme = scheme_by_id(session.topic) if kind and session.topic else None
+    if scheme is not None:
+        labels = FOLLOW_UP_LABELS.get(session.lang, FOLLOW_UP_LABELS["en"])
+        reply = ChatResponse(
+            reply=f"{scheme.get('title', '')}\n{labels[kind]}: {scheme.get(SCHEME_FIELDS[kind], '')}",
+            intent=f"followup_{kind}",
+            sources=[{"type": "scheme", "id": scheme.get("id"), "title": scheme.get("title", "")}],
+        )
+    else:
+        reply = cached_answer(query)
+        schemes = [s["id"] for s in reply.sources if s["type"] == "scheme"]
+        topic = INTENT_TOPICS.get(reply.intent) or (schemes[0] if schemes else None)
+        if topic:
+            session.topic = topic
+    session.intents.append(reply.intent)
+    return reply
+
+
+def reply_chunks(text: str) -> List[str]:
+    """Split a reply into paragraph chunks, each sent as soon as the client can take it"""
+    parts = text.split("\n\n")
+    return [part + "\n\n" for part in parts[:-1]] + [parts[-1]]
+
+
+async def stream_reply(session: ChatSession, query: str):
+    """(event, data) pairs: start, one chunk per paragraph, end"""
+    reply = await run_in_threadpool(session_answer, session, query)
+    yield "start", {"session_id": session.id, "intent": reply.intent}
+    for chunk in reply_chunks(reply.reply):
+        yield "chunk", {"text": chunk}
+        # Let other sessions on this worker interleave between chunks
+        await asyncio.sleep(0)
+    yield "end", {"intent": reply.intent, "sources": reply.sources, "recent_intents": list(session.intents)}
+
+
+@router.websocket("/ws")
+async def chatbot_ws(websocket: WebSocket, session_id: Optional[str] = None):
+    """
+    Chat channel: send {"query": "..."} (or plain text), receive
+    {"type": "start"|"chunk"|"end", ...} messages per reply. The session keeps
+    the language and current topic, so follow-ups like "how to apply?" work.
+    Reconnect with ?session_id=... to resume a session; an unknown or expired
+    id gets a new session, announced in a {"type": "session"} message.
+    """
+    await websocket.accept()
+    session = sessions.get(session_id)
+    await websocket.send_json({"type": "session", "session_id": session.id})
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                message = json.loads(raw)
+                query = message.get("query", "") if isinstance(message, dict) else str(message)
+            except ValueError:
+                query = raw
+            query = str(query).strip()
+            if not query or len(query) > MAX_QUERY_CHARS:
+                await websocket.send_json({"type": "error", "detail": f"query must be 1-{MAX_QUERY_CHARS} characters"})
+                continue
+            # Re-fetch so an idle session's TTL is refreshed (or it is recreated, under a new id, if it expired)
+            previous_id = session.id
+            session = sessions.get(previous_id)
+            if session.id != previous_id:
+                await websocket.send_json({"type": "session", "session_id": session.id})
+            async for event, data in stream_reply(session, query):
+                await websocket.send_json({"type": event, **data})
+    except WebSocketDisconnect:
+        pass
+
+
+@router.get("/stream")
+async def chatbot_stream(q: str = Query(..., min_length=1, max_length=MAX_QUERY_CHARS),
+                         session_id: Optional[str] = None):
+    """Server-Sent Events variant of /ws for one question (EventSource-friendly)"""
+    session = sessions.get(session_id)
 
-    intent = match_intent(req.query, data)
-    response = data["intents"].get(intent, data["intents"]["unknown"])['response']
+    async def events():
+        async for event, data in stream_reply(session, q.strip()):
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-    return ChatResponse(
-        reply=response,
-        intent=intent
+    return StreamingResponse(
+        events(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
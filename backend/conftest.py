@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Backend modules use flat imports (`import models`, `from auth_service import ...`)
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+os.environ.setdefault("JWT_SECRET", "test-secret")
+
+# Keep test runs away from the real database and logs
+_TMP_DIR = tempfile.mkdtemp(prefix="ruralassist-test-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_TMP_DIR}/test.db")
+os.environ.setdefault("ACTIVITY_LOG_PATH", f"{_TMP_DIR}/activity_log.jsonl")
+os.environ.setdefault("SEMANTIC_INDEX_DIR", f"{_TMP_DIR}/semantic_index")
+os.environ.setdefault("DATA_SNAPSHOT_DIR", f"{_TMP_DIR}/snapshots")
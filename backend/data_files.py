@@ -0,0 +1,297 @@
+"""
+Hot-reloaded JSON knowledge files (schemes, FAQs, scam keywords, common
+scams, chatbot intents).
+
+Each file is a DataFile. Its parsed value lives in an immutable snapshot,
+and readers take the current snapshot with one attribute read.
+
+Once `watcher.start()` has run (main.py's lifespan), a single background
+thread owns reloading. It wakes on filesystem events via `watchfiles`
+(inotify) when installed, and otherwise polls every DATA_WATCH_INTERVAL
+seconds. For a changed file it:
+
+1. parses the new file; on a parse error it keeps the old snapshot;
+2. stages it: within the watcher thread the file's readers and its
+   catalogs (catalog.CatalogCache) already see the new data, so the
+   registered warmers rebuild derived indexes (FAQ vote merge, facet
+   bitmaps, vectors, ...) there;
+3. swaps the snapshot and the prepared catalog encodings in while holding
+   the catalogs' locks.
+
+Requests therefore never see a half-built index and never pay for a reload.
+Without the watcher (scripts, tests, DATA_WATCH=off) a DataFile stats its
+file on each read and reloads inline, as the catalogs did before.
+
+    FAQ_FILE = data_file(FAQ_DB_PATH, compact=True)
+    FAQ_FILE.value                      # parsed JSON (None if the file is missing)
+    FAQ_FILE.derived("merged", build)   # built once per snapshot
+    FAQ_FILE.add_catalog(faq_catalog)   # rebuilt and swapped together with the file
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import data_snapshot
+from metrics import JSON_IO_SECONDS, Counter
+from profiling import stage
+
+DATA_WATCH = os.getenv("DATA_WATCH", "auto").lower()  # auto | poll | off
+DATA_WATCH_INTERVAL = float(os.getenv("DATA_WATCH_INTERVAL", "2"))
+
+DATA_RELOADS = Counter("ruralassist_data_reloads_total", "Knowledge file reloads", ("file", "result"))
+
+_MISSING = object()
+
+
+class _Snapshot:
+    __slots__ = ("value", "signature", "_derived", "_lock")
+
+    def __init__(self, value: Any, signature: Hashable):
+        self.value = value
+        self.signature = signature
+        self._derived: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+
+def _signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class DataFile:
+    def __init__(self, path: Path, default: Any = None, compact: bool = False):
+        self.path = Path(path)
+        self.default = default
+        # Back the value with a shared mmap snapshot (see data_snapshot.py)
+        self.compact = compact
+        self.catalogs: List[Any] = []
+        self.warmers: List[Callable[[], Any]] = []
+        self._snapshot: Optional[_Snapshot] = None
+        self._staging: Optional[Tuple[int, _Snapshot]] = None
+        self._reload_lock = threading.Lock()
+
+    # ---------- readers ----------
+
+    def snapshot(self) -> _Snapshot:
+        staging = self._staging
+        if staging is not None and staging[0] == threading.get_ident():
+            return staging[1]
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._reload_lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load()
+            return self._snapshot
+        if not watcher.running and _signature(self.path) != snapshot.signature:
+            # No watcher: swap inline and let catalogs rebuild lazily. Never
+            # wait behind a reload in progress (it may need a catalog lock we hold).
+            if self._reload_lock.acquire(blocking=False):
+                try:
+                    staged = self._try_load()
+                    if staged is not None:
+                        self._snapshot = staged
+                finally:
+                    self._reload_lock.release()
+            snapshot = self._snapshot
+        return snapshot
+
+    @property
+    def value(self) -> Any:
+        return self.snapshot().value
+
+    def generation(self) -> Hashable:
+        """Changes when a new snapshot is swapped in (use as a CatalogCache generation)"""
+        return self.snapshot().signature
+
+    def derived(self, name: str, factory: Callable[[Any], Any]) -> Any:
+        """factory(value), built once per snapshot"""
+        snapshot = self.snapshot()
+        value = snapshot._derived.get(name, _MISSING)
+        if value is _MISSING:
+            with snapshot._lock:
+                value = snapshot._derived.get(name, _MISSING)
+                if value is _MISSING:
+                    value = snapshot._derived[name] = factory(snapshot.value)
+        return value
+
+    # ---------- reloading ----------
+
+    def add_catalog(self, catalog):
+        """Rebuild `catalog` (generation=self.generation) off the request path on reload"""
+        self.catalogs.append(catalog)
+
+    def on_reload(self, warmer: Callable[[], Any]):
+        """Call `warmer` against each new snapshot before it is swapped in"""
+        self.warmers.append(warmer)
+
+    def _load(self) -> _Snapshot:
+        signature = _signature(self.path)
+        if signature is None:
+            return _Snapshot(self.default, None)
+        with JSON_IO_SECONDS.labels(self.path.name, "load").time(), stage("json_load"):
+            if self.compact and data_snapshot.DATA_SNAPSHOTS:
+                value = data_snapshot.load(self.path, signature)
+            else:
+                with self.path.open("r", encoding="utf-8") as f:
+                    value = json.load(f)
+        return _Snapshot(value, signature)
+
+    def _try_load(self) -> Optional[_Snapshot]:
+        """The next snapshot, or None (logged) if the file cannot be parsed"""
+        try:
+            staged = self._load()
+        except (OSError, ValueError) as e:
+            DATA_RELOADS.labels(self.path.name, "error").inc()
+            print(f"⚠️ Keeping previous {self.path.name}: {e}")
+            return None
+        DATA_RELOADS.labels(self.path.name, "ok").inc()
+        return staged
+
+    def reload(self) -> bool:
+        """
+        Parse the file, rebuild everything derived from it and swap it all in;
+        False if the file could not be parsed (the previous snapshot stays).
+        """
+        if self._snapshot is None:
+            self.snapshot()
+            return True
+        with self._reload_lock:
+            if _signature(self.path) == self._snapshot.signature:
+                return True  # another thread got here first
+            staged = self._try_load()
+            if staged is None:
+                return False
+            self._staging = (threading.get_ident(), staged)
+            try:
+                with stage("reload"):
+                    for warm in self.warmers:
+                        _warm(self.path.name, warm)
+                    prepared = [(catalog, catalog.prepare()) for catalog in self.catalogs]
+                    for catalog in self.catalogs:
+                        _warm(self.path.name, catalog.warm)
+                locks = [catalog._lock for catalog in self.catalogs]
+                for lock in locks:
+                    lock.acquire()
+                try:
+                    self._snapshot = staged
+                    for catalog, encoded in prepared:
+                        catalog.publish(encoded)
+                finally:
+                    for lock in reversed(locks):
+                        lock.release()
+            finally:
+                self._staging = None
+                for catalog in self.catalogs:
+                    catalog.discard_staged()
+            return True
+
+    def repoint(self, path: Path):
+        """Serve this file from `path` from now on (load tests, fixtures); loaded on next read"""
+        with self._reload_lock:
+            self.path = Path(path)
+            self._snapshot = None
+
+    def disk_generation(self) -> Hashable:
+        """generation() of the file as it is on disk now (may be ahead of the served snapshot)"""
+        return _signature(self.path)
+
+    def changed(self) -> bool:
+        snapshot = self._snapshot
+        return snapshot is not None and _signature(self.path) != snapshot.signature
+
+
+def _warm(name: str, warm: Callable[[], Any]):
+    # A failed warmer only means that index is built lazily on first use
+    try:
+        warm()
+    except Exception as e:
+        print(f"⚠️ Rebuilding indexes for {name} failed: {e}")
+
+
+FILES: Dict[Path, DataFile] = {}
+
+
+def data_file(path: Path, default: Any = None, compact: bool = False) -> DataFile:
+    """The shared DataFile for `path` (one per file per process)"""
+    path = Path(path).resolve()
+    if path not in FILES:
+        FILES[path] = DataFile(path, default, compact)
+    return FILES[path]
+
+
+class DataWatcher:
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, mode: str = DATA_WATCH):
+        if mode == "off" or self.running:
+            return
+        # Load everything once so the thread only ever handles changes
+        for f in list(FILES.values()):
+            f.snapshot()
+        watchfiles = None
+        if mode == "auto":
+            try:
+                import watchfiles  # optional (comes with uvicorn[standard]); polling is the fallback
+            except ImportError:
+                pass
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._watch_events if watchfiles else self._poll, args=(watchfiles,) if watchfiles else (),
+            name="data-watcher", daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def check(self) -> int:
+        """Reload every changed file; returns how many were reloaded"""
+        reloaded = 0
+        for f in list(FILES.values()):
+            if f.changed():
+                try:
+                    reloaded += f.reload()
+                except Exception as e:
+                    print(f"⚠️ Reloading {f.path.name} failed: {e}")
+        return reloaded
+
+    def _poll(self):
+        while not self._stop.wait(DATA_WATCH_INTERVAL):
+            self.check()
+
+    def _watch_events(self, watchfiles):
+        # Watch directories, not files: editors and os.replace() swap the inode
+        directories = sorted({str(f.path.parent) for f in FILES.values()})
+        try:
+            for _ in watchfiles.watch(*directories, stop_event=self._stop, debounce=200, rust_timeout=0):
+                self.check()
+        except Exception as e:
+            print(f"⚠️ File watcher failed ({e}); polling instead")
+            self._poll()
+
+
+watcher = DataWatcher()
+
+
+def write_json_atomic(path: Path, data: Any):
+    """Write JSON via a temp file + rename so readers and the watcher never see a partial file"""
+    path = Path(path)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False, default=data_snapshot.plain)
+    os.replace(tmp, path)
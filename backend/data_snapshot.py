@@ -0,0 +1,369 @@
+"""
+Compact binary snapshots of the JSON catalogs, shared between workers.
+
+schemes_db.json, faq_db.json, common_scams.json (lists of objects) and
+scam_keywords.json (an object of such lists) are compiled into one file
+each under DATA_SNAPSHOT_DIR:
+
+    b"RASNAP01" | u32 directory length | directory (JSON) | data
+    data: strings   u32 offsets[n + 1] + UTF-8 blob (every distinct string once)
+          pool      u32 words for string lists: [count, string id, ...]
+          tables    per table, rows x fields x (u32 kind, u32 ref)
+          id order  per table, u32 row numbers sorted by (id, row)
+
+Workers memory-map the snapshot read-only, so its pages are shared through
+the page cache instead of every worker holding its own dict tree. A table is
+a list of Record shells (read-only Mappings) that decode a field each time
+it is read and keep nothing, so the heap stays small however many records
+are read or serialized. Strings, string lists and 32-bit ints are stored
+directly; any other value is stored as compact JSON text and parsed on read
+(the last JSON_CACHE_SIZE parsed values per table are kept).
+Hot loops that read the same fields of every row on each request (search
+kernels) keep what they need via `RecordTable.derived()`, built once per
+snapshot table.
+`Record.to_json()` writes a record's JSON straight from the mapped bytes
+(catalog.dumps uses it); `plain()` turns records back into dicts for other
+serializers (data_files.write_json_atomic).
+
+A snapshot records its source's (mtime_ns, size). `load()` recompiles it
+when the JSON file has changed, writing a temp file and renaming it, so
+workers still mapping the previous snapshot are unaffected.
+`python data_snapshot.py` compiles every catalog ahead of time (the deploy build
+step); otherwise the first worker to load a catalog compiles it.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from pydantic_core import SchemaSerializer, core_schema
+
+DATA_SNAPSHOTS = os.getenv("DATA_SNAPSHOTS", "1") == "1"
+DATA_SNAPSHOT_DIR = Path(os.getenv("DATA_SNAPSHOT_DIR", Path(__file__).parent / ".snapshots"))
+CATALOG_FILES = ("schemes_db.json", "faq_db.json", "common_scams.json", "scam_keywords.json")
+
+MAGIC = b"RASNAP01"
+_HEADER = struct.Struct("<8sI")
+_ALIGN = 8
+
+# Slot kinds
+_ABSENT, _STR, _STR_LIST, _INT, _JSON = range(5)
+_INT_MIN, _INT_MAX = -(1 << 31), (1 << 31) - 1
+# Parsed JSON-slot values kept per table (most recently used)
+JSON_CACHE_SIZE = 256
+_json_str = json.encoder.encode_basestring  # '"..."', non-ASCII kept (C-accelerated)
+
+_MISSING = object()
+
+
+class Record(Mapping):
+    """One row of a snapshot table; fields are decoded from the mapping on every access"""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table: "RecordTable", row: int):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, key: str) -> Any:
+        return self._table._decode(self._row, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        return iter(self._table._keys(self._row))
+
+    def __len__(self) -> int:
+        return len(self._table._keys(self._row))
+
+    def copy(self) -> Dict[str, Any]:
+        return dict(self)
+
+    def to_json(self) -> bytes:
+        """Compact JSON of the record, written from the mapped bytes"""
+        return self._table._json(self._row)
+
+    def __repr__(self) -> str:
+        return f"Record({dict(self)!r})"
+
+
+# FastAPI serializes response_model bodies with pydantic, which needs to be told records are dicts
+Record.__pydantic_serializer__ = SchemaSerializer(
+    core_schema.any_schema(serialization=core_schema.plain_serializer_function_ser_schema(dict))
+)
+
+
+class RecordTable(list):
+    """A list of Records backed by the mapped file; `id_order` is the prebuilt (id, row) order"""
+
+    def __init__(self, snapshot: "Snapshot", offset: int, count: int, order_offset: int):
+        super().__init__()
+        self._snapshot = snapshot
+        self._fields = len(snapshot.fields)
+        self._slots = snapshot.words(offset, count * self._fields * 2)
+        self.id_order = snapshot.words(order_offset, count)
+        self._parsed: "OrderedDict[int, Any]" = OrderedDict()  # string id -> parsed JSON
+        self._parsed_lock = threading.Lock()
+        self._derived: Dict[str, Any] = {}
+        self.extend(Record(self, row) for row in range(count))
+
+    def derived(self, name: str, factory: Callable[[], Any]) -> Any:
+        """factory(), built once for this table (e.g. per-row search text)"""
+        value = self._derived.get(name, _MISSING)
+        if value is _MISSING:
+            with self._parsed_lock:
+                value = self._derived.get(name, _MISSING)
+                if value is _MISSING:
+                    value = self._derived[name] = factory()
+        return value
+
+    def _parse(self, ref: int) -> Any:
+        with self._parsed_lock:
+            value = self._parsed.get(ref, _MISSING)
+            if value is not _MISSING:
+                self._parsed.move_to_end(ref)
+                return value
+        value = json.loads(self._snapshot.string(ref))
+        with self._parsed_lock:
+            self._parsed[ref] = value
+            if len(self._parsed) > JSON_CACHE_SIZE:
+                self._parsed.popitem(last=False)
+        return value
+
+    def _decode(self, row: int, key: str) -> Any:
+        field = self._snapshot.field_ids[key]  # KeyError for unknown fields
+        base = (row * self._fields + field) * 2
+        kind, ref = self._slots[base], self._slots[base + 1]
+        snapshot = self._snapshot
+        if kind == _STR:
+            return snapshot.string(ref)
+        if kind == _STR_LIST:
+            pool = snapshot.pool
+            return [snapshot.string(i) for i in pool[ref + 1:ref + 1 + pool[ref]]]
+        if kind == _INT:
+            return ref - (1 << 32) if ref > _INT_MAX else ref
+        if kind == _JSON:
+            return self._parse(ref)
+        raise KeyError(key)
+
+    def _json(self, row: int) -> bytes:
+        snapshot = self._snapshot
+        slots, pool = self._slots, snapshot.pool
+        base = row * self._fields * 2
+        parts = []
+        for f, name in enumerate(snapshot.fields):
+            kind, ref = slots[base + f * 2], slots[base + f * 2 + 1]
+            if kind == _ABSENT:
+                continue
+            if kind == _STR:
+                value = _json_str(snapshot.string(ref))
+            elif kind == _STR_LIST:
+                value = "[" + ",".join(_json_str(snapshot.string(i)) for i in pool[ref + 1:ref + 1 + pool[ref]]) + "]"
+            elif kind == _INT:
+                value = str(ref - (1 << 32) if ref > _INT_MAX else ref)
+            else:  # _JSON: the stored text is already JSON
+                value = snapshot.string(ref)
+            parts.append(f"{_json_str(name)}:{value}")
+        return ("{" + ",".join(parts) + "}").encode("utf-8")
+
+    def _keys(self, row: int) -> List[str]:
+        base = row * self._fields * 2
+        slots = self._slots
+        return [name for f, name in enumerate(self._snapshot.fields) if slots[base + f * 2] != _ABSENT]
+
+
+class Snapshot:
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            magic, length = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a data snapshot")
+            self.directory = json.loads(f.read(length))
+            # The mapping stays valid after the file is closed (and after it is replaced)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.directory.get("byteorder") != sys.byteorder:
+            raise ValueError(f"{path} was compiled on a {self.directory.get('byteorder')}-endian machine")
+        self._data = memoryview(self._map)[_aligned(_HEADER.size + length):]
+        self.source = tuple(self.directory["source"]) if self.directory["source"] else None
+        self.fields: List[str] = self.directory["fields"]
+        self.field_ids = {name: i for i, name in enumerate(self.fields)}
+        offsets, count, blob, size = self.directory["strings"]
+        self._offsets = self.words(offsets, count + 1)
+        self._blob = self._data[blob:blob + size]
+        self.pool = self.words(*self.directory["pool"])
+
+    def words(self, offset: int, count: int) -> memoryview:
+        return self._data[offset:offset + count * 4].cast("I")
+
+    def string(self, i: int) -> str:
+        return str(self._blob[self._offsets[i]:self._offsets[i + 1]], "utf-8")
+
+    def value(self) -> Any:
+        tables = {name: RecordTable(self, *spec) for name, spec in self.directory["tables"].items()}
+        return tables[""] if self.directory["shape"] == "list" else tables
+
+
+def _aligned(n: int) -> int:
+    return -(-n // _ALIGN) * _ALIGN
+
+
+def _tables(value: Any) -> Optional[Dict[str, list]]:
+    """{table name: rows} for a list of objects or an object of such lists, else None"""
+    tables = {"": value} if isinstance(value, list) else value
+    if not isinstance(tables, dict):
+        return None
+    for rows in tables.values():
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            return None
+    return tables
+
+
+def compile_snapshot(value: Any, source: Hashable, path: Path) -> bool:
+    """Write `value` as a snapshot at `path`; False if its shape cannot be compiled"""
+    tables = _tables(value)
+    if tables is None:
+        return False
+
+    strings: Dict[str, int] = {}
+    pool = array("I")
+
+    def intern(s: str) -> int:
+        i = strings.get(s)
+        if i is None:
+            i = strings[s] = len(strings)
+        return i
+
+    fields = list(dict.fromkeys(key for rows in tables.values() for row in rows for key in row))
+    encoded_tables = {}
+    for name, rows in tables.items():
+        slots = array("I")
+        for row in rows:
+            for field in fields:
+                v = row.get(field, _MISSING)
+                if v is _MISSING:
+                    slots.extend((_ABSENT, 0))
+                elif isinstance(v, str):
+                    slots.extend((_STR, intern(v)))
+                elif isinstance(v, list) and all(isinstance(s, str) for s in v):
+                    slots.extend((_STR_LIST, len(pool)))
+                    pool.append(len(v))
+                    pool.extend(intern(s) for s in v)
+                elif type(v) is int and _INT_MIN <= v <= _INT_MAX:
+                    slots.extend((_INT, v & 0xFFFFFFFF))
+                else:
+                    slots.extend((_JSON, intern(json.dumps(v, ensure_ascii=False, separators=(",", ":")))))
+        order = array("I", sorted(range(len(rows)), key=lambda r: (str(rows[r].get("id", "")), r)))
+        encoded_tables[name] = (slots, order, len(rows))
+
+    blobs = [s.encode("utf-8") for s in strings]
+    offsets = array("I", [0])
+    for b in blobs:
+        offsets.append(offsets[-1] + len(b))
+
+    sections: List[bytes] = []
+    position = 0
+
+    def add(data: bytes) -> int:
+        nonlocal position
+        start = position
+        padded = data + b"\0" * (_aligned(len(data)) - len(data))
+        sections.append(padded)
+        position += len(padded)
+        return start
+
+    directory = {
+        "version": 1,
+        "byteorder": sys.byteorder,
+        "source": list(source) if source else None,
+        "shape": "list" if isinstance(value, list) else "object",
+        "fields": fields,
+        "strings": [add(offsets.tobytes()), len(blobs), add(b"".join(blobs)), offsets[-1]],
+        "pool": [add(pool.tobytes()), len(pool)],
+        "tables": {},
+    }
+    for name, (slots, order, count) in encoded_tables.items():
+        directory["tables"][name] = [add(slots.tobytes()), count, add(order.tobytes())]
+
+    header = json.dumps(directory, ensure_ascii=False).encode("utf-8")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(header)) + header)
+        f.write(b"\0" * (_aligned(_HEADER.size + len(header)) - _HEADER.size - len(header)))
+        for section in sections:
+            f.write(section)
+    os.replace(tmp, path)
+    return True
+
+
+def snapshot_path(json_path: Path) -> Path:
+    return DATA_SNAPSHOT_DIR / (Path(json_path).stem + ".snap")
+
+
+def open_snapshot(path: Path, source: Hashable = None) -> Optional[Snapshot]:
+    """The snapshot at `path` if it exists, is readable and (given `source`) is current"""
+    try:
+        snapshot = Snapshot(path)
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+    if source is not None and snapshot.source != tuple(source):
+        return None
+    return snapshot
+
+
+def load(json_path: Path, source: Hashable) -> Any:
+    """
+    The contents of `json_path` (whose signature is `source`) backed by its
+    snapshot, compiling it first if it is missing or stale. Files that are not
+    lists of objects are returned as plain parsed JSON.
+    """
+    path = snapshot_path(json_path)
+    snapshot = open_snapshot(path, source)
+    if snapshot is None:
+        with open(json_path, "r", encoding="utf-8") as f:
+            value = json.load(f)
+        try:
+            if not compile_snapshot(value, source, path):
+                return value
+        except OSError as e:
+            print(f"⚠️ Could not write snapshot for {Path(json_path).name}: {e}")
+            return value
+        snapshot = open_snapshot(path)
+        if snapshot is None:
+            return value
+    return snapshot.value()
+
+
+def plain(obj: Any) -> Any:
+    """json/orjson `default` hook: records become dicts"""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    return str(obj)
+
+
+def _signature(path: Path) -> Hashable:
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+if __name__ == "__main__":
+    base = Path(__file__).parent
+    for name in sys.argv[1:] or CATALOG_FILES:
+        json_path = base / name
+        if not json_path.exists():
+            print(f"skipped {name} (not found)")
+            continue
+        load(json_path, _signature(json_path))
+        print(f"compiled {name} -> {snapshot_path(json_path)}")
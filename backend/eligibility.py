@@ -0,0 +1,360 @@
+"""
+Scheme eligibility matching.
+
+Each scheme is compiled once into structured criteria (state, occupations,
+gender, age range, income ceiling, land holding), parsed from its free-text
+`eligibility`/`title` or taken from an explicit `criteria` annotation in
+schemes_db.json (which always wins over parsing). Parsed income ceilings for
+category terms (BPL, EWS, LIG, MIG, "low income") are approximations.
+
+EligibilityIndex turns the criteria into bitmaps (one bit per scheme, as in
+facet_index.py): per state/occupation/gender value, per age year, and
+cumulative bitmaps over the sorted income and land thresholds. Matching a
+profile is a handful of big-int ANDs, so a nightly run over thousands of
+profiles x thousands of schemes stays cheap:
+
+    python eligibility.py --out recommendations.jsonl
+
+Unknown profile attributes never exclude a scheme; they only lower its rank,
+because ranking counts the targeted criteria the profile is known to meet.
+"""
+
+import argparse
+import json
+import re
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from facet_index import FacetResult, norm
+
+MAX_AGE = 120
+HECTARE_ACRES = 2.471
+# Approximate annual household income ceilings (rupees) for category terms
+INCOME_TERMS = (
+    (re.compile(r"\bBPL\b|below poverty line"), 100_000),
+    (re.compile(r"\bEWS\b|economically weaker"), 300_000),
+    (re.compile(r"low(?:er)?[- ]income"), 300_000),
+    (re.compile(r"\bLIG\b|low income group"), 600_000),
+    (re.compile(r"\bMIG\b|middle income group"), 1_800_000),
+)
+SMALL_MARGINAL_ACRES = 2 * HECTARE_ACRES
+
+# Weights for ranking: how strongly a met criterion says "this scheme is for you"
+MATCH_WEIGHTS = {"state": 3, "occupation": 3, "gender": 2, "income": 2, "land": 2, "age": 1}
+
+OCCUPATIONS = {
+    "farmer": ("farmer", "cultivator", "kisan", "krishak", "landholding", "agricultur"),
+    "student": ("student", "scholarship", "school", "college", "academic", "coaching"),
+    "worker": ("worker", "labour", "labor", "unorganized", "unorganised", "manual work"),
+    "business": ("business", "entrepreneur", "enterprise", "msme", "startup", "self-employed", "shopkeeper"),
+    "fisher": ("fisher", "fishermen", "fishing"),
+    "artisan": ("artisan", "weaver", "craftsm"),
+    "unemployed": ("unemployed", "job seeker", "jobseeker"),
+}
+GENDERS = ("female", "male", "other")
+_FEMALE_RE = re.compile(r"\b(women|woman|girls?|female|widows?|mothers?|daughters?|pregnant)\b", re.I)
+_SOFT_RE = re.compile(r"priorit|prefer", re.I)
+# Mentions of women alongside these groups mean "also women", not "women only"
+_GENERAL_RE = re.compile(
+    r"\b(children|citizens|persons|people|old age|all|any|youth|students|farmers|households|families|parents|adults?|"
+    r"sc/st)\b", re.I,
+)
+
+STATE_ALIASES = {
+    "madhya pradesh": "mp",
+    "uttar pradesh": "up",
+    "tamil nadu": "tn",
+    "jammu and kashmir": "jammu_kashmir",
+    "jammu & kashmir": "jammu_kashmir",
+    "j&k": "jammu_kashmir",
+    "nct of delhi": "delhi",
+}
+NATIONWIDE = {"", "central", "all", "india", "national"}
+
+_AGE_PATTERNS = (
+    # "aged 18-40", "18 to 40 years", "between 18 and 35"
+    (re.compile(r"(?:aged?\s*|between\s*)?(\d{1,3})\s*(?:-|–|to|and)\s*(\d{1,3})\s*(?:years|yrs)?", re.I), "range"),
+    # "60+", "aged 60 years or above", "above 18 years"
+    (re.compile(r"(?:aged?\s*)?(\d{1,3})\s*\+|(\d{1,3})\s*(?:years|yrs)?\s*(?:or|and)\s*(?:above|older|more)"
+                r"|(?:above|over|at least|minimum age(?: of)?)\s*(\d{1,3})\s*(?:years|yrs)", re.I), "min"),
+    # "below 10 years", "up to 35 years", "under 18 years"
+    (re.compile(r"(?:below|under|up to|upto|less than|not more than)\s*(\d{1,3})\s*(?:years|yrs)", re.I), "max"),
+)
+_INCOME_RE = re.compile(
+    r"income[^.;₹]{0,40}?(?:below|less than|under|up to|upto|not exceeding|<|≤)\s*(?:₹|rs\.?|inr)?\s*"
+    r"(\d+(?:\.\d+)?)\s*(lakh|lac|crore)?",
+    re.I,
+)
+_HECTARE_RE = re.compile(r"(?:up to|upto|below|less than|<)\s*(\d+(?:\.\d+)?)\s*(hectares?|ha|acres?)", re.I)
+
+
+def normalize_state(value) -> str:
+    key = norm(value).replace("-", " ")
+    key = STATE_ALIASES.get(key, key)
+    return key.replace(" ", "_")
+
+
+def normalize_occupation(value) -> Optional[str]:
+    text = norm(value)
+    if not text:
+        return None
+    if text in OCCUPATIONS:
+        return text
+    for occupation, terms in OCCUPATIONS.items():
+        if any(term in text for term in terms):
+            return occupation
+    return text
+
+
+def _age_context(text: str, match) -> bool:
+    window = text[max(0, match.start() - 15): match.end() + 12].lower()
+    return "age" in window or "year" in window or "yrs" in window or "+" in match.group(0)
+
+
+def parse_criteria(scheme: Dict) -> Dict:
+    """Structured criteria for a scheme; keys are omitted when unconstrained"""
+    text = " ".join([scheme.get("eligibility", ""), scheme.get("title", "")])
+    lowered = text.lower()
+    criteria: Dict = {}
+
+    state = normalize_state(scheme.get("state"))
+    if state not in NATIONWIDE:
+        criteria["states"] = [state]
+
+    occupations = [occ for occ, terms in OCCUPATIONS.items()
+                   if any(term in scheme.get("eligibility", "").lower() for term in terms)]
+    if occupations:
+        criteria["occupations"] = occupations
+
+    category = norm(scheme.get("category"))
+    women_only = (
+        any(_FEMALE_RE.search(s) and not _SOFT_RE.search(s) for s in re.split(r"[.;]", text))
+        and not _GENERAL_RE.search(scheme.get("eligibility", ""))
+    )
+    if women_only or category in ("girl_child", "women_welfare"):
+        criteria["genders"] = ["female"]
+
+    min_ages, max_ages = [], []
+    for pattern, kind in _AGE_PATTERNS:
+        for m in pattern.finditer(text):
+            if not _age_context(text, m):
+                continue
+            numbers = [int(g) for g in m.groups() if g]
+            if kind == "range" and len(numbers) == 2 and numbers[0] < numbers[1] <= MAX_AGE:
+                min_ages.append(numbers[0])
+                max_ages.append(numbers[1])
+            elif kind == "min" and numbers and numbers[0] <= MAX_AGE:
+                min_ages.append(numbers[0])
+            elif kind == "max" and numbers and numbers[0] <= MAX_AGE:
+                max_ages.append(numbers[0])
+    if min_ages:
+        criteria["min_age"] = min(min_ages)
+    if max_ages:
+        criteria["max_age"] = max(max_ages)
+
+    ceilings = []
+    if "no income limit" not in lowered:
+        for m in _INCOME_RE.finditer(text):
+            amount = float(m.group(1))
+            unit = (m.group(2) or "").lower()
+            amount *= 10_000_000 if unit == "crore" else 100_000 if unit in ("lakh", "lac") else 1
+            ceilings.append(int(amount))
+        if not ceilings:
+            ceilings = [ceiling for pattern, ceiling in INCOME_TERMS if pattern.search(text)]
+    if ceilings:
+        criteria["max_income"] = max(ceilings)
+
+    if "landless" in lowered:
+        criteria["max_land_acres"] = 0.0
+    elif re.search(r"land ?holding|owning (?:cultivable )?land|with cultivable land|own(?:s|ing)? land", lowered):
+        criteria["requires_land"] = True
+    if "small and marginal" in lowered or "marginal farmer" in lowered:
+        criteria["max_land_acres"] = SMALL_MARGINAL_ACRES
+    m = _HECTARE_RE.search(text)
+    if m:
+        value = float(m.group(1))
+        criteria["max_land_acres"] = value * HECTARE_ACRES if m.group(2).lower().startswith("h") else value
+
+    # Explicit annotations in schemes_db.json win over parsing
+    criteria.update(scheme.get("criteria") or {})
+    return criteria
+
+
+class _Thresholds:
+    """Bitmaps of schemes whose ceiling is >= a value, over sorted distinct ceilings"""
+
+    def __init__(self, ceilings: List[Tuple[float, int]], unconstrained: int):
+        values = sorted({c for c, _ in ceilings})
+        self.values = values
+        self.unconstrained = unconstrained
+        # at_least[i] = schemes with ceiling >= values[i]
+        self.at_least = [0] * (len(values) + 1)
+        for ceiling, bit in ceilings:
+            self.at_least[bisect_left(values, ceiling)] |= bit
+        for i in range(len(values) - 1, -1, -1):
+            self.at_least[i] |= self.at_least[i + 1]
+
+    def allowing(self, value: float) -> int:
+        return self.unconstrained | self.at_least[bisect_left(self.values, value)]
+
+
+class EligibilityIndex:
+    def __init__(self, rows: List[Dict]):
+        self.rows = rows
+        self.criteria = [parse_criteria(row) for row in rows]
+        self.all_bits = (1 << len(rows)) - 1
+
+        self.nationwide = 0
+        self.by_state: Dict[str, int] = {}
+        self.any_occupation = 0
+        self.by_occupation: Dict[str, int] = {}
+        self.any_gender = 0
+        self.by_gender: Dict[str, int] = {}
+        self.needs_land = 0
+        self.targeted = {name: 0 for name in MATCH_WEIGHTS}
+        age_limits: List[Tuple[int, int, int]] = []
+        incomes: List[Tuple[float, int]] = []
+        lands: List[Tuple[float, int]] = []
+
+        for pos, c in enumerate(self.criteria):
+            bit = 1 << pos
+            if not self._index_values(bit, c.get("states"), self.by_state, normalize_state, "state"):
+                self.nationwide |= bit
+            if not self._index_values(bit, c.get("occupations"), self.by_occupation, normalize_occupation, "occupation"):
+                self.any_occupation |= bit
+            if not self._index_values(bit, c.get("genders"), self.by_gender, norm, "gender"):
+                self.any_gender |= bit
+            low, high = c.get("min_age", 0), c.get("max_age", MAX_AGE)
+            age_limits.append((low, high, bit))
+            if "min_age" in c or "max_age" in c:
+                self.targeted["age"] |= bit
+            if "max_income" in c:
+                incomes.append((float(c["max_income"]), bit))
+                self.targeted["income"] |= bit
+            if c.get("requires_land"):
+                self.needs_land |= bit
+                self.targeted["land"] |= bit
+            if "max_land_acres" in c:
+                lands.append((float(c["max_land_acres"]), bit))
+                self.targeted["land"] |= bit
+
+        self.by_age = [0] * (MAX_AGE + 1)
+        for low, high, bit in age_limits:
+            for age in range(max(0, low), min(MAX_AGE, high) + 1):
+                self.by_age[age] |= bit
+        self.income = _Thresholds(incomes, self.all_bits & ~self.targeted["income"])
+        self.land = _Thresholds(lands, self.all_bits & ~_bits_of(lands))
+
+    def _index_values(self, bit: int, values, index: Dict[str, int], normalize, target: str) -> bool:
+        """Set `bit` under each value; False if the criterion is unconstrained"""
+        if not values:
+            return False
+        self.targeted[target] |= bit
+        for value in values:
+            key = normalize(value)
+            if key:
+                index[key] = index.get(key, 0) | bit
+        return True
+
+    def eligible_bits(self, profile: Dict) -> int:
+        bits = self.all_bits
+        state = profile.get("state")
+        if state:
+            bits &= self.nationwide | self.by_state.get(normalize_state(state), 0)
+        occupation = normalize_occupation(profile.get("occupation"))
+        if occupation:
+            bits &= self.any_occupation | self.by_occupation.get(occupation, 0)
+        gender = norm(profile.get("gender"))
+        if gender:
+            bits &= self.any_gender | self.by_gender.get(gender, 0)
+        age = profile.get("age")
+        if age is not None:
+            bits &= self.by_age[max(0, min(MAX_AGE, int(age)))]
+        income = profile.get("annual_income")
+        if income is not None:
+            bits &= self.income.allowing(float(income))
+        land = profile.get("land_acres")
+        if land is not None:
+            bits &= self.land.allowing(float(land))
+            if float(land) <= 0:
+                bits &= ~self.needs_land
+        return bits
+
+    def match(self, profile: Dict, limit: Optional[int] = None) -> List[Tuple[int, int, List[str]]]:
+        """Ranked (row position, score, matched criteria) for the schemes a profile qualifies for"""
+        bits = self.eligible_bits(profile)
+        known = {
+            "state": bool(profile.get("state")),
+            "occupation": bool(profile.get("occupation")),
+            "gender": bool(profile.get("gender")),
+            "age": profile.get("age") is not None,
+            "income": profile.get("annual_income") is not None,
+            "land": profile.get("land_acres") is not None,
+        }
+        names = [name for name in MATCH_WEIGHTS if known[name]]
+        met = [bits & self.targeted[name] for name in names]
+
+        # Split the eligible set by which known criteria each scheme targets:
+        # at most 2^6 bitmaps, so cost does not grow with the number of matches.
+        by_score: Dict[int, List[Tuple[int, List[str]]]] = {}
+        for mask in range(1 << len(names)):
+            group = bits
+            for i, met_bits in enumerate(met):
+                group &= met_bits if mask >> i & 1 else ~met_bits
+                if not group:
+                    break
+            if group:
+                subset = [names[i] for i in range(len(names)) if mask >> i & 1]
+                score = sum(MATCH_WEIGHTS[name] for name in subset)
+                by_score.setdefault(score, []).append((group, subset))
+
+        ranked: List[Tuple[int, int, List[str]]] = []
+        for score in sorted(by_score, reverse=True):
+            groups = by_score[score]
+            union = 0
+            for group, _ in groups:
+                union |= group
+            remaining = None if limit is None else limit - len(ranked)
+            for pos in FacetResult(union, {}).positions(0, remaining):
+                subset = next(sub for group, sub in groups if (group >> pos) & 1)
+                ranked.append((pos, score, subset))
+            if limit is not None and len(ranked) >= limit:
+                break
+        return ranked
+
+
+def _bits_of(pairs: Iterable[Tuple[float, int]]) -> int:
+    bits = 0
+    for _, bit in pairs:
+        bits |= bit
+    return bits
+
+
+def run_batch(schemes_path: Path, out_path: Path, limit: int = 20) -> int:
+    """Write {"email", "attributes_version", "schemes": [ids]} per profile as JSON lines"""
+    import persistence
+
+    with open(schemes_path, "r", encoding="utf-8") as f:
+        index = EligibilityIndex(json.load(f))
+    count = 0
+    with open(out_path, "w", encoding="utf-8") as out:
+        for email, attributes, version in persistence.iter_profile_attributes():
+            ranked = index.match(attributes, limit)
+            out.write(json.dumps({
+                "email": email,
+                "attributes_version": version,
+                "schemes": [index.rows[pos]["id"] for pos, _, _ in ranked],
+            }) + "\n")
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank schemes for every profile (nightly notifications)")
+    parser.add_argument("--schemes", default=str(Path(__file__).parent / "schemes_db.json"))
+    parser.add_argument("--out", default="recommendations.jsonl")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    n = run_batch(Path(args.schemes), Path(args.out), args.limit)
+    print(f"✅ Wrote recommendations for {n} profiles to {args.out}")
@@ -0,0 +1,235 @@
+"""
+Async email outbox.
+
+Endpoints enqueue an EmailMessage and return immediately. A small pool of
+worker tasks drains the queue; each worker keeps one authenticated
+aiosmtplib.SMTP connection open and reuses it across messages, so the
+TCP + STARTTLS + AUTH handshake is paid once per connection instead of once
+per OTP. Failed sends are retried with exponential backoff and finally
+written to a dead-letter log.
+"""
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from email.message import EmailMessage
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import aiosmtplib
+
+BASE_DIR = Path(__file__).resolve().parent
+
+EMAIL_POOL_SIZE = int(os.getenv("EMAIL_POOL_SIZE", "2"))
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "3"))
+EMAIL_RETRY_BACKOFF = float(os.getenv("EMAIL_RETRY_BACKOFF", "1.0"))
+EMAIL_QUEUE_SIZE = int(os.getenv("EMAIL_QUEUE_SIZE", "1000"))
+# Servers usually drop idle sessions after a few minutes; probe with NOOP before reuse
+EMAIL_IDLE_PROBE_SECONDS = float(os.getenv("EMAIL_IDLE_PROBE_SECONDS", "60"))
+# How long shutdown waits for queued mail before dead-lettering the rest
+EMAIL_SHUTDOWN_TIMEOUT = float(os.getenv("EMAIL_SHUTDOWN_TIMEOUT", "10"))
+EMAIL_DEAD_LETTER_PATH = os.getenv("EMAIL_DEAD_LETTER_PATH", str(BASE_DIR / "email_dead_letter.jsonl"))
+
+# Send latency buckets (seconds)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _PooledConnection:
+    """One persistent SMTP session owned by a single worker"""
+
+    def __init__(self, outbox: "EmailOutbox"):
+        self.outbox = outbox
+        self.smtp: Optional[aiosmtplib.SMTP] = None
+        self.last_used = 0.0
+
+    async def ensure(self) -> aiosmtplib.SMTP:
+        if self.smtp is not None and self.smtp.is_connected:
+            if time.monotonic() - self.last_used < EMAIL_IDLE_PROBE_SECONDS:
+                return self.smtp
+            try:
+                await self.smtp.noop()
+                return self.smtp
+            except aiosmtplib.SMTPException:
+                await self.close()
+
+        ob = self.outbox
+        smtp = aiosmtplib.SMTP(hostname=ob.hostname, port=ob.port, start_tls=ob.start_tls, timeout=ob.timeout)
+        await smtp.connect()
+        if ob.username:
+            await smtp.login(ob.username, ob.password or "")
+        self.smtp = smtp
+        ob.metrics["connections_opened"] += 1
+        return smtp
+
+    async def send(self, message: EmailMessage):
+        smtp = await self.ensure()
+        await smtp.send_message(message)
+        self.last_used = time.monotonic()
+
+    async def close(self):
+        if self.smtp is None:
+            return
+        try:
+            if self.smtp.is_connected:
+                await self.smtp.quit()
+        except Exception:
+            self.smtp.close()
+        self.smtp = None
+
+
+class EmailOutbox:
+    def __init__(
+        self,
+        hostname: Optional[str],
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        start_tls: bool = True,
+        pool_size: int = EMAIL_POOL_SIZE,
+        max_retries: int = EMAIL_MAX_RETRIES,
+        retry_backoff: float = EMAIL_RETRY_BACKOFF,
+        dead_letter_path: str = EMAIL_DEAD_LETTER_PATH,
+        timeout: float = 30,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.dead_letter_path = Path(dead_letter_path)
+        self.timeout = timeout
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._connections: List[_PooledConnection] = []
+        self.metrics: Dict[str, float] = {
+            "enqueued": 0,
+            "sent": 0,
+            "retries": 0,
+            "dead_lettered": 0,
+            "connections_opened": 0,
+            "latency_sum": 0.0,
+        }
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    # ---------- lifecycle ----------
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self):
+        """Start workers on the running event loop (idempotent)"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=EMAIL_QUEUE_SIZE)
+        for i in range(self.pool_size):
+            conn = _PooledConnection(self)
+            self._connections.append(conn)
+            self._workers.append(asyncio.create_task(self._worker(conn), name=f"email-worker-{i}"))
+
+    async def stop(self, drain: bool = True, timeout: Optional[float] = None):
+        """
+        Optionally wait (up to `timeout` seconds) for queued mail, then close
+        workers and SMTP sessions. Mail still queued is dead-lettered.
+        """
+        if not self.running:
+            return
+        if drain:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"⚠️ Email outbox still had {self._queue.qsize()} queued message(s) after {timeout}s")
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        while not self._queue.empty():
+            message, attempt = self._queue.get_nowait()
+            self._dead_letter(message, RuntimeError("outbox stopped before delivery"), attempt)
+        for conn in self._connections:
+            await conn.close()
+        self._workers = []
+        self._connections = []
+        self._queue = None
+
+    async def join(self):
+        if self.running:
+            await self._queue.join()
+
+    # ---------- producer ----------
+
+    def enqueue(self, message: EmailMessage):
+        """Queue a message for delivery; never waits on SMTP"""
+        if not self.hostname:
+            raise RuntimeError("SMTP_HOST not configured")
+        if not self.running:
+            self.start()
+        self._queue.put_nowait((message, 0))
+        self.metrics["enqueued"] += 1
+
+    # ---------- consumer ----------
+
+    async def _worker(self, conn: _PooledConnection):
+        while True:
+            message, attempt = await self._queue.get()
+            try:
+                await self._deliver(conn, message, attempt)
+            except asyncio.CancelledError:
+                self._dead_letter(message, RuntimeError("outbox stopped before delivery"), attempt)
+                raise
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, conn: _PooledConnection, message: EmailMessage, attempt: int):
+        while True:
+            started = time.perf_counter()
+            try:
+                await conn.send(message)
+                self._observe_latency(time.perf_counter() - started)
+                self.metrics["sent"] += 1
+                return
+            except Exception as e:
+                # Drop the session; the next attempt reconnects
+                await conn.close()
+                attempt += 1
+                if attempt > self.max_retries:
+                    self._dead_letter(message, e, attempt)
+                    return
+                self.metrics["retries"] += 1
+                await asyncio.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+
+    def _observe_latency(self, seconds: float):
+        self.metrics["latency_sum"] += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.latency_buckets[i] += 1
+                return
+        self.latency_buckets[-1] += 1
+
+    def _dead_letter(self, message: EmailMessage, error: Exception, attempts: int):
+        self.metrics["dead_lettered"] += 1
+        # Never persist the body: it carries the OTP
+        entry = {
+            "to": message.get("To"),
+            "subject": message.get("Subject"),
+            "error": str(error),
+            "attempts": attempts,
+            "failed_at": datetime.utcnow().isoformat(),
+        }
+        print(f"❌ Email to {entry['to']} dead-lettered after {attempts} attempts: {error}")
+        try:
+            with self.dead_letter_path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"⚠️ Could not write email dead-letter log: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        data = dict(self.metrics)
+        data["queue_depth"] = self._queue.qsize() if self._queue is not None else 0
+        data["latency_count"] = sum(self.latency_buckets)
+        return data
@@ -1,6 +1,8 @@
 import os
 from email.message import EmailMessage
-import aiosmtplib
+
+from email_outbox import EmailOutbox
+from metrics import Gauge
 
 SMTP_HOST = os.getenv("SMTP_HOST")
 SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
@@ -8,12 +10,26 @@ SMTP_USERNAME = os.getenv("SMTP_USERNAME")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 SMTP_SENDER_EMAIL = os.getenv("SMTP_SENDER_EMAIL")
 SMTP_SENDER_NAME = os.getenv("SMTP_SENDER_NAME")
+SMTP_START_TLS = os.getenv("SMTP_START_TLS", "true").lower() != "false"
 
-print("SMTP USER:", os.getenv("SMTP_USERNAME"))
+# Shared outbox: pooled SMTP sessions, retries and dead-letter log
+outbox = EmailOutbox(
+    hostname=SMTP_HOST,
+    port=SMTP_PORT,
+    username=SMTP_USERNAME,
+    password=SMTP_PASSWORD,
+    start_tls=SMTP_START_TLS,
+)
 
+Gauge(
+    "ruralassist_email_outbox",
+    "Email outbox counters, queue depth and send latency totals",
+    ("stat",),
+    func=lambda: {(k,): v for k, v in outbox.stats().items()},
+)
 
 
-async def send_otp_email(to_email: str, otp: str):
+def build_otp_message(to_email: str, otp: str) -> EmailMessage:
     message = EmailMessage()
     message["From"] = f"{SMTP_SENDER_NAME} <{SMTP_SENDER_EMAIL}>"
     message["To"] = to_email
@@ -22,23 +38,10 @@ async def send_otp_email(to_email: str, otp: str):
     message.set_content(
         f"Your OTP is: {otp}\nThis OTP is valid for 5 minutes."
     )
+    return message
 
-    try:
-        await aiosmtplib.send(
-            message,
-            hostname=SMTP_HOST,
-            port=SMTP_PORT,
-            username=SMTP_USERNAME,
-            password=SMTP_PASSWORD,
-            start_tls=True,
-        )
-        print("OTP email sent successfully!")
 
-    except Exception as e:
-        print("Error sending email:", e)
-        raise e
-
-async def send_welcome_email(to_email: str):
+def build_welcome_message(to_email: str) -> EmailMessage:
     message = EmailMessage()
     message["From"] = f"{SMTP_SENDER_NAME} <{SMTP_SENDER_EMAIL}>"
     message["To"] = to_email
@@ -47,18 +50,21 @@ async def send_welcome_email(to_email: str):
     message.set_content(
         f"Hi there,\n\nWelcome to RuralAssist! We're glad to have you."
     )
+    return message
 
+
+async def send_otp_email(to_email: str, otp: str):
+    """Queue the OTP email; raises only if the outbox cannot accept it"""
     try:
-        await aiosmtplib.send(
-            message,
-            hostname=SMTP_HOST,
-            port=SMTP_PORT,
-            username=SMTP_USERNAME,
-            password=SMTP_PASSWORD,
-            start_tls=True,
-        )
-        print("Welcome email sent successfully!")
+        outbox.enqueue(build_otp_message(to_email, otp))
+    except Exception as e:
+        print("Error queueing email:", e)
+        raise e
 
+async def send_welcome_email(to_email: str):
+    """Queue the welcome email"""
+    try:
+        outbox.enqueue(build_welcome_message(to_email))
     except Exception as e:
-        print("Error sending welcome email:", e)
-        # We don't re-raise here to avoid breaking the login flow
\ No newline at end of file
+        print("Error queueing welcome email:", e)
+        # We don't re-raise here to avoid breaking the login flow
@@ -0,0 +1,140 @@
+"""
+Bitmap facet index over a catalog.
+
+Every row gets a bit position; each facet value (state "bihar", category
+"agriculture", keyword "loan") and each text token maps to a Python int used
+as a bitset. Filters are AND/OR of those bitsets and facet counts are
+popcounts of `result & value_bitmap`, so nothing rescans the rows and counts
+stay cheap well past 10k schemes.
+
+Facet counts are disjunctive: the counts for a facet ignore that facet's own
+selection (but apply all the others), so the UI can show how many results
+picking another state/category would give.
+
+    index = FacetIndex(rows, {"state": lambda r: [r["state"]], ...}, text=...)
+    result = index.search(filters={"state": ["bihar", "up"]}, modes={"keyword": "all"}, query="kisan")
+    result.positions(start, limit), result.total, result.facets
+"""
+
+import re
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _popcount(bits: int) -> int:
+    return bits.bit_count() if hasattr(bits, "bit_count") else bin(bits).count("1")
+
+
+def norm(value) -> str:
+    return str(value or "").strip().lower()
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class FacetResult:
+    __slots__ = ("bits", "total", "facets")
+
+    def __init__(self, bits: int, facets: Dict[str, Dict[str, int]]):
+        self.bits = bits
+        self.total = _popcount(bits)
+        self.facets = facets
+
+    def positions(self, start: int = 0, limit: Optional[int] = None) -> List[int]:
+        """Set bit positions >= start, in ascending order"""
+        bits = (self.bits >> start) << start
+        out = []
+        while bits and (limit is None or len(out) < limit):
+            low = bits & -bits
+            out.append(low.bit_length() - 1)
+            bits ^= low
+        return out
+
+
+class FacetIndex:
+    def __init__(self, rows: List[dict], facets: Dict[str, Callable[[dict], Iterable]],
+                 text: Optional[Callable[[dict], str]] = None):
+        self.rows = rows
+        self.all_bits = (1 << len(rows)) - 1
+        self.facets: Dict[str, Dict[str, int]] = {name: {} for name in facets}
+        # Original spelling per normalized value, for display in facet counts
+        self.labels: Dict[str, Dict[str, str]] = {name: {} for name in facets}
+        tokens: Dict[str, int] = {}
+
+        for pos, row in enumerate(rows):
+            bit = 1 << pos
+            for name, values_of in facets.items():
+                bitmaps, labels = self.facets[name], self.labels[name]
+                for value in values_of(row) or ():
+                    key = norm(value)
+                    if key:
+                        bitmaps[key] = bitmaps.get(key, 0) | bit
+                        labels.setdefault(key, str(value).strip())
+            if text is not None:
+                for token in set(tokenize(text(row))):
+                    tokens[token] = tokens.get(token, 0) | bit
+
+        self.tokens = tokens
+        self.vocabulary = sorted(tokens)
+
+    def match_text(self, query: str) -> int:
+        """Rows containing every query token as a word prefix ("kis" matches "kisan")"""
+        bits = self.all_bits
+        for token in tokenize(query):
+            token_bits = 0
+            i = bisect_left(self.vocabulary, token)
+            while i < len(self.vocabulary) and self.vocabulary[i].startswith(token):
+                token_bits |= self.tokens[self.vocabulary[i]]
+                i += 1
+            bits &= token_bits
+            if not bits:
+                break
+        return bits
+
+    def facet_bits(self, name: str, values: List[str], mode: str = "any") -> int:
+        bitmaps = self.facets[name]
+        selected = [bitmaps.get(norm(v), 0) for v in values]
+        if mode == "all":
+            bits = self.all_bits
+            for b in selected:
+                bits &= b
+            return bits
+        bits = 0
+        for b in selected:
+            bits |= b
+        return bits
+
+    def search(self, filters: Optional[Dict[str, List[str]]] = None, modes: Optional[Dict[str, str]] = None,
+               query: Optional[str] = None, facet_limit: Optional[Dict[str, int]] = None) -> FacetResult:
+        filters = {k: v for k, v in (filters or {}).items() if v}
+        modes = modes or {}
+        facet_limit = facet_limit or {}
+
+        base = self.match_text(query) if query and query.strip() else self.all_bits
+        selections = {
+            name: self.facet_bits(name, values, modes.get(name, "any"))
+            for name, values in filters.items()
+        }
+        result = base
+        for bits in selections.values():
+            result &= bits
+
+        counts: Dict[str, Dict[str, int]] = {}
+        for name, bitmaps in self.facets.items():
+            # Disjunctive counts: apply every selection except this facet's own
+            scope = base
+            for other, bits in selections.items():
+                if other != name:
+                    scope &= bits
+            facet_counts = {}
+            for key, bits in bitmaps.items():
+                n = _popcount(scope & bits)
+                if n:
+                    facet_counts[self.labels[name][key]] = n
+            ordered = sorted(facet_counts.items(), key=lambda kv: (-kv[1], kv[0]))
+            limit = facet_limit.get(name)
+            counts[name] = dict(ordered[:limit] if limit else ordered)
+        return FacetResult(result, counts)
@@ -1,51 +1,39 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel
 from typing import List, Optional
-import json
 from pathlib import Path
 from datetime import datetime
 import time
+import persistence
+from catalog import CatalogCache, is_paged
+from data_files import data_file, write_json_atomic
+from metrics import cache_lookup, JSON_IO_SECONDS
+from profiling import TimedRoute, stage
 # --- In-memory response cache ---
 _RESPONSE_CACHE = {}
 def get_cache(key, ttl=120):
     now = time.time()
     entry = _RESPONSE_CACHE.get(key)
     if entry and now - entry['ts'] < ttl:
-        return entry['value']
-    return None
+        return cache_lookup("faq", entry['value'])
+    return cache_lookup("faq", None)
 
 def set_cache(key, value):
     _RESPONSE_CACHE[key] = {'value': value, 'ts': time.time()}
-import time
-
-# --- In-memory FAQ dataset cache (30 min) ---
-_FAQ_CACHE = None
-_FAQ_CACHE_TS = 0
-def load_faqs(ttl=1800) -> list:
-    global _FAQ_CACHE, _FAQ_CACHE_TS
-    now = time.time()
-    if _FAQ_CACHE is not None and now - _FAQ_CACHE_TS < ttl:
-        return _FAQ_CACHE
-    if not FAQ_DB_PATH.exists():
-        raise HTTPException(status_code=404, detail="FAQ database not found")
-    try:
-        with FAQ_DB_PATH.open("r", encoding="utf-8") as f:
-            _FAQ_CACHE = json.load(f)
-            _FAQ_CACHE_TS = now
-            return _FAQ_CACHE
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Invalid FAQ database format")
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 BASE_DIR = Path(__file__).resolve().parent
 FAQ_DB_PATH = BASE_DIR / "faq_db.json"
+FAQ_FILE = data_file(FAQ_DB_PATH, compact=True)
 
 
 class FAQSearchRequest(BaseModel):
     query: str
     limit: int = 20
     category: Optional[str] = None
+    # "lexical" (default), "semantic" or "hybrid" (see semantic_index.py)
+    mode: str = "lexical"
 
 
 class FAQVoteRequest(BaseModel):
@@ -71,30 +59,42 @@ class SearchResponse(BaseModel):
 
 
 
-_FAQ_CACHE = None
-_FAQ_CACHE_TS = 0
-def load_faqs(ttl=1800) -> List[dict]:
-    """Load FAQs from JSON database with in-memory cache"""
-    global _FAQ_CACHE, _FAQ_CACHE_TS
-    now = time.time()
-    if _FAQ_CACHE is not None and now - _FAQ_CACHE_TS < ttl:
-        return _FAQ_CACHE
-    if not FAQ_DB_PATH.exists():
-        raise HTTPException(status_code=404, detail="FAQ database not found")
+def _with_votes(faqs: Optional[List[dict]]) -> Optional[List[dict]]:
+    if faqs is None:
+        return None
+    # Vote counters live in the faq_votes table
+    votes = persistence.load_faq_votes()
+    merged = []
+    for faq in faqs:
+        vote = votes.get(faq.get("id"))
+        if vote:
+            faq = dict(faq)
+            faq["helpful_count"], faq["unhelpful_count"], faq["last_voted_at"] = vote
+        merged.append(faq)
+    return merged
+
+
+def load_faqs() -> List[dict]:
+    """FAQs from faq_db.json with vote counts merged in (once per file version)"""
     try:
-        with FAQ_DB_PATH.open("r", encoding="utf-8") as f:
-            _FAQ_CACHE = json.load(f)
-            _FAQ_CACHE_TS = now
-            return _FAQ_CACHE
-    except json.JSONDecodeError:
+        faqs = FAQ_FILE.derived("with_votes", _with_votes)
+    except ValueError:
         raise HTTPException(status_code=500, detail="Invalid FAQ database format")
+    if faqs is None:
+        raise HTTPException(status_code=404, detail="FAQ database not found")
+    return faqs
+
+
+# Merge votes into the next version before it is swapped in
+FAQ_FILE.on_reload(load_faqs)
 
 
 def save_faqs(faqs: List[dict]) -> bool:
     """Save FAQs to JSON database"""
     try:
-        with FAQ_DB_PATH.open("w", encoding="utf-8") as f:
-            json.dump(faqs, f, indent=2, ensure_ascii=False)
+        with JSON_IO_SECONDS.labels("faq_db.json", "save").time(), stage("json_save"):
+            write_json_atomic(FAQ_DB_PATH, faqs)
+        FAQ_FILE.reload()
         return True
     except Exception as e:
         print(f"Error saving FAQs: {e}")
@@ -161,9 +161,7 @@ def advanced_match_score(query: str, item: dict) -> int:
     return score
 
 
-@router.get("/")
-async def get_all_faqs():
-    """Get all FAQs"""
+def _all_faqs_payload() -> dict:
     faqs = load_faqs()
     return {
         "count": len(faqs),
@@ -171,6 +169,34 @@ async def get_all_faqs():
         "categories": list(set(faq.get("category", "general") for faq in faqs))
     }
 
+# Pre-encoded GET /faq/ body; rebuilt when faq_db.json changes or a vote lands
+faq_catalog = CatalogCache(
+    "faq", build=_all_faqs_payload, generation=FAQ_FILE.generation,
+    items=lambda payload: payload["faqs"], summary_fields=("id", "category", "question"),
+    live=True,  # re-encoded on every vote
+)
+FAQ_FILE.add_catalog(faq_catalog)
+
+
+@router.get("/")
+async def get_all_faqs(request: Request, category: Optional[str] = None, limit: Optional[int] = Query(None, ge=1),
+                       cursor: Optional[str] = None, fields: Optional[str] = None, view: Optional[str] = None):
+    """Get all FAQs (paged with limit/cursor, trimmed with fields= or view=summary)"""
+    if not is_paged(limit, cursor, fields, view, category):
+        return faq_catalog.response(request)
+    wanted = category.lower() if category else None
+    return faq_catalog.page(
+        request, limit, cursor, fields, view,
+        predicate=(lambda faq: faq.get("category", "").lower() == wanted) if wanted else None,
+        wrap=lambda rows, total, next_cursor, payload: {
+            "count": len(rows),
+            "total": total,
+            "faqs": rows,
+            "categories": payload["categories"],
+            "next_cursor": next_cursor,
+        },
+    )
+
 
 @router.get("/categories")
 async def get_categories():
@@ -199,26 +225,69 @@ async def get_faqs_by_category(category: str):
     }
 
 
+def _faq_text(faq: dict) -> str:
+    return " ".join([faq.get("question", ""), " ".join(faq.get("keywords", [])), faq.get("answer", "")])
+
+
+def faq_vectors():
+    """(rows, VectorIndex) for the current FAQ catalog"""
+    from semantic_index import VectorIndex  # numpy; only loaded when semantic search is used
+
+    encoded = faq_catalog.current()
+    rows = encoded.index(faq_catalog.items).rows
+    # Rebuilt per catalog generation (votes included), but only changed FAQ texts are re-embedded
+    return rows, encoded.derived(
+        "vectors", lambda: VectorIndex("faqs").build([f.get("id") for f in rows], [_faq_text(f) for f in rows])
+    )
+
+
+faq_catalog.warm_with("vectors", faq_vectors)
+
+
+def semantic_faqs(query: str) -> List[tuple]:
+    """(faq, cosine similarity) for every FAQ with positive similarity, best first"""
+    rows, vectors = faq_vectors()
+    return [(rows[r], sim) for r, sim in vectors.search([query], k=len(rows))[0]]
+
+
 @router.post("/search")
 async def search_faqs(req: FAQSearchRequest) -> SearchResponse:
-    """Advanced FAQ search with scoring and filtering (cached by query/category/limit)"""
-    cache_key = f"faq_search:{req.query.lower()}:{req.category or ''}:{req.limit}"
+    """Advanced FAQ search with scoring and filtering (cached by query/category/limit/mode)"""
+    if req.mode not in ("lexical", "semantic", "hybrid"):
+        raise HTTPException(status_code=400, detail="mode must be one of lexical, semantic, hybrid")
+    cache_key = f"faq_search:{req.query.lower()}:{req.category or ''}:{req.limit}:{req.mode}"
     cached = get_cache(cache_key, ttl=180)
     if cached:
         return cached
     faqs = load_faqs()
     # Filter by category if specified
-    if req.category and req.category.lower() != "all":
-        faqs = [faq for faq in faqs if faq.get("category", "").lower() == req.category.lower()]
+    with stage("index"):
+        if req.category and req.category.lower() != "all":
+            faqs = [faq for faq in faqs if faq.get("category", "").lower() == req.category.lower()]
     # Score and rank results
     ranked = []
-    for faq in faqs:
-        score = advanced_match_score(req.query, faq)
-        if score > 0:
-            faq_copy = faq.copy()
-            faq_copy["_score"] = score
-            ranked.append((score, faq_copy))
-    ranked.sort(key=lambda x: x[0], reverse=True)
+    with stage("scoring"):
+        if req.mode != "semantic":
+            for faq in faqs:
+                score = advanced_match_score(req.query, faq)
+                if score > 0:
+                    faq_copy = faq.copy()
+                    faq_copy["_score"] = score
+                    ranked.append((score, faq_copy))
+            ranked.sort(key=lambda x: x[0], reverse=True)
+        if req.mode != "lexical":
+            allowed = {faq.get("id") for faq in faqs}
+            semantic = [(round(sim * 100), faq.copy()) for faq, sim in semantic_faqs(req.query) if faq.get("id") in allowed]
+            for score, faq_copy in semantic:
+                faq_copy["_score"] = score
+            if req.mode == "semantic":
+                ranked = semantic
+            else:
+                from semantic_index import reciprocal_rank_fusion
+
+                by_id = {faq.get("id"): (score, faq) for score, faq in semantic + ranked}
+                fused = reciprocal_rank_fusion([[f.get("id") for _, f in ranked], [f.get("id") for _, f in semantic]])
+                ranked = [by_id[key] for key, _ in fused]
     # Limit results
     results = [faq for _, faq in ranked[:req.limit]]
     # Get available categories
@@ -248,28 +317,34 @@ async def vote_faq(req: FAQVoteRequest):
     if faq_index is None:
         raise HTTPException(status_code=404, detail="FAQ not found")
     
-    # Update vote count
-    if req.vote_type == "helpful":
-        faqs[faq_index]["helpful_count"] = faqs[faq_index].get("helpful_count", 0) + 1
-    elif req.vote_type == "unhelpful":
-        faqs[faq_index]["unhelpful_count"] = faqs[faq_index].get("unhelpful_count", 0) + 1
-    else:
+    if req.vote_type not in ("helpful", "unhelpful"):
         raise HTTPException(status_code=400, detail="Invalid vote type")
     
-    # Add timestamp
-    faqs[faq_index]["last_voted_at"] = datetime.now().isoformat()
-    
-    # Save updated FAQs
-    if save_faqs(faqs):
-        return {
-            "message": "Vote recorded successfully",
-            "faq_id": req.faq_id,
-            "vote_type": req.vote_type,
-            "helpful_count": faqs[faq_index]["helpful_count"],
-            "unhelpful_count": faqs[faq_index]["unhelpful_count"]
-        }
-    else:
+    # Atomic counter update in faq_votes (no full-file rewrite)
+    faq = faqs[faq_index]
+    try:
+        helpful, unhelpful = persistence.record_faq_vote(
+            req.faq_id,
+            req.vote_type,
+            base_helpful=faq.get("helpful_count", 0),
+            base_unhelpful=faq.get("unhelpful_count", 0),
+        )
+    except Exception as e:
+        print(f"Error saving vote: {e}")
         raise HTTPException(status_code=500, detail="Failed to save vote")
+    
+    # Keep the cached FAQ list in sync (snapshot rows are read-only, so swap in a copy)
+    faqs[faq_index] = dict(faq, helpful_count=helpful, unhelpful_count=unhelpful,
+                           last_voted_at=datetime.now().isoformat())
+    faq_catalog.invalidate()
+    
+    return {
+        "message": "Vote recorded successfully",
+        "faq_id": req.faq_id,
+        "vote_type": req.vote_type,
+        "helpful_count": helpful,
+        "unhelpful_count": unhelpful
+    }
 
 
 @router.get("/popular")
@@ -0,0 +1,68 @@
+"""
+Multi-worker profile: gunicorn managing uvicorn workers.
+
+    gunicorn -c backend/gunicorn.conf.py
+
+- WEB_CONCURRENCY workers (default: one per CPU).
+- The app is preloaded and warmed in the master before forking. Catalogs,
+  mmap snapshots, facet/eligibility bitmaps and vector indexes are then
+  shared copy-on-write, and every worker answers /ready immediately.
+- State that must agree across workers lives in the shared SQLite stores:
+  OTP_STORE=sqlite and RATE_LIMIT_STORE=sqlite. Caches and chat sessions
+  stay per worker; a WebSocket chat stays on the worker that accepted it.
+- OCR runs in each worker's own spawned process pool (OCR_PROCESSES,
+  see ocr_service.py), never in the API workers or the master.
+
+Single-process development is unchanged: `uvicorn main:app --reload`.
+"""
+
+import multiprocessing
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = "main:app"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+try:
+    import uvicorn_worker  # noqa: F401
+
+    worker_class = "uvicorn_worker.UvicornWorker"
+except ImportError:  # older uvicorn releases ship the worker themselves
+    worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so slow leaks (e.g. OCR buffers) cannot pile up
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "5000"))
+max_requests_jitter = 500
+
+os.environ.setdefault("OTP_STORE", "sqlite")
+os.environ.setdefault("RATE_LIMIT_STORE", "sqlite")
+
+
+def when_ready(server):
+    """Runs in the master after the app is preloaded and before any worker is forked"""
+    import database
+    import persistence
+    import warmup
+
+    persistence.init_db()
+    # Process pools and threads do not survive fork; OCR warms up in the workers
+    warmup.STARTUP_WARMUP_OCR = False
+    warmup.run()
+    # Workers must open their own database connections
+    database.engine.dispose()
+    server.log.info("Warm-up finished in the master: %s", warmup.status()["steps"])
+
+
+def post_fork(server, worker):
+    """
+    Runs in each worker right after fork. The OTP store and rate limiter are
+    per process (reset by os.register_at_fork, created on first use); with
+    STARTUP_WARMUP_OCR=1 the worker's OCR pool starts loading the model now.
+    """
+    if os.getenv("STARTUP_WARMUP_OCR", "0") == "1":
+        import ocr_service
+
+        ocr_service.warm_ocr_pool()
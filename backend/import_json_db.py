@@ -0,0 +1,148 @@
+"""
+One-shot importer: copies the legacy JSON stores into the SQLite database.
+
+    python import_json_db.py
+
+- profiles_db.json      -> profiles
+- activity_db.json      -> activity_events (plus activity_log.jsonl if present)
+- faq_db.json           -> faq_votes (helpful/unhelpful counters)
+- scam_reports_db.json  -> scam_reports
+
+Safe to re-run: profiles, votes and reports already in the database are
+left untouched, and activity is only imported for users with no events yet.
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+
+import models
+import persistence
+from database import SessionLocal
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def _read_json(path: Path, default):
+    if not path.exists():
+        return default
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def import_profiles(db, profiles: dict) -> int:
+    added = 0
+    for email, record in profiles.items():
+        if db.get(models.Profile, email) is not None:
+            continue
+        stats = record.get("stats", {})
+        db.add(models.Profile(
+            email=email,
+            name=record.get("name", ""),
+            member_since=persistence._parse_ts(record.get("member_since") or stats.get("last_active")),
+            last_active=persistence._parse_ts(stats.get("last_active")),
+            **{col: stats.get(col, 0) for col in persistence.STAT_COLUMNS},
+        ))
+        added += 1
+    return added
+
+
+def import_activity(db, activity: dict) -> int:
+    added = 0
+    imported_at = datetime.now()  # for legacy events without a usable timestamp
+    for email, items in activity.items():
+        exists = db.query(models.ActivityEvent.id).filter(models.ActivityEvent.email == email).first()
+        if exists:
+            continue
+        for item in items:
+            db.add(models.ActivityEvent(
+                email=email,
+                type=item.get("type", ""),
+                description=item.get("description", ""),
+                timestamp=persistence._parse_ts(item.get("timestamp")) or imported_at,
+            ))
+            added += 1
+    return added
+
+
+def import_faq_votes(db, faqs: list) -> int:
+    added = 0
+    for faq in faqs:
+        helpful = faq.get("helpful_count", 0)
+        unhelpful = faq.get("unhelpful_count", 0)
+        if not (helpful or unhelpful) or db.get(models.FAQVote, faq["id"]) is not None:
+            continue
+        db.add(models.FAQVote(
+            faq_id=faq["id"],
+            helpful_count=helpful,
+            unhelpful_count=unhelpful,
+            last_voted_at=persistence._parse_ts(faq.get("last_voted_at")),
+        ))
+        added += 1
+    return added
+
+
+def import_scam_reports(db, reports: list) -> int:
+    added = 0
+    imported_at = datetime.now()  # for legacy reports without a usable created_at
+    seen = set()
+    for i, report in enumerate(reports):
+        report_id = report.get("report_id") or f"SCAM-IMPORTED-{i}"
+        # Old report ids were second-resolution timestamps and can repeat
+        if report_id in seen:
+            report_id = f"{report_id}-{i}"
+        seen.add(report_id)
+        if db.query(models.ScamReport.id).filter(models.ScamReport.report_id == report_id).first():
+            continue
+        db.add(models.ScamReport(
+            report_id=report_id,
+            email=report.get("email"),
+            description=report.get("description", ""),
+            risk_level=report.get("risk_level"),
+            risk_score=report.get("risk_score"),
+            scam_type=report.get("scam_type"),
+            location=report.get("location"),
+            created_at=persistence._parse_ts(report.get("created_at")) or imported_at,
+        ))
+        added += 1
+    return added
+
+
+def _activity_from_log(path: Path) -> dict:
+    activity = {}
+    if not path.exists():
+        return activity
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            email = event.pop("email", None)
+            if email:
+                activity.setdefault(email, []).append(event)
+    return activity
+
+
+def run_import(base_dir: Path = BASE_DIR) -> dict:
+    persistence.init_db()
+    activity = _read_json(base_dir / "activity_db.json", {})
+    for email, items in _activity_from_log(base_dir / "activity_log.jsonl").items():
+        activity.setdefault(email, []).extend(items)
+    reports = _read_json(base_dir / "scam_reports_db.json", {}).get("reports", [])
+
+    with SessionLocal() as db:
+        result = {
+            "profiles": import_profiles(db, _read_json(base_dir / "profiles_db.json", {})),
+            "activity_events": import_activity(db, activity),
+            "faq_votes": import_faq_votes(db, _read_json(base_dir / "faq_db.json", [])),
+            "scam_reports": import_scam_reports(db, reports),
+        }
+        db.commit()
+    return result
+
+
+if __name__ == "__main__":
+    counts = run_import()
+    for table, n in counts.items():
+        print(f"✅ Imported {n} rows into {table}")
@@ -0,0 +1,307 @@
+"""
+Scam indicators: phone numbers, UPI IDs and domains in free text, and a
+blocklist of the ones seen in scam reports.
+
+`extract()` finds indicators with precompiled regexes and normalises them:
+- phone: Indian mobile numbers as +91XXXXXXXXXX;
+- upi: handle@psp, lower case (e-mail addresses are skipped);
+- domain: host names, lower case, without "www." or a port; a bare name
+  must start with www. or end in a common TLD.
+
+Every /scam/report adds its indicators to the database (models.ScamIndicator).
+report_count counts distinct reporters (signed-in user, else hashed IP), so
+repeating a report does not inflate it. scam_indicators.json holds the seed
+list ("blocked") and an allowlist of official numbers and domains
+("allowed", matched on the domain and its parents) that are never recorded
+or flagged.
+
+Each worker keeps a Bloom filter of every stored indicator, loaded
+incrementally by row id so it sees other workers' reports. A lookup is a few
+bit tests per indicator. Only filter hits, which are rare for clean text, go
+to the database for the exact counts; that also weeds out false positives. A
+filter costs about 1.8 MB per million indicators at the default error rate.
+
+Reports are unauthenticated, so they alone never make an indicator
+known-bad: only seeded and moderator-confirmed indicators raise risk scores.
+Indicators with SCAM_INDICATOR_MIN_REPORTS reporters are mentioned in
+analyses and queued for review (GET /scam/indicators).
+"""
+
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+
+import persistence
+from data_files import data_file
+from metrics import SCAM_INDICATOR_CHECKS
+
+# Distinct reporters before an unconfirmed indicator is mentioned and queued for review
+SCAM_INDICATOR_MIN_REPORTS = int(os.getenv("SCAM_INDICATOR_MIN_REPORTS", "2"))
+SCAM_INDICATOR_CAPACITY = int(os.getenv("SCAM_INDICATOR_CAPACITY", "1000000"))
+SCAM_INDICATOR_ERROR_RATE = float(os.getenv("SCAM_INDICATOR_ERROR_RATE", "0.001"))
+# Reports from other workers reach this worker's filter within this many seconds
+SCAM_INDICATOR_REFRESH_SECONDS = float(os.getenv("SCAM_INDICATOR_REFRESH_SECONDS", "2"))
+MAX_INDICATORS = 20  # per text
+KINDS = ("phone", "upi", "domain")
+
+SEED_FILE = data_file(Path(__file__).resolve().parent / "scam_indicators.json", default={})
+
+_PHONE_RE = re.compile(r"(?<![\d+])(?:(?:\+|00)?91[\s-]?|0)?([6-9]\d{4})[\s-]?(\d{5})(?!\d)")
+_UPI_RE = re.compile(r"(?<![\w.-])([a-z0-9][a-z0-9._-]{1,255})@([a-z][a-z0-9]{1,63})(?![\w-]|\.[a-z0-9])")
+_URL_RE = re.compile(r"\b(?:https?|hxxps?)://([\w.:@-]+)")
+_HOST_RE = re.compile(r"(?<![\w@./-])((?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,24})(?![\w@-]|\.[a-z0-9])")
+_DEFANG_RE = re.compile(r"\[\.\]|\(\.\)|\{\.\}")
+# TLDs a bare name (no scheme, no www.) must end in to count as a domain
+_BARE_TLDS = frozenset(
+    "com in net org info biz co io me ly cc app link click xyz top online site live shop store "
+    "club buzz icu vip win today tk ml ga cf gq pw ws su ru cn".split()
+)
+# Second-level labels that are public suffixes under a country TLD (co.in, gov.in, ...)
+_PUBLIC_SLDS = frozenset("co com org net gov ac edu nic gen firm ind res mil".split())
+
+
+class Indicator(NamedTuple):
+    kind: str
+    value: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.kind}:{self.value}"
+
+
+def reporter_id(email: Optional[str], ip: Optional[str]) -> str:
+    """Who a report counts for: the signed-in user, else a hash of the client IP"""
+    if email:
+        return f"user:{email.lower()}"
+    return "ip:" + hashlib.sha256((ip or "").encode("utf-8")).hexdigest()[:16]
+
+
+def normalize_phone(text: str) -> Optional[str]:
+    digits = re.sub(r"\D", "", text)
+    if digits.startswith("0091"):
+        digits = digits[4:]
+    elif len(digits) == 12 and digits.startswith("91"):
+        digits = digits[2:]
+    elif len(digits) == 11 and digits.startswith("0"):
+        digits = digits[1:]
+    if len(digits) != 10 or digits[0] not in "6789":
+        return None
+    return f"+91{digits}"
+
+
+def normalize_domain(host: str) -> Optional[str]:
+    host = host.lower().rsplit("@", 1)[-1].split(":", 1)[0].strip(".")
+    host = host.removeprefix("www.")
+    return host if "." in host else None
+
+
+def normalize(kind: str, value: str) -> Optional[str]:
+    if kind == "phone":
+        return normalize_phone(value)
+    if kind == "domain":
+        return normalize_domain(value)
+    if kind == "upi":
+        value = value.strip().lower()
+        return value if "@" in value else None
+    return None
+
+
+def _suffixes(domain: str) -> List[str]:
+    labels = domain.split(".")
+    return [".".join(labels[i:]) for i in range(len(labels) - 1)]
+
+
+def lookup_keys(indicator: Indicator) -> List[Indicator]:
+    """The indicator, and for a domain its parent domains (random subdomains of a known-bad domain)"""
+    if indicator.kind != "domain":
+        return [indicator]
+    keys = []
+    for suffix in _suffixes(indicator.value):
+        labels = suffix.split(".")
+        if len(labels) == 2 and labels[0] in _PUBLIC_SLDS and len(labels[1]) == 2:
+            break  # co.in, gov.in, ...
+        keys.append(Indicator("domain", suffix))
+    return keys
+
+
+def extract(text: str) -> List[Indicator]:
+    """Indicators in `text`, in order of appearance, without duplicates"""
+    if not text:
+        return []
+    text = _DEFANG_RE.sub(".", text[:10000].lower())
+    found = []
+    for match in _PHONE_RE.finditer(text):
+        phone = normalize_phone(match.group(1) + match.group(2))
+        if phone:
+            found.append((match.start(), Indicator("phone", phone)))
+    for match in _UPI_RE.finditer(text):
+        found.append((match.start(), Indicator("upi", match.group(0))))
+    for match in _URL_RE.finditer(text):
+        domain = normalize_domain(match.group(1))
+        if domain:
+            found.append((match.start(), Indicator("domain", domain)))
+    for match in _HOST_RE.finditer(text):
+        host = match.group(1)
+        if host.startswith("www.") or host.rsplit(".", 1)[1] in _BARE_TLDS:
+            domain = normalize_domain(host)
+            if domain:
+                found.append((match.start(), Indicator("domain", domain)))
+    found.sort(key=lambda item: item[0])
+    allowed = SEED_FILE.derived("allowed", _allowed)
+    indicators = []
+    for _, indicator in found:
+        if indicator not in indicators and not _is_allowed(indicator, allowed):
+            indicators.append(indicator)
+    return indicators[:MAX_INDICATORS]
+
+
+def _seed_list(value, section: str) -> FrozenSet[Indicator]:
+    entries = set()
+    for kind in KINDS:
+        for raw in ((value or {}).get(section) or {}).get(kind, []):
+            normalized = normalize(kind, str(raw))
+            if normalized:
+                entries.add(Indicator(kind, normalized))
+    return frozenset(entries)
+
+
+def _allowed(value) -> FrozenSet[Indicator]:
+    return _seed_list(value, "allowed")
+
+
+def _is_allowed(indicator: Indicator, allowed: FrozenSet[Indicator]) -> bool:
+    if indicator.kind == "domain":
+        return any(Indicator("domain", suffix) in allowed for suffix in _suffixes(indicator.value))
+    return indicator in allowed
+
+
+class BloomFilter:
+    """Set membership with no false negatives and about `error_rate` false positives"""
+
+    def __init__(self, capacity: int, error_rate: float = SCAM_INDICATOR_ERROR_RATE):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.size = max(64, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        # Double hashing: k positions from one 128-bit digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        bits = self._bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+class IndicatorStore:
+    """Bloom filter over the database's indicators, with exact counts for filter hits"""
+
+    def __init__(self, capacity: int = SCAM_INDICATOR_CAPACITY):
+        self._lock = threading.Lock()
+        self._bloom = BloomFilter(capacity)
+        self._loaded_id = 0
+        self._synced_at = 0.0
+        self._seed_generation = object()
+
+    def _catch_up(self, force: bool = False):
+        seed_generation = SEED_FILE.generation()
+        if not force and seed_generation == self._seed_generation \
+                and time.monotonic() - self._synced_at < SCAM_INDICATOR_REFRESH_SECONDS:
+            return
+        with self._lock:
+            if seed_generation != self._seed_generation:
+                persistence.seed_scam_indicators(SEED_FILE.derived("blocked", lambda v: _seed_list(v, "blocked")))
+                self._seed_generation = seed_generation
+            while True:
+                rows = persistence.scam_indicators_after(self._loaded_id)
+                if not rows:
+                    break
+                if len(self._bloom) + len(rows) > self._bloom.capacity:
+                    # Full: rebuild at twice the size rather than let the error rate climb
+                    self._bloom = BloomFilter(self._bloom.capacity * 2, self._bloom.error_rate)
+                    self._loaded_id = 0
+                    continue
+                for row_id, kind, value in rows:
+                    self._bloom.add(f"{kind}:{value}")
+                self._loaded_id = rows[-1][0]
+            self._synced_at = time.monotonic()
+
+    def warm(self):
+        self._catch_up(force=True)
+
+    def record(self, indicators: Iterable[Indicator], reporter: str) -> Dict[Indicator, int]:
+        """Record `reporter`'s report of each indicator; returns their report counts"""
+        counts = persistence.record_scam_indicators(indicators, reporter)
+        self._catch_up(force=True)
+        return {Indicator(*key): count for key, count in counts.items()}
+
+    def lookup(self, indicators: Iterable[Indicator]) -> Dict[Indicator, Dict]:
+        """
+        Stored indicators among `indicators`, with their counts: {"known",
+        "seeded", "confirmed", "report_count", "hit_count", "last_seen",
+        "matched"}. "known" (seeded or confirmed) means known-bad; "matched"
+        is the stored indicator (a parent domain for a subdomain).
+        """
+        self._catch_up()
+        candidates = {}
+        for indicator in indicators:
+            hits = [key for key in lookup_keys(indicator) if key.key in self._bloom]
+            if not hits:
+                SCAM_INDICATOR_CHECKS.labels("miss").inc()
+            for key in hits:
+                candidates.setdefault(key, []).append(indicator)
+        if not candidates:
+            return {}
+        stats = persistence.scam_indicator_stats(candidates)
+        found = {}
+        for key, found_for in candidates.items():
+            row = stats.get(key)
+            if row is None:
+                SCAM_INDICATOR_CHECKS.labels("false_positive").inc()
+                continue
+            row = dict(row, known=row["seeded"] or row["confirmed"], matched=key)
+            SCAM_INDICATOR_CHECKS.labels("known" if row["known"] else "reported").inc()
+            for indicator in found_for:
+                # A domain may match itself and a parent: prefer known-bad, then most reported
+                best = found.get(indicator)
+                if best is None or (row["known"], row["report_count"]) > (best["known"], best["report_count"]):
+                    found[indicator] = row
+        hits = {row["matched"] for row in found.values() if row["known"]}
+        if hits:
+            persistence.add_scam_indicator_hits(hits)
+        return found
+
+    def stats(self) -> Dict:
+        return {
+            "loaded": len(self._bloom),
+            "capacity": self._bloom.capacity,
+            "bytes": self._bloom.nbytes,
+            "hashes": self._bloom.hashes,
+        }
+
+
+store = IndicatorStore()
+SEED_FILE.on_reload(store.warm)
@@ -0,0 +1,417 @@
+"""
+Load test: drive a realistic request mix against the app and check latency SLOs.
+
+    python loadtest.py                                   # 1x data, in-process
+    python loadtest.py --scale 10 --scale 100 --requests 3000 --concurrency 32
+    python loadtest.py --url http://127.0.0.1:8000       # a running server (its own data)
+
+In-process runs (the default) send requests through httpx's ASGI transport,
+so there is no network in the measurement. They serve synthetic catalogs at
+the requested scale: 1x is the shipped data, and N x adds N-1 perturbed
+copies of every scheme, FAQ, common scam and scam keyword. The database,
+snapshots and vector indexes are kept in a temporary directory.
+
+The mix (MIX, --mix name=weight,...) covers scheme search, FAQ search,
+chatbot messages, scam analysis, the profile dashboard and PDF OCR. Queries
+follow a Zipf-like popularity curve, so the response caches see a realistic
+hit rate. Each endpoint reports throughput and p50/p95/p99. The run fails
+(exit status 1) when an endpoint breaks its SLO in loadtest_slo.json:
+"p95_ms", "p99_ms" or "max_error_rate", set per scale. test_loadtest.py
+only checks latency against those SLOs when LOADTEST_ENFORCE_SLOS=1, since
+wall-clock numbers depend on the machine running the suite.
+
+Rate limits are lifted for in-process runs. A live server only reaches
+/scam/analyze and /ocr/extract at about 3 requests per 10 s per client.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+SLO_PATH = BASE_DIR / "loadtest_slo.json"
+
+MIX = {
+    "schemes_search": 30,
+    "faq_search": 20,
+    "chatbot_message": 25,
+    "scam_analyze": 10,
+    "profile_dashboard": 10,
+    "ocr_extract": 5,
+}
+USERS = 20
+QUERY_POOL = 300
+STATES = ["central", "bihar", "uttar pradesh", "maharashtra", "tamil nadu", "rajasthan", "odisha", "kerala"]
+VARIANTS = ["rural", "district", "women", "youth", "tribal", "urban", "coastal", "hill", "minority", "senior"]
+BENIGN_MESSAGES = [
+    "Your electricity bill for this month is ready, view it on the official portal",
+    "Meeting at the panchayat office tomorrow at 10 am",
+    "Your ration card application has been received by the block office",
+]
+
+Request = Tuple[str, str, Dict[str, Any]]  # method, path, httpx request kwargs
+
+
+# ---------- synthetic catalogs ----------
+
+def _vary(rows: List[dict], scale: int, rng: random.Random, mutate: Callable[[dict, int], None]) -> List[dict]:
+    out = list(rows)
+    for copy in range(1, scale):
+        for row in rows:
+            clone = json.loads(json.dumps(row))
+            if "id" in clone:
+                clone["id"] = f"{clone['id']}__{copy}"
+            mutate(clone, copy)
+            out.append(clone)
+    rng.shuffle(out[len(rows):])
+    return out
+
+
+def generate_catalogs(directory: Path, scale: int, seed: int = 7) -> Dict[str, int]:
+    """Write schemes/FAQ/scam catalogs at `scale` x the shipped size into `directory`"""
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    sizes = {}
+
+    def load(name):
+        with open(BASE_DIR / name, encoding="utf-8") as f:
+            return json.load(f)
+
+    def scheme(row, copy):
+        word = VARIANTS[copy % len(VARIANTS)]
+        row["title"] = f"{row.get('title', '')} ({word} {copy})"
+        row["state"] = rng.choice(STATES)
+        keywords = list(row.get("keywords", []))
+        rng.shuffle(keywords)
+        row["keywords"] = keywords[:max(1, len(keywords) - 1)] + [word]
+
+    def faq(row, copy):
+        word = VARIANTS[copy % len(VARIANTS)]
+        row["question"] = f"{row.get('question', '')} ({word})"
+        row["keywords"] = list(row.get("keywords", [])) + [word]
+
+    def scam(row, copy):
+        row["title"] = f"{row.get('title', '')} {copy}"
+
+    def keyword(row, copy):
+        word = f"{row.get('keyword', '')}{copy}"
+        row["keyword"] = word
+        row["patterns"] = [f".*{word}.*", word]
+
+    for name, mutate in (("schemes_db.json", scheme), ("faq_db.json", faq), ("common_scams.json", scam)):
+        rows = _vary(load(name), scale, rng, mutate)
+        (directory / name).write_text(json.dumps(rows, ensure_ascii=False), encoding="utf-8")
+        sizes[name] = len(rows)
+    keywords = {level: _vary(rows, scale, rng, keyword) for level, rows in load("scam_keywords.json").items()}
+    (directory / "scam_keywords.json").write_text(json.dumps(keywords, ensure_ascii=False), encoding="utf-8")
+    sizes["scam_keywords.json"] = sum(len(rows) for rows in keywords.values())
+    return sizes
+
+
+@contextmanager
+def serve_catalogs(directory: Path):
+    """Point the app's knowledge files at `directory` (restored afterwards)"""
+    import data_files
+    import faq_service
+    import scam_service
+    import schemes_service
+
+    moved = []
+    for f in list(data_files.FILES.values()):
+        if (directory / f.path.name).exists():
+            moved.append((f, f.path))
+            f.repoint(directory / f.path.name)
+    caches = [faq_service._RESPONSE_CACHE, scam_service._RESPONSE_CACHE, schemes_service._RESPONSE_CACHE]
+    for cache in caches:
+        cache.clear()
+    try:
+        yield
+    finally:
+        for f, path in moved:
+            f.repoint(path)
+        for cache in caches:
+            cache.clear()
+
+
+@contextmanager
+def unlimited_rate_limits():
+    import rate_limit
+
+    class _Unlimited(rate_limit.RateLimiter):
+        def hit(self, key, max_req, window):
+            return True
+
+    previous, rate_limit._LIMITER = rate_limit._LIMITER, _Unlimited()
+    try:
+        yield
+    finally:
+        rate_limit._LIMITER = previous
+
+
+# ---------- request mix ----------
+
+def _zipf(rng: random.Random, pool: List[Any]) -> Any:
+    return pool[min(int(rng.paretovariate(1.2)) - 1, len(pool) - 1)]
+
+
+class Workload:
+    """Builds requests for each endpoint from the catalogs being served"""
+
+    def __init__(self, rng: random.Random, tokens: List[str], pdf: Optional[bytes]):
+        from chatbot_service import load_language
+        from faq_service import load_faqs
+        from scam_service import common_scams_catalog
+        from schemes_service import load_local_schemes
+
+        self.rng = rng
+        self.tokens = tokens
+        self.pdf = pdf
+        schemes = load_local_schemes()
+        faqs = load_faqs()
+        scams = common_scams_catalog.current().payload["common_scams"]
+        words = sorted({w for s in schemes[:QUERY_POOL] for w in s.get("keywords", [])})
+        rng.shuffle(words)
+        self.scheme_queries = words[:QUERY_POOL] + [s.get("title", "") for s in schemes[:50]]
+        self.faq_queries = [f.get("question", "") for f in faqs[:QUERY_POOL]] + words[:50]
+        intents = [kw for intent in load_language("en")["intents"].values() for kw in intent.get("keywords", [])[:2]]
+        self.chat_queries = intents[:100] + self.faq_queries[:QUERY_POOL // 2] + ["money for farmers", "ghar ke liye yojana"]
+        self.scam_texts = [e for s in scams for e in s.get("examples", [])] + BENIGN_MESSAGES
+        for pool in (self.scheme_queries, self.faq_queries, self.chat_queries, self.scam_texts):
+            rng.shuffle(pool)
+
+    def schemes_search(self) -> Request:
+        mode = self.rng.choices(["lexical", "semantic", "hybrid"], weights=[6, 2, 2])[0]
+        return "GET", "/schemes/search", {"params": {"q": _zipf(self.rng, self.scheme_queries), "mode": mode, "limit": 20}}
+
+    def faq_search(self) -> Request:
+        mode = self.rng.choices(["lexical", "hybrid"], weights=[7, 3])[0]
+        return "POST", "/faq/search", {"json": {"query": _zipf(self.rng, self.faq_queries), "limit": 10, "mode": mode}}
+
+    def chatbot_message(self) -> Request:
+        return "POST", "/chatbot/message", {"json": {"query": _zipf(self.rng, self.chat_queries)}}
+
+    def scam_analyze(self) -> Request:
+        return "POST", "/scam/analyze", {"json": {"description": _zipf(self.rng, self.scam_texts)}}
+
+    def profile_dashboard(self) -> Request:
+        token = self.rng.choice(self.tokens)
+        return "GET", "/profile/dashboard", {"headers": {"Authorization": f"Bearer {token}"}}
+
+    def ocr_extract(self) -> Request:
+        return "POST", "/ocr/extract", {"files": {"file": ("notice.pdf", self.pdf, "application/pdf")}}
+
+
+def make_tokens(n: int = USERS) -> List[str]:
+    from datetime import datetime, timedelta
+
+    from jose import jwt
+
+    from auth_service import JWT_ALGO, JWT_SECRET
+
+    exp = datetime.utcnow() + timedelta(hours=1)
+    return [jwt.encode({"email": f"load{i}@example.com", "exp": exp}, JWT_SECRET, algorithm=JWT_ALGO) for i in range(n)]
+
+
+def make_pdf() -> Optional[bytes]:
+    """A one-page PDF with a text layer (OCR's fast path), or None without PyMuPDF"""
+    try:
+        import fitz
+    except ImportError:
+        return None
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Ration card renewal notice. Visit your block office with Aadhaar.")
+    return doc.tobytes()
+
+
+# ---------- running and reporting ----------
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+async def drive(client, workload: Workload, mix: Dict[str, int], requests: int, concurrency: int,
+                warmup: int = 0) -> Dict[str, Any]:
+    """Send `requests` requests from `concurrency` concurrent clients; returns per-endpoint stats"""
+    names = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in names]
+    plan = [workload.rng.choices(names, weights=weights)[0] for _ in range(warmup + requests)]
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    cursor = iter(enumerate(plan))
+
+    async def user():
+        for i, name in cursor:
+            method, path, kwargs = getattr(workload, name)()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            elapsed = time.perf_counter() - started
+            if i < warmup:
+                continue
+            latencies[name].append(elapsed)
+            errors[name] += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    endpoints = {}
+    for name in names:
+        values = sorted(latencies[name])
+        endpoints[name] = {
+            "count": len(values),
+            "errors": errors[name],
+            "error_rate": errors[name] / len(values) if values else 0.0,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": (values[-1] if values else 0.0) * 1000,
+        }
+    total = sum(e["count"] for e in endpoints.values())
+    return {"requests": total, "seconds": wall, "rps": total / wall if wall else 0.0, "endpoints": endpoints}
+
+
+def check_slos(report: Dict[str, Any], slos: Dict[str, Dict[str, float]]) -> List[str]:
+    """Violations of `slos` ({endpoint or "*": {p95_ms, p99_ms, max_error_rate}})"""
+    violations = []
+    for name, stats in report["endpoints"].items():
+        limits = dict(slos.get("*", {}), **slos.get(name, {}))
+        for metric in ("p95_ms", "p99_ms"):
+            if metric in limits and stats[metric] > limits[metric]:
+                violations.append(f"{name}: {metric} {stats[metric]:.1f} > {limits[metric]}")
+        if "max_error_rate" in limits and stats["error_rate"] > limits["max_error_rate"]:
+            violations.append(f"{name}: error rate {stats['error_rate']:.2%} > {limits['max_error_rate']:.2%}")
+    return violations
+
+
+def load_slos(path: Path, scale: int) -> Dict[str, Dict[str, float]]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get(f"{scale}x", {})
+
+
+def format_report(label: str, report: Dict[str, Any]) -> str:
+    lines = [
+        f"{label}: {report['requests']} requests in {report['seconds']:.2f}s = {report['rps']:.1f} req/s",
+        f"  {'endpoint':<18} {'n':>6} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'errors':>6}",
+    ]
+    for name, e in report["endpoints"].items():
+        rps = e["count"] / report["seconds"] if report["seconds"] else 0.0
+        lines.append(
+            f"  {name:<18} {e['count']:>6} {rps:>7.1f} {e['p50_ms']:>6.1f}ms {e['p95_ms']:>6.1f}ms"
+            f" {e['p99_ms']:>6.1f}ms {e['max_ms']:>6.1f}ms {e['errors']:>6}"
+        )
+    return "\n".join(lines)
+
+
+async def run_in_process(scale: int, requests: int, concurrency: int, mix: Dict[str, int],
+                         warmup: int = 50, seed: int = 7) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """Load-test the app in this process against `scale` x catalogs"""
+    import httpx
+
+    import main
+    import persistence
+    import warmup as startup
+
+    persistence.init_db()
+    workdir = Path(tempfile.mkdtemp(prefix="ruralassist-load-"))
+    try:
+        sizes = generate_catalogs(workdir, scale, seed) if scale > 1 else {}
+        with serve_catalogs(workdir), unlimited_rate_limits():
+            startup.run()  # no-op if the app already warmed up
+            tokens = make_tokens()
+            pdf = make_pdf()
+            if pdf is None:
+                mix = dict(mix, ocr_extract=0)
+            workload = Workload(random.Random(seed), tokens, pdf)
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+                for token in tokens:
+                    await client.post("/profile/me", json={"name": "Load Test", "state": STATES[len(token) % len(STATES)],
+                                      "age": 35, "annual_income": 120000}, headers={"Authorization": f"Bearer {token}"})
+                report = await drive(client, workload, mix, requests, concurrency, warmup)
+        return report, sizes
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+async def run_against(url: str, requests: int, concurrency: int, mix: Dict[str, int],
+                      warmup: int = 50, seed: int = 7) -> Dict[str, Any]:
+    """Load-test a running server (using the data it serves and its JWT secret)"""
+    import httpx
+
+    pdf = make_pdf()
+    if pdf is None:
+        mix = dict(mix, ocr_extract=0)
+    workload = Workload(random.Random(seed), make_tokens(), pdf)
+    async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+        return await drive(client, workload, mix, requests, concurrency, warmup)
+
+
+def _parse_mix(value: Optional[str]) -> Dict[str, int]:
+    mix = dict(MIX)
+    for part in (value or "").split(","):
+        name, _, weight = part.partition("=")
+        if name.strip():
+            if name.strip() not in MIX:
+                raise SystemExit(f"unknown endpoint in --mix: {name}")
+            mix[name.strip()] = int(weight)
+    return mix
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", type=int, action="append", help="catalog size multiple (repeatable; default 1)")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=50, help="requests sent before measuring")
+    parser.add_argument("--mix", help="endpoint weights, e.g. schemes_search=50,ocr_extract=0")
+    parser.add_argument("--url", help="test a running server instead of the app in-process")
+    parser.add_argument("--slo", type=Path, default=SLO_PATH)
+    parser.add_argument("--json", type=Path, help="also write the reports here")
+    args = parser.parse_args(argv)
+    mix = _parse_mix(args.mix)
+
+    if not args.url:
+        # Keep the run away from the real database, snapshots and indexes
+        scratch = tempfile.mkdtemp(prefix="ruralassist-load-state-")
+        os.environ.setdefault("DATABASE_URL", f"sqlite:///{scratch}/load.db")
+        os.environ.setdefault("ACTIVITY_LOG_PATH", f"{scratch}/activity_log.jsonl")
+        os.environ.setdefault("SEMANTIC_INDEX_DIR", f"{scratch}/semantic_index")
+        os.environ.setdefault("DATA_SNAPSHOT_DIR", f"{scratch}/snapshots")
+        os.environ.setdefault("JWT_SECRET", "loadtest-secret")
+
+    results, failed = {}, False
+    for scale in args.scale or [1]:
+        if args.url:
+            report, sizes = asyncio.run(run_against(args.url, args.requests, args.concurrency, mix, args.warmup)), {}
+        else:
+            report, sizes = asyncio.run(run_in_process(scale, args.requests, args.concurrency, mix, args.warmup))
+        label = f"{scale}x" + (f" ({', '.join(f'{k}: {v}' for k, v in sizes.items())})" if sizes else "")
+        print(format_report(label, report))
+        violations = check_slos(report, load_slos(args.slo, scale))
+        for violation in violations:
+            print(f"  SLO violated - {violation}")
+        failed = failed or bool(violations)
+        results[f"{scale}x"] = dict(report, sizes=sizes, violations=violations)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
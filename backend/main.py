@@ -1,30 +1,56 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Response, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.gzip import GZipMiddleware
 from pathlib import Path
+from starlette.concurrency import run_in_threadpool
 import os
+import traceback
 
-import models
-from database import engine
+import data_files
+import email_outbox
+import email_service
+import persistence
+import warmup
+from metrics import MetricsMiddleware, render_metrics
+from profiling import ProfilingMiddleware, router as profiling_router
 
 # Routers
-from ocr_service import router as ocr_router
+from ocr_service import router as ocr_router, shutdown_ocr_pool
 from chatbot_service import router as chatbot_router
 from schemes_service import router as schemes_router
 from scam_service import router as scam_router
 from faq_service import router as faq_router
 from auth_service import router as auth_router
 from profile_service import router as profile_router
+from search_service import router as search_router
+from sync_service import router as sync_router
 
 
 BASE_DIR = Path(__file__).resolve().parent
 
-# Create DB tables
-models.Base.metadata.create_all(bind=engine)
 
-
-app = FastAPI(title="RuralAssist Backend", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Importing this module does no I/O; tables, catalogs and indexes are set up here.
+    # Create DB tables (SQLite in WAL mode, see database.py)
+    persistence.init_db()
+    print("✅ Allowed CORS origins:", origins)
+    if warmup.STARTUP_WARMUP == "blocking":
+        await run_in_threadpool(warmup.run)
+    else:
+        warmup.start()
+    # Hot-reload the JSON knowledge files (see data_files.py)
+    await run_in_threadpool(data_files.watcher.start)
+    yield
+    data_files.watcher.stop()
+    # Give queued OTP/welcome mail a bounded chance to go out
+    await email_service.outbox.stop(timeout=email_outbox.EMAIL_SHUTDOWN_TIMEOUT)
+    shutdown_ocr_pool()
+
+
+app = FastAPI(title="RuralAssist Backend", version="1.0.0", lifespan=lifespan)
 app.add_middleware(GZipMiddleware, minimum_size=500)
 
 # Upload directory
@@ -39,7 +65,6 @@ frontend_urls_str = os.environ.get(
     "http://localhost:5500,http://127.0.0.1:5500,https://ruralassist.vercel.app,https://ruralasist-beta.vercel.app"
 )
 origins = [url.strip() for url in frontend_urls_str.split(",")]
-print("✅ Allowed CORS origins:", origins)
 
 
 app.add_middleware(
@@ -48,8 +73,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Server-Timing stages and request-sampled profiling (see profiling.py)
+app.add_middleware(ProfilingMiddleware)
+
+# Outermost app middleware: sees every request, including CORS preflights
+app.add_middleware(MetricsMiddleware)
+
 # Include all routers with prefixes
 # Include all routers with prefixes
 app.include_router(ocr_router, prefix="/ocr")
@@ -59,10 +91,17 @@ app.include_router(scam_router, prefix="/scam")
 app.include_router(auth_router, prefix="/auth")
 app.include_router(faq_router, prefix="/faq")
 app.include_router(profile_router, prefix="/profile")
+app.include_router(search_router, prefix="/search")
+app.include_router(sync_router, prefix="/sync")
+# Disabled (404) unless ADMIN_TOKEN is set
+app.include_router(profiling_router, prefix="/admin/profiling", include_in_schema=False)
 
 # --- Global 500 Exception Handler ---
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
+    # Counted per route by MetricsMiddleware; keep the traceback in the logs
+    print(f"❌ Unhandled error on {request.method} {request.url.path}:")
+    traceback.print_exception(type(exc), exc, exc.__traceback__)
     return JSONResponse(
         status_code=500,
         content={"detail": "An unexpected error occurred. Please try again later."}
@@ -81,10 +120,28 @@ def root():
             "/auth",
             "/faq",
             "/profile",
+            "/search",
+            "/sync",
         ]
     }
 
 
+@app.get("/ready", include_in_schema=False)
+def ready():
+    """Readiness probe: 200 once this worker has finished warming up, 503 before"""
+    is_ready = warmup.ready()
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "pid": os.getpid(), "warmup": warmup.status()},
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text exposition of request and subsystem metrics"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/favicon.ico", include_in_schema=False)
 def favicon():
     return Response(status_code=204)
@@ -0,0 +1,340 @@
+"""
+Minimal Prometheus-compatible metrics (text exposition format 0.0.4).
+
+Metrics are created once at import time. Each distinct label combination gets
+a child object that is cached, so the hot path is a dict lookup plus an
+increment. Histograms preallocate their bucket counters.
+
+    REQUESTS = Counter("ruralassist_x_total", "Help text", ("route",))
+    REQUESTS.labels("/faq/search").inc()
+    with JSON_IO_SECONDS.labels("faq_db.json", "load").time(): ...
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (200, 1_000, 5_000, 20_000, 100_000, 500_000, 2_000_000)
+
+_REGISTRY: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), register: bool = True):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+        if register:
+            _REGISTRY.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def collect(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self.collect())
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def collect(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+            for values, child in list(self._children.items())
+        ]
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Gauge(_Metric):
+    """A gauge; pass `func` to read the value from a subsystem at scrape time"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 func: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None, register: bool = True):
+        self.func = func
+        super().__init__(name, documentation, labelnames, register)
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._default.dec(amount)
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def collect(self) -> List[str]:
+        if self.func is not None:
+            try:
+                values = self.func()
+            except Exception:
+                return []
+            return [
+                f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}"
+                for labels, v in values.items()
+            ]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+            for values, child in list(self._children.items())
+        ]
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, register: bool = True):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, register)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def collect(self) -> List[str]:
+        lines = []
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render_metrics() -> str:
+    return "\n".join(m.render() for m in _REGISTRY) + "\n"
+
+
+# ============================================================
+# Shared metrics
+# ============================================================
+
+HTTP_REQUESTS = Counter(
+    "ruralassist_http_requests_total", "HTTP requests by route, method and status", ("method", "route", "status")
+)
+HTTP_LATENCY = Histogram(
+    "ruralassist_http_request_duration_seconds", "Request latency by route", ("method", "route")
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "ruralassist_http_response_size_bytes", "Response body size by route", ("method", "route"), buckets=SIZE_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge("ruralassist_http_requests_in_flight", "Requests currently being handled")
+HTTP_EXCEPTIONS = Counter(
+    "ruralassist_http_exceptions_total", "Unhandled exceptions by route and type", ("route", "exception")
+)
+
+CACHE_REQUESTS = Counter(
+    "ruralassist_cache_requests_total", "In-memory cache lookups", ("cache", "result")
+)
+JSON_IO_SECONDS = Histogram(
+    "ruralassist_json_io_duration_seconds", "JSON file load/save time", ("file", "op")
+)
+SCAM_MATCH_SECONDS = Histogram(
+    "ruralassist_scam_match_duration_seconds", "calculate_risk_score time",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5),
+)
+SCAM_INDICATOR_CHECKS = Counter(
+    "ruralassist_scam_indicator_checks_total",
+    "Indicator blocklist lookups (miss = Bloom filter negative)", ("result",)
+)
+OCR_QUEUE_DEPTH = Gauge("ruralassist_ocr_queue_depth", "OCR jobs waiting or running")
+OCR_STAGE_SECONDS = Histogram(
+    "ruralassist_ocr_stage_duration_seconds", "OCR pipeline stage time", ("stage",),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+SEARCH_SOURCE_SECONDS = Histogram(
+    "ruralassist_search_source_duration_seconds", "Unified /search per-source time", ("source", "status"),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+CHAT_RETRIEVAL_SECONDS = Histogram(
+    "ruralassist_chat_retrieval_duration_seconds", "Chatbot FAQ/scheme retrieval time",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.02, 0.05, 0.1, 0.5),
+)
+
+CHAT_SESSIONS = Gauge("ruralassist_chat_sessions", "Live chatbot sessions (WebSocket/SSE)")
+
+
+def cache_lookup(cache: str, value):
+    """Record a hit/miss for `cache` and pass `value` through"""
+    CACHE_REQUESTS.labels(cache, "miss" if value is None else "hit").inc()
+    return value
+
+
+# ============================================================
+# ASGI middleware
+# ============================================================
+
+class MetricsMiddleware:
+    """Records per-route latency, status, response size, in-flight and exceptions"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+        size = [0]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                size[0] += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            HTTP_EXCEPTIONS.labels(_route_of(scope), type(exc).__name__).inc()
+            raise
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            elapsed = time.perf_counter() - start
+            method = scope["method"]
+            route = _route_of(scope)
+            HTTP_LATENCY.labels(method, route).observe(elapsed)
+            HTTP_RESPONSE_SIZE.labels(method, route).observe(size[0])
+            HTTP_REQUESTS.labels(method, route, str(status[0])).inc()
+
+
+_ROUTE_TEMPLATES: Dict[int, str] = {}  # id(route) -> template; routes live for the app's lifetime
+
+
+def _route_of(scope) -> str:
+    """Route template ("/schemes/{scheme_id}") to keep label cardinality bounded"""
+    route = scope.get("route")
+    if route is None:
+        return "<unmatched>"
+    key = id(route)
+    template = _ROUTE_TEMPLATES.get(key)
+    if template is None:
+        # Depending on the FastAPI version, routes of an included router may or
+        # may not carry the prefix; recover it from the request path.
+        path = getattr(route, "path", "")
+        segments = scope["path"].rstrip("/").split("/")
+        own = len([p for p in path.split("/") if p])
+        prefix = "/".join(segments[: len(segments) - own]) if own else "/".join(segments)
+        template = _ROUTE_TEMPLATES[key] = path if path.startswith(prefix) else prefix + path
+    return template
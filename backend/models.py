@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, Float, DateTime, Index, LargeBinary
 
 from database import Base
 
@@ -13,7 +13,133 @@ class ScamReport(Base):
     __tablename__ = "scam_reports"
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
-    contact = Column(String)
-    description = Column(String)
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
\ No newline at end of file
+    report_id = Column(String, unique=True, index=True, nullable=False)
+    email = Column(String, index=True)
+    description = Column(String, nullable=False)
+    risk_level = Column(String)
+    risk_score = Column(Float)
+    scam_type = Column(String)
+    location = Column(String)
+    created_at = Column(DateTime, index=True, nullable=False)
+    # Near-duplicate cluster (see report_clusters.py)
+    cluster_id = Column(Integer)
+
+class Profile(Base):
+    __tablename__ = "profiles"
+
+    email = Column(String, primary_key=True)
+    name = Column(String, default="")
+    member_since = Column(DateTime)
+    last_active = Column(DateTime)
+    total_logins = Column(Integer, default=0, nullable=False)
+    ocr_scans = Column(Integer, default=0, nullable=False)
+    chat_messages = Column(Integer, default=0, nullable=False)
+    scam_reports = Column(Integer, default=0, nullable=False)
+    schemes_viewed = Column(Integer, default=0, nullable=False)
+    # Optional eligibility attributes (see eligibility.py); version bumps on change
+    state = Column(String)
+    occupation = Column(String)
+    annual_income = Column(Integer)
+    age = Column(Integer)
+    gender = Column(String)
+    land_acres = Column(Float)
+    attributes_version = Column(Integer, default=0, nullable=False, server_default="0")
+
+class ActivityEvent(Base):
+    __tablename__ = "activity_events"
+
+    id = Column(Integer, primary_key=True)
+    email = Column(String, nullable=False)
+    type = Column(String, nullable=False)
+    description = Column(String, default="")
+    timestamp = Column(DateTime, nullable=False)
+
+    # "last N activities for a user" is an index range scan
+    __table_args__ = (Index("ix_activity_events_email_timestamp", "email", "timestamp"),)
+
+class FAQVote(Base):
+    __tablename__ = "faq_votes"
+
+    faq_id = Column(String, primary_key=True)
+    helpful_count = Column(Integer, default=0, nullable=False)
+    unhelpful_count = Column(Integer, default=0, nullable=False)
+    last_voted_at = Column(DateTime)
+
+class SyncCollection(Base):
+    """File signature each synced collection (schemes, faqs, common_scams) was last diffed at"""
+    __tablename__ = "sync_collections"
+
+    collection = Column(String, primary_key=True)
+    signature = Column(String, nullable=False)
+    version = Column(Integer, default=0, nullable=False)
+    checked_at = Column(DateTime)
+
+class SyncRecord(Base):
+    """Content digest of every record as of the collection's signature"""
+    __tablename__ = "sync_records"
+
+    collection = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    digest = Column(String, nullable=False)
+
+class SyncChange(Base):
+    """Change log: version is the global, monotonic sync version"""
+    __tablename__ = "sync_changes"
+
+    version = Column(Integer, primary_key=True, autoincrement=True)
+    collection = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    op = Column(String, nullable=False)  # add | change | remove
+    changed_at = Column(DateTime, nullable=False, index=True)
+
+class ScamCluster(Base):
+    """Near-duplicate scam reports; the first report is the representative"""
+    __tablename__ = "scam_clusters"
+
+    id = Column(Integer, primary_key=True)
+    representative_report_id = Column(String, nullable=False)
+    representative = Column(String, nullable=False)
+    scam_type = Column(String)
+    signature = Column(LargeBinary, nullable=False)  # MinHash values (uint32)
+    report_count = Column(Integer, default=1, nullable=False)
+    first_seen = Column(DateTime, nullable=False)
+    last_seen = Column(DateTime, nullable=False, index=True)
+    # Risk analysis shared by the cluster's reports, and the scam keyword version it used
+    risk_level = Column(String)
+    risk_score = Column(Float)
+    keywords = Column(String)  # JSON list
+    analysis_text = Column(String)
+    analysis_key = Column(String)
+
+class ScamClusterBand(Base):
+    """LSH index: (band, hash of the band's MinHash values) -> cluster"""
+    __tablename__ = "scam_cluster_bands"
+
+    band = Column(Integer, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    cluster_id = Column(Integer, primary_key=True)
+
+class ScamIndicator(Base):
+    """Phone number, UPI ID or domain from scam reports or the seed list (see indicators.py)"""
+    __tablename__ = "scam_indicators"
+
+    id = Column(Integer, primary_key=True)  # insertion order: workers load new rows by id
+    kind = Column(String, nullable=False)  # phone | upi | domain
+    value = Column(String, nullable=False)
+    seeded = Column(Boolean, default=False, nullable=False)
+    # Set by a moderator; only seeded or confirmed indicators raise risk scores
+    confirmed = Column(Boolean, default=False, nullable=False, server_default="0")
+    report_count = Column(Integer, default=0, nullable=False)  # distinct reporters
+    # /scam/analyze requests that flagged it
+    hit_count = Column(Integer, default=0, nullable=False)
+    first_seen = Column(DateTime, nullable=False)
+    last_seen = Column(DateTime, nullable=False)
+
+    __table_args__ = (Index("ix_scam_indicators_kind_value", "kind", "value", unique=True),)
+
+class ScamIndicatorReporter(Base):
+    """Who reported an indicator (user or hashed IP), so repeat reports count once"""
+    __tablename__ = "scam_indicator_reporters"
+
+    indicator_id = Column(Integer, primary_key=True)
+    reporter = Column(String, primary_key=True)
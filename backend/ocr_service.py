@@ -1,16 +1,62 @@
+"""
+Document OCR (POST /ocr/extract).
+
+The OCR job (PDF text extraction, OpenCV preprocessing, EasyOCR) is CPU-bound
+and memory-hungry, so it runs in a small process pool, OCR_PROCESSES processes per API
+worker (default 1), started with "spawn" on the first upload. API workers
+never import OpenCV/EasyOCR or hold the model, a slow document cannot
+stall the event loop, and a crashed OCR process fails that request only.
+OCR_PROCESSES=0 runs the job in the API worker's threadpool instead.
+
+A new pool first imports the OCR libraries and loads the EasyOCR model. That
+start-up is waited for separately (OCR_STARTUP_TIMEOUT) and does not count
+against a request's OCR_TIMEOUT. With STARTUP_WARMUP_OCR=1 gunicorn starts it
+in each worker right after fork (see gunicorn.conf.py). An upload that times
+out keeps its temp file until the job still reading it has finished.
+"""
+
 from fastapi import APIRouter, File, UploadFile, HTTPException
 import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pydantic import BaseModel
 from pathlib import Path
-import cv2
-import numpy as np
 import tempfile
-import fitz  # PyMuPDF
+import time
+from typing import Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from metrics import OCR_QUEUE_DEPTH, OCR_STAGE_SECONDS
+from profiling import TimedRoute, record_stage
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
-# Lazy import for EasyOCR to avoid slow startup
+OCR_PROCESSES = int(os.getenv("OCR_PROCESSES", "1"))
+OCR_TIMEOUT = 10
+# Pool start-up and model load, kept out of OCR_TIMEOUT
+OCR_STARTUP_TIMEOUT = float(os.getenv("OCR_STARTUP_TIMEOUT", "180"))
+
+# OpenCV, PyMuPDF and EasyOCR are imported on first use (or by warm_ocr_imports())
+# so that importing the app stays fast on cold starts
 _reader = None
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_ready: Optional[Future] = None  # the new pool's _load_ocr_libs job
+_pool_lock = threading.Lock()
+
+
+def _import_ocr_libs():
+    import cv2  # noqa: F401
+    import fitz  # noqa: F401  PyMuPDF
+
+
+def _load_ocr_libs():
+    _import_ocr_libs()
+    get_ocr_reader()
+
 
 def get_ocr_reader():
     global _reader
@@ -24,7 +70,13 @@ class OCRResponse(BaseModel):
     text: str
 
 
+class OCRError(Exception):
+    """A document the OCR job could not read (message is safe to show)"""
+
+
 def extract_pdf_text(pdf_path: str) -> str:
+    import fitz  # PyMuPDF
+
     text_out = []
     doc = fitz.open(pdf_path)
     for page in doc:
@@ -32,29 +84,129 @@ def extract_pdf_text(pdf_path: str) -> str:
     return "\n".join(text_out)
 
 
+def run_ocr(file_path: str, is_pdf: bool) -> Tuple[str, Dict[str, float]]:
+    """The OCR job: (text, seconds per stage). Runs in the OCR pool."""
+    timings = {}
+    # If PDF → try text extraction first
+    if is_pdf:
+        started = time.perf_counter()
+        pdf_text = extract_pdf_text(file_path)
+        timings["pdf_text"] = time.perf_counter() - started
+        if pdf_text.strip():
+            return pdf_text, timings
+    # Otherwise → OCR image
+    started = time.perf_counter()
+    import cv2
+
+    img = cv2.imread(file_path)
+    if img is None:
+        raise OCRError("Failed to read image.")
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    gray = cv2.threshold(gray, 0, 255, cv2.THRESH_OTSU + cv2.THRESH_BINARY)[1]
+    timings["preprocess"] = time.perf_counter() - started
+    started = time.perf_counter()
+    try:
+        result = get_ocr_reader().readtext(gray, detail=0)
+    except Exception:
+        raise OCRError("OCR processing failed. Please upload a valid image or PDF.")
+    timings["recognize"] = time.perf_counter() - started
+    extracted_text = "\n".join(result)
+    return (extracted_text if extracted_text.strip() else "No readable text found."), timings
+
+
+def _executor() -> Optional[ProcessPoolExecutor]:
+    global _pool, _pool_ready
+    if OCR_PROCESSES <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the OCR processes start clean instead of copying the API worker
+            _pool = ProcessPoolExecutor(max_workers=OCR_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+            _pool_ready = _pool.submit(_load_ocr_libs)
+        return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor):
+    global _pool, _pool_ready
+    with _pool_lock:
+        if _pool is broken:
+            _pool, _pool_ready = None, None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_ocr_pool():
+    global _pool, _pool_ready
+    with _pool_lock:
+        pool, _pool, _pool_ready = _pool, None, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def warm_ocr_pool() -> Optional[Future]:
+    """Start the OCR pool and its model load without waiting (gunicorn post_fork)"""
+    _executor()
+    return _pool_ready
+
+
+def warm_ocr_imports():
+    """Import OpenCV/PyMuPDF and load the model where OCR runs (starting the OCR pool)"""
+    ready = warm_ocr_pool()
+    if ready is None:
+        _load_ocr_libs()
+    else:
+        ready.result()
+
+
+async def _ocr_ready():
+    """Wait for the pool's start-up, which does not count against OCR_TIMEOUT"""
+    ready = warm_ocr_pool()
+    if ready is None or ready.done():
+        return
+    try:
+        await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(ready)), timeout=OCR_STARTUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="OCR is starting up. Please try again shortly.")
+    except Exception:
+        pass  # e.g. the model could not load: the job reports the failure
+
+
+def _discard_when_done(job: asyncio.Future, file_path: str):
+    """Delete the upload once a job that timed out has stopped reading it"""
+    def cleanup(done: asyncio.Future):
+        if not done.cancelled():
+            done.exception()  # retrieved, so it is not logged as unhandled
+        Path(file_path).unlink(missing_ok=True)
+
+    job.add_done_callback(cleanup)
+
+
+async def _run_job(file_path: str, is_pdf: bool) -> Tuple[str, Dict[str, float]]:
+    pool = _executor()
+    if pool is None:
+        return await run_in_threadpool(run_ocr, file_path, is_pdf)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, run_ocr, file_path, is_pdf)
+    except BrokenProcessPool:
+        # An OCR process died (e.g. out of memory); the next upload gets a fresh pool
+        _reset_pool(pool)
+        raise OCRError("OCR worker crashed. Please try again.")
+
+
 from fastapi import Request
-# --- Lightweight Rate Limiting ---
-import time
-RATE_LIMIT = {}  # (ip, endpoint): [timestamps]
-def check_rate_limit(ip, endpoint, max_req=3, window=10):
-    now = time.time()
-    key = (ip, endpoint)
-    timestamps = RATE_LIMIT.get(key, [])
-    timestamps = [t for t in timestamps if now - t < window]
-    if len(timestamps) >= max_req:
-        raise HTTPException(status_code=429, detail="Too many requests. Please slow down.")
-    timestamps.append(now)
-    RATE_LIMIT[key] = timestamps
+
+# --- Rate Limiting (shared across workers with RATE_LIMIT_STORE=sqlite) ---
+from rate_limit import check_rate_limit
 
 @router.post("/extract", response_model=OCRResponse)
 async def extract_text(file: UploadFile = File(...), request: Request = None):
     if request:
         client_ip = request.client.host
-        check_rate_limit(client_ip, 'ocr-extract')
+        await run_in_threadpool(check_rate_limit, client_ip, 'ocr-extract')
     if not file.filename.lower().endswith((".jpg", ".jpeg", ".png", ".pdf")):
         raise HTTPException(status_code=400, detail="Invalid file format. Upload JPG, PNG, or PDF.")
 
     temp = tempfile.NamedTemporaryFile(delete=False)
+    upload_started = time.perf_counter()
     try:
         while True:
             chunk = await file.read(1024 * 1024)  # 1MB chunks
@@ -63,35 +215,33 @@ async def extract_text(file: UploadFile = File(...), request: Request = None):
             temp.write(chunk)
         temp.close()
         file_path = temp.name
+        upload_seconds = time.perf_counter() - upload_started
+        OCR_STAGE_SECONDS.labels("upload").observe(upload_seconds)
+        record_stage("ocr_upload", upload_seconds)
     except Exception:
         temp.close()
         Path(temp.name).unlink(missing_ok=True)
         raise HTTPException(status_code=500, detail="Failed to save uploaded file.")
-    async def ocr_task():
-        try:
-            # If PDF → try text extraction first
-            if file.filename.lower().endswith(".pdf"):
-                pdf_text = extract_pdf_text(file_path)
-                if pdf_text.strip():
-                    return {"text": pdf_text}
-            # Otherwise → OCR image
-            img = cv2.imread(file_path)
-            if img is None:
-                raise HTTPException(status_code=500, detail="Failed to read image.")
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            gray = cv2.threshold(gray, 0, 255, cv2.THRESH_OTSU + cv2.THRESH_BINARY)[1]
-            try:
-                reader = get_ocr_reader()
-                result = reader.readtext(gray, detail=0)
-                extracted_text = "\n".join(result)
-            except Exception:
-                raise HTTPException(status_code=500, detail="OCR processing failed. Please upload a valid image or PDF.")
-            return {"text": extracted_text if extracted_text.strip() else "No readable text found."}
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"OCR failed: {str(e)}")
+    OCR_QUEUE_DEPTH.inc()
+    job = None
     try:
-        return await asyncio.wait_for(ocr_task(), timeout=10)
+        await _ocr_ready()
+        job = asyncio.ensure_future(_run_job(file_path, file.filename.lower().endswith(".pdf")))
+        # shield: on timeout the job keeps running, so its temp file must stay
+        text, timings = await asyncio.wait_for(asyncio.shield(job), timeout=OCR_TIMEOUT)
     except asyncio.TimeoutError:
         raise HTTPException(status_code=504, detail="OCR processing timed out. Please try again with a clearer image.")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"OCR failed: {str(e)}")
     finally:
-        Path(file_path).unlink(missing_ok=True)
+        OCR_QUEUE_DEPTH.dec()
+        if job is not None and not job.done():
+            _discard_when_done(job, file_path)
+        else:
+            Path(file_path).unlink(missing_ok=True)
+    for name, seconds in timings.items():
+        OCR_STAGE_SECONDS.labels(name).observe(seconds)
+        record_stage(f"ocr_{name}", seconds)
+    return {"text": text}
@@ -0,0 +1,340 @@
+"""
+OTP storage backends for auth_service.
+
+- InMemoryOTPStore: process-local dict with a TTL heap and a background reaper
+- SQLiteOTPStore: shared file-backed store (WAL) so every uvicorn worker sees
+  the same OTPs; attempt counting happens inside one IMMEDIATE transaction
+
+Pick the backend with OTP_STORE=memory|sqlite (default: memory).
+"""
+
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+
+OTP_STORE_BACKEND = os.getenv("OTP_STORE", "memory").lower()
+OTP_STORE_PATH = os.getenv("OTP_STORE_PATH", str(BASE_DIR / "otp_store.db"))
+OTP_STORE_MAX_ENTRIES = int(os.getenv("OTP_STORE_MAX_ENTRIES", "100000"))
+OTP_REAPER_INTERVAL = int(os.getenv("OTP_REAPER_INTERVAL", "30"))
+OTP_MAX_ATTEMPTS = 3
+
+# verify() outcomes
+VERIFY_OK = "ok"
+VERIFY_EXPIRED = "expired"
+VERIFY_INVALID = "invalid"
+VERIFY_LOCKED = "locked"
+
+
+class OTPStore(ABC):
+    """Common interface + metrics for OTP backends"""
+
+    def __init__(self):
+        self._metrics_lock = threading.Lock()
+        self._metrics = {"issued": 0, "verified": 0, "failed": 0, "locked": 0, "expired": 0, "evicted": 0}
+
+    def _count(self, name: str, n: int = 1):
+        with self._metrics_lock:
+            self._metrics[name] += n
+
+    def _count_verify(self, status: str):
+        if status == VERIFY_OK:
+            self._count("verified")
+        elif status == VERIFY_INVALID:
+            self._count("failed")
+        elif status == VERIFY_LOCKED:
+            self._count("locked")
+
+    @abstractmethod
+    def put(self, email: str, otp_hash: str, ttl_seconds: int):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, email: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def mark_welcome(self, email: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def verify(self, email: str, otp_hash: str) -> Tuple[str, Optional[Dict]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, email: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def active_count(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def reap(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        with self._metrics_lock:
+            data = dict(self._metrics)
+        data["active"] = self.active_count()
+        return data
+
+    def _start_reaper(self):
+        def loop():
+            while True:
+                time.sleep(OTP_REAPER_INTERVAL)
+                try:
+                    self.reap()
+                except Exception as e:
+                    print(f"⚠️ OTP reaper error: {e}")
+
+        threading.Thread(target=loop, name="otp-reaper", daemon=True).start()
+
+
+class InMemoryOTPStore(OTPStore):
+    """
+    Process-local OTP store.
+    Expired entries are removed by a reaper thread using a min-heap of expiry
+    times, and the store never holds more than `max_entries` OTPs.
+    """
+
+    def __init__(self, max_entries: int = OTP_STORE_MAX_ENTRIES, start_reaper: bool = True):
+        super().__init__()
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict] = {}
+        self._heap = []  # [(expires_at, email)] - may contain stale entries
+        if start_reaper:
+            self._start_reaper()
+
+    def put(self, email: str, otp_hash: str, ttl_seconds: int):
+        now = time.time()
+        expires_at = now + ttl_seconds
+        with self._lock:
+            if email not in self._records and len(self._records) >= self.max_entries:
+                self._reap_locked(now)
+                while len(self._records) >= self.max_entries and self._heap:
+                    self._evict_one_locked()
+            self._records[email] = {
+                "otp_hash": otp_hash,
+                "expires_at": expires_at,
+                "created_at": now,
+                "attempts": 0,
+                "welcome": False,
+            }
+            heapq.heappush(self._heap, (expires_at, email))
+            # Re-sends leave stale heap entries behind; compact occasionally
+            if len(self._heap) > 2 * len(self._records) + 64:
+                self._heap = [(r["expires_at"], e) for e, r in self._records.items()]
+                heapq.heapify(self._heap)
+        self._count("issued")
+
+    def get(self, email: str) -> Optional[Dict]:
+        with self._lock:
+            record = self._records.get(email)
+            if record is None or record["expires_at"] < time.time():
+                return None
+            return dict(record)
+
+    def mark_welcome(self, email: str):
+        with self._lock:
+            if email in self._records:
+                self._records[email]["welcome"] = True
+
+    def verify(self, email: str, otp_hash: str) -> Tuple[str, Optional[Dict]]:
+        with self._lock:
+            record = self._records.get(email)
+            if record is None:
+                status = VERIFY_EXPIRED
+            elif time.time() > record["expires_at"]:
+                del self._records[email]
+                status = VERIFY_EXPIRED
+            elif record["attempts"] >= OTP_MAX_ATTEMPTS:
+                del self._records[email]
+                status = VERIFY_LOCKED
+            elif otp_hash != record["otp_hash"]:
+                record["attempts"] += 1
+                if record["attempts"] >= OTP_MAX_ATTEMPTS:
+                    del self._records[email]
+                    status = VERIFY_LOCKED
+                else:
+                    status = VERIFY_INVALID
+            else:
+                del self._records[email]
+                status = VERIFY_OK
+        self._count_verify(status)
+        return status, (dict(record) if record is not None else None)
+
+    def delete(self, email: str):
+        with self._lock:
+            self._records.pop(email, None)
+
+    def active_count(self) -> int:
+        return len(self._records)
+
+    def reap(self) -> int:
+        with self._lock:
+            removed = self._reap_locked(time.time())
+        if removed:
+            self._count("expired", removed)
+        return removed
+
+    def _reap_locked(self, now: float) -> int:
+        removed = 0
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, email = heapq.heappop(self._heap)
+            record = self._records.get(email)
+            # Only drop the record if this heap entry is its current expiry
+            if record is not None and record["expires_at"] == expires_at:
+                del self._records[email]
+                removed += 1
+        return removed
+
+    def _evict_one_locked(self):
+        expires_at, email = heapq.heappop(self._heap)
+        record = self._records.get(email)
+        if record is not None and record["expires_at"] == expires_at:
+            del self._records[email]
+            self._count("evicted")
+
+
+class SQLiteOTPStore(OTPStore):
+    """
+    OTP store shared by all workers on one host through a SQLite file in WAL mode.
+    verify() reads and updates the attempt counter inside a single
+    BEGIN IMMEDIATE transaction, so concurrent guesses cannot race.
+    """
+
+    def __init__(self, path: str = OTP_STORE_PATH, start_reaper: bool = True):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS otps ("
+            " email TEXT PRIMARY KEY,"
+            " otp_hash TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " welcome INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_otps_expires_at ON otps (expires_at)")
+        if start_reaper:
+            self._start_reaper()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_record(row) -> Dict:
+        return {
+            "otp_hash": row["otp_hash"],
+            "expires_at": row["expires_at"],
+            "created_at": row["created_at"],
+            "attempts": row["attempts"],
+            "welcome": bool(row["welcome"]),
+        }
+
+    def put(self, email: str, otp_hash: str, ttl_seconds: int):
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO otps (email, otp_hash, expires_at, created_at, attempts, welcome)"
+            " VALUES (?, ?, ?, ?, 0, 0)",
+            (email, otp_hash, now + ttl_seconds, now),
+        )
+        self._count("issued")
+
+    def get(self, email: str) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT * FROM otps WHERE email = ? AND expires_at >= ?", (email, time.time())
+        ).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def mark_welcome(self, email: str):
+        self._conn().execute("UPDATE otps SET welcome = 1 WHERE email = ?", (email,))
+
+    def verify(self, email: str, otp_hash: str) -> Tuple[str, Optional[Dict]]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT * FROM otps WHERE email = ?", (email,)).fetchone()
+            record = self._row_to_record(row) if row else None
+            if record is None:
+                status = VERIFY_EXPIRED
+            elif time.time() > record["expires_at"]:
+                status = VERIFY_EXPIRED
+            elif record["attempts"] >= OTP_MAX_ATTEMPTS:
+                status = VERIFY_LOCKED
+            elif otp_hash != record["otp_hash"]:
+                record["attempts"] += 1
+                status = VERIFY_LOCKED if record["attempts"] >= OTP_MAX_ATTEMPTS else VERIFY_INVALID
+            else:
+                status = VERIFY_OK
+
+            if status == VERIFY_INVALID:
+                conn.execute("UPDATE otps SET attempts = ? WHERE email = ?", (record["attempts"], email))
+            elif record is not None:
+                conn.execute("DELETE FROM otps WHERE email = ?", (email,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._count_verify(status)
+        return status, record
+
+    def delete(self, email: str):
+        self._conn().execute("DELETE FROM otps WHERE email = ?", (email,))
+
+    def active_count(self) -> int:
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM otps WHERE expires_at >= ?", (time.time(),)
+        ).fetchone()
+        return row[0]
+
+    def reap(self) -> int:
+        cur = self._conn().execute("DELETE FROM otps WHERE expires_at < ?", (time.time(),))
+        if cur.rowcount:
+            self._count("expired", cur.rowcount)
+        return cur.rowcount
+
+
+_STORE: Optional[OTPStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def _reset_after_fork():
+    # A forked worker (gunicorn preload) must not share the parent's SQLite
+    # connection, and the parent's reaper thread does not exist in the child
+    global _STORE, _STORE_LOCK
+    _STORE = None
+    _STORE_LOCK = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_otp_store() -> OTPStore:
+    """Return this process's OTP store selected by OTP_STORE (created on first use)"""
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                if OTP_STORE_BACKEND == "sqlite":
+                    _STORE = SQLiteOTPStore()
+                else:
+                    _STORE = InMemoryOTPStore()
+    return _STORE
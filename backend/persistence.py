@@ -0,0 +1,523 @@
+"""
+SQLAlchemy-backed persistence for profiles, activity events, FAQ votes and
+scam reports (see models.py). Services call these helpers instead of
+rewriting the *_db.json files; import_json_db.py migrates existing JSON data.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, inspect, select, text, tuple_, update
+from sqlalchemy.exc import IntegrityError
+
+import models
+from database import engine, SessionLocal
+
+STAT_COLUMNS = ("total_logins", "ocr_scans", "chat_messages", "scam_reports", "schemes_viewed")
+PROFILE_ATTRIBUTES = ("state", "occupation", "annual_income", "age", "gender", "land_acres")
+
+
+def _parse_ts(value) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def init_db():
+    """Create tables, replacing the never-used legacy scam_reports table if present"""
+    insp = inspect(engine)
+    if insp.has_table("scam_reports"):
+        columns = {c["name"] for c in insp.get_columns("scam_reports")}
+        if "report_id" not in columns:
+            with engine.begin() as conn:
+                count = conn.execute(text("SELECT COUNT(*) FROM scam_reports")).scalar()
+                if count:
+                    conn.execute(text("ALTER TABLE scam_reports RENAME TO scam_reports_legacy"))
+                else:
+                    conn.execute(text("DROP TABLE scam_reports"))
+    models.Base.metadata.create_all(bind=engine)
+    _add_missing_columns(models.Profile.__table__)
+    _add_missing_columns(models.ScamReport.__table__)
+    _add_missing_columns(models.ScamIndicator.__table__)
+
+
+def _add_missing_columns(table):
+    """create_all() does not alter existing tables; add nullable/defaulted columns added since"""
+    existing = {c["name"] for c in inspect(engine).get_columns(table.name)}
+    missing = [c for c in table.columns if c.name not in existing]
+    if not missing:
+        return
+    with engine.begin() as conn:
+        for column in missing:
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+            if column.server_default is not None:
+                ddl += f" NOT NULL DEFAULT {column.server_default.arg}"
+            conn.execute(text(ddl))
+
+
+# ---------- Profiles ----------
+
+def _profile_to_dict(p: models.Profile) -> Dict:
+    return {
+        "name": p.name or "",
+        "member_since": _iso(p.member_since),
+        "stats": {
+            **{col: getattr(p, col) or 0 for col in STAT_COLUMNS},
+            "last_active": _iso(p.last_active),
+        },
+        "attributes": {col: getattr(p, col) for col in PROFILE_ATTRIBUTES},
+        "attributes_version": p.attributes_version or 0,
+    }
+
+
+def get_profile(email: str) -> Optional[Dict]:
+    with SessionLocal() as db:
+        p = db.get(models.Profile, email)
+        return _profile_to_dict(p) if p else None
+
+
+def _get_or_create_profile(db, email: str) -> models.Profile:
+    p = db.get(models.Profile, email)
+    if p is None:
+        p = models.Profile(email=email, name="", member_since=datetime.now())
+        for col in STAT_COLUMNS:
+            setattr(p, col, 0)
+        db.add(p)
+    return p
+
+
+def set_profile_name(email: str, name: str) -> Dict:
+    with SessionLocal() as db:
+        p = _get_or_create_profile(db, email)
+        p.name = name
+        db.commit()
+        return _profile_to_dict(p)
+
+
+def set_profile_attributes(email: str, attributes: Dict) -> Dict:
+    """Update eligibility attributes (None clears one); bumps attributes_version on change"""
+    with SessionLocal() as db:
+        p = _get_or_create_profile(db, email)
+        changed = False
+        for col, value in attributes.items():
+            if col in PROFILE_ATTRIBUTES and getattr(p, col) != value:
+                setattr(p, col, value)
+                changed = True
+        if changed:
+            p.attributes_version = (p.attributes_version or 0) + 1
+        db.commit()
+        return _profile_to_dict(p)
+
+
+def iter_profile_attributes(batch_size: int = 1000):
+    """Yield (email, attributes, attributes_version) for every profile, streamed in batches"""
+    t = models.Profile.__table__
+    cols = [t.c.email, t.c.attributes_version] + [t.c[col] for col in PROFILE_ATTRIBUTES]
+    last_email = ""
+    while True:
+        stmt = select(*cols).where(t.c.email > last_email).order_by(t.c.email).limit(batch_size)
+        with engine.connect() as conn:
+            rows = conn.execute(stmt).all()
+        if not rows:
+            return
+        for r in rows:
+            yield r.email, {col: getattr(r, col) for col in PROFILE_ATTRIBUTES}, r.attributes_version or 0
+        last_email = rows[-1].email
+
+
+def apply_stat_deltas(pending: Dict[str, Dict]):
+    """Add aggregated counters ({email: {"counts": {...}, "last_active": iso}}) in one transaction"""
+    with SessionLocal() as db:
+        for email, delta in pending.items():
+            p = _get_or_create_profile(db, email)
+            db.flush()
+            values = {col: getattr(models.Profile, col) + n for col, n in delta["counts"].items() if col in STAT_COLUMNS}
+            values["last_active"] = _parse_ts(delta["last_active"])
+            db.execute(update(models.Profile).where(models.Profile.email == email).values(**values))
+        db.commit()
+
+
+# ---------- Activity events ----------
+
+class ActivityStore:
+    """Storage backend for activity_log.ActivityLog"""
+
+    def append(self, batch: List[Dict]):
+        rows = [
+            {
+                "email": e["email"],
+                "type": e["type"],
+                "description": e.get("description", ""),
+                "timestamp": _parse_ts(e["timestamp"]) or datetime.now(),
+            }
+            for e in batch
+        ]
+        with engine.begin() as conn:
+            conn.execute(models.ActivityEvent.__table__.insert(), rows)
+
+    def recent(self, email: str, limit: int) -> List[Dict]:
+        """Last `limit` events for a user, oldest first (uses the email+timestamp index)"""
+        t = models.ActivityEvent.__table__
+        stmt = (
+            select(t.c.type, t.c.description, t.c.timestamp)
+            .where(t.c.email == email)
+            .order_by(t.c.timestamp.desc(), t.c.id.desc())
+            .limit(limit)
+        )
+        with engine.connect() as conn:
+            rows = conn.execute(stmt).all()
+        return [
+            {"type": r.type, "description": r.description, "timestamp": _iso(r.timestamp)}
+            for r in reversed(rows)
+        ]
+
+
+# ---------- FAQ votes ----------
+
+def load_faq_votes() -> Dict[str, Tuple[int, int, Optional[str]]]:
+    """faq_id -> (helpful_count, unhelpful_count, last_voted_at)"""
+    with engine.connect() as conn:
+        rows = conn.execute(select(models.FAQVote.__table__)).all()
+    return {r.faq_id: (r.helpful_count, r.unhelpful_count, _iso(r.last_voted_at)) for r in rows}
+
+
+def record_faq_vote(faq_id: str, vote_type: str, base_helpful: int = 0, base_unhelpful: int = 0) -> Tuple[int, int]:
+    """Atomically increment a vote counter; returns (helpful_count, unhelpful_count)"""
+    column = "helpful_count" if vote_type == "helpful" else "unhelpful_count"
+    now = datetime.now()
+    with SessionLocal() as db:
+        vote = db.get(models.FAQVote, faq_id)
+        if vote is None:
+            db.add(models.FAQVote(
+                faq_id=faq_id,
+                helpful_count=base_helpful,
+                unhelpful_count=base_unhelpful,
+                last_voted_at=now,
+            ))
+            db.flush()
+        db.execute(
+            update(models.FAQVote)
+            .where(models.FAQVote.faq_id == faq_id)
+            .values(**{column: getattr(models.FAQVote, column) + 1, "last_voted_at": now})
+        )
+        db.commit()
+        vote = db.get(models.FAQVote, faq_id, populate_existing=True)
+        return vote.helpful_count, vote.unhelpful_count
+
+
+# ---------- Sync change log ----------
+
+def _signature_time(signature: str) -> int:
+    return int(signature.split(":", 1)[0])
+
+
+def record_sync_state(collection: str, signature: str, digests: Dict[str, str],
+                      retention_days: Optional[float] = None, force: bool = False) -> bool:
+    """
+    Log the differences between `digests` ({record key: content digest}) and
+    the stored state of `collection`, which becomes `signature` ("mtime_ns:size").
+    Returns False, recording nothing, when the stored state comes from a newer
+    file (the caller's snapshot is behind) unless `force` is set.
+    """
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        # Write first so the transaction holds SQLite's write lock before it
+        # reads: workers noticing the same file change diff it one at a time
+        db.execute(
+            update(models.SyncCollection)
+            .where(models.SyncCollection.collection == collection)
+            .values(checked_at=now)
+        )
+        state = db.get(models.SyncCollection, collection)
+        if state is not None and state.signature != signature:
+            if not force and _signature_time(state.signature) > _signature_time(signature):
+                db.commit()
+                return False
+        elif state is not None:
+            db.commit()
+            return True
+
+        stored = dict(db.execute(
+            select(models.SyncRecord.key, models.SyncRecord.digest).where(models.SyncRecord.collection == collection)
+        ).all())
+        changes = []
+        for key, digest in digests.items():
+            old = stored.get(key)
+            if old is None:
+                changes.append((key, "add"))
+                db.add(models.SyncRecord(collection=collection, key=key, digest=digest))
+            elif old != digest:
+                changes.append((key, "change"))
+        for key in sorted(stored.keys() - digests.keys()):
+            changes.append((key, "remove"))
+        if changes:
+            changed = [key for key, op in changes if op == "change"]
+            for key in changed:
+                db.execute(
+                    update(models.SyncRecord)
+                    .where(models.SyncRecord.collection == collection, models.SyncRecord.key == key)
+                    .values(digest=digests[key])
+                )
+            removed = [key for key, op in changes if op == "remove"]
+            if removed:
+                db.execute(delete(models.SyncRecord).where(
+                    models.SyncRecord.collection == collection, models.SyncRecord.key.in_(removed)
+                ))
+            log = [models.SyncChange(collection=collection, key=key, op=op, changed_at=now) for key, op in changes]
+            db.add_all(log)
+            db.flush()
+        version = log[-1].version if changes else (state.version if state is not None else 0)
+        if state is None:
+            db.add(models.SyncCollection(collection=collection, signature=signature, version=version, checked_at=now))
+        else:
+            state.signature, state.version = signature, version
+        if retention_days:
+            db.execute(delete(models.SyncChange).where(
+                models.SyncChange.changed_at < now - timedelta(days=retention_days)
+            ))
+        db.commit()
+    return True
+
+
+def sync_collection_states() -> Dict[str, Tuple[str, int]]:
+    """collection -> (signature, version) as last recorded"""
+    t = models.SyncCollection.__table__
+    with engine.connect() as conn:
+        rows = conn.execute(select(t.c.collection, t.c.signature, t.c.version)).all()
+    return {r.collection: (r.signature, r.version) for r in rows}
+
+
+def sync_changes_since(since: int, until: int) -> Tuple[int, Dict[str, Dict[str, str]]]:
+    """
+    (oldest version still logged, {collection: {key: first op after `since`}})
+    for changes in (since, until]
+    """
+    t = models.SyncChange.__table__
+    with engine.connect() as conn:
+        oldest = conn.execute(select(func.min(t.c.version))).scalar()
+        rows = conn.execute(
+            select(t.c.collection, t.c.key, t.c.op)
+            .where(t.c.version > since, t.c.version <= until)
+            .order_by(t.c.version)
+        ).all()
+    first: Dict[str, Dict[str, str]] = {}
+    for r in rows:
+        first.setdefault(r.collection, {}).setdefault(r.key, r.op)
+    return (oldest if oldest is not None else until + 1), first
+
+
+# ---------- Scam reports ----------
+
+def add_scam_report(report: Dict):
+    with SessionLocal() as db:
+        db.add(models.ScamReport(
+            report_id=report["report_id"],
+            email=report.get("email"),
+            description=report["description"],
+            risk_level=report.get("risk_level"),
+            risk_score=report.get("risk_score"),
+            scam_type=report.get("scam_type"),
+            location=report.get("location"),
+            created_at=_parse_ts(report.get("created_at")) or datetime.utcnow(),
+            cluster_id=report.get("cluster_id"),
+        ))
+        db.commit()
+
+
+def list_scam_reports(limit: int = 100) -> List[Dict]:
+    t = models.ScamReport.__table__
+    with engine.connect() as conn:
+        rows = conn.execute(select(t).order_by(t.c.created_at.desc()).limit(limit)).all()
+    return [
+        {
+            "report_id": r.report_id,
+            "email": r.email,
+            "description": r.description,
+            "risk_level": r.risk_level,
+            "risk_score": r.risk_score,
+            "scam_type": r.scam_type,
+            "location": r.location,
+            "created_at": _iso(r.created_at),
+            "cluster_id": r.cluster_id,
+        }
+        for r in rows
+    ]
+
+
+# ---------- Scam indicators ----------
+
+INDICATOR_BATCH = 500
+IndicatorKey = Tuple[str, str]  # (kind, value)
+
+
+def _batches(keys: List[IndicatorKey]):
+    for i in range(0, len(keys), INDICATOR_BATCH):
+        yield keys[i:i + INDICATOR_BATCH]
+
+
+def _indicator_rows(db, keys: List[IndicatorKey]) -> Dict[IndicatorKey, models.ScamIndicator]:
+    t = models.ScamIndicator
+    rows = {}
+    for batch in _batches(keys):
+        for row in db.execute(select(t).where(tuple_(t.kind, t.value).in_(batch))).scalars():
+            rows[(row.kind, row.value)] = row
+    return rows
+
+
+def _insert_missing(db, keys: List[IndicatorKey], now: datetime, **values) -> int:
+    existing = _indicator_rows(db, keys)
+    missing = [key for key in keys if key not in existing]
+    db.add_all(
+        models.ScamIndicator(kind=kind, value=value, first_seen=now, last_seen=now, **values)
+        for kind, value in missing
+    )
+    db.flush()
+    return len(missing)
+
+
+def _retry_on_conflict(fn):
+    # Another worker may insert the same indicator between our select and insert
+    for attempt in range(3):
+        try:
+            return fn()
+        except IntegrityError:
+            if attempt == 2:
+                raise
+
+
+def record_scam_indicators(keys: Iterable[IndicatorKey], reporter: str,
+                           now: Optional[datetime] = None) -> Dict[IndicatorKey, int]:
+    """
+    Record a report of each indicator by `reporter`; report_count counts
+    distinct reporters, so a repeat report only updates last_seen. Returns
+    the report counts.
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+    now = now or datetime.utcnow()
+    t = models.ScamIndicator
+    r = models.ScamIndicatorReporter
+
+    def record():
+        with SessionLocal() as db:
+            _insert_missing(db, keys, now, report_count=0)
+            ids = [row.id for row in _indicator_rows(db, keys).values()]
+            known = set(db.execute(
+                select(r.indicator_id).where(r.indicator_id.in_(ids), r.reporter == reporter)
+            ).scalars())
+            new = [indicator_id for indicator_id in ids if indicator_id not in known]
+            db.add_all(r(indicator_id=indicator_id, reporter=reporter) for indicator_id in new)
+            db.flush()
+            if new:
+                db.execute(update(t).where(t.id.in_(new)).values(report_count=t.report_count + 1))
+            db.execute(update(t).where(t.id.in_(ids)).values(last_seen=now))
+            db.commit()
+            rows = db.execute(
+                select(t.kind, t.value, t.report_count).where(tuple_(t.kind, t.value).in_(keys))
+            ).all()
+            return {(r.kind, r.value): r.report_count for r in rows}
+
+    counts = _retry_on_conflict(record)
+    return {(kind, value): counts.get((kind, value), 0) for kind, value in keys}
+
+
+def seed_scam_indicators(keys: Iterable[IndicatorKey], now: Optional[datetime] = None) -> int:
+    """Make `keys` the seeded indicators, adding missing ones; returns how many were added"""
+    wanted = set(keys)
+    now = now or datetime.utcnow()
+    t = models.ScamIndicator
+
+    def seed():
+        with SessionLocal() as db:
+            seeded = {(r.kind, r.value) for r in db.execute(select(t.kind, t.value).where(t.seeded))}
+            for batch in _batches(sorted(seeded - wanted)):
+                db.execute(update(t).where(tuple_(t.kind, t.value).in_(batch)).values(seeded=False))
+            new = sorted(wanted - seeded)
+            added = _insert_missing(db, new, now, seeded=True)
+            for batch in _batches(new):
+                db.execute(update(t).where(tuple_(t.kind, t.value).in_(batch)).values(seeded=True))
+            db.commit()
+            return added
+
+    return _retry_on_conflict(seed)
+
+
+def scam_indicators_after(after_id: int, limit: int = 10000) -> List[Tuple[int, str, str]]:
+    """(id, kind, value) of indicators added after `after_id`, oldest first"""
+    t = models.ScamIndicator.__table__
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(t.c.id, t.c.kind, t.c.value).where(t.c.id > after_id).order_by(t.c.id).limit(limit)
+        ).all()
+    return [(r.id, r.kind, r.value) for r in rows]
+
+
+def scam_indicator_stats(keys: Iterable[IndicatorKey]) -> Dict[IndicatorKey, Dict]:
+    """Exact counts of the indicators that exist"""
+    with SessionLocal() as db:
+        rows = _indicator_rows(db, list(dict.fromkeys(keys)))
+    return {
+        key: {
+            "seeded": row.seeded,
+            "confirmed": row.confirmed,
+            "report_count": row.report_count,
+            "hit_count": row.hit_count,
+            "last_seen": _iso(row.last_seen),
+        }
+        for key, row in rows.items()
+    }
+
+
+def add_scam_indicator_hits(keys: Iterable[IndicatorKey]):
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return
+    t = models.ScamIndicator
+    with SessionLocal() as db:
+        db.execute(update(t).where(tuple_(t.kind, t.value).in_(keys)).values(hit_count=t.hit_count + 1))
+        db.commit()
+
+
+def confirm_scam_indicator(key: IndicatorKey, confirmed: bool = True) -> bool:
+    """Mark an indicator as moderator-confirmed (or not); False if it is unknown"""
+    kind, value = key
+    t = models.ScamIndicator
+    with SessionLocal() as db:
+        result = db.execute(update(t).where(t.kind == kind, t.value == value).values(confirmed=confirmed))
+        db.commit()
+        return result.rowcount > 0
+
+
+def list_scam_indicators(min_reports: int = 1, limit: int = 50, unconfirmed: bool = True) -> List[Dict]:
+    """Most reported indicators, for moderators to confirm"""
+    t = models.ScamIndicator.__table__
+    stmt = select(t).where(t.c.report_count >= min_reports)
+    if unconfirmed:
+        stmt = stmt.where(t.c.confirmed.is_(False), t.c.seeded.is_(False))
+    stmt = stmt.order_by(t.c.report_count.desc(), t.c.last_seen.desc()).limit(limit)
+    with engine.connect() as conn:
+        rows = conn.execute(stmt).all()
+    return [
+        {
+            "kind": r.kind,
+            "value": r.value,
+            "seeded": r.seeded,
+            "confirmed": r.confirmed,
+            "report_count": r.report_count,
+            "hit_count": r.hit_count,
+            "first_seen": _iso(r.first_seen),
+            "last_seen": _iso(r.last_seen),
+        }
+        for r in rows
+    ]
+
@@ -1,22 +1,26 @@
-from fastapi import APIRouter, HTTPException, Header
-from pydantic import BaseModel
-from pathlib import Path
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel, Field
 from typing import Optional, Dict, List
 from datetime import datetime
-import json
-from jose import jwt
-from auth_service import JWT_SECRET, JWT_ALGO
+from security import UserPrincipal, get_current_user
+from activity_log import ActivityLog
+from eligibility import GENDERS, MAX_AGE
+import persistence
+from profiling import TimedRoute
 
-router = APIRouter()
-
-BASE_DIR = Path(__file__).resolve().parent
-PROFILE_DB = BASE_DIR / "profiles_db.json"
-ACTIVITY_DB = BASE_DIR / "activity_db.json"
+router = APIRouter(route_class=TimedRoute)
 
 
 class Profile(BaseModel):
     email: str
     name: Optional[str] = ""
+    # Optional eligibility attributes used by GET /schemes/recommended
+    state: Optional[str] = None
+    occupation: Optional[str] = None
+    annual_income: Optional[int] = None
+    age: Optional[int] = None
+    gender: Optional[str] = None
+    land_acres: Optional[float] = None
 
 
 class ActivityItem(BaseModel):
@@ -41,132 +45,41 @@ class DashboardResponse(BaseModel):
     recent_activity: List[ActivityItem]
 
 
-_PROFILE_CACHE = None
-_PROFILE_CACHE_TS = 0
-def _load_db(ttl=600) -> Dict[str, Dict]:
-    global _PROFILE_CACHE, _PROFILE_CACHE_TS
-    now = time.time()
-    if _PROFILE_CACHE is not None and now - _PROFILE_CACHE_TS < ttl:
-        return _PROFILE_CACHE
-    if not PROFILE_DB.exists():
-        return {}
-    try:
-        with PROFILE_DB.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-            if isinstance(data, dict):
-                _PROFILE_CACHE = data
-                _PROFILE_CACHE_TS = now
-                return data
-            return {}
-    except Exception:
-        return {}
-
-
-def _save_db(data: Dict[str, Dict]):
-    with PROFILE_DB.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-
-_ACTIVITY_CACHE = None
-_ACTIVITY_CACHE_TS = 0
-def _load_activity_db(ttl=600) -> Dict[str, List[Dict]]:
-    global _ACTIVITY_CACHE, _ACTIVITY_CACHE_TS
-    now = time.time()
-    if _ACTIVITY_CACHE is not None and now - _ACTIVITY_CACHE_TS < ttl:
-        return _ACTIVITY_CACHE
-    if not ACTIVITY_DB.exists():
-        return {}
-    try:
-        with ACTIVITY_DB.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-            if isinstance(data, dict):
-                _ACTIVITY_CACHE = data
-                _ACTIVITY_CACHE_TS = now
-                return data
-            return {}
-    except Exception:
-        return {}
-
-
-def _save_activity_db(data: Dict[str, List[Dict]]):
-    with ACTIVITY_DB.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-
-def _get_email_from_auth(authorization: Optional[str]) -> str:
-    if not authorization or not authorization.lower().startswith("bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid Authorization header")
-    token = authorization.split(" ", 1)[1].strip()
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
-        email = payload.get("email") or payload.get("sub")
-        if not email:
-            raise HTTPException(status_code=401, detail="Invalid token payload")
-        return email
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
+# Events go to the activity_events table in batches; stat deltas to profiles
+activity_log = ActivityLog(on_flush=persistence.apply_stat_deltas, store=persistence.ActivityStore())
 
 
 def log_activity(email: str, activity_type: str, description: str):
-    """Log user activity for analytics"""
-    activity_db = _load_activity_db()
-    if email not in activity_db:
-        activity_db[email] = []
-    
-    activity_db[email].append({
-        "type": activity_type,
-        "description": description,
-        "timestamp": datetime.now().isoformat()
-    })
-    
-    # Keep only last 50 activities per user
-    activity_db[email] = activity_db[email][-50:]
-    _save_activity_db(activity_db)
-    
-    # Update stats in profile db
-    profile_db = _load_db()
-    if email not in profile_db:
-        profile_db[email] = {"name": "", "stats": {}, "member_since": datetime.now().isoformat()}
-    
-    stats = profile_db[email].get("stats", {})
-    
-    if activity_type == "login":
-        stats["total_logins"] = stats.get("total_logins", 0) + 1
-    elif activity_type == "ocr":
-        stats["ocr_scans"] = stats.get("ocr_scans", 0) + 1
-    elif activity_type == "chatbot":
-        stats["chat_messages"] = stats.get("chat_messages", 0) + 1
-    elif activity_type == "scam_report":
-        stats["scam_reports"] = stats.get("scam_reports", 0) + 1
-    elif activity_type == "scheme_view":
-        stats["schemes_viewed"] = stats.get("schemes_viewed", 0) + 1
-    
-    stats["last_active"] = datetime.now().isoformat()
-    profile_db[email]["stats"] = stats
-    _save_db(profile_db)
+    """Log user activity for analytics (buffered; see activity_log.py)"""
+    activity_log.log(email, activity_type, description)
 
 
 @router.get("/me", response_model=Profile)
-def get_my_profile(authorization: Optional[str] = Header(None)):
-    email = _get_email_from_auth(authorization)
-    db = _load_db()
-    record = db.get(email, {})
-    name = record.get("name", "")
-    return Profile(email=email, name=name)
+def get_my_profile(user: UserPrincipal = Depends(get_current_user)):
+    email = user.email
+    record = persistence.get_profile(email) or {}
+    return _profile_response(email, record)
+
+
+def _profile_response(email: str, record: Dict) -> Profile:
+    return Profile(email=email, name=record.get("name", ""), **(record.get("attributes") or {}))
 
 
 @router.get("/dashboard", response_model=DashboardResponse)
-def get_dashboard(authorization: Optional[str] = Header(None)):
-    email = _get_email_from_auth(authorization)
+def get_dashboard(user: UserPrincipal = Depends(get_current_user)):
+    email = user.email
     
     # Get profile
-    profile_db = _load_db()
-    record = profile_db.get(email, {})
-    name = record.get("name", "")
+    record = persistence.get_profile(email) or {}
     
-    # Get stats
-    stats_data = record.get("stats", {})
-    member_since = record.get("member_since", datetime.now().isoformat())
+    # Get stats (persisted counters + deltas not yet flushed)
+    stats_data = {k: v for k, v in record.get("stats", {}).items() if v is not None}
+    pending = activity_log.pending_stats(email)
+    for field, n in pending["counts"].items():
+        stats_data[field] = stats_data.get(field, 0) + n
+    if pending["last_active"]:
+        stats_data["last_active"] = pending["last_active"]
+    member_since = record.get("member_since") or datetime.now().isoformat()
     
     stats = UserStats(
         total_logins=stats_data.get("total_logins", 1),
@@ -178,44 +91,52 @@ def get_dashboard(authorization: Optional[str] = Header(None)):
         last_active=stats_data.get("last_active", datetime.now().isoformat())
     )
     
-    # Get recent activity
-    activity_db = _load_activity_db()
-    activities = activity_db.get(email, [])
+    # Get recent activity (ring buffer, filled from the email+timestamp index)
     recent_activity = [
         ActivityItem(
             type=a["type"],
             description=a["description"],
             timestamp=a["timestamp"]
         )
-        for a in reversed(activities[-10:])  # Last 10 activities
+        for a in activity_log.recent(email, 10)  # Last 10 activities
     ]
     
     return DashboardResponse(
-        profile=Profile(email=email, name=name),
+        profile=_profile_response(email, record),
         stats=stats,
         recent_activity=recent_activity
     )
 
 
 class UpdateProfileRequest(BaseModel):
-    name: str
+    name: Optional[str] = None
+    state: Optional[str] = None
+    occupation: Optional[str] = None
+    annual_income: Optional[int] = Field(None, ge=0)
+    age: Optional[int] = Field(None, ge=0, le=MAX_AGE)
+    gender: Optional[str] = None
+    land_acres: Optional[float] = Field(None, ge=0)
 
 
 @router.post("/me", response_model=Profile)
-def update_my_profile(payload: UpdateProfileRequest, authorization: Optional[str] = Header(None)):
-    email = _get_email_from_auth(authorization)
-    name = (payload.name or "").strip()
-    db = _load_db()
-    
-    if email not in db:
-        db[email] = {"member_since": datetime.now().isoformat()}
+def update_my_profile(payload: UpdateProfileRequest, user: UserPrincipal = Depends(get_current_user)):
+    """Update the name and/or eligibility attributes; omitted fields are left unchanged"""
+    email = user.email
+    sent = payload.model_dump(exclude_unset=True) if hasattr(payload, "model_dump") else payload.dict(exclude_unset=True)
+    if payload.gender is not None and payload.gender.strip().lower() not in GENDERS:
+        raise HTTPException(status_code=400, detail=f"gender must be one of {', '.join(GENDERS)}")
+
+    if "name" in sent:
+        record = persistence.set_profile_name(email, (payload.name or "").strip())
+    attributes = {k: v for k, v in sent.items() if k in persistence.PROFILE_ATTRIBUTES}
+    if "gender" in attributes and attributes["gender"]:
+        attributes["gender"] = attributes["gender"].strip().lower()
+    if attributes or "name" not in sent:
+        record = persistence.set_profile_attributes(email, attributes)
     
-    db[email]["name"] = name
-    _save_db(db)
+    log_activity(email, "profile_update", "Updated profile" if attributes else "Updated profile name")
     
-    log_activity(email, "profile_update", "Updated profile name")
-    
-    return Profile(email=email, name=name)
+    return _profile_response(email, record)
 
 
 class LogActivityRequest(BaseModel):
@@ -224,7 +145,12 @@ class LogActivityRequest(BaseModel):
 
 
 @router.post("/activity")
-def log_user_activity(payload: LogActivityRequest, authorization: Optional[str] = Header(None)):
-    email = _get_email_from_auth(authorization)
+def log_user_activity(payload: LogActivityRequest, user: UserPrincipal = Depends(get_current_user)):
+    email = user.email
     log_activity(email, payload.type, payload.description)
     return {"status": "logged"}
+
+
+@router.get("/activity", response_model=List[ActivityItem])
+def get_user_activity(limit: int = 50, user: UserPrincipal = Depends(get_current_user)):
+    return [ActivityItem(**a) for a in activity_log.recent(user.email, max(1, min(limit, 50)))]
@@ -0,0 +1,321 @@
+"""
+Opt-in production diagnostics.
+
+1. Server-Timing: code marks stages with `with stage("json_load"): ...`.
+   ProfilingMiddleware collects them per request and returns a
+   `Server-Timing` header (json_load, index, scoring, endpoint, serialize,
+   ocr_* ...). When SERVER_TIMING=0, or outside a request, stage() returns a
+   shared no-op context manager.
+
+2. Sampling profiler: an admin (X-Admin-Token == ADMIN_TOKEN) can start a
+   background thread that samples every thread's Python stack with
+   sys._current_frames(), for N seconds or only while a random percentage of
+   requests is in flight. Results come out as flamegraph-compatible collapsed
+   stacks ("frame;frame;frame count"). Overhead is bounded by the sampling
+   interval and the session's maximum duration; with no session running the
+   middleware only checks a float.
+"""
+
+import hmac
+import inspect
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from contextlib import nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING", "1") != "0"
+PROFILE_MAX_SECONDS = 300
+PROFILE_MIN_INTERVAL_MS = 1
+PROFILE_MAX_DEPTH = 64
+
+# ============================================================
+# Server-Timing stages
+# ============================================================
+
+_TIMINGS: ContextVar[Optional[Dict[str, float]]] = ContextVar("server_timings", default=None)
+_NULL_STAGE = nullcontext()
+
+
+class _Stage:
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings: Dict[str, float], name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.timings[self.name] = self.timings.get(self.name, 0.0) + elapsed
+        return False
+
+
+def stage(name: str):
+    """Time a block as a Server-Timing stage (no-op outside an instrumented request)"""
+    timings = _TIMINGS.get()
+    if timings is None:
+        return _NULL_STAGE
+    return _Stage(timings, name)
+
+
+def record_stage(name: str, seconds: float):
+    timings = _TIMINGS.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def _format_server_timing(timings: Dict[str, float], total: float) -> bytes:
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts).encode("latin-1")
+
+
+class TimedRoute(APIRoute):
+    """
+    APIRoute that splits handler time into `endpoint` (the route function) and
+    `serialize` (request validation, dependencies and response encoding).
+    Routers opt in with APIRouter(route_class=TimedRoute).
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            timings = _TIMINGS.get()
+            if timings is None:
+                return await handler(request)
+            started = time.perf_counter()
+            response = await handler(request)
+            elapsed = time.perf_counter() - started
+            timings["serialize"] = timings.get("serialize", 0.0) + max(0.0, elapsed - timings.get("endpoint", 0.0))
+            return response
+
+        return timed_handler
+
+
+def _timed_endpoint(endpoint):
+    if inspect.iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            with stage("endpoint"):
+                return await endpoint(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(endpoint)
+    def sync_wrapper(*args, **kwargs):
+        with stage("endpoint"):
+            return endpoint(*args, **kwargs)
+    return sync_wrapper
+
+
+# ============================================================
+# Sampling profiler
+# ============================================================
+
+class SamplingProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stacks: StackCounter = StackCounter()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.interval = 0.01
+        self.deadline = 0.0
+        self.started_at = 0.0
+        self.samples = 0
+        # Fraction of requests that turn sampling on while they run (0 = time-boxed mode)
+        self.request_rate = 0.0
+        self._sampled_requests = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval_ms: float = 10, request_rate: float = 0.0):
+        with self._lock:
+            if self.running:
+                raise RuntimeError("Profiler already running")
+            self._stacks = StackCounter()
+            self.samples = 0
+            self.interval = max(PROFILE_MIN_INTERVAL_MS, interval_ms) / 1000
+            self.request_rate = max(0.0, min(1.0, request_rate))
+            self.started_at = time.time()
+            self.deadline = time.monotonic() + min(seconds, PROFILE_MAX_SECONDS)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self.request_rate = 0.0
+
+    def request_started(self) -> bool:
+        """Called per request; True if this request turned sampling on"""
+        rate = self.request_rate
+        if rate <= 0.0 or random.random() >= rate:
+            return False
+        with self._lock:
+            self._sampled_requests += 1
+        return True
+
+    def request_finished(self):
+        with self._lock:
+            self._sampled_requests -= 1
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.is_set() and time.monotonic() < self.deadline:
+            if self.request_rate <= 0.0 or self._sampled_requests > 0:
+                self._sample(own_id)
+            self._stop.wait(self.interval)
+        self.request_rate = 0.0
+
+    def _sample(self, own_id: int):
+        frames = sys._current_frames()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        collected = []
+        for thread_id, frame in frames.items():
+            if thread_id == own_id:
+                continue
+            stack: List[str] = []
+            while frame is not None and len(stack) < PROFILE_MAX_DEPTH:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            stack.reverse()
+            collected.append(";".join(stack))
+        with self._lock:
+            self._stacks.update(collected)
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        with self._lock:
+            items = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def status(self) -> Dict:
+        return {
+            "running": self.running,
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000,
+            "request_rate": self.request_rate,
+            "started_at": self.started_at or None,
+            "seconds_left": max(0.0, self.deadline - time.monotonic()) if self.running else 0.0,
+            "unique_stacks": len(self._stacks),
+        }
+
+
+profiler = SamplingProfiler()
+
+
+# ============================================================
+# Middleware
+# ============================================================
+
+class ProfilingMiddleware:
+    """Adds Server-Timing headers and drives request-sampled profiling"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sampled = profiler.request_rate > 0.0 and profiler.request_started()
+        if not SERVER_TIMING_ENABLED:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                if sampled:
+                    profiler.request_finished()
+            return
+
+        timings: Dict[str, float] = {}
+        token = _TIMINGS.set(timings)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                header = _format_server_timing(timings, time.perf_counter() - started)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _TIMINGS.reset(token)
+            if sampled:
+                profiler.request_finished()
+
+
+# ============================================================
+# Admin endpoints
+# ============================================================
+
+router = APIRouter()
+
+
+def require_admin(token: Optional[str]):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+class ProfileStartRequest(BaseModel):
+    seconds: float = 30
+    interval_ms: float = 10
+    # 0 = sample continuously for `seconds`; otherwise only while this fraction of requests runs
+    request_rate: float = 0.0
+
+
+@router.post("/start")
+def start_profiling(req: ProfileStartRequest, x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    try:
+        profiler.start(req.seconds, req.interval_ms, req.request_rate)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profiler.status()
+
+
+@router.post("/stop")
+def stop_profiling(x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    profiler.stop()
+    return profiler.status()
+
+
+@router.get("/status")
+def profiling_status(x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    return profiler.status()
+
+
+@router.get("/collapsed", response_class=PlainTextResponse)
+def profiling_collapsed(x_admin_token: Optional[str] = Header(None)):
+    """Collapsed stacks for flamegraph.pl / speedscope"""
+    require_admin(x_admin_token)
+    return PlainTextResponse(profiler.collapsed())
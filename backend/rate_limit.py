@@ -0,0 +1,124 @@
+"""
+Per-client rate limiting for the auth, OCR and scam endpoints.
+
+- InMemoryRateLimiter: process-local sliding window (one worker)
+- SQLiteRateLimiter: sliding window in a shared SQLite file (WAL), so the
+  limit holds across every worker on the host; each check runs in one
+  BEGIN IMMEDIATE transaction
+
+Pick the backend with RATE_LIMIT_STORE=memory|sqlite (default: memory; the
+multi-worker profile in gunicorn.conf.py selects sqlite).
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from fastapi import HTTPException
+
+BASE_DIR = Path(__file__).resolve().parent
+
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory").lower()
+RATE_LIMIT_STORE_PATH = os.getenv("RATE_LIMIT_STORE_PATH", str(BASE_DIR / "rate_limit.db"))
+# Hits older than this are purged whatever their endpoint's window
+MAX_WINDOW = 3600
+PURGE_EVERY = 1000
+
+
+class RateLimiter(ABC):
+    @abstractmethod
+    def hit(self, key: str, max_req: int, window: float) -> bool:
+        """Record a request for `key`; False if it exceeds max_req per window seconds"""
+        raise NotImplementedError
+
+
+class InMemoryRateLimiter(RateLimiter):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hits = {}  # key -> [timestamps]
+        self._calls = 0
+
+    def hit(self, key: str, max_req: int, window: float) -> bool:
+        now = time.time()
+        with self._lock:
+            timestamps = [t for t in self._hits.get(key, ()) if now - t < window]
+            allowed = len(timestamps) < max_req
+            if allowed:
+                timestamps.append(now)
+            self._hits[key] = timestamps
+            self._calls += 1
+            if self._calls % PURGE_EVERY == 0:
+                self._hits = {k: ts for k, ts in self._hits.items() if ts and now - ts[-1] < MAX_WINDOW}
+        return allowed
+
+
+class SQLiteRateLimiter(RateLimiter):
+    def __init__(self, path: str = RATE_LIMIT_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS rate_hits (key TEXT NOT NULL, ts REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_hits_key_ts ON rate_hits (key, ts)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key: str, max_req: int, window: float) -> bool:
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            count = conn.execute(
+                "SELECT COUNT(*) FROM rate_hits WHERE key = ? AND ts > ?", (key, now - window)
+            ).fetchone()[0]
+            allowed = count < max_req
+            if allowed:
+                conn.execute("INSERT INTO rate_hits (key, ts) VALUES (?, ?)", (key, now))
+            self._calls += 1
+            if self._calls % PURGE_EVERY == 0:
+                conn.execute("DELETE FROM rate_hits WHERE ts < ?", (now - MAX_WINDOW,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed
+
+
+_LIMITER = None
+_LIMITER_LOCK = threading.Lock()
+
+
+def _reset_after_fork():
+    # Forked workers open their own SQLite connections
+    global _LIMITER, _LIMITER_LOCK
+    _LIMITER = None
+    _LIMITER_LOCK = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return this process's limiter selected by RATE_LIMIT_STORE (created on first use)"""
+    global _LIMITER
+    if _LIMITER is None:
+        with _LIMITER_LOCK:
+            if _LIMITER is None:
+                _LIMITER = SQLiteRateLimiter() if RATE_LIMIT_STORE == "sqlite" else InMemoryRateLimiter()
+    return _LIMITER
+
+
+def check_rate_limit(ip, endpoint, max_req=3, window=10):
+    """Raise 429 if `ip` has made more than max_req calls to `endpoint` in `window` seconds"""
+    if not get_rate_limiter().hit(f"{endpoint}:{ip}", max_req, window):
+        raise HTTPException(status_code=429, detail="Too many requests. Please slow down.")
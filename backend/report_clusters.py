@@ -0,0 +1,217 @@
+"""
+Near-duplicate clustering of scam reports (MinHash + LSH).
+
+During a scam wave /scam/report receives many reports with almost the same
+text. On ingest a report is:
+
+1. normalised: lower case, links collapsed to "url", digits to 0;
+2. cut into character SHINGLE_SIZE-grams and MinHashed into NUM_PERM values;
+3. looked up in the LSH index. The signature is split into BANDS bands of
+   ROWS values, and a cluster shares a bucket with the report when one band
+   hashes the same. That is BANDS index lookups (scam_cluster_bands),
+   however many reports exist.
+
+A candidate whose estimated Jaccard similarity reaches
+SCAM_CLUSTER_SIMILARITY takes the report, which reuses the cluster's risk
+analysis. It is re-run only once scam_keywords.json has changed. Otherwise
+the report starts a new cluster as its representative. Only representatives
+are indexed, so buckets hold clusters rather than every report.
+
+Clusters live in the database, so every worker sees the same ones.
+`top_clusters()` backs the moderators' /scam/clusters listing.
+"""
+
+import hashlib
+import json
+import os
+import re
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select, tuple_, update
+
+import models
+from database import SessionLocal
+
+SCAM_CLUSTER_SIMILARITY = float(os.getenv("SCAM_CLUSTER_SIMILARITY", "0.6"))
+SHINGLE_SIZE = 5
+BANDS = 20
+ROWS = 3
+NUM_PERM = BANDS * ROWS
+# Candidates compared per report (a bucket collision is only a candidate)
+MAX_CANDIDATES = 50
+
+# (a * h + b) mod P over 32-bit shingle hashes; fixed seed, so every worker agrees
+_PRIME = np.uint64(4294967291)  # largest prime below 2**32
+_rng = np.random.default_rng(0x5CA3)
+_A = _rng.integers(1, int(_PRIME), NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, int(_PRIME), NUM_PERM, dtype=np.uint64)
+
+_URL_RE = re.compile(r"(?:https?://|www\.)\S+")
+# \w alone splits Devanagari words at vowel signs (combining marks)
+_WORD_RE = re.compile(r"[\w\u0900-\u097F]+", re.UNICODE)
+
+Analysis = Tuple[str, float, List[str], str]  # calculate_risk_score() result
+
+
+def normalize(text: str) -> str:
+    text = _URL_RE.sub(" url ", text.lower())
+    return " ".join(_WORD_RE.findall(re.sub(r"\d", "0", text)))
+
+
+def shingles(text: str) -> List[str]:
+    text = normalize(text)
+    if len(text) <= SHINGLE_SIZE:
+        return [text] if text else []
+    return list({text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)})
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """NUM_PERM uint32 MinHash values, or None for text without words"""
+    grams = shingles(text)
+    if not grams:
+        return None
+    hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+    # a < 2**32 and h < 2**32, so a * h + b stays below 2**64
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the two shingle sets"""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def band_buckets(signature: np.ndarray) -> List[Tuple[int, int]]:
+    """(band, bucket) keys of a signature"""
+    buckets = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(signature[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, "big", signed=True)))
+    return buckets
+
+
+@dataclass
+class ClusterMatch:
+    cluster_id: Optional[int]
+    report_count: int
+    analysis: Analysis
+    # The report joined an existing cluster (and reused its analysis unless stale)
+    duplicate: bool = False
+
+
+def _analysis(cluster: models.ScamCluster) -> Analysis:
+    return cluster.risk_level, cluster.risk_score, json.loads(cluster.keywords or "[]"), cluster.analysis_text
+
+
+def _store_analysis(cluster: models.ScamCluster, analysis: Analysis, analysis_key: str):
+    cluster.risk_level, cluster.risk_score, keywords, cluster.analysis_text = analysis
+    cluster.keywords = json.dumps(keywords, ensure_ascii=False)
+    cluster.analysis_key = analysis_key
+
+
+def assign(report_id: str, description: str, scam_type: Optional[str],
+           analyze: Callable[[str], Analysis], analysis_key: str,
+           now: Optional[datetime] = None) -> ClusterMatch:
+    """
+    Put a report into its near-duplicate cluster (or a new one); returns the
+    cluster and the risk analysis to record for the report.
+    """
+    now = now or datetime.utcnow()
+    signature = minhash(description)
+    if signature is None:
+        return ClusterMatch(None, 1, analyze(description))
+    buckets = band_buckets(signature)
+
+    with SessionLocal() as db:
+        band = models.ScamClusterBand
+        candidate_ids = db.execute(
+            select(band.cluster_id).where(tuple_(band.band, band.bucket).in_(buckets)).distinct().limit(MAX_CANDIDATES)
+        ).scalars().all()
+        best, best_score = None, 0.0
+        if candidate_ids:
+            for cluster in db.execute(
+                select(models.ScamCluster).where(models.ScamCluster.id.in_(candidate_ids))
+            ).scalars():
+                score = similarity(signature, np.frombuffer(cluster.signature, dtype=np.uint32))
+                if score > best_score:
+                    best, best_score = cluster, score
+
+        if best is not None and best_score >= SCAM_CLUSTER_SIMILARITY:
+            if best.analysis_key == analysis_key:
+                analysis = _analysis(best)
+            else:
+                analysis = analyze(description)
+                _store_analysis(best, analysis, analysis_key)
+            db.execute(
+                update(models.ScamCluster)
+                .where(models.ScamCluster.id == best.id)
+                .values(report_count=models.ScamCluster.report_count + 1, last_seen=now)
+            )
+            db.commit()
+            count = db.execute(
+                select(models.ScamCluster.report_count).where(models.ScamCluster.id == best.id)
+            ).scalar_one()
+            return ClusterMatch(best.id, count, analysis, duplicate=True)
+
+        analysis = analyze(description)
+        cluster = models.ScamCluster(
+            representative_report_id=report_id,
+            representative=description,
+            scam_type=scam_type,
+            signature=signature.tobytes(),
+            report_count=1,
+            first_seen=now,
+            last_seen=now,
+        )
+        _store_analysis(cluster, analysis, analysis_key)
+        db.add(cluster)
+        db.flush()
+        db.add_all(models.ScamClusterBand(band=b, bucket=h, cluster_id=cluster.id) for b, h in buckets)
+        db.commit()
+        return ClusterMatch(cluster.id, 1, analysis)
+
+
+def top_clusters(hours: float = 24, limit: int = 20, min_reports: int = 2) -> List[Dict]:
+    """Clusters with the most reports in the last `hours`, for moderators"""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    report = models.ScamReport
+    recent = func.count(report.id).label("recent")
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(report.cluster_id, recent)
+            .where(report.created_at >= since, report.cluster_id.is_not(None))
+            .group_by(report.cluster_id)
+            .having(recent >= min_reports)
+            .order_by(recent.desc(), func.max(report.created_at).desc())
+            .limit(limit)
+        ).all()
+        clusters = {
+            c.id: c for c in db.execute(
+                select(models.ScamCluster).where(models.ScamCluster.id.in_([r.cluster_id for r in rows]))
+            ).scalars()
+        } if rows else {}
+    result = []
+    for row in rows:
+        c = clusters.get(row.cluster_id)
+        if c is None:
+            continue
+        level, score, keywords, _ = _analysis(c)
+        result.append({
+            "cluster_id": c.id,
+            "recent_reports": row.recent,
+            "total_reports": c.report_count,
+            "first_seen": c.first_seen.isoformat(),
+            "last_seen": c.last_seen.isoformat(),
+            "representative": {
+                "report_id": c.representative_report_id,
+                "description": c.representative,
+                "scam_type": c.scam_type,
+            },
+            "risk_level": level,
+            "risk_score": score,
+            "keywords_detected": keywords[:5],
+        })
+    return result
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException, Request, Header
+from fastapi import APIRouter, HTTPException, Header, Query, Request, Depends
 import time
-from jose import jwt
 
-from auth_service import JWT_SECRET, JWT_ALGO
+from security import UserPrincipal, get_optional_user
+from catalog import CatalogCache, is_paged
+from data_files import data_file
+from metrics import cache_lookup, SCAM_MATCH_SECONDS
+from profiling import TimedRoute, require_admin, stage
 
 # --- In-memory response cache ---
 _RESPONSE_CACHE = {}
@@ -10,49 +13,32 @@ def get_cache(key, ttl=120):
     now = time.time()
     entry = _RESPONSE_CACHE.get(key)
     if entry and now - entry['ts'] < ttl:
-        return entry['value']
-    return None
+        return cache_lookup("scam", entry['value'])
+    return cache_lookup("scam", None)
 
 def set_cache(key, value):
     _RESPONSE_CACHE[key] = {'value': value, 'ts': time.time()}
 
-# --- Scam keywords/common scams JSON cache (30 min) ---
-_SCAM_KEYWORDS_CACHE = None
-_SCAM_KEYWORDS_CACHE_TS = 0
-def load_scam_keywords(ttl=1800):
-    global _SCAM_KEYWORDS_CACHE, _SCAM_KEYWORDS_CACHE_TS
-    now = time.time()
-    if _SCAM_KEYWORDS_CACHE is not None and now - _SCAM_KEYWORDS_CACHE_TS < ttl:
-        return _SCAM_KEYWORDS_CACHE
-    if not SCAM_KEYWORDS_PATH.exists():
-        _SCAM_KEYWORDS_CACHE = {"high_risk": [], "medium_risk": [], "low_risk": []}
-        return _SCAM_KEYWORDS_CACHE
-    with SCAM_KEYWORDS_PATH.open("r", encoding="utf-8") as f:
-        _SCAM_KEYWORDS_CACHE = json.load(f)
-        _SCAM_KEYWORDS_CACHE_TS = now
-        return _SCAM_KEYWORDS_CACHE
-
-RATE_LIMIT = {}  # (ip, endpoint): [timestamps]
-def check_rate_limit(ip, endpoint, max_req=3, window=10):
-    now = time.time()
-    key = (ip, endpoint)
-    timestamps = RATE_LIMIT.get(key, [])
-    timestamps = [t for t in timestamps if now - t < window]
-    if len(timestamps) >= max_req:
-        raise HTTPException(status_code=429, detail="Too many requests. Please slow down.")
-    timestamps.append(now)
-    RATE_LIMIT[key] = timestamps
+from rate_limit import check_rate_limit
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import datetime
-import json
+import re
+import secrets
 from pathlib import Path
 
-router = APIRouter()
+import indicators
+import persistence
+
+router = APIRouter(route_class=TimedRoute)
 
 BASE_DIR = Path(__file__).resolve().parent
 SCAM_KEYWORDS_PATH = BASE_DIR / "scam_keywords.json"
 COMMON_SCAMS_PATH = BASE_DIR / "common_scams.json"
+SCAM_KEYWORDS_FILE = data_file(
+    SCAM_KEYWORDS_PATH, default={"high_risk": [], "medium_risk": [], "low_risk": []}, compact=True
+)
+COMMON_SCAMS_FILE = data_file(COMMON_SCAMS_PATH, compact=True)
 SCAM_REPORTS_DB_PATH = BASE_DIR / "scam_reports_db.json"
 
 
@@ -64,21 +50,34 @@ class ScamReportRequest(BaseModel):
     anonymous: bool = False
 
 
+class IndicatorResult(BaseModel):
+    kind: str  # phone | upi | domain
+    value: str
+    known: bool = False  # seeded or moderator-confirmed: raises the risk score
+    reports: int = 0  # distinct reporters
+
+
 class ScamAnalysisResponse(BaseModel):
     risk_level: str
     risk_score: float
     keywords_detected: List[str]
     analysis_text: str
+    indicators: List[IndicatorResult] = []
 
 
 class ScamReportResponse(BaseModel):
     report_id: str
     risk_level: str
     message: str
+    # Near-duplicate cluster the report joined, and how many reports it holds
+    cluster_id: Optional[int] = None
+    cluster_reports: int = 1
 
 
 # --- Risk Keywords & Patterns ---
-SCAM_KEYWORDS_CACHE = None
+# Added per known-bad (seeded or confirmed) phone number, UPI ID or domain in the text
+KNOWN_INDICATOR_SCORE = 40
+
 SAFE_KEYWORDS = {
     "official",
     "verified",
@@ -93,17 +92,7 @@ SAFE_KEYWORDS = {
 
 
 def load_scam_keywords():
-    global SCAM_KEYWORDS_CACHE
-    if SCAM_KEYWORDS_CACHE is not None:
-        return SCAM_KEYWORDS_CACHE
-
-    if not SCAM_KEYWORDS_PATH.exists():
-        SCAM_KEYWORDS_CACHE = {"high_risk": [], "medium_risk": [], "low_risk": []}
-        return SCAM_KEYWORDS_CACHE
-
-    with SCAM_KEYWORDS_PATH.open("r", encoding="utf-8") as f:
-        SCAM_KEYWORDS_CACHE = json.load(f)
-        return SCAM_KEYWORDS_CACHE
+    return SCAM_KEYWORDS_FILE.value
 
 
 # --- Risk Scoring Function ---
@@ -149,18 +138,34 @@ def calculate_risk_score(description: str):
         score += 5
 
     score = max(0, min(100, score))
+    risk_level, analysis_text = risk_level_for(score)
+    return risk_level, score, list(set(detected)), analysis_text
 
-    if score >= 70:
-        risk_level = "High"
-        analysis_text = "🚨 HIGH-RISK SCAM — Do NOT share OTP, passwords, or bank details. Do NOT click any links. Contact your bank immediately if money was involved."
-    elif score >= 40:
-        risk_level = "Medium"
-        analysis_text = "⚠️ MEDIUM-RISK — Be cautious. Verify by contacting official sources directly. Never share personal/financial information via unsolicited messages."
-    else:
-        risk_level = "Low"
-        analysis_text = "✅ LOW-RISK — Appears low risk, but stay cautious. Always verify unexpected requests."
 
-    return risk_level, score, list(set(detected)), analysis_text
+def risk_level_for(score: float) -> Tuple[str, str]:
+    """(risk_level, analysis_text) for a 0-100 risk score"""
+    if score >= 70:
+        return "High", "🚨 HIGH-RISK SCAM — Do NOT share OTP, passwords, or bank details. Do NOT click any links. Contact your bank immediately if money was involved."
+    if score >= 40:
+        return "Medium", "⚠️ MEDIUM-RISK — Be cautious. Verify by contacting official sources directly. Never share personal/financial information via unsolicited messages."
+    return "Low", "✅ LOW-RISK — Appears low risk, but stay cautious. Always verify unexpected requests."
+
+
+def check_indicators(description: str, score: float) -> Tuple[float, List[IndicatorResult]]:
+    """Phone numbers, UPI IDs and domains in the text; known-bad ones raise the score"""
+    found = indicators.extract(description)
+    if not found:
+        return score, []
+    stored = indicators.store.lookup(found)
+    results = [
+        IndicatorResult(kind=i.kind, value=i.value, known=i in stored and stored[i]["known"],
+                        reports=stored[i]["report_count"] if i in stored else 0)
+        for i in found
+    ]
+    known = sum(1 for r in results if r.known)
+    if known:
+        score = min(100, score + KNOWN_INDICATOR_SCORE * known)
+    return score, results
 
 
 # --- Endpoints ---
@@ -172,7 +177,20 @@ def analyze_scam(request: ScamReportRequest, req: Request):
     check_rate_limit(client_ip, 'scam-analyze')
     result = {}
     def analysis():
-        rl, rs, kw, at = calculate_risk_score(request.description)
+        with SCAM_MATCH_SECONDS.time(), stage("scoring"):
+            rl, rs, kw, at = calculate_risk_score(request.description)
+        with stage("indicators"):
+            score, found = check_indicators(request.description, rs)
+        flagged = [i.value for i in found if i.known]
+        if flagged:
+            rs = score
+            rl, at = risk_level_for(score)
+            at = f"🚩 Known scam contact: {', '.join(flagged)}. {at}"
+        reported = [f"{i.value} ({i.reports} reports)" for i in found
+                    if not i.known and i.reports >= indicators.SCAM_INDICATOR_MIN_REPORTS]
+        if reported:
+            at = f"{at} Reported by other users, not yet verified: {', '.join(reported)}."
+        result['indicators'] = found
         result['risk_level'] = rl
         result['risk_score'] = rs
         result['keywords'] = kw
@@ -188,30 +206,27 @@ def analyze_scam(request: ScamReportRequest, req: Request):
         risk_score=result['risk_score'],
         keywords_detected=result['keywords'][:5],
         analysis_text=result['analysis_text'],
+        indicators=result['indicators'],
     )
 
 
 @router.post("/report", response_model=ScamReportResponse)
-def submit_scam_report(request: ScamReportRequest, authorization: Optional[str] = Header(None)):
-    risk_level, risk_score, _, _ = calculate_risk_score(request.description)
-    report_id = f"SCAM-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+def submit_scam_report(request: ScamReportRequest, req: Request,
+                       user: Optional[UserPrincipal] = Depends(get_optional_user)):
+    import report_clusters  # numpy; only loaded once reports come in
+
+    check_rate_limit(req.client.host, 'scam-report', max_req=5, window=60)
+
+    report_id = f"SCAM-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{secrets.token_hex(3)}"
+    # Near-duplicates of an earlier report reuse its cluster's analysis
+    with SCAM_MATCH_SECONDS.time(), stage("scoring"):
+        match = report_clusters.assign(
+            report_id, request.description, request.scam_type,
+            analyze=calculate_risk_score, analysis_key=str(SCAM_KEYWORDS_FILE.generation()),
+        )
+    risk_level, risk_score, _, _ = match.analysis
 
-    # --- JSON Persistence ---
-    try:
-        with SCAM_REPORTS_DB_PATH.open("r", encoding="utf-8") as f:
-            db = json.load(f)
-            reports = db.get("reports", [])
-    except (FileNotFoundError, json.JSONDecodeError):
-        reports = []
-
-    email = None
-    if authorization and authorization.lower().startswith("bearer "):
-        token = authorization.split(" ")[1]
-        try:
-            payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
-            email = payload.get("email")
-        except jwt.JWTError:
-            email = None
+    email = user.email if user else None
 
     # Compose new report dict
     new_report = {
@@ -222,52 +237,124 @@ def submit_scam_report(request: ScamReportRequest, authorization: Optional[str]
         "risk_score": risk_score,
         "scam_type": request.scam_type,
         "location": request.location,
-        "created_at": datetime.utcnow().isoformat()
+        "created_at": datetime.utcnow().isoformat(),
+        "cluster_id": match.cluster_id,
     }
-    reports.append(new_report)
 
-    # Save back to disk
-    with SCAM_REPORTS_DB_PATH.open("w", encoding="utf-8") as f:
-        json.dump({"reports": reports}, f, ensure_ascii=False, indent=2)
+    # --- Database Persistence (scam_reports table) ---
+    persistence.add_scam_report(new_report)
+    with stage("indicators"):
+        indicators.store.record(indicators.extract(request.description),
+                                reporter=indicators.reporter_id(email, req.client.host))
 
     return ScamReportResponse(
         report_id=report_id,
         risk_level=risk_level,
         message=f"Report submitted successfully! Risk Level: {risk_level}",
+        cluster_id=match.cluster_id,
+        cluster_reports=match.report_count,
     )
 
 
-@router.get("/common-scams")
-def get_common_scams():
-    cache_key = 'common_scams'
-    cached = get_cache(cache_key, ttl=300)
-    if cached:
-        return cached
-    # In-memory cache for common scams JSON
-    now = time.time()
-    if not hasattr(get_common_scams, '_COMMON_SCAMS_CACHE') or not hasattr(get_common_scams, '_COMMON_SCAMS_CACHE_TS'):
-        get_common_scams._COMMON_SCAMS_CACHE = None
-        get_common_scams._COMMON_SCAMS_CACHE_TS = 0
-    if get_common_scams._COMMON_SCAMS_CACHE is not None and now - get_common_scams._COMMON_SCAMS_CACHE_TS < 1800:
-        resp = get_common_scams._COMMON_SCAMS_CACHE
-        set_cache(cache_key, resp)
-        return resp
-    if not COMMON_SCAMS_PATH.exists():
-        raise HTTPException(status_code=404, detail="Common scams data not found")
-    with COMMON_SCAMS_PATH.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+@router.get("/clusters")
+def get_report_clusters(hours: float = Query(24, gt=0), limit: int = Query(20, ge=1, le=100),
+                        min_reports: int = Query(2, ge=1), x_admin_token: Optional[str] = Header(None)):
+    """Most active near-duplicate report clusters, for moderators (X-Admin-Token)"""
+    require_admin(x_admin_token)
+    import report_clusters
+
+    with stage("query"):
+        clusters = report_clusters.top_clusters(hours, limit, min_reports)
+    return {"hours": hours, "count": len(clusters), "clusters": clusters}
+
+
+class IndicatorReview(BaseModel):
+    kind: str
+    value: str
+    confirmed: bool = True
+
+
+@router.get("/indicators")
+def get_reported_indicators(min_reports: int = Query(indicators.SCAM_INDICATOR_MIN_REPORTS, ge=1),
+                            limit: int = Query(50, ge=1, le=500),
+                            x_admin_token: Optional[str] = Header(None)):
+    """Most reported indicators not yet seeded or confirmed, for moderators (X-Admin-Token)"""
+    require_admin(x_admin_token)
+    with stage("query"):
+        rows = persistence.list_scam_indicators(min_reports, limit)
+    return {"count": len(rows), "indicators": rows}
+
+
+@router.post("/indicators/confirm")
+def confirm_indicator(review: IndicatorReview, x_admin_token: Optional[str] = Header(None)):
+    """Confirm (or un-confirm) a reported indicator as known-bad (X-Admin-Token)"""
+    require_admin(x_admin_token)
+    value = indicators.normalize(review.kind, review.value)
+    if value is None or not persistence.confirm_scam_indicator((review.kind, value), review.confirmed):
+        raise HTTPException(status_code=404, detail="Indicator has not been reported")
+    return {"kind": review.kind, "value": value, "confirmed": review.confirmed}
+
+
+def adapt_common_scams(data) -> List[dict]:
+    """common_scams.json rows in the shape the API returns"""
     adapted = []
     for item in data:
         adapted.append(
             {
+                "id": item.get("id"),
                 "type": item.get("title", "Scam"),
                 "description": item.get("description", ""),
                 "warning": "Be cautious and verify through official channels.",
                 "examples": item.get("examples", []),
             }
         )
-    resp = {"common_scams": adapted}
-    get_common_scams._COMMON_SCAMS_CACHE = resp
-    get_common_scams._COMMON_SCAMS_CACHE_TS = now
-    set_cache(cache_key, resp)
-    return resp
+    return adapted
+
+
+def _common_scams_payload():
+    data = COMMON_SCAMS_FILE.value
+    if data is None:
+        raise FileNotFoundError(COMMON_SCAMS_PATH)
+    return {"common_scams": adapt_common_scams(data)}
+
+# Pre-encoded body, rebuilt when common_scams.json changes
+common_scams_catalog = CatalogCache(
+    "common_scams", build=_common_scams_payload, generation=COMMON_SCAMS_FILE.generation,
+    items=lambda payload: payload["common_scams"], summary_fields=("id", "type"),
+)
+COMMON_SCAMS_FILE.add_catalog(common_scams_catalog)
+
+
+def match_common_scams(query: str, limit: int = 10) -> List[Tuple[dict, float]]:
+    """(scam, score 0-1) for common scams mentioning the query words, best first"""
+    tokens = [t for t in re.findall(r"\w+", query.lower()) if len(t) >= 3]
+    if not tokens:
+        return []
+    q = query.lower().strip()
+    hits = []
+    for scam in common_scams_catalog.current().payload["common_scams"]:
+        text = " ".join([scam["type"], scam["description"], " ".join(scam["examples"])]).lower()
+        words = set(re.findall(r"\w+", text))
+        found = sum(1 for t in tokens if t in words or any(w.startswith(t) for w in words))
+        if found:
+            score = 0.9 * found / len(tokens) + (0.1 if q in scam["type"].lower() else 0.0)
+            hits.append((scam, round(score, 4)))
+    hits.sort(key=lambda h: -h[1])
+    return hits[:limit]
+
+
+@router.get("/common-scams")
+def get_common_scams(request: Request, limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None,
+                     fields: Optional[str] = None, view: Optional[str] = None):
+    if not COMMON_SCAMS_PATH.exists():
+        raise HTTPException(status_code=404, detail="Common scams data not found")
+    if is_paged(limit, cursor, fields, view):
+        return common_scams_catalog.page(
+            request, limit, cursor, fields, view,
+            wrap=lambda rows, total, next_cursor, payload: {
+                "common_scams": rows,
+                "total": total,
+                "next_cursor": next_cursor,
+            },
+        )
+    return common_scams_catalog.response(request)
@@ -5,16 +5,19 @@ from pydantic import BaseModel, EmailStr
 # ---------- Scam Report Schemas ----------
 
 class ScamReportBase(BaseModel):
-    name: Optional[str] = None
-    contact: Optional[str] = None
     description: str
+    scam_type: Optional[str] = None
+    location: Optional[str] = None
 
 class ScamReportCreate(ScamReportBase):
     pass
 
 class ScamReport(ScamReportBase):
     id: int
-    owner_id: int
+    report_id: str
+    email: Optional[str] = None
+    risk_level: Optional[str] = None
+    risk_score: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -7,14 +7,42 @@ Smart Government Schemes System
 - Graceful offline handling
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
-import json
+from starlette.concurrency import run_in_threadpool
 from pathlib import Path
 import os
 from typing import List, Optional, Dict, Any, Tuple
-import httpx
+import time
 from datetime import datetime
+from bisect import bisect_right
+from collections import OrderedDict
+import threading
+
+from catalog import (
+    CatalogCache, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor, is_paged,
+    projection_fields,
+)
+from data_files import data_file, write_json_atomic
+from eligibility import EligibilityIndex
+from facet_index import FacetIndex, FacetResult
+from metrics import cache_lookup, JSON_IO_SECONDS
+from profiling import TimedRoute, stage
+from security import UserPrincipal, get_current_user
+import persistence
+
+
+# --- In-memory response cache ---
+_RESPONSE_CACHE = {}
+def get_cache(key, ttl=120):
+    now = time.time()
+    entry = _RESPONSE_CACHE.get(key)
+    if entry and now - entry['ts'] < ttl:
+        return cache_lookup("schemes", entry['value'])
+    return cache_lookup("schemes", None)
+
+def set_cache(key, value):
+    _RESPONSE_CACHE[key] = {'value': value, 'ts': time.time()}
 
 
 
@@ -32,29 +60,11 @@ def get_fuzz():
             FUZZY_AVAILABLE = False
     return fuzz
 
-# --- In-memory schemes DB cache (60 min) ---
-_SCHEMES_CACHE = None
-_SCHEMES_CACHE_TS = 0
-def load_local_schemes(ttl=3600) -> list:
-    global _SCHEMES_CACHE, _SCHEMES_CACHE_TS
-    now = time.time()
-    if _SCHEMES_CACHE is not None and now - _SCHEMES_CACHE_TS < ttl:
-        return _SCHEMES_CACHE
-    try:
-        if SCHEMES_DB_PATH.exists():
-            with open(SCHEMES_DB_PATH, "r", encoding="utf-8") as f:
-                _SCHEMES_CACHE = json.load(f)
-                _SCHEMES_CACHE_TS = now
-                return _SCHEMES_CACHE
-        return []
-    except Exception as e:
-        print(f"❌ Error loading local schemes: {e}")
-        return []
-
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 # Paths
 SCHEMES_DB_PATH = Path(__file__).parent / "schemes_db.json"
+SCHEMES_FILE = data_file(SCHEMES_DB_PATH, default=[], compact=True)
 MYSCHEME_API_BASE = "https://www.myscheme.gov.in/api/v2/search"
 
 # ============================================================
@@ -104,21 +114,19 @@ class OnlineStatus(BaseModel):
 # ============================================================
 
 def load_local_schemes() -> List[Dict[str, Any]]:
-    """Load schemes from local JSON file"""
+    """Schemes from the local JSON file (current hot-reloaded snapshot)"""
     try:
-        if SCHEMES_DB_PATH.exists():
-            with open(SCHEMES_DB_PATH, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return []
+        return SCHEMES_FILE.value
     except Exception as e:
         print(f"❌ Error loading local schemes: {e}")
         return []
 
 def save_local_schemes(schemes: List[Dict[str, Any]]) -> bool:
-    """Save schemes to local JSON file"""
+    """Save schemes to local JSON file and swap in the rebuilt catalogs"""
     try:
-        with open(SCHEMES_DB_PATH, "w", encoding="utf-8") as f:
-            json.dump(schemes, f, indent=2, ensure_ascii=False)
+        with JSON_IO_SECONDS.labels("schemes_db.json", "save").time(), stage("json_save"):
+            write_json_atomic(SCHEMES_DB_PATH, schemes)
+        SCHEMES_FILE.reload()
         print(f"✅ Saved {len(schemes)} schemes to {SCHEMES_DB_PATH}")
         return True
     except Exception as e:
@@ -128,6 +136,8 @@ def save_local_schemes(schemes: List[Dict[str, Any]]) -> bool:
 def check_internet() -> bool:
     """Check if internet is available"""
     try:
+        import httpx  # only needed for the online fallback; keeps cold start fast
+
         with httpx.Client(timeout=5) as client:
             response = client.get("https://www.myscheme.gov.in/", follow_redirects=True)
             return response.status_code < 500
@@ -142,6 +152,8 @@ def fetch_online_schemes(query: str, limit: int = 30) -> Optional[List[Dict[str,
             print("⚠️ No internet connection")
             return None
         
+        import httpx
+
         with httpx.Client(timeout=10) as client:
             url = f"{MYSCHEME_API_BASE}?q={query}"
             response = client.get(url)
@@ -214,7 +226,7 @@ def merge_schemes(local: List[Dict[str, Any]],
         
         if scheme_id in local_dict:
             # Update existing
-            local_dict[scheme_id].update(normalized)
+            local_dict[scheme_id] = {**local_dict[scheme_id], **normalized}
             updated += 1
         else:
             # Add new
@@ -232,6 +244,33 @@ def search_schemes_fuzzy(query: str, schemes: List[Dict[str, Any]],
     Search schemes using fuzzy matching (requires rapidfuzz)
     Returns matched schemes sorted by score
     """
+    return [scheme for scheme, _ in score_schemes_fuzzy(query, schemes, threshold)]
+
+def _row_search_fields(scheme: Dict[str, Any]) -> Tuple[str, str, str, str, List[str], str]:
+    """Lower-cased (title, description, category, state, keywords, joined keywords) of a scheme"""
+    keywords = scheme.get("keywords", [])
+    return (
+        scheme.get("title", "").lower(),
+        scheme.get("description", "").lower(),
+        scheme.get("category", "").lower(),
+        scheme.get("state", "").lower(),
+        [kw.lower() for kw in keywords],
+        " ".join(keywords).lower(),
+    )
+
+def _search_fields(schemes: List[Dict[str, Any]]) -> Optional[List[Tuple[str, str, str, str, List[str], str]]]:
+    """
+    _row_search_fields() of every row of a snapshot table, built once per table
+    (its records decode a field on every read); None for plain lists.
+    """
+    derived = getattr(schemes, "derived", None)
+    if derived is None:
+        return None
+    return derived("search_fields", lambda: [_row_search_fields(scheme) for scheme in schemes])
+
+def score_schemes_fuzzy(query: str, schemes: List[Dict[str, Any]],
+                        threshold: int = 60) -> List[Tuple[Dict[str, Any], float]]:
+    """(scheme, score 0-100) pairs sorted by score; empty without rapidfuzz"""
     if FUZZY_AVAILABLE is None:
         get_fuzz()
     if not FUZZY_AVAILABLE or not query.strip():
@@ -239,23 +278,24 @@ def search_schemes_fuzzy(query: str, schemes: List[Dict[str, Any]],
     fuzz_func = get_fuzz()
     results = []
     query_lower = query.lower()
-    for scheme in schemes:
+    rows = _search_fields(schemes) or map(_row_search_fields, schemes)
+    for scheme, (title, description, category, _, _, keywords) in zip(schemes, rows):
         # Search in multiple fields
         fields = [
-            (scheme.get("title", ""), 100),      # Title highest weight
-            (scheme.get("description", ""), 80),
-            (scheme.get("category", ""), 60),
-            (" ".join(scheme.get("keywords", [])), 70),
+            (title, 100),      # Title highest weight
+            (description, 80),
+            (category, 60),
+            (keywords, 70),
         ]
         max_score = 0
         for field_text, weight in fields:
-            score = fuzz_func.partial_ratio(query_lower, field_text.lower()) * weight / 100
+            score = fuzz_func.partial_ratio(query_lower, field_text) * weight / 100
             max_score = max(max_score, score)
         if max_score >= threshold:
             results.append((scheme, max_score))
     # Sort by score descending
     results.sort(key=lambda x: x[1], reverse=True)
-    return [r[0] for r in results]
+    return results
 
 def search_schemes_keyword(query: str, schemes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
@@ -268,6 +308,17 @@ def search_schemes_keyword(query: str, schemes: List[Dict[str, Any]]) -> List[Di
     query_lower = query.lower()
     results = []
     
+    table = _search_fields(schemes)
+    if table is not None:
+        for scheme, (title, description, category, state, keywords, _) in zip(schemes, table):
+            if (query_lower in title or
+                query_lower in description or
+                query_lower in category or
+                query_lower in state or
+                any(query_lower in kw for kw in keywords)):
+                results.append(scheme)
+        return results
+
     for scheme in schemes:
         # Check multiple fields
         if (query_lower in scheme.get("title", "").lower() or
@@ -283,16 +334,33 @@ def search_schemes_keyword(query: str, schemes: List[Dict[str, Any]]) -> List[Di
 # API Endpoints
 # ============================================================
 
-@router.get("")
-async def list_schemes(q: Optional[str] = None, state: Optional[str] = None, category: Optional[str] = None) -> List[Dict[str, Any]]:
-    """
-    Return schemes as a plain array (frontend expects an array).
-    Optional filters: `q` (search), `state`, `category`.
-    Gracefully returns [] if database is missing/empty.
-    """
+def _local_schemes_payload() -> Dict[str, Any]:
     schemes = load_local_schemes()
-    if not schemes:
-        return []
+    return {
+        "source": "local",
+        "total": len(schemes),
+        "schemes": schemes,
+        "timestamp": datetime.now().isoformat()
+    }
+
+SCHEME_SUMMARY_FIELDS = ("id", "title", "category", "state")
+
+# Pre-encoded catalog bodies, rebuilt when schemes_db.json changes
+schemes_catalog = CatalogCache(
+    "schemes", build=lambda: load_local_schemes(), generation=SCHEMES_FILE.generation,
+    summary_fields=SCHEME_SUMMARY_FIELDS,
+)
+local_schemes_catalog = CatalogCache(
+    "schemes_local", build=_local_schemes_payload, generation=SCHEMES_FILE.generation,
+    items=lambda payload: payload["schemes"], summary_fields=SCHEME_SUMMARY_FIELDS,
+)
+SCHEMES_FILE.add_catalog(schemes_catalog)
+SCHEMES_FILE.add_catalog(local_schemes_catalog)
+
+def _scheme_filter(q: Optional[str], state: Optional[str], category: Optional[str]):
+    """Predicate for the q/state/category filters, or None when unfiltered"""
+    if not (q or state or category):
+        return None
 
     def norm(s: str) -> str:
         return (s or "").strip().lower()
@@ -318,41 +386,99 @@ async def list_schemes(q: Optional[str] = None, state: Optional[str] = None, cat
             return False
         return True
 
-    filtered = [s for s in schemes if matches(s)]
+    return matches
+
+def scheme_facets(encoded=None) -> FacetIndex:
+    """Bitmap facet index for the current (or given) schemes_db.json generation, in the catalog's stable id order"""
+    encoded = encoded or schemes_catalog.current()
+    rows = encoded.index(schemes_catalog.items).rows
+    return encoded.derived("facets", lambda: FacetIndex(
+        rows,
+        facets={
+            "state": lambda s: [s.get("state")],
+            "category": lambda s: [s.get("category")],
+            "keyword": lambda s: s.get("keywords", []),
+        },
+        text=lambda s: " ".join([
+            s.get("title", ""),
+            s.get("description", ""),
+            s.get("category", ""),
+            s.get("state", ""),
+            " ".join(s.get("keywords", [])),
+        ]),
+    ))
+
+schemes_catalog.warm_with("facets", scheme_facets)
+
+def _facet_rows(state: Optional[str] = None, category: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Schemes in a state and/or category, answered from the facet bitmaps, in schemes_db.json order"""
+    encoded = schemes_catalog.current()
+    keys = encoded.index(schemes_catalog.items).keys  # (id, file position) per bitmap position
+    index = scheme_facets(encoded)
+    bits = index.all_bits
+    if state:
+        bits &= index.facet_bits("state", [state])
+    if category:
+        bits &= index.facet_bits("category", [category])
+    positions = sorted(FacetResult(bits, {}).positions(), key=lambda pos: keys[pos][1])
+    return [index.rows[pos] for pos in positions]
+
+def _csv(value: Optional[str]) -> List[str]:
+    return [v.strip() for v in value.split(",") if v.strip()] if value else []
+
+@router.get("")
+async def list_schemes(request: Request, q: Optional[str] = None, state: Optional[str] = None, category: Optional[str] = None,
+                       limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None,
+                       fields: Optional[str] = None, view: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Return schemes as a plain array (frontend expects an array).
+    Optional filters: `q` (search), `state`, `category`.
+    Gracefully returns [] if database is missing/empty.
+    The unfiltered list is served pre-encoded with an ETag.
+
+    Paging: `limit` (max 100) and `cursor` (from the X-Next-Cursor header) walk the
+    list in stable id order; `fields=id,title` or `view=summary` trim each row.
+    """
+    matches = _scheme_filter(q, state, category)
+    if is_paged(limit, cursor, fields, view):
+        return schemes_catalog.page(request, limit, cursor, fields, view, predicate=matches)
+    if matches is None:
+        return schemes_catalog.response(request)
+
+    if not q:
+        # state/category only: answer from the facet bitmaps
+        with stage("index"):
+            return _facet_rows(state, category)
+
+    schemes = load_local_schemes()
+    if not schemes:
+        return []
+
+    with stage("index"):
+        filtered = [s for s in schemes if matches(s)]
     return filtered
 
 @router.get("/local", response_model=Dict[str, Any])
-async def get_local_schemes() -> Dict[str, Any]:
+async def get_local_schemes(request: Request, limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None,
+                            fields: Optional[str] = None, view: Optional[str] = None) -> Dict[str, Any]:
     """
-    Get schemes from local JSON database (offline mode), with in-memory cache
-    Always returns a JSON object with a 'schemes' array for frontend compatibility.
+    Get schemes from local JSON database (offline mode), pre-encoded per file version.
+    Always returns a JSON object with a 'schemes' array for frontend compatibility;
+    `timestamp` is when the current version was encoded.
+    Supports the same limit/cursor/fields/view paging as GET /schemes; pages add `next_cursor`.
     """
-    cache_key = 'schemes_local'
-    cached = get_cache(cache_key, ttl=300)
-    if cached:
-        # Ensure response is always an object with 'schemes' key
-        if isinstance(cached, list):
-            return {
+    if is_paged(limit, cursor, fields, view):
+        return local_schemes_catalog.page(
+            request, limit, cursor, fields, view,
+            wrap=lambda rows, total, next_cursor, payload: {
                 "source": "local",
-                "total": len(cached),
-                "schemes": cached,
-                "timestamp": datetime.now().isoformat()
-            }
-        return cached
-    schemes = load_local_schemes()
-    # If load_local_schemes returns a list, wrap it
-    if isinstance(schemes, list):
-        resp = {
-            "source": "local",
-            "total": len(schemes),
-            "schemes": schemes,
-            "timestamp": datetime.now().isoformat()
-        }
-    else:
-        # If already a dict/object, use as is
-        resp = schemes
-    set_cache(cache_key, resp)
-    return resp
+                "total": total,
+                "schemes": rows,
+                "next_cursor": next_cursor,
+                "timestamp": payload["timestamp"],
+            },
+        )
+    return local_schemes_catalog.response(request)
 
 @router.get("/online", response_model=Dict[str, Any])
 async def get_online_schemes(q: str = "scheme") -> Dict[str, Any]:
@@ -427,8 +553,38 @@ async def update_schemes(request: UpdateRequest) -> UpdateResponse:
         timestamp=datetime.now().isoformat()
     )
 
+SEARCH_MODES = ("lexical", "semantic", "hybrid")
+
+def _scheme_text(scheme: Dict[str, Any]) -> str:
+    return " ".join([
+        scheme.get("title", ""),
+        scheme.get("description", ""),
+        scheme.get("benefits", ""),
+        scheme.get("category", "").replace("_", " "),
+        " ".join(scheme.get("keywords", [])),
+        " ".join(scheme.get("tags", [])),
+    ])
+
+def scheme_vectors():
+    """Semantic vector index for the current schemes_db.json (re-embeds only changed schemes)"""
+    from semantic_index import VectorIndex  # numpy; only loaded when semantic search is used
+
+    encoded = schemes_catalog.current()
+    rows = encoded.index(schemes_catalog.items).rows
+    return rows, encoded.derived(
+        "vectors", lambda: VectorIndex("schemes").build([r.get("id") for r in rows], [_scheme_text(r) for r in rows])
+    )
+
+schemes_catalog.warm_with("vectors", scheme_vectors)
+
+def semantic_rank(q: str, limit: int) -> List[Dict[str, Any]]:
+    rows, vectors = scheme_vectors()
+    with stage("scoring"):
+        hits = vectors.search([q], k=limit)[0]
+    return [rows[r] for r, _ in hits]
+
 @router.get("/search", response_model=Dict[str, Any])
-async def search_schemes(q: str, fuzzy: bool = True, limit: int = 50) -> Dict[str, Any]:
+async def search_schemes(q: str, fuzzy: bool = True, limit: int = 50, mode: str = "lexical") -> Dict[str, Any]:
     """
     Search schemes using keyword or fuzzy matching
     
@@ -436,9 +592,13 @@ async def search_schemes(q: str, fuzzy: bool = True, limit: int = 50) -> Dict[st
     - q: Search query (required)
     - fuzzy: Use fuzzy matching if available (default: true)
     - limit: Max results to return (default: 50)
+    - mode: "lexical" (default), "semantic" (embedding similarity, finds paraphrases
+      such as "money for farmers") or "hybrid" (reciprocal-rank fusion of both)
     
     Returns schemes from local database with search results
     """
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(SEARCH_MODES)}")
     if not q.strip():
         # Graceful empty search response
         return {
@@ -463,13 +623,31 @@ async def search_schemes(q: str, fuzzy: bool = True, limit: int = 50) -> Dict[st
             "fuzzy_available": FUZZY_AVAILABLE,
         }
     
-    # Search using available method
-    if fuzzy and FUZZY_AVAILABLE:
-        results = search_schemes_fuzzy(q, schemes, threshold=50)
-        search_type = "fuzzy"
+    if mode == "semantic":
+        # Building or loading the vector index is blocking work; keep it off the event loop
+        results = await run_in_threadpool(semantic_rank, q, limit)
+        search_type = "semantic"
     else:
-        results = search_schemes_keyword(q, schemes)
-        search_type = "keyword"
+        # Search using available method
+        if fuzzy and FUZZY_AVAILABLE is None:
+            get_fuzz()
+        if fuzzy and FUZZY_AVAILABLE:
+            with stage("scoring"):
+                results = search_schemes_fuzzy(q, schemes, threshold=50)
+            search_type = "fuzzy"
+        else:
+            with stage("index"):
+                results = search_schemes_keyword(q, schemes)
+            search_type = "keyword"
+
+        if mode == "hybrid":
+            from semantic_index import reciprocal_rank_fusion
+
+            semantic = await run_in_threadpool(semantic_rank, q, max(limit, 50))
+            by_id = {s.get("id"): s for s in semantic + results}
+            fused = reciprocal_rank_fusion([[s.get("id") for s in results], [s.get("id") for s in semantic]])
+            results = [by_id[key] for key, _ in fused]
+            search_type = f"hybrid+{search_type}"
     
     # Limit results
     results = results[:limit]
@@ -483,6 +661,111 @@ async def search_schemes(q: str, fuzzy: bool = True, limit: int = 50) -> Dict[st
         "fuzzy_available": FUZZY_AVAILABLE,
     }
 
+@router.get("/facets", response_model=Dict[str, Any])
+async def facet_search(q: Optional[str] = None, state: Optional[str] = None, category: Optional[str] = None,
+                       keyword: Optional[str] = None, keyword_mode: str = "any",
+                       limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None,
+                       fields: Optional[str] = None, view: Optional[str] = None,
+                       facet_size: int = Query(20, ge=1, le=500)):
+    """
+    Faceted scheme search.
+
+    - `state`, `category`, `keyword`: comma-separated values, OR-ed within a facet
+      (`keyword_mode=all` requires every keyword); facets are AND-ed together.
+    - `q`: text search; every word must match (as a word prefix).
+    - `facets`: per-facet counts under the other facets' selections, so a state
+      count says how many results choosing that state would give.
+    - `limit`/`cursor`/`fields`/`view` page and trim results as in GET /schemes.
+    """
+    if keyword_mode not in ("any", "all"):
+        raise HTTPException(status_code=400, detail="keyword_mode must be 'any' or 'all'")
+    # One generation for the bitmaps and the cursor keys they are positioned by
+    encoded = schemes_catalog.current()
+    index = scheme_facets(encoded)
+    keys = encoded.index(schemes_catalog.items).keys
+    with stage("index"):
+        result = index.search(
+            filters={"state": _csv(state), "category": _csv(category), "keyword": _csv(keyword)},
+            modes={"keyword": keyword_mode},
+            query=q,
+            facet_limit={"keyword": facet_size},
+        )
+
+    start = bisect_right(keys, decode_cursor(cursor)) if cursor else 0
+    limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    positions = result.positions(start, limit + 1)
+    next_cursor = encode_cursor(keys[positions[limit - 1]]) if len(positions) > limit else None
+    rows = [index.rows[pos] for pos in positions[:limit]]
+    projection = projection_fields(fields, view, SCHEME_SUMMARY_FIELDS)
+    if projection:
+        rows = [{f: row[f] for f in projection if f in row} for row in rows]
+
+    return {
+        "total": result.total,
+        "count": len(rows),
+        "schemes": rows,
+        "facets": result.facets,
+        "next_cursor": next_cursor,
+    }
+
+_RECOMMENDATIONS: "OrderedDict[tuple, list]" = OrderedDict()  # (email, attributes_version, catalog etag) -> ranked
+_RECOMMENDATIONS_LOCK = threading.Lock()
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "2048"))
+
+def scheme_eligibility(encoded=None) -> EligibilityIndex:
+    """Eligibility bitmaps for the current (or given) schemes_db.json generation (same row order as scheme_facets())"""
+    encoded = encoded or schemes_catalog.current()
+    rows = encoded.index(schemes_catalog.items).rows
+    return encoded.derived("eligibility", lambda: EligibilityIndex(rows))
+
+schemes_catalog.warm_with("eligibility", scheme_eligibility)
+
+@router.get("/recommended", response_model=Dict[str, Any])
+def recommended_schemes(limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE), fields: Optional[str] = None,
+                        view: Optional[str] = None, user: UserPrincipal = Depends(get_current_user)):
+    """
+    Schemes the signed-in user qualifies for, ranked by how many of the scheme's
+    targeted criteria (state, occupation, gender, income, land, age) their profile
+    is known to meet. Set attributes with POST /profile/me. Rankings are cached per
+    profile attributes_version and schemes_db.json version.
+    """
+    profile = persistence.get_profile(user.email) or {}
+    attributes = profile.get("attributes") or {}
+    version = profile.get("attributes_version", 0)
+    # One generation for the cache key, the ranking and the rows it points into
+    encoded = schemes_catalog.current()
+    eligibility = scheme_eligibility(encoded)
+    key = (user.email, version, encoded.etag)
+
+    with _RECOMMENDATIONS_LOCK:
+        ranked = _RECOMMENDATIONS.get(key)
+        if ranked is not None:
+            _RECOMMENDATIONS.move_to_end(key)
+    cache_lookup("recommendations", ranked)
+    if ranked is None:
+        with stage("scoring"):
+            ranked = eligibility.match(attributes, MAX_PAGE_SIZE)
+        with _RECOMMENDATIONS_LOCK:
+            _RECOMMENDATIONS[key] = ranked
+            if len(_RECOMMENDATIONS) > RECOMMENDATION_CACHE_SIZE:
+                _RECOMMENDATIONS.popitem(last=False)
+
+    rows = eligibility.rows
+    projection = projection_fields(fields, view or "summary", SCHEME_SUMMARY_FIELDS)
+    schemes = []
+    for pos, score, matched in ranked[:limit]:
+        row = rows[pos]
+        item = {f: row[f] for f in projection if f in row} if projection else dict(row)
+        item["score"] = score
+        item["matched"] = matched
+        schemes.append(item)
+    return {
+        "attributes_version": version,
+        "missing_attributes": [k for k in persistence.PROFILE_ATTRIBUTES if attributes.get(k) in (None, "")],
+        "count": len(schemes),
+        "schemes": schemes,
+    }
+
 @router.get("/status", response_model=OnlineStatus)
 async def check_status() -> OnlineStatus:
     """
@@ -533,8 +816,7 @@ async def get_scheme(scheme_id: str) -> SchemeResponse:
 @router.get("/category/{category}", response_model=Dict[str, Any])
 async def get_by_category(category: str) -> Dict[str, Any]:
     """Filter schemes by category"""
-    schemes = load_local_schemes()
-    filtered = [s for s in schemes if s.get("category", "").lower() == category.lower()]
+    filtered = _facet_rows(category=category)
     
     if not filtered:
         raise HTTPException(status_code=404, detail=f"No schemes found in category '{category}'")
@@ -548,8 +830,7 @@ async def get_by_category(category: str) -> Dict[str, Any]:
 @router.get("/state/{state}", response_model=Dict[str, Any])
 async def get_by_state(state: str) -> Dict[str, Any]:
     """Filter schemes by state"""
-    schemes = load_local_schemes()
-    filtered = [s for s in schemes if s.get("state", "").lower() == state.lower()]
+    filtered = _facet_rows(state=state)
     
     if not filtered:
         raise HTTPException(status_code=404, detail=f"No schemes found for state '{state}'")
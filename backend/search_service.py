@@ -0,0 +1,199 @@
+"""
+Unified search: answer one question from every catalog in a single round-trip.
+
+GET /search?q=... fans out concurrently to the scheme index, the FAQ index,
+the common-scams list and the chatbot intents. Each source runs in the
+threadpool under its own deadline (SOURCE_DEADLINES_MS, overridable with
+SEARCH_DEADLINES_MS="schemes=500,faqs=300"); a source that misses it is
+reported as "timeout" and the response carries whatever the others returned,
+with partial=true. A timed-out source keeps running in its worker thread but
+is no longer waited for.
+
+Every source scores its hits on 0-1 so they can be merged into one ranked
+list. The raw scorers are unbounded or start at a threshold, so they are
+squashed onto 0-1 per source:
+- schemes: rapidfuzz score above the match threshold (substring-only matches 0.3)
+- faqs: advanced_match_score / (score + FAQ_HALF_SCORE)
+- scams: share of query words found in the scam text
+- chatbot: intent keyword score / (score + INTENT_HALF_SCORE)
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+
+from chatbot_service import detect_language, load_language, score_intent
+from faq_service import advanced_match_score, load_faqs
+from metrics import SEARCH_SOURCE_SECONDS
+from profiling import TimedRoute, record_stage
+from scam_service import match_common_scams
+from schemes_service import load_local_schemes, score_schemes_fuzzy, search_schemes_keyword
+
+router = APIRouter(route_class=TimedRoute)
+
+SOURCE_DEADLINES_MS = {"schemes": 400, "faqs": 300, "scams": 200, "chatbot": 200}
+SCHEME_FUZZY_THRESHOLD = 50
+# Raw score that maps to 0.5
+FAQ_HALF_SCORE = 60
+INTENT_HALF_SCORE = 6
+SNIPPET_CHARS = 200
+
+Hit = Dict[str, Any]
+
+
+def _deadlines() -> Dict[str, float]:
+    deadlines = dict(SOURCE_DEADLINES_MS)
+    for part in os.getenv("SEARCH_DEADLINES_MS", "").split(","):
+        name, _, ms = part.partition("=")
+        if name.strip() in deadlines and ms.strip().isdigit():
+            deadlines[name.strip()] = int(ms)
+    return deadlines
+
+
+def _snippet(text: str) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= SNIPPET_CHARS else text[:SNIPPET_CHARS - 1].rstrip() + "…"
+
+
+def search_schemes(q: str, limit: int) -> List[Hit]:
+    schemes = load_local_schemes()
+    scored = [
+        (s, (score - SCHEME_FUZZY_THRESHOLD) / (100 - SCHEME_FUZZY_THRESHOLD))
+        for s, score in score_schemes_fuzzy(q, schemes, threshold=SCHEME_FUZZY_THRESHOLD)
+    ]
+    if not scored:
+        scored = [(s, 0.3) for s in search_schemes_keyword(q, schemes)]
+    return [
+        {
+            "id": s.get("id"),
+            "title": s.get("title", ""),
+            "snippet": _snippet(s.get("description", "")),
+            "category": s.get("category"),
+            "state": s.get("state"),
+            "score": score,
+        }
+        for s, score in scored[:limit]
+    ]
+
+
+def search_faqs(q: str, limit: int) -> List[Hit]:
+    scored = []
+    for faq in load_faqs():
+        score = advanced_match_score(q, faq)
+        if score > 0:
+            scored.append((faq, score / (score + FAQ_HALF_SCORE)))
+    scored.sort(key=lambda h: -h[1])
+    return [
+        {
+            "id": faq.get("id"),
+            "title": faq.get("question", ""),
+            "snippet": _snippet(faq.get("answer", "")),
+            "category": faq.get("category"),
+            "score": score,
+        }
+        for faq, score in scored[:limit]
+    ]
+
+
+def search_scams(q: str, limit: int) -> List[Hit]:
+    return [
+        {"id": scam["id"], "title": scam["type"], "snippet": _snippet(scam["description"]), "score": score}
+        for scam, score in match_common_scams(q, limit)
+    ]
+
+
+def search_chatbot(q: str, limit: int) -> List[Hit]:
+    data = load_language(detect_language(q))
+    intent, score = score_intent(q, data)
+    if intent == "unknown" or score <= 0:
+        return []
+    return [{
+        "id": intent,
+        "title": intent.replace("_", " "),
+        "snippet": data["intents"][intent]["response"],
+        "score": score / (score + INTENT_HALF_SCORE),
+    }]
+
+
+SOURCES: Dict[str, Callable[[str, int], List[Hit]]] = {
+    "schemes": search_schemes,
+    "faqs": search_faqs,
+    "scams": search_scams,
+    "chatbot": search_chatbot,
+}
+
+
+async def _run_source(name: str, q: str, limit: int, deadline: float) -> Tuple[str, List[Hit], Dict[str, Any]]:
+    started = time.perf_counter()
+    hits: List[Hit] = []
+    try:
+        hits = await asyncio.wait_for(run_in_threadpool(SOURCES[name], q, limit), timeout=deadline)
+        status = "ok"
+    except asyncio.TimeoutError:
+        status = "timeout"
+    except Exception as e:
+        print(f"⚠️ /search source {name} failed: {e}")
+        status = "error"
+    elapsed = time.perf_counter() - started
+    SEARCH_SOURCE_SECONDS.labels(name, status).observe(elapsed)
+    record_stage(f"search_{name}", elapsed)
+    return name, hits, {"status": status, "count": len(hits), "ms": round(elapsed * 1000, 1)}
+
+
+async def fan_out(q: str, sources: List[str], limit: int, timeout_ms: Optional[int] = None) -> Dict[str, Any]:
+    """Query `sources` concurrently and merge their hits by normalised score"""
+    deadlines = _deadlines()
+    runs = [
+        _run_source(name, q, limit, min(deadlines[name], timeout_ms or deadlines[name]) / 1000)
+        for name in sources
+    ]
+    merged: List[Hit] = []
+    seen = set()
+    status: Dict[str, Dict[str, Any]] = {}
+    for name, hits, info in await asyncio.gather(*runs):
+        status[name] = info
+        for hit in hits:
+            # schemes_db.json lists a few schemes more than once
+            if (name, hit["id"]) not in seen:
+                seen.add((name, hit["id"]))
+                merged.append(dict(hit, source=name, score=round(hit["score"], 4)))
+    # Stable sort keeps the source order for equal scores
+    merged.sort(key=lambda hit: -hit["score"])
+    return {
+        "query": q,
+        "count": min(len(merged), limit),
+        "results": merged[:limit],
+        "sources": status,
+        "partial": any(info["status"] != "ok" for info in status.values()),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+@router.get("", response_model=Dict[str, Any])
+async def unified_search(q: str, sources: Optional[str] = None, limit: int = Query(10, ge=1, le=50),
+                         timeout_ms: Optional[int] = Query(None, ge=10, le=5000)) -> Dict[str, Any]:
+    """
+    Search schemes, FAQs, common scams and chatbot answers at once
+
+    Query Parameters:
+    - q: Search query (required)
+    - sources: comma-separated subset of schemes,faqs,scams,chatbot (default: all)
+    - limit: Max merged results (default: 10)
+    - timeout_ms: Caps every source deadline (e.g. for clients on slow networks)
+
+    Results are merged by a 0-1 score; `sources` reports each source's status
+    ("ok", "timeout" or "error") and `partial` is true if any source missed.
+    """
+    selected = [s.strip().lower() for s in sources.split(",") if s.strip()] if sources else list(SOURCES)
+    unknown = [s for s in selected if s not in SOURCES]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"sources must be among {', '.join(SOURCES)}")
+    if not q.strip():
+        return {"query": q, "count": 0, "results": [], "sources": {}, "partial": False,
+                "timestamp": datetime.now().isoformat()}
+    return await fan_out(q.strip(), list(dict.fromkeys(selected)), limit, timeout_ms)
@@ -0,0 +1,107 @@
+"""
+Shared bearer-token authentication for all routers.
+
+Verified JWT claims are cached in a bounded LRU keyed by the SHA-256 digest of
+the token, until the token's own `exp`, so repeated requests (dashboard
+polling) skip the HMAC verification.
+
+Usage:
+    user: UserPrincipal = Depends(get_current_user)            # 401 if missing/invalid
+    user: Optional[UserPrincipal] = Depends(get_optional_user)  # None if anonymous
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from typing import Any, Dict, Optional
+
+from fastapi import Header, HTTPException
+from jose import jwt
+from pydantic import BaseModel
+
+from auth_service import JWT_SECRET, JWT_ALGO
+from metrics import CACHE_REQUESTS
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+# Upper bound for tokens that carry no `exp`
+TOKEN_CACHE_MAX_TTL = int(os.getenv("TOKEN_CACHE_MAX_TTL", "300"))
+
+_TOKEN_CACHE: "OrderedDict[bytes, tuple]" = OrderedDict()  # digest -> (claims, cache_until)
+_TOKEN_CACHE_LOCK = threading.Lock()
+TOKEN_CACHE_STATS = {"hits": 0, "misses": 0}
+
+
+class UserPrincipal(BaseModel):
+    email: str
+    claims: Dict[str, Any] = {}
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """Verify a JWT, using the LRU cache when possible. Raises jwt.JWTError on failure."""
+    digest = sha256(token.encode()).digest()
+    now = time.time()
+    with _TOKEN_CACHE_LOCK:
+        entry = _TOKEN_CACHE.get(digest)
+        if entry is not None:
+            claims, cache_until = entry
+            if now < cache_until:
+                _TOKEN_CACHE.move_to_end(digest)
+                TOKEN_CACHE_STATS["hits"] += 1
+                CACHE_REQUESTS.labels("jwt", "hit").inc()
+                return claims
+            del _TOKEN_CACHE[digest]
+        TOKEN_CACHE_STATS["misses"] += 1
+    CACHE_REQUESTS.labels("jwt", "miss").inc()
+
+    claims = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
+    exp = claims.get("exp")
+    cache_until = min(float(exp), now + TOKEN_CACHE_MAX_TTL) if exp is not None else now + TOKEN_CACHE_MAX_TTL
+    # jose already checked exp, but keep the (tiny) window honest
+    if exp is None or float(exp) > now:
+        with _TOKEN_CACHE_LOCK:
+            _TOKEN_CACHE[digest] = (claims, cache_until)
+            if len(_TOKEN_CACHE) > TOKEN_CACHE_SIZE:
+                _TOKEN_CACHE.popitem(last=False)
+    return claims
+
+
+def _bearer_token(authorization: Optional[str]) -> Optional[str]:
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    token = authorization.split(" ", 1)[1].strip()
+    return token or None
+
+
+def get_current_user(authorization: Optional[str] = Header(None)) -> UserPrincipal:
+    """Dependency: require a valid bearer token"""
+    token = _bearer_token(authorization)
+    if token is None:
+        raise HTTPException(status_code=401, detail="Missing or invalid Authorization header")
+    try:
+        claims = decode_token(token)
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    email = claims.get("email") or claims.get("sub")
+    if not email:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+    return UserPrincipal(email=email, claims=claims)
+
+
+def get_optional_user(authorization: Optional[str] = Header(None)) -> Optional[UserPrincipal]:
+    """Dependency: the caller's principal, or None for anonymous/invalid tokens"""
+    token = _bearer_token(authorization)
+    if token is None:
+        return None
+    try:
+        claims = decode_token(token)
+    except Exception:
+        return None
+    email = claims.get("email") or claims.get("sub")
+    return UserPrincipal(email=email, claims=claims) if email else None
+
+
+def token_cache_stats() -> Dict[str, int]:
+    with _TOKEN_CACHE_LOCK:
+        return {**TOKEN_CACHE_STATS, "size": len(_TOKEN_CACHE)}
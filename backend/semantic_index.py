@@ -0,0 +1,261 @@
+"""
+Offline semantic search for schemes and FAQs (CPU only).
+
+Embedders:
+- SentenceEmbedder: a local sentence-transformers model, used when
+  SEMANTIC_MODEL is set (e.g. "paraphrase-multilingual-MiniLM-L12-v2", which
+  also matches Hindi questions to English FAQs) and the package is installed.
+- HashingEmbedder (default): hashed word + character n-gram features with
+  stopwords dropped. A small concept lexicon maps common paraphrases and
+  Hindi/Hinglish terms ("paisa", "किसान", "ghar") to shared concepts, so
+  "money for farmers" reaches PM-Kisan without any model download.
+
+VectorIndex keeps one L2-normalised float32 row per document in
+SEMANTIC_INDEX_DIR/<name>.<stamp>.npy, opened with mmap, plus <name>.meta.json
+holding per-row content hashes and the name of that matrix file. The stamp is
+derived from the hashes, so a rebuild writes a new matrix file and then swaps
+the meta file in atomically: a reader never pairs hashes with another
+generation's rows. Rebuilding re-embeds only rows whose text changed. Queries are batched: (queries x dim) @ matrix.T,
+then argpartition top-k.
+
+`reciprocal_rank_fusion()` merges semantic and lexical rankings.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SEMANTIC_INDEX_DIR = Path(os.getenv("SEMANTIC_INDEX_DIR", Path(__file__).parent / ".semantic_index"))
+SEMANTIC_MODEL = os.getenv("SEMANTIC_MODEL")
+HASH_DIM = 1024
+RRF_K = 60
+
+# \w alone splits Devanagari words at vowel signs (combining marks)
+_WORD_RE = re.compile(r"[\w\u0900-\u097F]+", re.UNICODE)
+
+# term -> concept tokens added alongside it (English paraphrases, Hindi, Hinglish)
+CONCEPTS: Dict[str, Tuple[str, ...]] = {}
+for _concept, _terms in {
+    "money": ("money", "cash", "paisa", "paise", "rupees", "financial", "assistance", "income", "support",
+              "benefit", "transfer", "पैसा", "पैसे", "रुपये", "धन", "सहायता", "आर्थिक"),
+    "farmer": ("farmer", "farmers", "farming", "agriculture", "agricultural", "kisan", "krishak", "crop", "crops",
+               "किसान", "खेती", "कृषि", "फसल"),
+    "house": ("house", "housing", "home", "ghar", "makaan", "awas", "pucca", "घर", "मकान", "आवास"),
+    "job": ("job", "jobs", "employment", "work", "naukri", "rozgar", "wage", "wages", "नौकरी", "रोजगार", "काम"),
+    "loan": ("loan", "loans", "credit", "karz", "rin", "ऋण", "कर्ज", "लोन"),
+    "health": ("health", "hospital", "medical", "treatment", "doctor", "ilaj", "swasthya", "इलाज", "स्वास्थ्य",
+               "अस्पताल"),
+    "pension": ("pension", "old", "elderly", "senior", "budhapa", "पेंशन", "बुढ़ापा", "वृद्ध"),
+    "education": ("education", "school", "student", "students", "scholarship", "study", "padhai", "shiksha",
+                  "पढ़ाई", "शिक्षा", "छात्रवृत्ति", "स्कूल"),
+    "women": ("women", "woman", "girl", "girls", "female", "mahila", "beti", "महिला", "बेटी", "लड़की"),
+    "insurance": ("insurance", "bima", "cover", "बीमा"),
+    "gas": ("gas", "lpg", "cylinder", "ujjwala", "गैस", "सिलेंडर"),
+    "food": ("food", "ration", "grain", "anna", "राशन", "अनाज", "भोजन"),
+    "fraud": ("fraud", "scam", "cheat", "dhokha", "thagi", "धोखा", "ठगी", "फ्रॉड"),
+    "scheme": ("scheme", "schemes", "yojana", "yojna", "योजना", "स्कीम"),
+    "apply": ("apply", "application", "register", "registration", "avedan", "आवेदन", "पंजीकरण"),
+    "document": ("document", "documents", "aadhaar", "certificate", "dastavez", "दस्तावेज", "आधार"),
+}.items():
+    for _term in _terms:
+        CONCEPTS.setdefault(_term, ())
+        CONCEPTS[_term] += ("@" + _concept,)
+
+# Question words and particles carry no topic; without this "how do I ..." questions all look alike
+STOPWORDS = frozenset(
+    "a an and are am be by can do does for from get how i in is it me my of on or the this to what when where "
+    "which who will with you your kya hai hain ka ki ke ko se mein mera meri mujhe kaise "
+    "क्या है हैं का की के को से में मेरा मेरी मुझे कैसे और या".split()
+)
+
+
+class HashingEmbedder:
+    """Feature-hashed word/char-n-gram vectors; deterministic across processes"""
+
+    def __init__(self, dim: int = HASH_DIM):
+        self.dim = dim
+        # Changing the lexicon changes vectors, so it is part of the id stored with the index
+        lexicon = zlib.crc32(
+            json.dumps([sorted(CONCEPTS.items()), sorted(STOPWORDS)], ensure_ascii=False).encode("utf-8")
+        )
+        self.id = f"hash-ngram-v1-{dim}-{lexicon:08x}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD_RE.findall(text.lower())
+            # A query made only of stopwords ("what is this") still needs some features
+            words = [w for w in words if w not in STOPWORDS] or words
+            if not words:
+                continue
+            buckets, weights = [], []
+            for word in words:
+                b, w = _word_features(word, self.dim)
+                buckets.extend(b)
+                weights.extend(w)
+            out[row] = np.bincount(buckets, weights, minlength=self.dim)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+@lru_cache(maxsize=65536)
+def _word_features(word: str, dim: int) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+    """Hashed (bucket, signed weight) features of one word: the word, its concepts, its char trigrams"""
+    features = [(word, 1.0)]
+    features.extend((concept, 1.5) for concept in CONCEPTS.get(word, ()))
+    padded = f"<{word}>"
+    features.extend((padded[i:i + 3], 0.3) for i in range(len(padded) - 2))
+    buckets, weights = [], []
+    for feature, weight in features:
+        h = zlib.crc32(feature.encode("utf-8"))
+        buckets.append(h % dim)
+        weights.append(weight if (h >> 31) & 1 else -weight)
+    return tuple(buckets), tuple(weights)
+
+
+class SentenceEmbedder:
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.id = f"st:{model_name}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return np.asarray(
+            self.model.encode(list(texts), batch_size=32, normalize_embeddings=True), dtype=np.float32
+        )
+
+
+_EMBEDDER = None
+_EMBEDDER_LOCK = threading.Lock()
+
+
+def get_embedder():
+    """SentenceEmbedder when SEMANTIC_MODEL is set and loadable, else HashingEmbedder"""
+    global _EMBEDDER
+    if _EMBEDDER is None:
+        with _EMBEDDER_LOCK:
+            if _EMBEDDER is None:
+                embedder = None
+                if SEMANTIC_MODEL:
+                    try:
+                        embedder = SentenceEmbedder(SEMANTIC_MODEL)
+                    except Exception as e:
+                        print(f"⚠️ Semantic model unavailable ({e}); using hashed n-grams")
+                _EMBEDDER = embedder or HashingEmbedder()
+    return _EMBEDDER
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class VectorIndex:
+    def __init__(self, name: str, embedder=None, directory: Path = SEMANTIC_INDEX_DIR):
+        self.name = name
+        self.embedder = embedder or get_embedder()
+        self.directory = Path(directory)
+        self.matrix: Optional[np.ndarray] = None
+        self.ids: List[Hashable] = []
+        self.embedded = 0  # rows embedded by the last build (the rest were reused)
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.directory / f"{self.name}.meta.json"
+
+    def _matrix_name(self, hashes: List[str]) -> str:
+        """Matrix file name for these rows; the meta file refers to it by this name"""
+        stamp = _digest(json.dumps([self.embedder.id, hashes]))[:16]
+        return f"{self.name}.{stamp}.npy"
+
+    def _load_previous(self) -> Tuple[Dict[str, int], Optional[np.ndarray], List[str]]:
+        try:
+            meta = json.loads(self._meta_path.read_text(encoding="utf-8"))
+            if meta.get("embedder") != self.embedder.id or meta.get("matrix") != self._matrix_name(meta["hashes"]):
+                return {}, None, []
+            matrix = np.load(self.directory / meta["matrix"], mmap_mode="r")
+            if matrix.shape != (len(meta["hashes"]), self.embedder.dim):
+                return {}, None, []
+        except (OSError, ValueError, KeyError):
+            return {}, None, []
+        return {h: i for i, h in enumerate(meta["hashes"])}, matrix, meta["hashes"]
+
+    def build(self, ids: Sequence[Hashable], texts: Sequence[str]) -> "VectorIndex":
+        """Embed `texts` (one per id), reusing stored rows whose text is unchanged"""
+        hashes = [_digest(t) for t in texts]
+        previous, old_matrix, old_hashes = self._load_previous()
+        self.ids = list(ids)
+
+        if old_matrix is not None and old_hashes == hashes:
+            self.matrix = old_matrix
+            self.embedded = 0
+            return self
+
+        matrix = np.empty((len(texts), self.embedder.dim), dtype=np.float32)
+        missing = []
+        for row, h in enumerate(hashes):
+            old_row = previous.get(h)
+            if old_row is not None:
+                matrix[row] = old_matrix[old_row]
+            else:
+                missing.append(row)
+        if missing:
+            matrix[missing] = self.embedder.embed([texts[row] for row in missing])
+        self.embedded = len(missing)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        matrix_name = self._matrix_name(hashes)
+        tmp_matrix = self.directory / f"{matrix_name}.{os.getpid()}.tmp.npy"
+        tmp_meta = self._meta_path.with_suffix(f".{os.getpid()}.tmp")
+        np.save(tmp_matrix, matrix)
+        os.replace(tmp_matrix, self.directory / matrix_name)
+        tmp_meta.write_text(
+            json.dumps({"embedder": self.embedder.id, "hashes": hashes, "matrix": matrix_name}), encoding="utf-8"
+        )
+        os.replace(tmp_meta, self._meta_path)
+        self.matrix = np.load(self.directory / matrix_name, mmap_mode="r")
+        # Older generations; open mmaps keep working after the unlink
+        for stale in self.directory.glob(f"{self.name}.*.npy"):
+            if stale.name != matrix_name and ".tmp." not in stale.name:
+                stale.unlink(missing_ok=True)
+        return self
+
+    def search(self, queries: Sequence[str], k: int = 10, min_score: float = 0.0) -> List[List[Tuple[int, float]]]:
+        """Top-k (row, cosine score) per query, best first"""
+        if self.matrix is None or not len(self.ids) or not queries:
+            return [[] for _ in queries]
+        return self.search_vectors(self.embedder.embed(queries), k, min_score)
+
+    def search_vectors(self, q: np.ndarray, k: int = 10, min_score: float = 0.0) -> List[List[Tuple[int, float]]]:
+        """search() for queries already embedded with this index's embedder"""
+        if self.matrix is None or not len(self.ids):
+            return [[] for _ in q]
+        scores = q @ np.asarray(self.matrix).T  # (queries, rows)
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for qi, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[qi, candidates])]
+            results.append([(int(r), float(scores[qi, r])) for r in ordered if scores[qi, r] > min_score])
+        return results
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = RRF_K,
+                           weights: Optional[Sequence[float]] = None) -> List[Tuple[Hashable, float]]:
+    """Merge ranked key lists: score(key) = sum(weight / (k + rank)); best first"""
+    weights = weights or [1.0] * len(rankings)
+    fused: Dict[Hashable, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, key in enumerate(ranking):
+            fused[key] = fused.get(key, 0.0) + weight / (k + rank + 1)
+    return sorted(fused.items(), key=lambda kv: -kv[1])
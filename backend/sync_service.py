@@ -0,0 +1,212 @@
+"""
+Offline-first delta sync for the service worker's IndexedDB replica.
+
+    GET /sync               manifest: {"version", "collections": {name: {"count"}}, "snapshot"}
+    GET /sync?since=N       manifest + "changes" since version N:
+                            {name: {"added": {key: record}, "changed": {key: record}, "removed": [key]}}
+                            or "full": true when no delta can be given (N is 0, too
+                            old, or from another database) or it would be larger than
+                            SYNC_MAX_DELTA records; the client then fetches the snapshot
+    GET /sync/snapshot      every record at "version" (pre-encoded, gzip/br, ETag)
+
+Collections: schemes, faqs and common_scams (in the /scam/common-scams shape).
+FAQ vote counts are left out: they change on every vote and /faq/ serves them
+live. Records are keyed by id; a repeated id gets "~2", "~3", ... and a row
+without an id is keyed by its content digest.
+
+The change log lives in the database (models.SyncChange). Whenever a request
+or the data watcher meets a new version of a knowledge file, the records are
+diffed against the stored digests and the differences are appended under one
+global, monotonic version. Diffs are keyed on the file's signature, so every
+worker agrees on the versions and each change is logged once.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+
+import persistence
+from catalog import CatalogCache, dumps
+from data_files import DataFile
+from data_snapshot import plain
+from faq_service import FAQ_FILE
+from profiling import TimedRoute, stage
+from scam_service import COMMON_SCAMS_FILE, adapt_common_scams
+from schemes_service import SCHEMES_FILE
+
+router = APIRouter(route_class=TimedRoute)
+
+# Changes older than this are pruned; clients further behind get the snapshot
+SYNC_LOG_DAYS = float(os.getenv("SYNC_LOG_DAYS", "90"))
+# A delta with more records than this is answered with "full": true
+SYNC_MAX_DELTA = int(os.getenv("SYNC_MAX_DELTA", "500"))
+VOTE_FIELDS = ("helpful_count", "unhelpful_count", "last_voted_at")
+
+
+def _faqs(value) -> List[dict]:
+    return [{k: v for k, v in faq.items() if k not in VOTE_FIELDS} for faq in value or []]
+
+
+COLLECTIONS: Dict[str, Tuple[DataFile, Callable[[Any], List[dict]]]] = {
+    "schemes": (SCHEMES_FILE, lambda value: list(value or [])),
+    "faqs": (FAQ_FILE, _faqs),
+    "common_scams": (COMMON_SCAMS_FILE, lambda value: adapt_common_scams(value or [])),
+}
+
+
+class _Keyed:
+    """A collection's records by sync key, with their content digests"""
+
+    __slots__ = ("records", "digests")
+
+    def __init__(self, rows: List[dict]):
+        self.records: Dict[str, Any] = {}
+        self.digests: Dict[str, str] = {}
+        seen: Dict[str, int] = {}
+        for row in rows:
+            digest = _digest(row)
+            record_id = row.get("id")
+            if record_id in (None, ""):
+                key = f"~{digest}"
+            else:
+                key = str(record_id)
+                seen[key] = seen.get(key, 0) + 1
+                if seen[key] > 1:
+                    key = f"{key}~{seen[key]}"
+            self.records[key] = row
+            self.digests[key] = digest
+
+
+def _digest(record: Any) -> str:
+    data = json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=plain)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+def _signature(generation: Hashable) -> Optional[str]:
+    return None if generation is None else f"{generation[0]}:{generation[1]}"
+
+
+def _current(name: str) -> Tuple[Optional[str], _Keyed]:
+    """(signature, records) of one file version (retried if a reload lands in between)"""
+    file, adapt = COLLECTIONS[name]
+    while True:
+        generation = file.generation()
+        keyed = file.derived("sync", lambda value: _Keyed(adapt(value)))
+        if file.generation() == generation:
+            return _signature(generation), keyed
+
+
+_lock = threading.Lock()
+_recorded: Dict[str, str] = {}  # collection -> signature this process has logged
+
+
+def refresh(*names: str) -> Dict[str, Tuple[Optional[str], _Keyed]]:
+    """
+    Current records per collection, logging changes the change log has not
+    seen yet. Also runs as an on_reload warmer (inside DataFile.reload()), so
+    it must never reload a file itself.
+    """
+    current = {}
+    for name in names or COLLECTIONS:
+        file = COLLECTIONS[name][0]
+        signature, keyed = _current(name)
+        if signature is not None and _recorded.get(name) != signature:
+            with _lock, stage("sync_log"):
+                if _recorded.get(name) != signature:
+                    logged = persistence.record_sync_state(name, signature, keyed.digests, SYNC_LOG_DAYS)
+                    if not logged and _signature(file.disk_generation()) == signature:
+                        # Another worker logged a newer file, but ours is what is on
+                        # disk now (the file went back in time): it is authoritative
+                        logged = persistence.record_sync_state(
+                            name, signature, keyed.digests, SYNC_LOG_DAYS, force=True
+                        )
+                    if logged:
+                        _recorded[name] = signature
+                    # else this process is behind the file on disk: the next reload logs it
+        current[name] = (signature, keyed)
+    return current
+
+
+def _consistent() -> Tuple[Dict[str, Tuple[Optional[str], _Keyed]], int]:
+    """
+    Current records and the version they correspond to: the newest change
+    logged for any collection, provided every collection is logged at the
+    signature this process serves.
+    """
+    for _ in range(3):
+        current = refresh()
+        states = persistence.sync_collection_states()
+        behind = [name for name, (signature, _) in current.items()
+                  if signature is not None and states.get(name, (None,))[0] != signature]
+        if not behind:
+            return current, max((state[1] for state in states.values()), default=0)
+        # Another worker logged a newer file: catch up (outside every lock) and retry
+        for name in behind:
+            COLLECTIONS[name][0].reload()
+    raise HTTPException(status_code=503, detail="Sync data is being updated, please retry")
+
+
+def _manifest(current, version: int) -> Dict[str, Any]:
+    return {
+        "version": version,
+        "collections": {name: {"count": len(keyed.records)} for name, (_, keyed) in current.items()},
+        "snapshot": "/sync/snapshot",
+    }
+
+
+def _snapshot_payload() -> Dict[str, Any]:
+    current, version = _consistent()
+    return dict(_manifest(current, version),
+                records={name: keyed.records for name, (_, keyed) in current.items()})
+
+
+# Pre-encoded full snapshot; a new version of any file makes a new generation
+snapshot_catalog = CatalogCache(
+    "sync_snapshot", build=_snapshot_payload,
+    generation=lambda: tuple(file.generation() for file, _ in COLLECTIONS.values()),
+)
+
+for _name, (_file, _) in COLLECTIONS.items():
+    # Log a file's changes when the watcher stages it, not on the next request
+    _file.on_reload(partial(refresh, _name))
+
+
+@router.get("")
+def sync(since: Optional[int] = Query(None, ge=0)):
+    """Manifest, plus the changes since `since` (see module docstring)"""
+    current, version = _consistent()
+    body = _manifest(current, version)
+    if since is None:
+        return Response(dumps(body), media_type="application/json")
+
+    with stage("delta"):
+        oldest, first_ops = persistence.sync_changes_since(since, version)
+        full = since == 0 or since > version or since < oldest - 1
+        changes, total = {}, 0
+        if not full:
+            for name, ops in first_ops.items():
+                records = current[name][1].records if name in current else {}
+                delta = {"added": {}, "changed": {}, "removed": []}
+                for key, op in ops.items():
+                    existed = op != "add"  # the first change after `since` tells what the client has
+                    if key in records:
+                        delta["changed" if existed else "added"][key] = records[key]
+                    elif existed:
+                        delta["removed"].append(key)
+                total += len(delta["added"]) + len(delta["changed"]) + len(delta["removed"])
+                if any(delta.values()):
+                    changes[name] = delta
+            full = total > SYNC_MAX_DELTA
+    body.update(since=since, full=full, changes={} if full else changes)
+    return Response(dumps(body), media_type="application/json")
+
+
+@router.get("/snapshot")
+def sync_snapshot(request: Request):
+    """Every synced record at the manifest version (ETag, gzip/brotli)"""
+    return snapshot_catalog.response(request)
@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+
+import activity_log
+from activity_log import ActivityLog, ACTIVITY_RING_SIZE
+
+
+def test_ring_buffer_and_batched_flush(tmp_path):
+    flushed = []
+    log = ActivityLog(
+        log_path=tmp_path / "activity.jsonl",
+        on_flush=flushed.append,
+        flush_interval=0.05,
+        legacy_path=None,
+    )
+    for i in range(ACTIVITY_RING_SIZE + 10):
+        log.log("a@example.com", "ocr", f"scan {i}")
+    log.log("a@example.com", "chatbot", "hello")
+
+    recent = log.recent("a@example.com", 3)
+    assert [a["description"] for a in recent] == ["hello", f"scan {ACTIVITY_RING_SIZE + 9}", f"scan {ACTIVITY_RING_SIZE + 8}"]
+    assert log.pending_stats("a@example.com")["counts"] == {"ocr_scans": ACTIVITY_RING_SIZE + 10, "chat_messages": 1}
+
+    log.close()
+    assert sum(d["a@example.com"]["counts"].get("ocr_scans", 0) for d in flushed) == ACTIVITY_RING_SIZE + 10
+    lines = (tmp_path / "activity.jsonl").read_text().splitlines()
+    assert len(lines) == ACTIVITY_RING_SIZE + 11
+    assert json.loads(lines[-1])["email"] == "a@example.com"
+
+
+def test_replay_rebuilds_ring_buffers(tmp_path):
+    path = tmp_path / "activity.jsonl"
+    first = ActivityLog(log_path=path, legacy_path=None, flush_interval=0.05)
+    first.log("b@example.com", "login", "Logged in")
+    first.close()
+
+    second = ActivityLog(log_path=path, legacy_path=None, flush_interval=0.05)
+    assert second.recent("b@example.com")[0]["description"] == "Logged in"
+    second.close()
+
+
+def test_ingestion_throughput(tmp_path):
+    log = ActivityLog(log_path=tmp_path / "activity.jsonl", legacy_path=None, flush_interval=0.05)
+    started = time.perf_counter()
+    for i in range(5000):
+        log.log(f"user{i % 100}@example.com", "chatbot", "message")
+    elapsed = time.perf_counter() - started
+    log.close()
+    assert 5000 / elapsed > 2000
+
+
+class SlowStore:
+    """Stand-in for persistence.ActivityStore that never writes until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.rows = {}
+
+    def recent(self, email, limit):
+        return list(self.rows.get(email, []))[-limit:]
+
+    def append(self, batch):
+        self.release.wait(5)
+        for event in batch:
+            event = dict(event)
+            self.rows.setdefault(event.pop("email"), []).append(event)
+
+
+def test_eviction_keeps_rings_with_unwritten_events(tmp_path, monkeypatch):
+    monkeypatch.setattr(activity_log, "ACTIVITY_MAX_CACHED_USERS", 2)
+    store = SlowStore()
+    log = ActivityLog(log_path=tmp_path / "activity.jsonl", legacy_path=None, flush_interval=0.05, store=store)
+    for i in range(4):
+        log.log(f"user{i}@example.com", "login", "Logged in")
+    # Nothing is written yet, so no ring may be dropped
+    assert all(log.recent(f"user{i}@example.com") for i in range(4))
+
+    store.release.set()
+    log.close()
+    log.recent("late@example.com")
+    assert len(log._recent) <= 2
+    assert log.recent("user0@example.com")[0]["description"] == "Logged in"
+
+
+def test_compacted_log_does_not_replay_legacy_events_twice(tmp_path):
+    path, legacy = tmp_path / "activity.jsonl", tmp_path / "activity_db.json"
+    legacy.write_text(json.dumps({"c@example.com": [
+        {"type": "login", "description": "Old login", "timestamp": "2024-01-01T00:00:00"},
+    ]}))
+    first = ActivityLog(log_path=path, legacy_path=legacy, flush_interval=0.05)
+    first.log("c@example.com", "ocr", "scan")
+    first.close()
+    first.compact()
+
+    second = ActivityLog(log_path=path, legacy_path=legacy, flush_interval=0.05)
+    assert [a["description"] for a in second.recent("c@example.com")] == ["scan", "Old login"]
+    second.close()
+
+
+def test_workers_sharing_a_store_see_each_others_events(tmp_path, monkeypatch):
+    import persistence
+
+    persistence.init_db()
+    monkeypatch.setattr(activity_log, "ACTIVITY_RING_TTL", 0.05)
+    email = f"shared-{time.time_ns()}@example.com"
+    worker_a = ActivityLog(log_path=tmp_path / "a.jsonl", legacy_path=None, flush_interval=0.05,
+                           store=persistence.ActivityStore())
+    worker_b = ActivityLog(log_path=tmp_path / "b.jsonl", legacy_path=None, flush_interval=0.05,
+                           store=persistence.ActivityStore())
+    assert worker_b.recent(email) == []  # cached empty ring
+
+    worker_a.log(email, "login", "Logged in on A")
+    worker_a.close()
+    time.sleep(0.1)
+    assert [a["description"] for a in worker_b.recent(email)] == ["Logged in on A"]
+
+    # B's own unwritten events are never replaced by an older read
+    worker_b.log(email, "chatbot", "hello from B")
+    assert [a["description"] for a in worker_b.recent(email)] == ["hello from B", "Logged in on A"]
+    worker_b.close()
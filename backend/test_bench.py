@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from bench import KERNELS, compare, load_baseline, run_benchmarks, save_baseline
+from schemes_service import get_fuzz
+
+
+def test_kernels_match_the_recorded_baseline_outputs():
+    results = run_benchmarks([1], repeat=1)
+    assert {case.split("[")[0] for case in results} == set(KERNELS)
+    if not get_fuzz():
+        results = {case: r for case, r in results.items() if not case.startswith("search_schemes_fuzzy")}
+    baseline = load_baseline()
+    assert set(results) <= set(baseline)
+    # Timings are machine-dependent; only changed outputs fail here
+    assert compare(results, baseline) == []
+
+
+def test_compare_flags_changed_outputs_and_slowdowns():
+    baseline = {"k[1x,en]": {"digest": "aaa", "us_median": 10.0}}
+    slower = {"k[1x,en]": {"digest": "aaa", "us_median": 30.0}}
+    assert compare(slower, baseline) == []
+    assert compare(slower, baseline, max_slowdown=2) == ["k[1x,en]: 3.00x slower than the baseline"]
+    assert slower["k[1x,en]"]["speedup"] == pytest.approx(1 / 3)
+    changed = {"k[1x,en]": {"digest": "bbb", "us_median": 5.0}}
+    assert compare(changed, baseline) == ["k[1x,en]: output changed (aaa -> bbb)"]
+
+
+def test_save_merges_a_subset_into_the_baseline(tmp_path):
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"meta": {}, "results": {
+        "a[1x,en]": {"digest": "aaa", "us_median": 10.0},
+        "b[1x,en]": {"digest": "bbb", "us_median": 20.0},
+    }}))
+    subset = {"b[1x,en]": {"digest": "bbb", "us_median": 5.0}}
+    compare(subset, load_baseline(path))
+    save_baseline(subset, {"repeat": 1}, path)
+    assert load_baseline(path) == {
+        "a[1x,en]": {"digest": "aaa", "us_median": 10.0},
+        "b[1x,en]": {"digest": "bbb", "us_median": 5.0},
+    }
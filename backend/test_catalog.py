@@ -0,0 +1,128 @@
+import gzip
+import json
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.testclient import TestClient
+
+from catalog import CatalogCache, file_generation
+
+
+def _client(catalog):
+    app = FastAPI()
+    app.add_middleware(GZipMiddleware, minimum_size=500)
+
+    @app.get("/catalog")
+    def get_catalog(request: Request):
+        return catalog.response(request)
+
+    return TestClient(app)
+
+
+def test_encodes_once_per_generation_and_serves_304(tmp_path):
+    path = tmp_path / "items.json"
+    path.write_text(json.dumps([{"id": i, "name": f"item {i}"} for i in range(100)]))
+    builds = []
+
+    def build():
+        builds.append(1)
+        return json.loads(path.read_text())
+
+    client = _client(CatalogCache("test", build=build, generation=file_generation(path)))
+    first = client.get("/catalog")
+    assert first.status_code == 200
+    assert first.headers["content-encoding"] == "gzip"
+    assert len(first.json()) == 100
+    etag = first.headers["etag"]
+
+    assert client.get("/catalog").headers["etag"] == etag
+    assert len(builds) == 1
+
+    not_modified = client.get("/catalog", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    path.write_text(json.dumps([{"id": 1}]))
+    changed = client.get("/catalog", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json() == [{"id": 1}]
+    assert changed.headers["etag"] != etag
+    assert len(builds) == 2
+
+
+def test_identity_and_precompressed_variants_match():
+    payload = {"rows": ["x" * 50] * 40}
+    catalog = CatalogCache("test_variants", build=lambda: payload)
+    client = _client(catalog)
+
+    plain = client.get("/catalog", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.json() == payload
+
+    encoded = catalog.current()
+    assert gzip.decompress(encoded.gzip) == encoded.identity
+
+    # Each variant has its own validator, and only that variant's tag revalidates it
+    zipped = client.get("/catalog", headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["etag"] != plain.headers["etag"]
+    assert client.get("/catalog", headers={"Accept-Encoding": "gzip", "If-None-Match": zipped.headers["etag"]}).status_code == 304
+    assert client.get("/catalog", headers={"Accept-Encoding": "identity", "If-None-Match": zipped.headers["etag"]}).status_code == 200
+
+
+def test_invalidate_forces_rebuild():
+    state = {"n": 0}
+
+    def build():
+        state["n"] += 1
+        return {"n": state["n"]}
+
+    catalog = CatalogCache("test_invalidate", build=build)
+    client = _client(catalog)
+    assert client.get("/catalog").json() == {"n": 1}
+    assert client.get("/catalog").json() == {"n": 1}
+    catalog.invalidate()
+    assert client.get("/catalog").json() == {"n": 2}
+
+
+def _paged_client(catalog):
+    app = FastAPI()
+
+    @app.get("/items")
+    def items(request: Request, limit: int = None, cursor: str = None, fields: str = None, view: str = None):
+        return catalog.page(request, limit, cursor, fields, view)
+
+    return TestClient(app)
+
+
+def test_cursor_pages_cover_catalog_in_stable_order_including_duplicate_ids():
+    rows = [{"id": f"s{i % 7}", "title": f"t{i}", "description": "long" * 20} for i in range(15)]
+    client = _paged_client(CatalogCache("test_pages", build=lambda: rows, summary_fields=("id", "title")))
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 4, "view": "summary"}
+        if cursor:
+            params["cursor"] = cursor
+        resp = client.get("/items", params=params)
+        assert resp.headers["x-total-count"] == "15"
+        page = resp.json()
+        assert all(set(row) == {"id", "title"} for row in page)
+        seen.extend(row["title"] for row in page)
+        cursor = resp.headers.get("x-next-cursor")
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(r["title"] for r in rows)
+    assert len(seen) == 15
+    ids = [row["id"] for row in client.get("/items", params={"limit": 100, "fields": "id"}).json()]
+    assert ids == sorted(ids)
+
+
+def test_page_etag_and_invalid_cursor():
+    client = _paged_client(CatalogCache("test_page_etag", build=lambda: [{"id": "a"}, {"id": "b"}]))
+    first = client.get("/items", params={"limit": 1})
+    assert first.json() == [{"id": "a"}]
+    assert first.headers["etag"].startswith('W/"')  # the body may be gzipped after the tag is chosen
+    again = client.get("/items", params={"limit": 1}, headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert client.get("/items", params={"cursor": "not-a-cursor"}).status_code == 400
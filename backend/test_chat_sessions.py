@@ -0,0 +1,87 @@
+import json
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import persistence
+from chat_sessions import SessionStore
+from chatbot_service import follow_up_kind, router
+
+
+def _client():
+    persistence.init_db()
+    app = FastAPI()
+    app.include_router(router, prefix="/chatbot")
+    return TestClient(app)
+
+
+def test_store_is_bounded_and_expires_idle_sessions():
+    store = SessionStore(max_sessions=2, ttl=0.05)
+    a = store.get()
+    b = store.get()
+    assert store.get(a.id) is a  # a is now the most recently used
+    store.get()
+    assert len(store) == 2
+    assert store.get(b.id).id != b.id  # b was evicted; its id is not reused
+    time.sleep(0.06)
+    store.get()
+    assert len(store) == 1
+
+
+def test_unknown_session_ids_get_a_fresh_one():
+    store = SessionStore(max_sessions=2)
+    assert store.get("bad id!").id != "bad id!"
+    # Well-formed but unknown ids are not adopted either (no session fixation)
+    assert store.get("abcdefgh1234").id != "abcdefgh1234"
+    assert len(store) == 2
+
+
+def test_follow_up_detection():
+    assert follow_up_kind("how to apply?") == "apply"
+    assert follow_up_kind("am I eligible for it") == "eligibility"
+    assert follow_up_kind("कितना मिलेगा?") == "benefits"
+    assert follow_up_kind("how to apply for mudra loan") is None
+    assert follow_up_kind("what is pm kisan") is None
+
+
+def test_websocket_streams_chunks_and_resolves_follow_ups():
+    with _client().websocket_connect("/chatbot/ws") as ws:
+        session_id = ws.receive_json()["session_id"]
+
+        ws.send_json({"query": "kisan samman"})
+        start = ws.receive_json()
+        assert start == {"type": "start", "session_id": session_id, "intent": "pmkisan"}
+        chunks = []
+        while True:
+            message = ws.receive_json()
+            if message["type"] == "end":
+                break
+            chunks.append(message["text"])
+        assert len(chunks) > 1
+        assert "PM Kisan" in "".join(chunks)
+
+        ws.send_text("how to apply?")
+        assert ws.receive_json()["intent"] == "followup_apply"
+        text = ws.receive_json()["text"]
+        assert "pmkisan.gov.in" in text
+        end = ws.receive_json()
+        assert end["type"] == "end"
+        assert end["recent_intents"] == ["pmkisan", "followup_apply"]
+
+        ws.send_json({"query": ""})
+        assert ws.receive_json()["type"] == "error"
+
+
+def test_sse_stream_shares_sessions():
+    client = _client()
+    first = client.get("/chatbot/stream", params={"q": "loan for small shop", "session_id": "sse-session-1"})
+    assert first.headers["content-type"].startswith("text/event-stream")
+    assert first.text.startswith("event: start\n")
+    assert "event: end" in first.text
+    start = json.loads(first.text.split("\n")[1].removeprefix("data: "))
+    assert start["session_id"] != "sse-session-1"
+
+    follow_up = client.get("/chatbot/stream", params={"q": "benefits?", "session_id": start["session_id"]})
+    assert '"intent": "followup_benefits"' in follow_up.text
+    assert "Mudra" in follow_up.text
@@ -0,0 +1,89 @@
+import json
+import threading
+import time
+
+import data_files
+from catalog import CatalogCache
+from data_files import DataFile, data_file, watcher
+
+
+def _write(path, rows):
+    path.write_text(json.dumps(rows))
+
+
+def test_reload_prepares_indexes_before_swapping(tmp_path):
+    path = tmp_path / "rows.json"
+    _write(path, [{"id": "a"}])
+    rows = DataFile(path)
+    catalog = CatalogCache("test_reload", build=lambda: rows.value, generation=rows.generation)
+    rows.add_catalog(catalog)
+    builds = []
+
+    def names():
+        encoded = catalog.current()
+        return encoded.derived("names", lambda: builds.append(1) or [r["id"] for r in encoded.payload])
+
+    catalog.warm_with("names", names)
+    assert names() == ["a"]
+
+    seen_by_others = []
+
+    def check_isolation():
+        # Another thread keeps seeing the published data while the reload is prepared
+        reader = threading.Thread(target=lambda: seen_by_others.append((rows.value, catalog.current().payload)))
+        reader.start()
+        reader.join()
+
+    rows.on_reload(check_isolation)
+    _write(path, [{"id": "a"}, {"id": "b"}])
+    assert rows.reload()
+
+    assert seen_by_others == [([{"id": "a"}], [{"id": "a"}])]
+    assert catalog.current().payload == [{"id": "a"}, {"id": "b"}]
+    # The index in use was rebuilt by the reload, not by the next reader
+    assert len(builds) == 2
+    assert names() == ["a", "b"]
+    assert len(builds) == 2
+
+
+def test_invalid_json_keeps_previous_snapshot(tmp_path):
+    path = tmp_path / "rows.json"
+    _write(path, {"version": 1})
+    rows = DataFile(path)
+    assert rows.value == {"version": 1}
+
+    path.write_text("{not json")
+    assert not rows.reload()
+    assert rows.value == {"version": 1}
+
+    _write(path, {"version": 2})
+    assert rows.reload()
+    assert rows.value == {"version": 2}
+
+
+def test_missing_file_uses_default(tmp_path):
+    rows = DataFile(tmp_path / "absent.json", default=[])
+    assert rows.value == []
+    assert rows.generation() is None
+
+
+def test_watcher_picks_up_changes_off_the_request_path(tmp_path, monkeypatch):
+    path = tmp_path / "watched.json"
+    _write(path, {"version": 1})
+    rows = data_file(path)
+    monkeypatch.setattr(data_files, "DATA_WATCH_INTERVAL", 0.05)
+    try:
+        watcher.start("poll")
+        assert watcher.running
+        snapshot = rows.snapshot()
+        _write(path, {"version": 2, "note": "changed"})
+        # Readers never stat or reload themselves while the watcher runs
+        assert rows.snapshot() is snapshot
+
+        deadline = time.monotonic() + 5
+        while rows.value["version"] != 2 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert rows.value == {"version": 2, "note": "changed"}
+    finally:
+        watcher.stop()
+        data_files.FILES.pop(rows.path, None)
@@ -0,0 +1,70 @@
+import json
+import os
+
+from catalog import CatalogCache, dumps
+from data_snapshot import compile_snapshot, load, open_snapshot, snapshot_path
+
+ROWS = [
+    {"id": "b", "title": "Second", "keywords": ["farmer", "किसान"], "count": -3, "criteria": {"min_age": 18}},
+    {"id": "a", "title": "First", "score": 1.5, "active": True, "note": None, "keywords": []},
+    {"id": "a", "title": "First again", "mixed": ["x", 1]},
+]
+
+
+def _signature(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def test_records_round_trip_and_serialize_as_dicts(tmp_path):
+    path = tmp_path / "rows.snap"
+    assert compile_snapshot(ROWS, (1, 2), path)
+    table = open_snapshot(path, (1, 2)).value()
+
+    assert [dict(row) for row in table] == ROWS
+    assert table[0]["keywords"] == ["farmer", "किसान"]
+    assert table[1].get("missing", "default") == "default"
+    assert "note" in table[1] and "note" not in table[0]
+    assert json.loads(dumps({"rows": table})) == {"rows": ROWS}
+    # Written from the mapped bytes, identical to serializing the records as dicts
+    dicts = [dict(row) for row in table]
+    assert dumps({"rows": table, "total": 3}) == dumps({"rows": dicts, "total": 3})
+    assert dumps(table[0]) == dumps(dicts[0])
+    # Shells keep no decoded values
+    assert not hasattr(table[0], "__dict__") and table[0].__slots__ == ("_table", "_row")
+    # Prebuilt (id, row) order matches what the page index would sort to
+    assert list(table.id_order) == [1, 2, 0]
+    assert [row["title"] for row in CatalogCache("snap", build=lambda: table).current().index(lambda p: p).rows] == [
+        "First", "First again", "Second"
+    ]
+
+
+def test_object_of_lists_and_unsupported_shapes(tmp_path):
+    keywords = {"high_risk": [{"keyword": "otp", "risk_score": 85}], "low_risk": []}
+    assert compile_snapshot(keywords, None, tmp_path / "keywords.snap")
+    value = open_snapshot(tmp_path / "keywords.snap").value()
+    assert {name: [dict(r) for r in rows] for name, rows in value.items()} == keywords
+
+    assert not compile_snapshot({"version": 1}, None, tmp_path / "other.snap")
+    assert not compile_snapshot([1, 2], None, tmp_path / "other.snap")
+
+
+def test_load_recompiles_when_the_json_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr("data_snapshot.DATA_SNAPSHOT_DIR", tmp_path / "snapshots")
+    source = tmp_path / "catalog.json"
+    source.write_text(json.dumps(ROWS))
+    first = load(source, _signature(source))
+    assert len(first) == 3
+    assert open_snapshot(snapshot_path(source), _signature(source)) is not None
+
+    source.write_text(json.dumps(ROWS[:1]))
+    assert open_snapshot(snapshot_path(source), _signature(source)) is None
+    second = load(source, _signature(source))
+    assert [dict(row) for row in second] == ROWS[:1]
+    # Rows from the previous mapping stay readable after the file was replaced
+    assert first[2]["title"] == "First again"
+
+    # Non-tabular JSON is returned as is
+    plain = tmp_path / "settings.json"
+    plain.write_text(json.dumps({"version": 2}))
+    assert load(plain, _signature(plain)) == {"version": 2}
@@ -0,0 +1,67 @@
+import os
+import time
+
+from eligibility import EligibilityIndex, parse_criteria
+
+SCHEMES = [
+    {"id": "kisan", "state": "central", "category": "agriculture",
+     "eligibility": "Small and marginal landholding farmers.", "title": "Kisan support"},
+    {"id": "bihar_girls", "state": "bihar", "category": "girl_child",
+     "eligibility": "Girls in Bihar below 18 years.", "title": "Kanya scheme"},
+    {"id": "pension", "state": "central", "category": "pension",
+     "eligibility": "Indian citizens aged 60 years or above.", "title": "Old age pension"},
+    {"id": "loan", "state": "central", "category": "education",
+     "eligibility": "Students with family income below ₹4.5 lakh.", "title": "Education loan"},
+    {"id": "annotated", "state": "central", "category": "business",
+     "eligibility": "See portal.", "title": "Annotated", "criteria": {"occupations": ["artisan"]}},
+]
+
+
+def _ids(index, ranked):
+    return [index.rows[pos]["id"] for pos, _, _ in ranked]
+
+
+def test_parse_criteria():
+    assert parse_criteria(SCHEMES[0]) == {"occupations": ["farmer"], "requires_land": True, "max_land_acres": 4.942}
+    assert parse_criteria(SCHEMES[1]) == {"states": ["bihar"], "genders": ["female"], "max_age": 18}
+    assert parse_criteria(SCHEMES[2]) == {"min_age": 60}
+    assert parse_criteria(SCHEMES[3])["max_income"] == 450_000
+    assert parse_criteria(SCHEMES[4]) == {"occupations": ["artisan"]}
+
+
+def test_match_filters_and_ranks_by_targeted_criteria():
+    index = EligibilityIndex(SCHEMES)
+    farmer = {"state": "Bihar", "occupation": "Farmer", "gender": "male", "age": 40, "land_acres": 2.0}
+    assert _ids(index, index.match(farmer)) == ["kisan"]
+    girl = {"state": "bihar", "gender": "female", "age": 15, "occupation": "student", "annual_income": 200_000}
+    ranked = index.match(girl)
+    assert _ids(index, ranked)[0] == "bihar_girls"
+    assert set(_ids(index, ranked)) == {"bihar_girls", "loan"}
+    # Unknown attributes do not exclude anything
+    assert len(index.match({})) == len(SCHEMES)
+
+
+def test_land_and_income_thresholds():
+    index = EligibilityIndex(SCHEMES)
+    assert "kisan" not in _ids(index, index.match({"land_acres": 0}))
+    assert "kisan" not in _ids(index, index.match({"land_acres": 10}))
+    assert "loan" not in _ids(index, index.match({"annual_income": 500_000}))
+    assert "loan" in _ids(index, index.match({"annual_income": 450_000}))
+
+
+def test_batch_matching_scales():
+    schemes = [
+        {"id": f"s{i}", "state": ["central", "bihar", "up"][i % 3], "category": "x",
+         "eligibility": f"Farmers aged {18 + i % 20}-{60 + i % 20} years with income below ₹{1 + i % 5} lakh.",
+         "title": "t"}
+        for i in range(3000)
+    ]
+    index = EligibilityIndex(schemes)
+    profiles = [{"state": "up", "occupation": "farmer", "age": 20 + i % 50, "annual_income": 50_000 * (i % 10)}
+                for i in range(2000)]
+    started = time.perf_counter()
+    total = sum(len(index.match(p, 20)) for p in profiles)
+    assert total > 0
+    # Wall-clock budgets only hold on the reference host (see test_loadtest.py)
+    if os.getenv("LOADTEST_ENFORCE_SLOS") == "1":
+        assert time.perf_counter() - started < 2
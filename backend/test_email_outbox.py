@@ -0,0 +1,92 @@
+import asyncio
+import json
+import socket
+
+import pytest
+
+from email_outbox import EmailOutbox
+from email_service import build_otp_message
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+
+class _Sink:
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        self.sessions.add(id(session))
+        return "250 OK"
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_outbox_reuses_pooled_connections():
+    sink = _Sink()
+    controller = aiosmtpd_controller.Controller(sink, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    try:
+        async def run():
+            outbox = EmailOutbox("127.0.0.1", controller.port, start_tls=False, pool_size=2)
+            for i in range(10):
+                outbox.enqueue(build_otp_message(f"user{i}@example.com", "123456"))
+            await outbox.stop(drain=True)
+            return outbox.stats()
+
+        stats = asyncio.run(run())
+    finally:
+        controller.stop()
+
+    assert stats["sent"] == 10
+    assert len(sink.messages) == 10
+    # Ten messages over at most two SMTP sessions
+    assert stats["connections_opened"] <= 2
+    assert len(sink.sessions) <= 2
+    assert stats["latency_count"] == 10
+
+
+def test_outbox_dead_letters_after_retries(tmp_path):
+    dead_letter = tmp_path / "dead.jsonl"
+
+    async def run():
+        outbox = EmailOutbox(
+            "127.0.0.1", _free_port(), start_tls=False, pool_size=1,
+            max_retries=2, retry_backoff=0.01, dead_letter_path=str(dead_letter), timeout=1,
+        )
+        outbox.enqueue(build_otp_message("user@example.com", "654321"))
+        await outbox.stop(drain=True)
+        return outbox.stats()
+
+    stats = asyncio.run(run())
+    assert stats["retries"] == 2
+    assert stats["dead_lettered"] == 1
+    entry = json.loads(dead_letter.read_text().strip())
+    assert entry["to"] == "user@example.com"
+    assert "654321" not in dead_letter.read_text()
+
+
+def test_stop_gives_up_after_timeout_and_dead_letters_the_rest(tmp_path):
+    dead_letter = tmp_path / "dead.jsonl"
+
+    async def run():
+        outbox = EmailOutbox(
+            "127.0.0.1", _free_port(), start_tls=False, pool_size=1,
+            max_retries=5, retry_backoff=10, dead_letter_path=str(dead_letter), timeout=1,
+        )
+        for i in range(3):
+            outbox.enqueue(build_otp_message(f"user{i}@example.com", "111111"))
+        await asyncio.wait_for(outbox.stop(drain=True, timeout=0.3), 5)
+        return outbox
+
+    outbox = asyncio.run(run())
+    assert not outbox.running
+    # The message being retried is cancelled mid-backoff; it and the two still queued are dead-lettered
+    assert sorted(json.loads(line)["to"] for line in dead_letter.read_text().splitlines()) == [
+        "user0@example.com", "user1@example.com", "user2@example.com",
+    ]
@@ -0,0 +1,72 @@
+import time
+
+from facet_index import FacetIndex
+
+ROWS = [
+    {"id": "a", "state": "Bihar", "category": "agriculture", "keywords": ["farmer", "loan"], "title": "Kisan credit"},
+    {"id": "b", "state": "central", "category": "agriculture", "keywords": ["farmer"], "title": "PM Kisan"},
+    {"id": "c", "state": "central", "category": "pension", "keywords": ["loan"], "title": "Atal pension"},
+    {"id": "d", "state": "UP", "category": "education", "keywords": ["girl"], "title": "Scholarship"},
+]
+
+
+def _index(rows=ROWS):
+    return FacetIndex(
+        rows,
+        facets={
+            "state": lambda r: [r["state"]],
+            "category": lambda r: [r["category"]],
+            "keyword": lambda r: r["keywords"],
+        },
+        text=lambda r: r["title"],
+    )
+
+
+def _ids(index, result):
+    return [index.rows[pos]["id"] for pos in result.positions()]
+
+
+def test_or_within_facet_and_across_facets():
+    index = _index()
+    result = index.search(filters={"state": ["bihar", "Central"], "category": ["agriculture"]})
+    assert _ids(index, result) == ["a", "b"]
+    assert result.total == 2
+
+
+def test_keyword_all_mode_and_text_prefix():
+    index = _index()
+    assert _ids(index, index.search(filters={"keyword": ["farmer", "loan"]}, modes={"keyword": "all"})) == ["a"]
+    assert _ids(index, index.search(query="kis")) == ["a", "b"]
+    assert _ids(index, index.search(query="kisan credit")) == ["a"]
+    assert index.search(query="nomatch").total == 0
+
+
+def test_facet_counts_ignore_own_selection():
+    index = _index()
+    result = index.search(filters={"state": ["central"]})
+    # state counts are computed without the state filter...
+    assert result.facets["state"] == {"central": 2, "Bihar": 1, "UP": 1}
+    # ...other facets are counted within it
+    assert result.facets["category"] == {"agriculture": 1, "pension": 1}
+
+
+def test_positions_paging():
+    index = _index()
+    result = index.search()
+    assert result.positions(0, 2) == [0, 1]
+    assert result.positions(2) == [2, 3]
+
+
+def test_counts_stay_fast_for_large_catalogs():
+    rows = [
+        {"id": f"s{i}", "state": f"state{i % 36}", "category": f"cat{i % 25}",
+         "keywords": [f"kw{i % 300}", f"kw{(i * 7) % 300}"], "title": f"scheme {i} yojana"}
+        for i in range(20_000)
+    ]
+    index = _index(rows)
+    started = time.perf_counter()
+    result = index.search(filters={"state": ["state1", "state2"], "keyword": ["kw3"]}, query="yojana")
+    assert time.perf_counter() - started < 0.5
+    assert result.total == sum(
+        1 for r in rows if r["state"] in ("state1", "state2") and "kw3" in r["keywords"]
+    )
@@ -0,0 +1,80 @@
+import gzip
+import http.client
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+FRONTEND_DIR = Path(__file__).resolve().parent.parent / "frontend"
+sys.path.insert(0, str(FRONTEND_DIR))
+
+from build import FINGERPRINTED, build  # noqa: E402
+from server import IMMUTABLE, make_server  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def site(tmp_path_factory):
+    dist = tmp_path_factory.mktemp("dist")
+    manifest = build(dist=dist)
+    server = make_server(port=0, prod=True, directory=dist)
+    server.RequestHandlerClass.log_message = lambda *args: None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield dist, manifest, server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def _get(port, path, **headers):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request("GET", path, headers=headers)
+    response = conn.getresponse()
+    return response, response.read()
+
+
+def test_build_fingerprints_assets_and_generates_the_precache(site):
+    dist, manifest, _ = site
+    style = manifest["assets"]["assets/css/style.css"]
+    assert FINGERPRINTED.search(style)
+    assert f'href="{style}"' in (dist / "index.html").read_text(encoding="utf-8")
+    assert 'href="assets/css/style.css"' not in (dist / "index.html").read_text(encoding="utf-8")
+    worker = (dist / "sw.js").read_text(encoding="utf-8")
+    assert f"ruralassist-{manifest['version']}" in worker and f'"/{style}"' in worker
+    assert "ruralassist-chatbot-v6" not in worker
+    # The same sources always build the same names
+    assert build(dist=dist.parent / "again")["version"] == manifest["version"]
+
+
+def test_assets_are_immutable_compressed_and_revalidated(site):
+    dist, manifest, port = site
+    style = "/" + manifest["assets"]["assets/css/style.css"]
+    response, body = _get(port, style, **{"Accept-Encoding": "gzip, br;q=0"})
+    assert response.status == 200
+    assert response.getheader("Cache-Control") == IMMUTABLE
+    assert response.getheader("Content-Encoding") == "gzip"
+    assert gzip.decompress(body) == (dist / style.lstrip("/")).read_bytes()
+    etag = response.getheader("ETag")
+    again, body = _get(port, style, **{"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert again.status == 304 and body == b""
+
+    page, _ = _get(port, "/index.html")
+    assert page.getheader("Cache-Control") == "no-cache"
+    assert page.getheader("Content-Encoding") is None
+    assert _get(port, "/missing.js")[0].status == 404
+
+
+def test_byte_ranges(site):
+    dist, manifest, port = site
+    logo = manifest["assets"]["assets/images/logo.png"]
+    data = (dist / logo).read_bytes()
+    response, body = _get(port, "/" + logo, Range="bytes=10-19")
+    assert response.status == 206 and body == data[10:20]
+    assert response.getheader("Content-Range") == f"bytes 10-19/{len(data)}"
+    assert _get(port, "/" + logo, Range="bytes=-5")[1] == data[-5:]
+    assert _get(port, "/" + logo, Range=f"bytes={len(data)}-")[0].status == 416
+    etag = response.getheader("ETag")
+    assert _get(port, "/" + logo, Range="bytes=10-19", **{"If-Range": etag})[0].status == 206
+    # If-Range uses strong comparison: a weak or stale validator gets the whole file
+    weak, body = _get(port, "/" + logo, Range="bytes=10-19", **{"If-Range": "W/" + etag})
+    assert weak.status == 200 and body == data
+    assert _get(port, "/" + logo, Range="bytes=10-19", **{"If-Range": '"stale"'})[0].status == 200
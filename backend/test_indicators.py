@@ -0,0 +1,117 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+import indicators
+import main
+import models
+import persistence
+import profiling
+import rate_limit
+from database import SessionLocal
+from indicators import BloomFilter, Indicator
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    persistence.init_db()
+    with SessionLocal() as db:
+        db.execute(delete(models.ScamIndicator))
+        db.execute(delete(models.ScamIndicatorReporter))
+        db.commit()
+    seed_path = indicators.SEED_FILE.path
+    indicators.SEED_FILE.repoint(tmp_path / "scam_indicators.json")
+    (tmp_path / "scam_indicators.json").write_text(json.dumps({
+        "blocked": {"domain": ["evil-kyc.xyz"], "upi": ["Lucky.Draw@okaxis"]},
+        "allowed": {"domain": ["gov.in"], "phone": ["+91 99999 00000"]},
+    }), encoding="utf-8")
+    monkeypatch.setattr(rate_limit, "_LIMITER", rate_limit.InMemoryRateLimiter())
+    fresh = indicators.IndicatorStore(capacity=100)
+    monkeypatch.setattr(indicators, "store", fresh)
+    yield fresh
+    indicators.SEED_FILE.repoint(seed_path)
+
+
+def test_extract_normalises_and_skips_emails_and_allowlisted(store):
+    text = (
+        "Call +91 98765-43210 or 09123456780 (or 9999900000), pay refund.desk@YBL. "
+        "Login at HTTPS://www.SBI-kyc.top:8080/x or www.fake-bank.in, see https://uidai.gov.in, "
+        "mail a.b@gmail.com, e.g. read lottery[.]xyz"
+    )
+    assert indicators.extract(text) == [
+        Indicator("phone", "+919876543210"),
+        Indicator("phone", "+919123456780"),
+        Indicator("upi", "refund.desk@ybl"),
+        Indicator("domain", "sbi-kyc.top"),
+        Indicator("domain", "fake-bank.in"),
+        Indicator("domain", "lottery.xyz"),
+    ]
+    assert indicators.extract("OTP 123456, pay Rs. 5000 by 5.30 pm") == []
+    assert indicators.lookup_keys(Indicator("domain", "a.b.evil.co.in")) == [
+        Indicator("domain", "a.b.evil.co.in"), Indicator("domain", "b.evil.co.in"), Indicator("domain", "evil.co.in"),
+    ]
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(10000, error_rate=0.01)
+    for i in range(10000):
+        bloom.add(f"phone:{i}")
+    assert all(f"phone:{i}" in bloom for i in range(10000))
+    false_positives = sum(f"domain:{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+    assert bloom.nbytes < 12500  # ~9.6 bits per key at 1%
+
+
+def test_only_seeded_or_confirmed_indicators_raise_scores(store, monkeypatch):
+    client = TestClient(main.app)
+    message = "Your parcel is held, call 9876543210 to release it"
+    phone = Indicator("phone", "+919876543210")
+    body = client.post("/scam/analyze", json={"description": message}).json()
+    assert body["indicators"] == [{"kind": "phone", "value": "+919876543210", "known": False, "reports": 0}]
+    baseline = body["risk_score"]
+
+    # The same client reporting twice counts once
+    for _ in range(2):
+        client.post("/scam/report", json={"description": "Got a call from +91 98765 43210 about a parcel"})
+    assert store.lookup([phone])[phone]["report_count"] == 1
+    store.record([phone], reporter=indicators.reporter_id("someone@example.com", None))
+
+    # Reported by two people: mentioned, but the score is unchanged until a moderator confirms
+    body = client.post("/scam/analyze", json={"description": message}).json()
+    assert body["indicators"] == [{"kind": "phone", "value": "+919876543210", "known": False, "reports": 2}]
+    assert body["risk_score"] == baseline
+    assert "+919876543210 (2 reports)" in body["analysis_text"]
+
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "secret")
+    admin = {"X-Admin-Token": "secret"}
+    queue = client.get("/scam/indicators", headers=admin).json()
+    assert [(i["value"], i["report_count"]) for i in queue["indicators"]] == [("+919876543210", 2)]
+    assert client.post("/scam/indicators/confirm", json={"kind": "phone", "value": "98765 43210"}).status_code == 403
+    assert client.post("/scam/indicators/confirm", headers=admin,
+                       json={"kind": "phone", "value": "98765 43210"}).json()["confirmed"] is True
+    assert client.get("/scam/indicators", headers=admin).json()["count"] == 0
+
+    body = client.post("/scam/analyze", json={"description": message}).json()
+    assert body["indicators"] == [{"kind": "phone", "value": "+919876543210", "known": True, "reports": 2}]
+    assert body["risk_score"] == baseline + 40
+    assert "+919876543210" in body["analysis_text"]
+
+
+def test_seeded_indicators_match_subdomains_and_count_hits(store):
+    client = TestClient(main.app)
+    # A random subdomain and a UPI ID in different case
+    body = client.post("/scam/analyze", json={"description": "Pay at https://x7.evil-kyc.xyz or lucky.draw@okaxis"}).json()
+    assert [(i["value"], i["known"]) for i in body["indicators"]] == [
+        ("x7.evil-kyc.xyz", True), ("lucky.draw@okaxis", True),
+    ]
+    assert body["risk_level"] == "High"
+    hits = persistence.scam_indicator_stats([("domain", "evil-kyc.xyz")])[("domain", "evil-kyc.xyz")]
+    assert hits["seeded"] and hits["hit_count"] == 1
+
+
+def test_scam_reports_are_rate_limited(store):
+    client = TestClient(main.app)
+    codes = [client.post("/scam/report", json={"description": f"Fake KYC call {i}"}).status_code for i in range(6)]
+    assert codes == [200] * 5 + [429]
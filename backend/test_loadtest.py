@@ -0,0 +1,48 @@
+import asyncio
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+import loadtest
+from loadtest import MIX, check_slos, generate_catalogs, load_slos, run_in_process
+
+
+def test_synthetic_catalogs_scale_with_unique_ids(tmp_path):
+    sizes = generate_catalogs(tmp_path, 3)
+    schemes = json.loads((tmp_path / "schemes_db.json").read_text(encoding="utf-8"))
+    assert sizes["schemes_db.json"] == len(schemes)
+    shipped = json.loads(Path(loadtest.BASE_DIR, "schemes_db.json").read_text(encoding="utf-8"))
+    # Copies never collide with the shipped ids or with each other
+    assert len({s.get("id") for s in schemes}) == 3 * len({s.get("id") for s in shipped})
+    assert sizes == generate_catalogs(tmp_path / "again", 3)
+
+
+def test_slo_check_reports_each_breach():
+    report = {"endpoints": {
+        "faq_search": {"p95_ms": 30.0, "p99_ms": 80.0, "error_rate": 0.0},
+        "ocr_extract": {"p95_ms": 900.0, "p99_ms": 950.0, "error_rate": 0.1},
+    }}
+    slos = {"*": {"p95_ms": 100, "max_error_rate": 0.0}, "ocr_extract": {"p95_ms": 1000, "p99_ms": 900}}
+    assert check_slos(report, slos) == [
+        "ocr_extract: p99_ms 950.0 > 900",
+        "ocr_extract: error rate 10.00% > 0.00%",
+    ]
+
+
+# Latency SLOs depend on the machine; set LOADTEST_ENFORCE_SLOS=1 on the reference host to check them
+ENFORCE_SLOS = os.getenv("LOADTEST_ENFORCE_SLOS") == "1"
+
+
+@pytest.mark.parametrize("scale", [int(s) for s in os.getenv("LOADTEST_SCALES", "1").split(",")])
+def test_request_mix_meets_slos(scale):
+    report, _ = asyncio.run(run_in_process(scale, requests=150, concurrency=8, mix=MIX, warmup=20))
+    assert report["requests"] == 150
+    assert set(report["endpoints"]) <= set(MIX)
+    assert sum(e["count"] for e in report["endpoints"].values()) == 150
+    for stats in report["endpoints"].values():
+        assert stats["errors"] == 0, report
+        assert 0 <= stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"] <= stats["max_ms"]
+    if ENFORCE_SLOS:
+        assert check_slos(report, load_slos(os.path.join(os.path.dirname(__file__), "loadtest_slo.json"), scale)) == []
@@ -0,0 +1,49 @@
+from fastapi import FastAPI, APIRouter
+from fastapi.testclient import TestClient
+
+from metrics import Counter, Histogram, MetricsMiddleware, render_metrics
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("test_latency_seconds", "test", ("route",), buckets=(0.1, 1.0), register=False)
+    child = h.labels("/x")
+    for v in (0.05, 0.1, 0.5, 5.0):
+        child.observe(v)
+    lines = h.render().splitlines()
+    assert 'test_latency_seconds_bucket{route="/x",le="0.1"} 2' in lines
+    assert 'test_latency_seconds_bucket{route="/x",le="1"} 3' in lines
+    assert 'test_latency_seconds_bucket{route="/x",le="+Inf"} 4' in lines
+    assert 'test_latency_seconds_count{route="/x"} 4' in lines
+
+
+def test_counter_children_are_reused():
+    c = Counter("test_total", "test", ("kind",), register=False)
+    assert c.labels("a") is c.labels("a")
+    c.labels("a").inc()
+    c.labels("a").inc(2)
+    assert 'test_total{kind="a"} 3' in c.render()
+
+
+def test_middleware_labels_route_templates_and_exceptions():
+    app = FastAPI()
+    router = APIRouter()
+
+    @router.get("/items/{item_id}")
+    def item(item_id: str):
+        return {"id": item_id}
+
+    @router.get("/boom")
+    def boom():
+        raise ValueError("boom")
+
+    app.include_router(router, prefix="/metrics-test")
+    app.add_middleware(MetricsMiddleware)
+    client = TestClient(app, raise_server_exceptions=False)
+
+    client.get("/metrics-test/items/1")
+    client.get("/metrics-test/items/2")
+    client.get("/metrics-test/boom")
+
+    text = render_metrics()
+    assert 'ruralassist_http_requests_total{method="GET",route="/metrics-test/items/{item_id}",status="200"} 2' in text
+    assert 'ruralassist_http_exceptions_total{route="/metrics-test/boom",exception="ValueError"} 1' in text
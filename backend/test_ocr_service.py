@@ -0,0 +1,32 @@
+import threading
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+import main
+import ocr_service
+
+
+def test_timed_out_job_keeps_its_upload_until_it_finishes(monkeypatch):
+    seen, release = [], threading.Event()
+
+    def slow_ocr(file_path, is_pdf):
+        seen.append(file_path)
+        release.wait(10)
+        assert Path(file_path).exists()
+        return "text", {}
+
+    monkeypatch.setattr(ocr_service, "OCR_PROCESSES", 0)
+    monkeypatch.setattr(ocr_service, "OCR_TIMEOUT", 0.2)
+    monkeypatch.setattr(ocr_service, "run_ocr", slow_ocr)
+    with TestClient(main.app) as client:
+        response = client.post("/ocr/extract", files={"file": ("scan.png", b"not really a png")})
+        assert response.status_code == 504
+        assert Path(seen[0]).exists()
+        release.set()
+        for _ in range(100):
+            if not Path(seen[0]).exists():
+                break
+            time.sleep(0.05)
+    assert not Path(seen[0]).exists()
@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from otp_store import (
+    OTPStore,
+    InMemoryOTPStore,
+    SQLiteOTPStore,
+    VERIFY_OK,
+    VERIFY_EXPIRED,
+    VERIFY_INVALID,
+    VERIFY_LOCKED,
+)
+
+
+def _stores(tmp_path):
+    return [
+        InMemoryOTPStore(start_reaper=False),
+        SQLiteOTPStore(path=str(tmp_path / "otp.db"), start_reaper=False),
+    ]
+
+
+def test_backends_must_implement_the_interface():
+    class Partial(OTPStore):
+        def put(self, email, otp_hash, ttl_seconds):
+            pass
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_verify_flow(tmp_path):
+    for store in _stores(tmp_path):
+        store.put("a@example.com", "good", 60)
+        assert store.verify("a@example.com", "bad")[0] == VERIFY_INVALID
+        status, record = store.verify("a@example.com", "good")
+        assert status == VERIFY_OK
+        assert record["attempts"] == 1
+        assert store.verify("a@example.com", "good")[0] == VERIFY_EXPIRED
+
+
+def test_attempts_lock_out(tmp_path):
+    for store in _stores(tmp_path):
+        store.put("b@example.com", "good", 60)
+        assert store.verify("b@example.com", "x")[0] == VERIFY_INVALID
+        assert store.verify("b@example.com", "x")[0] == VERIFY_INVALID
+        assert store.verify("b@example.com", "x")[0] == VERIFY_LOCKED
+        assert store.verify("b@example.com", "good")[0] == VERIFY_EXPIRED
+
+
+def test_reaper_and_bound(tmp_path):
+    for store in _stores(tmp_path):
+        store.put("c@example.com", "h", -1)
+        store.put("d@example.com", "h", 60)
+        assert store.reap() == 1
+        assert store.active_count() == 1
+        assert store.stats()["expired"] == 1
+
+    store = InMemoryOTPStore(max_entries=2, start_reaper=False)
+    for i in range(5):
+        store.put(f"user{i}@example.com", "h", 60 + i)
+    assert store.active_count() == 2
+    assert store.get("user4@example.com") is not None
+
+
+def test_shared_between_instances(tmp_path):
+    path = str(tmp_path / "shared.db")
+    worker_a = SQLiteOTPStore(path=path, start_reaper=False)
+    worker_b = SQLiteOTPStore(path=path, start_reaper=False)
+    worker_a.put("e@example.com", "good", 60)
+    worker_a.mark_welcome("e@example.com")
+    assert worker_b.get("e@example.com")["created_at"] <= time.time()
+    status, record = worker_b.verify("e@example.com", "good")
+    assert status == VERIFY_OK and record["welcome"]
+
+
+def test_forked_workers_get_their_own_store():
+    import multiprocessing
+
+    import otp_store
+
+    parent = otp_store.get_otp_store()
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+
+    def child():
+        queue.put(otp_store.get_otp_store() is not parent)
+
+    process = ctx.Process(target=child)
+    process.start()
+    process.join(10)
+    assert queue.get(timeout=5) is True
+    assert otp_store.get_otp_store() is parent
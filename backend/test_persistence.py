@@ -0,0 +1,74 @@
+import json
+
+import persistence
+from import_json_db import run_import
+
+
+def test_profile_and_stat_deltas():
+    persistence.init_db()
+    persistence.set_profile_name("p@example.com", "Asha")
+    persistence.apply_stat_deltas({
+        "p@example.com": {"counts": {"ocr_scans": 2, "total_logins": 1}, "last_active": "2025-12-02T07:56:31"},
+    })
+    persistence.apply_stat_deltas({
+        "p@example.com": {"counts": {"ocr_scans": 1}, "last_active": "2025-12-02T08:00:00"},
+    })
+    profile = persistence.get_profile("p@example.com")
+    assert profile["name"] == "Asha"
+    assert profile["stats"]["ocr_scans"] == 3
+    assert profile["stats"]["last_active"] == "2025-12-02T08:00:00"
+
+
+def test_activity_store_recent_is_ordered():
+    persistence.init_db()
+    store = persistence.ActivityStore()
+    store.append([
+        {"email": "q@example.com", "type": "chatbot", "description": f"m{i}", "timestamp": f"2025-12-02T07:00:{i:02d}"}
+        for i in range(20)
+    ])
+    recent = store.recent("q@example.com", 5)
+    assert [e["description"] for e in recent] == ["m15", "m16", "m17", "m18", "m19"]
+
+
+def test_faq_votes_are_atomic_counters():
+    persistence.init_db()
+    assert persistence.record_faq_vote("faq_x", "helpful", base_helpful=4) == (5, 0)
+    assert persistence.record_faq_vote("faq_x", "unhelpful") == (5, 1)
+    assert persistence.load_faq_votes()["faq_x"][:2] == (5, 1)
+
+
+def test_import_json_db(tmp_path):
+    (tmp_path / "profiles_db.json").write_text(json.dumps({
+        "r@example.com": {"name": "Ravi", "stats": {"total_logins": 2, "last_active": "2025-12-02T07:56:31"}},
+    }))
+    (tmp_path / "activity_db.json").write_text(json.dumps({
+        "r@example.com": [{"type": "login", "description": "Logged in via OTP", "timestamp": "2025-12-02T07:54:37"}],
+        "old@example.com": [{"type": "ocr", "description": "Scanned before timestamps were kept"}],
+    }))
+    (tmp_path / "faq_db.json").write_text(json.dumps([{"id": "faq_imp", "helpful_count": 3, "unhelpful_count": 1}]))
+    (tmp_path / "scam_reports_db.json").write_text(json.dumps({"reports": [
+        {"report_id": "SCAM-1", "description": "fake kyc", "created_at": "2025-12-09T00:00:00"},
+        {"report_id": "SCAM-1", "description": "fake kyc again", "created_at": "2025-12-09T00:00:00"},
+        {"report_id": "SCAM-OLD", "description": "no date"},
+    ]}))
+
+    counts = run_import(tmp_path)
+    assert counts == {"profiles": 1, "activity_events": 2, "faq_votes": 1, "scam_reports": 3}
+    assert persistence.get_profile("r@example.com")["stats"]["total_logins"] == 2
+    assert persistence.ActivityStore().recent("r@example.com", 10)[0]["type"] == "login"
+    # Legacy rows without a timestamp are stamped with the import time
+    assert persistence.ActivityStore().recent("old@example.com", 10)[0]["timestamp"]
+    # Re-running is a no-op
+    assert run_import(tmp_path) == {"profiles": 0, "activity_events": 0, "faq_votes": 0, "scam_reports": 0}
+
+
+def test_profile_attributes_bump_version_and_stream():
+    persistence.init_db()
+    persistence.set_profile_attributes("attr@example.com", {"state": "bihar", "age": 30})
+    same = persistence.set_profile_attributes("attr@example.com", {"state": "bihar"})
+    assert same["attributes_version"] == 1
+    changed = persistence.set_profile_attributes("attr@example.com", {"age": 31, "unknown": 1})
+    assert changed["attributes_version"] == 2
+    assert changed["attributes"]["age"] == 31
+    streamed = {email: (attrs, v) for email, attrs, v in persistence.iter_profile_attributes(batch_size=1)}
+    assert streamed["attr@example.com"] == (changed["attributes"], 2)
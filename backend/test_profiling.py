@@ -0,0 +1,88 @@
+import time
+
+from fastapi import FastAPI, APIRouter
+from fastapi.testclient import TestClient
+
+import profiling
+from profiling import ProfilingMiddleware, SamplingProfiler, TimedRoute, stage
+
+
+def _app():
+    app = FastAPI()
+    router = APIRouter(route_class=TimedRoute)
+
+    @router.get("/sync/{item_id}")
+    def sync_item(item_id: str):
+        with stage("json_load"):
+            time.sleep(0.002)
+        return {"id": item_id}
+
+    @router.get("/async")
+    async def async_item():
+        with stage("scoring"):
+            pass
+        return {"ok": True}
+
+    app.include_router(router, prefix="/t")
+    app.include_router(profiling.router, prefix="/admin/profiling")
+    app.add_middleware(ProfilingMiddleware)
+    return app
+
+
+def test_stage_is_noop_outside_request():
+    with stage("json_load") as s:
+        pass
+    assert s is None
+
+
+def test_server_timing_header_lists_stages():
+    client = TestClient(_app())
+    for path in ("/t/sync/1", "/t/async"):
+        resp = client.get(path)
+        assert resp.status_code == 200
+        header = resp.headers["server-timing"]
+        names = [part.split(";")[0] for part in header.split(", ")]
+        assert {"endpoint", "serialize", "total"} <= set(names)
+    assert "json_load;dur=" in client.get("/t/sync/2").headers["server-timing"]
+    # Path params still resolve through the wrapped endpoint
+    assert client.get("/t/sync/abc").json() == {"id": "abc"}
+
+
+def test_admin_endpoints_require_token(monkeypatch):
+    client = TestClient(_app())
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", None)
+    assert client.get("/admin/profiling/status").status_code == 404
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "secret")
+    assert client.get("/admin/profiling/status").status_code == 403
+    assert client.get("/admin/profiling/status", headers={"X-Admin-Token": "secret"}).status_code == 200
+
+
+def test_sampler_collects_collapsed_stacks():
+    profiler = SamplingProfiler()
+    profiler.start(seconds=5, interval_ms=1)
+
+    def busy_worker_function():
+        end = time.monotonic() + 0.1
+        while time.monotonic() < end:
+            sum(range(100))
+
+    busy_worker_function()
+    profiler.stop()
+    assert not profiler.running
+    assert profiler.samples > 0
+    lines = profiler.collapsed().splitlines()
+    assert any("test_profiling.py:busy_worker_function" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) >= 1 and ";" in stack
+
+
+def test_request_rate_mode_only_samples_while_sampled_requests_run():
+    profiler = SamplingProfiler()
+    profiler.start(seconds=5, interval_ms=1, request_rate=1.0)
+    time.sleep(0.05)
+    assert profiler.samples == 0
+    assert profiler.request_started()
+    time.sleep(0.05)
+    profiler.request_finished()
+    profiler.stop()
+    assert profiler.samples > 0
@@ -0,0 +1,33 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import rate_limit
+from rate_limit import InMemoryRateLimiter, SQLiteRateLimiter
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_sliding_window_per_key(backend, tmp_path):
+    limiter = InMemoryRateLimiter() if backend == "memory" else SQLiteRateLimiter(str(tmp_path / "rl.db"))
+    assert [limiter.hit("send-otp:1.2.3.4", 3, 10) for _ in range(4)] == [True, True, True, False]
+    assert limiter.hit("send-otp:5.6.7.8", 3, 10)
+    time.sleep(0.06)
+    assert limiter.hit("send-otp:1.2.3.4", 3, 0.05)
+
+
+def test_sqlite_limit_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "rl.db")
+    worker_a, worker_b = SQLiteRateLimiter(path), SQLiteRateLimiter(path)
+    assert worker_a.hit("ocr-extract:ip", 2, 10)
+    assert worker_b.hit("ocr-extract:ip", 2, 10)
+    assert not worker_a.hit("ocr-extract:ip", 2, 10)
+
+
+def test_check_rate_limit_raises_429(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_LIMITER", InMemoryRateLimiter())
+    for _ in range(3):
+        rate_limit.check_rate_limit("9.9.9.9", "scam-analyze")
+    with pytest.raises(HTTPException) as exc:
+        rate_limit.check_rate_limit("9.9.9.9", "scam-analyze")
+    assert exc.value.status_code == 429
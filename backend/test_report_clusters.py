@@ -0,0 +1,82 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+import main
+import models
+import persistence
+import profiling
+import rate_limit
+import report_clusters
+import scam_service
+from database import SessionLocal
+
+WAVE = [
+    "Your SBI account is blocked. Update KYC now at http://sbi-kyc.example/a1 or call 9876543210",
+    "Your SBI account is blocked. Update KYC now at http://sbi-kyc.example/zz9 or call 9123456780",
+    "your SBI account is blocked! update KYC now at www.sbi-kyc.example or call 9000000001",
+]
+OTHER = "Someone offered me a work from home job if I pay a registration fee of 2000 rupees"
+
+
+@pytest.fixture
+def clean_clusters(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_LIMITER", rate_limit.InMemoryRateLimiter())
+    persistence.init_db()
+    with SessionLocal() as db:
+        db.execute(delete(models.ScamReport).where(models.ScamReport.cluster_id.is_not(None)))
+        db.execute(delete(models.ScamClusterBand))
+        db.execute(delete(models.ScamCluster))
+        db.commit()
+    yield
+
+
+def test_near_duplicates_are_similar():
+    a, b, c = (report_clusters.minhash(text) for text in WAVE)
+    other = report_clusters.minhash(OTHER)
+    assert report_clusters.similarity(a, b) >= report_clusters.SCAM_CLUSTER_SIMILARITY
+    assert report_clusters.similarity(a, c) >= report_clusters.SCAM_CLUSTER_SIMILARITY
+    assert report_clusters.similarity(a, other) < 0.2
+    assert set(report_clusters.band_buckets(a)) & set(report_clusters.band_buckets(b))
+    assert report_clusters.minhash("!!! ...") is None
+
+
+def test_reports_join_cluster_and_reuse_analysis(clean_clusters, monkeypatch):
+    calls = []
+    calculate = scam_service.calculate_risk_score
+
+    def analyze(text):
+        calls.append(text)
+        return calculate(text)
+
+    monkeypatch.setattr(scam_service, "calculate_risk_score", analyze)
+    client = TestClient(main.app)
+    responses = [client.post("/scam/report", json={"description": text}).json() for text in WAVE]
+    assert len({r["cluster_id"] for r in responses}) == 1
+    assert [r["cluster_reports"] for r in responses] == [1, 2, 3]
+    assert len({r["risk_level"] for r in responses}) == 1
+    assert calls == WAVE[:1]
+
+    other = client.post("/scam/report", json={"description": OTHER}).json()
+    assert other["cluster_id"] != responses[0]["cluster_id"]
+    assert other["cluster_reports"] == 1
+    assert len(calls) == 2
+
+
+def test_clusters_endpoint_is_admin_only(clean_clusters, monkeypatch):
+    client = TestClient(main.app)
+    for text in WAVE:
+        client.post("/scam/report", json={"description": text})
+    client.post("/scam/report", json={"description": OTHER})
+
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", None)
+    assert client.get("/scam/clusters").status_code == 404
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "secret")
+    assert client.get("/scam/clusters", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    body = client.get("/scam/clusters", headers={"X-Admin-Token": "secret"}).json()
+    assert body["count"] == 1
+    cluster = body["clusters"][0]
+    assert cluster["recent_reports"] == 3
+    assert cluster["total_reports"] == 3
+    assert cluster["representative"]["description"] == WAVE[0]
@@ -0,0 +1,23 @@
+from fastapi.testclient import TestClient
+
+import main
+from schemes_service import load_local_schemes
+
+
+def _in_file_order(**wanted):
+    return [
+        s["id"] for s in load_local_schemes()
+        if all((s.get(field) or "").lower() == value.lower() for field, value in wanted.items())
+    ]
+
+
+def test_state_and_category_filters_keep_file_order():
+    client = TestClient(main.app)
+    schemes = load_local_schemes()
+    state, category = schemes[-1]["state"], schemes[-1]["category"]
+
+    assert [s["id"] for s in client.get(f"/schemes/state/{state}").json()["schemes"]] == _in_file_order(state=state)
+    assert [s["id"] for s in client.get(f"/schemes/category/{category}").json()["schemes"]] == \
+        _in_file_order(category=category)
+    assert [s["id"] for s in client.get("/schemes", params={"state": state, "category": category}).json()] == \
+        _in_file_order(state=state, category=category)
@@ -0,0 +1,53 @@
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import persistence
+import search_service
+
+
+def _client():
+    persistence.init_db()
+    app = FastAPI()
+    app.include_router(search_service.router, prefix="/search")
+    return TestClient(app)
+
+
+def test_merges_sources_by_normalised_score():
+    body = _client().get("/search", params={"q": "pm kisan farmer money"}).json()
+    assert set(body["sources"]) == {"schemes", "faqs", "scams", "chatbot"}
+    assert all(info["status"] == "ok" for info in body["sources"].values())
+    assert body["partial"] is False
+    scores = [hit["score"] for hit in body["results"]]
+    assert scores == sorted(scores, reverse=True)
+    assert all(0 < s <= 1 for s in scores)
+    assert "schemes" in {hit["source"] for hit in body["results"]}
+
+
+def test_slow_source_returns_partial_results(monkeypatch):
+    def slow(q, limit):
+        time.sleep(0.5)
+        return [{"id": "late", "title": "late", "snippet": "", "score": 1.0}]
+
+    monkeypatch.setitem(search_service.SOURCES, "schemes", slow)
+    monkeypatch.setenv("SEARCH_DEADLINES_MS", "schemes=50")
+    started = time.perf_counter()
+    body = _client().get("/search", params={"q": "otp fraud", "sources": "schemes,scams"}).json()
+    assert time.perf_counter() - started < 0.4
+    assert body["partial"] is True
+    assert body["sources"]["schemes"]["status"] == "timeout"
+    assert body["sources"]["scams"]["status"] == "ok"
+    assert all(hit["source"] == "scams" for hit in body["results"])
+
+
+def test_failing_source_and_bad_sources_param(monkeypatch):
+    def broken(q, limit):
+        raise RuntimeError("index unavailable")
+
+    monkeypatch.setitem(search_service.SOURCES, "faqs", broken)
+    client = _client()
+    body = client.get("/search", params={"q": "ration card", "sources": "faqs,chatbot"}).json()
+    assert body["sources"]["faqs"] == {"status": "error", "count": 0, "ms": body["sources"]["faqs"]["ms"]}
+    assert body["partial"] is True
+    assert client.get("/search", params={"q": "x", "sources": "weather"}).status_code == 400
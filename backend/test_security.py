@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from jose import jwt
+
+import security
+from auth_service import JWT_SECRET, JWT_ALGO
+
+
+def _token(email="user@example.com", hours=1):
+    return jwt.encode(
+        {"email": email, "exp": datetime.utcnow() + timedelta(hours=hours)},
+        JWT_SECRET,
+        algorithm=JWT_ALGO,
+    )
+
+
+def _client():
+    app = FastAPI()
+
+    @app.get("/required")
+    def required(user: security.UserPrincipal = Depends(security.get_current_user)):
+        return {"email": user.email}
+
+    @app.get("/optional")
+    def optional(user=Depends(security.get_optional_user)):
+        return {"email": user.email if user else None}
+
+    return TestClient(app)
+
+
+def test_required_and_optional_user():
+    client = _client()
+    headers = {"Authorization": f"Bearer {_token()}"}
+    assert client.get("/required", headers=headers).json() == {"email": "user@example.com"}
+    assert client.get("/required").status_code == 401
+    assert client.get("/required", headers={"Authorization": "Bearer junk"}).status_code == 401
+    assert client.get("/optional").json() == {"email": None}
+    assert client.get("/optional", headers={"Authorization": "Bearer junk"}).json() == {"email": None}
+    assert client.get("/optional", headers=headers).json() == {"email": "user@example.com"}
+
+
+def test_decode_token_is_cached():
+    token = _token("cached@example.com")
+    before = security.token_cache_stats()
+    security.decode_token(token)
+    security.decode_token(token)
+    after = security.token_cache_stats()
+    assert after["misses"] == before["misses"] + 1
+    assert after["hits"] == before["hits"] + 1
+
+
+def test_expired_token_rejected():
+    client = _client()
+    headers = {"Authorization": f"Bearer {_token(hours=-1)}"}
+    assert client.get("/required", headers=headers).status_code == 401
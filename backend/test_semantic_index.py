@@ -0,0 +1,73 @@
+import json
+
+import numpy as np
+
+from semantic_index import HashingEmbedder, VectorIndex, reciprocal_rank_fusion
+
+DOCS = {
+    "pm_kisan": "PM-Kisan income support of Rs 6000 per year for farmer families",
+    "pmay": "Pradhan Mantri Awas Yojana housing for the urban poor",
+    "mudra": "Mudra loans for small business owners",
+}
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dim=256)
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += len(texts)
+        return super().embed(texts)
+
+
+def test_hashing_embedder_is_normalized_and_deterministic():
+    a = HashingEmbedder().embed(["money for farmers", ""])
+    b = HashingEmbedder().embed(["money for farmers", ""])
+    assert np.allclose(a, b)
+    assert abs(np.linalg.norm(a[0]) - 1.0) < 1e-5
+    assert not a[1].any()
+
+
+def test_paraphrase_and_hindi_queries(tmp_path):
+    index = VectorIndex("docs", HashingEmbedder(), tmp_path).build(list(DOCS), list(DOCS.values()))
+    results = index.search(["money for farmers", "किसान के लिए पैसा", "ghar"], k=2)
+    assert index.ids[results[0][0][0]] == "pm_kisan"
+    assert index.ids[results[1][0][0]] == "pm_kisan"
+    assert index.ids[results[2][0][0]] == "pmay"
+
+
+def test_incremental_rebuild_only_embeds_changed_rows(tmp_path):
+    embedder = CountingEmbedder()
+    VectorIndex("docs", embedder, tmp_path).build(list(DOCS), list(DOCS.values()))
+    assert embedder.calls == 3
+
+    unchanged = VectorIndex("docs", embedder, tmp_path).build(list(DOCS), list(DOCS.values()))
+    assert embedder.calls == 3 and unchanged.embedded == 0
+    assert isinstance(unchanged.matrix, np.memmap)
+
+    texts = dict(DOCS, mudra="Mudra collateral-free loans for shopkeepers", new="Fasal bima crop insurance")
+    rebuilt = VectorIndex("docs", embedder, tmp_path).build(list(texts), list(texts.values()))
+    assert rebuilt.embedded == 2
+    assert embedder.calls == 5
+    assert rebuilt.matrix.shape == (4, 256)
+    assert [p.name for p in tmp_path.glob("docs.*.npy")] == [json.loads((tmp_path / "docs.meta.json").read_text())["matrix"]]
+
+
+def test_meta_and_matrix_from_different_builds_are_not_mixed(tmp_path):
+    embedder = CountingEmbedder()
+    VectorIndex("docs", embedder, tmp_path).build(list(DOCS), list(DOCS.values()))
+    # A meta file whose hashes don't belong to the matrix it names (e.g. copied from another build)
+    meta_path = tmp_path / "docs.meta.json"
+    meta = json.loads(meta_path.read_text())
+    meta["hashes"] = meta["hashes"][::-1]
+    meta_path.write_text(json.dumps(meta))
+
+    rebuilt = VectorIndex("docs", embedder, tmp_path).build(list(DOCS), list(DOCS.values()))
+    assert rebuilt.embedded == 3
+    assert rebuilt.ids[rebuilt.search(["money for farmers"], k=1)[0][0][0]] == "pm_kisan"
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]])
+    assert [key for key, _ in fused] == ["a", "c", "b"]
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+import warmup
+
+BACKEND_DIR = Path(__file__).resolve().parent
+# Cumulative `import main` time; generous so slow CI machines pass, tight enough to catch cv2/torch creeping back
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+DEFERRED_MODULES = ("cv2", "fitz", "pymupdf", "easyocr", "torch", "rapidfuzz", "numpy", "httpx")
+
+
+def _importtime():
+    """{module: cumulative microseconds} from `python -X importtime -c "import main"`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=dict(os.environ), capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cum, name = line[len("import time:"):].split("|")
+            if cum.strip().isdigit():
+                cumulative[name.strip()] = int(cum)
+    return cumulative
+
+
+def test_import_defers_heavy_modules_and_stays_in_budget():
+    cumulative = _importtime()
+    assert "main" in cumulative
+    assert not [m for m in DEFERRED_MODULES if m in cumulative]
+    assert cumulative["main"] / 1000 < IMPORT_TIME_BUDGET_MS
+
+
+def test_lifespan_creates_tables_and_warms_up(monkeypatch):
+    import main
+
+    monkeypatch.setattr(warmup, "STARTUP_WARMUP", "blocking")
+    with TestClient(main.app) as client:
+        assert warmup.status()["state"] == "done"
+        assert set(warmup.status()["steps"]) >= {"catalogs", "facets", "vectors"}
+        assert client.get("/faq/").status_code == 200
+        ready = client.get("/ready")
+        assert ready.status_code == 200 and ready.json()["ready"]
+
+
+def test_ready_reports_503_until_warm_up_is_done(monkeypatch):
+    import main
+
+    monkeypatch.setattr(warmup, "STARTUP_WARMUP", "background")
+    monkeypatch.setitem(warmup._status, "state", "running")
+    response = main.ready()
+    assert response.status_code == 503
@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+import main
+import models
+import persistence
+import sync_service
+from database import SessionLocal
+from faq_service import FAQ_FILE
+from scam_service import COMMON_SCAMS_FILE
+from schemes_service import SCHEMES_FILE
+
+SCHEMES = [
+    {"id": "a", "title": "Alpha"},
+    {"id": "b", "title": "Beta"},
+    {"id": "a", "title": "Alpha (state)"},
+]
+FAQS = [{"id": "f1", "question": "Q1?", "answer": "A1", "helpful_count": 3, "unhelpful_count": 0}]
+SCAMS = [{"id": "s1", "title": "Lottery", "description": "Fake prize", "examples": ["You won"]}]
+
+_MTIME = [1_700_000_000_000_000_000]
+
+
+def _write(path, rows):
+    path.write_text(json.dumps(rows), encoding="utf-8")
+    # Distinct, increasing signatures even within one clock tick
+    _MTIME[0] += 10**9
+    os.utime(path, ns=(_MTIME[0], _MTIME[0]))
+
+
+@pytest.fixture
+def files(tmp_path):
+    persistence.init_db()
+    with SessionLocal() as db:
+        for model in (models.SyncChange, models.SyncRecord, models.SyncCollection):
+            db.execute(delete(model))
+        db.commit()
+    paths = {}
+    for file, rows in ((SCHEMES_FILE, SCHEMES), (FAQ_FILE, FAQS), (COMMON_SCAMS_FILE, SCAMS)):
+        paths[file] = file.path
+        file.repoint(tmp_path / file.path.name)
+        _write(file.path, rows)
+    sync_service._recorded.clear()
+    yield {file.path.name: file.path for file in paths}
+    for file, path in paths.items():
+        file.repoint(path)
+    sync_service._recorded.clear()
+
+
+def test_manifest_deltas_and_snapshot(files):
+    client = TestClient(main.app)
+    manifest = client.get("/sync").json()
+    assert manifest["collections"] == {"schemes": {"count": 3}, "faqs": {"count": 1}, "common_scams": {"count": 1}}
+    version = manifest["version"]
+    assert version > 0
+    assert client.get(f"/sync?since={version}").json()["changes"] == {}
+    assert client.get("/sync?since=0").json()["full"] is True
+    assert client.get(f"/sync?since={version + 100}").json()["full"] is True
+
+    snapshot = client.get("/sync/snapshot")
+    body = snapshot.json()
+    assert body["version"] == version
+    assert list(body["records"]["schemes"]) == ["a", "b", "a~2"]
+    assert "helpful_count" not in body["records"]["faqs"]["f1"]
+    assert body["records"]["common_scams"]["s1"]["type"] == "Lottery"
+    assert client.get("/sync/snapshot", headers={"If-None-Match": snapshot.headers["etag"]}).status_code == 304
+
+    _write(files["schemes_db.json"], [{"id": "a", "title": "Alpha v2"}, {"id": "c", "title": "Gamma"}])
+    delta = client.get(f"/sync?since={version}").json()
+    assert delta["full"] is False and delta["version"] > version
+    assert delta["changes"] == {"schemes": {
+        "added": {"c": {"id": "c", "title": "Gamma"}},
+        "changed": {"a": {"id": "a", "title": "Alpha v2"}},
+        "removed": ["a~2", "b"],
+    }}
+    # Added then changed again before the client syncs: still an addition
+    newer = delta["version"]
+    _write(files["schemes_db.json"], [{"id": "a", "title": "Alpha v2"}, {"id": "c", "title": "Gamma v2"}])
+    assert client.get(f"/sync?since={version}").json()["changes"]["schemes"]["added"] == {
+        "c": {"id": "c", "title": "Gamma v2"}
+    }
+    assert client.get(f"/sync?since={newer}").json()["changes"]["schemes"]["changed"] == {
+        "c": {"id": "c", "title": "Gamma v2"}
+    }
+
+    # Vote counters are not synced, so rewriting them logs nothing
+    before = client.get("/sync").json()["version"]
+    _write(files["faq_db.json"], [dict(FAQS[0], helpful_count=9)])
+    assert client.get("/sync").json()["version"] == before
+
+
+def test_large_deltas_fall_back_to_the_snapshot(files, monkeypatch):
+    client = TestClient(main.app)
+    version = client.get("/sync").json()["version"]
+    _write(files["common_scams.json"], [dict(SCAMS[0], id=f"s{i}") for i in range(5)])
+    monkeypatch.setattr(sync_service, "SYNC_MAX_DELTA", 3)
+    delta = client.get(f"/sync?since={version}").json()
+    assert delta["full"] is True and delta["changes"] == {}
+
+
+def test_change_log_ignores_older_files_unless_forced(files):
+    assert persistence.record_sync_state("test", "200:1", {"x": "1"})
+    assert not persistence.record_sync_state("test", "100:1", {"x": "2"})
+    assert persistence.sync_collection_states()["test"][0] == "200:1"
+    assert persistence.record_sync_state("test", "100:1", {"y": "1"}, force=True)
+    version = persistence.sync_collection_states()["test"][1]
+    _, ops = persistence.sync_changes_since(version - 2, version)
+    assert ops == {"test": {"y": "add", "x": "remove"}}
+
+
+def test_reload_does_not_deadlock_when_another_worker_logged_newer(files):
+    client = TestClient(main.app)
+    client.get("/sync")
+    # Another worker logged a file newer than anything this process will read
+    persistence.record_sync_state("schemes", f"{_MTIME[0] + 10**12}:1", {"a": "0"}, force=True)
+    _write(files["schemes_db.json"], SCHEMES[:1])
+    thread = threading.Thread(target=SCHEMES_FILE.reload, daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+    # What is on disk wins: it is logged, and clients get the delta
+    assert persistence.sync_collection_states()["schemes"][0] == sync_service._recorded["schemes"]
+    assert client.get("/sync").json()["collections"]["schemes"] == {"count": 1}
@@ -0,0 +1,90 @@
+"""
+Startup warm-up: load catalogs and build derived indexes before the first
+request needs them.
+
+Importing the app does no data loading; main.py's lifespan calls `start()`
+with STARTUP_WARMUP:
+- "background" (default): warm up in a daemon thread while already serving
+- "blocking": finish warming before the app accepts requests
+- "off": everything is built lazily on first use
+
+GET /ready answers 503 until warm-up is done. Under gunicorn.conf.py the
+master runs warm-up before forking, so workers start out ready.
+
+STARTUP_WARMUP_OCR=1 also imports OpenCV/PyMuPDF ahead of the first upload;
+it is off by default because of their memory footprint on small instances.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "background").lower()
+STARTUP_WARMUP_OCR = os.getenv("STARTUP_WARMUP_OCR", "0") == "1"
+
+_status: Dict[str, object] = {"state": "pending", "steps": {}}
+_lock = threading.Lock()
+
+
+def _steps() -> List[Tuple[str, Callable[[], object]]]:
+    import chatbot_service
+    import faq_service
+    import indicators
+    import scam_service
+    import schemes_service
+
+    steps = [
+        ("catalogs", lambda: [
+            schemes_service.schemes_catalog.current(),
+            schemes_service.local_schemes_catalog.current(),
+            faq_service.faq_catalog.current(),
+            scam_service.common_scams_catalog.current(),
+        ]),
+        ("facets", schemes_service.scheme_facets),
+        ("eligibility", schemes_service.scheme_eligibility),
+        ("fuzzy", schemes_service.get_fuzz),
+        ("vectors", lambda: chatbot_service.retrieve("warm up")),
+        ("intents", lambda: [chatbot_service.load_language(lang) for lang in ("en", "hi")]),
+        ("scam_indicators", indicators.store.warm),
+    ]
+    if STARTUP_WARMUP_OCR:
+        import ocr_service
+
+        steps.append(("ocr_imports", ocr_service.warm_ocr_imports))
+    return steps
+
+
+def run():
+    """Run every warm-up step; a failing step is logged and skipped"""
+    with _lock:
+        if _status["state"] in ("running", "done"):
+            return
+        _status["state"] = "running"
+    started = time.perf_counter()
+    for name, step in _steps():
+        step_started = time.perf_counter()
+        try:
+            step()
+            _status["steps"][name] = round((time.perf_counter() - step_started) * 1000, 1)
+        except Exception as e:
+            print(f"⚠️ Warm-up step {name} failed: {e}")
+            _status["steps"][name] = "failed"
+    _status["state"] = "done"
+    print(f"✅ Warm-up finished in {time.perf_counter() - started:.2f}s")
+
+
+def start(mode: str = STARTUP_WARMUP):
+    if mode == "blocking":
+        run()
+    elif mode == "background":
+        threading.Thread(target=run, name="warmup", daemon=True).start()
+
+
+def status() -> Dict[str, object]:
+    return {"state": _status["state"], "steps": dict(_status["steps"])}
+
+
+def ready() -> bool:
+    """True once warm-up has finished (or was turned off), i.e. requests will not pay for it"""
+    return STARTUP_WARMUP == "off" or _status["state"] == "done"
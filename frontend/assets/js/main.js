@@ -119,6 +119,12 @@ document.addEventListener("DOMContentLoaded", () => {
         navigator.serviceWorker.register('sw.js')
             .then((registration) => {
                 console.log('✅ Service Worker registered successfully:', registration);
+                // Bring the offline data replica up to date (delta sync, see sw.js)
+                return navigator.serviceWorker.ready.then((ready) => {
+                    if (ready.active && typeof AppConfig !== 'undefined') {
+                        ready.active.postMessage({ type: 'sync', apiBase: AppConfig.API_BASE_URL });
+                    }
+                });
             })
             .catch((error) => {
                 console.log('⚠️ Service Worker registration failed:', error);
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Production build of the static frontend into dist/.
+
+- Assets (assets/, legacy/) are copied under content-hashed names
+  (style.css -> style.3f2a1b9c0d.css). They can then be cached forever:
+  a changed file gets a new URL.
+- Pages and components keep their names. Their src/href references are
+  rewritten to the hashed names.
+- Every text file gets pre-compressed .gz and, when the `brotli` package is
+  installed, .br siblings (only when smaller than the original).
+- sw.js gets a precache list of the pages and every asset they reference,
+  and a CACHE_NAME derived from those hashes, so a new build replaces the
+  offline cache without bumping a version by hand.
+- dist/asset-manifest.json maps original paths to hashed paths.
+
+    python build.py          # then: python server.py --prod
+"""
+
+import gzip
+import hashlib
+import json
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import brotli  # optional: without it only gzip variants are written
+except ImportError:
+    brotli = None
+
+SOURCE_DIR = Path(__file__).resolve().parent
+DIST_DIR = SOURCE_DIR / "dist"
+MANIFEST_NAME = "asset-manifest.json"
+FINGERPRINT_DIRS = ("assets", "legacy")
+PAGE_DIRS = (".", "components")
+COMPRESSIBLE = {".html", ".css", ".js", ".svg", ".json", ".txt"}
+HASH_LENGTH = 10
+# Names like style.3f2a1b9c0d.css, which server.py serves as immutable
+FINGERPRINTED = re.compile(r"\.[0-9a-f]{%d}\.[^./]+$" % HASH_LENGTH)
+
+_REFERENCE = re.compile(r"""\b(src|href)=(["'])(/?)([^"'#?:]+)([^"']*)\2""")
+_PRECACHE_BLOCK = re.compile(r"// precache:start\n.*?// precache:end\n", re.S)
+
+
+def _hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def _fingerprint(rel: str, data: bytes) -> str:
+    path = Path(rel)
+    return path.with_name(f"{path.stem}.{_hash(data)}{path.suffix}").as_posix()
+
+
+def _compress(path: Path):
+    if path.suffix not in COMPRESSIBLE:
+        return
+    data = path.read_bytes()
+    variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(data, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            path.with_name(path.name + suffix).write_bytes(compressed)
+
+
+def _rewrite(html: str, manifest: Dict[str, str], referenced: set) -> str:
+    def replace(match):
+        attr, quote, slash, rel, rest = match.groups()
+        hashed = manifest.get(rel)
+        if hashed is None:
+            return match.group(0)
+        referenced.add(hashed)
+        return f"{attr}={quote}{slash}{hashed}{rest}{quote}"
+
+    return _REFERENCE.sub(replace, html)
+
+
+def build(source: Path = SOURCE_DIR, dist: Optional[Path] = None) -> Dict[str, object]:
+    """Write the production tree to `dist` (default: source/dist); returns the manifest"""
+    dist = Path(dist or source / "dist")
+    if dist.exists():
+        shutil.rmtree(dist)
+    dist.mkdir(parents=True)
+
+    assets: Dict[str, str] = {}
+    for directory in FINGERPRINT_DIRS:
+        for path in sorted((source / directory).rglob("*")):
+            if path.is_file():
+                rel = path.relative_to(source).as_posix()
+                data = path.read_bytes()
+                assets[rel] = _fingerprint(rel, data)
+                target = dist / assets[rel]
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_bytes(data)
+
+    pages, referenced = [], set()
+    for directory in PAGE_DIRS:
+        for path in sorted((source / directory).glob("*.html")):
+            rel = path.relative_to(source).as_posix()
+            target = dist / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(_rewrite(path.read_text(encoding="utf-8"), assets, referenced), encoding="utf-8")
+            pages.append(rel)
+
+    urls = ["/"] + [f"/{rel}" for rel in pages] + sorted(f"/{rel}" for rel in referenced)
+    version = _hash("\n".join(urls).encode() + "".join(sorted(assets.values())).encode())
+    precache = (
+        "// precache:start\n"
+        "// Generated by build.py from the fingerprinted assets\n"
+        f"const CACHE_NAME = 'ruralassist-{version}';\n"
+        f"const urlsToCache = {json.dumps(urls, indent=2)};\n"
+        "// precache:end\n"
+    )
+    worker = (source / "sw.js").read_text(encoding="utf-8")
+    (dist / "sw.js").write_text(_PRECACHE_BLOCK.sub(lambda _: precache, worker, count=1), encoding="utf-8")
+
+    for path in sorted(dist.rglob("*")):
+        if path.is_file():
+            _compress(path)
+
+    manifest = {"version": version, "assets": assets, "precache": urls}
+    (dist / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+if __name__ == "__main__":
+    result = build()
+    print(f"✅ Built {len(result['assets'])} fingerprinted assets into {DIST_DIR} (cache {result['version']})")
+    if brotli is None:
+        print("ℹ️  brotli is not installed; only gzip variants were written")
@@ -1,36 +1,231 @@
 #!/usr/bin/env python3
 """
-Simple HTTP Server with No-Cache Headers for Development
-Prevents browser caching during active development
+Static file server for the frontend.
+
+    python server.py            # development: serves the sources, caching disabled
+    python server.py --prod     # production: serves dist/ (run build.py first, or pass --build)
+
+Production mode serves the output of build.py:
+- fingerprinted assets get `Cache-Control: public, max-age=31536000, immutable`;
+- pages, components and sw.js get `no-cache`, so they are revalidated
+  against their ETag;
+- pre-compressed .br/.gz variants are chosen from Accept-Encoding;
+- If-None-Match answers 304 and single byte ranges answer 206.
+
+A client on a metered connection therefore downloads each asset once.
 """
 
+import argparse
+import hashlib
 import http.server
-import socketserver
+import mimetypes
+import os
+import re
 from datetime import datetime
+from functools import partial
+
+from build import DIST_DIR, FINGERPRINTED, SOURCE_DIR, build
 
 PORT = 5500
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+CHUNK_SIZE = 64 * 1024
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_ETAGS = {}  # path -> (mtime_ns, size, etag); one entry per served file
+
 
 class NoCacheHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     """HTTP request handler with no-cache headers"""
-    
+
     def end_headers(self):
         # Add no-cache headers to prevent browser caching
         self.send_header('Cache-Control', 'no-store, no-cache, must-revalidate, max-age=0')
         self.send_header('Pragma', 'no-cache')
         self.send_header('Expires', '0')
         super().end_headers()
-    
+
     def log_message(self, format, *args):
         # Custom log format with timestamp
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         print(f"[{timestamp}] {self.address_string()} - {format % args}")
 
+
+def _etag(path, st):
+    cached = _ETAGS.get(path)
+    if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    etag = f'"{digest.hexdigest()[:20]}"'
+    _ETAGS[path] = (st.st_mtime_ns, st.st_size, etag)
+    return etag
+
+
+def _accepts(header, coding):
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() in (coding, "*"):
+            q = params.strip()
+            try:
+                return not (q.startswith("q=") and float(q[2:] or 0) == 0)
+            except ValueError:
+                return True
+    return False
+
+
+def _etag_matches(header, etag):
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    return etag.strip('"') in {tag.strip().removeprefix("W/").strip('"') for tag in header.split(",")}
+
+
+def _if_range_matches(header, etag):
+    # Strong comparison, as If-Range requires: a weak tag (or a date, since no
+    # Last-Modified is sent) must not turn a full response into a partial one
+    return header.strip() == etag
+
+
+def _byte_range(header, size):
+    """(start, end) inclusive, None to serve the whole file, or "invalid" for a 416"""
+    match = _RANGE.match(header.strip())
+    if not match:
+        return None  # multiple or malformed ranges: a full 200 is allowed
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return "invalid"
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return "invalid"
+    return start, end
+
+
+class StaticRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves a build.py tree with long-lived caching, compression, ETags and ranges"""
+
+    def do_GET(self):
+        self._serve(body=True)
+
+    def do_HEAD(self):
+        self._serve(body=False)
+
+    def _serve(self, body):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            path = os.path.join(path, "index.html")
+        if not os.path.isfile(path) or path.endswith((".gz", ".br")):
+            self.send_error(404, "File not found")
+            return
+
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        cache_control = IMMUTABLE if FINGERPRINTED.search(path) else REVALIDATE
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range"):
+            if not _if_range_matches(self.headers["If-Range"], _etag(path, os.stat(path))):
+                range_header = None
+
+        # Ranges address the identity bytes, so only whole responses are compressed
+        encoding, file_path = None, path
+        if not range_header:
+            for coding, suffix in ENCODINGS:
+                if os.path.isfile(path + suffix) and _accepts(self.headers.get("Accept-Encoding"), coding):
+                    encoding, file_path = coding, path + suffix
+                    break
+        compressible = any(os.path.isfile(path + suffix) for _, suffix in ENCODINGS)
+
+        st = os.stat(file_path)
+        etag = _etag(file_path, st)
+
+        def common_headers():
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            self.send_header("Accept-Ranges", "bytes")
+            if compressible:
+                self.send_header("Vary", "Accept-Encoding")
+
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            self.send_response(304)
+            common_headers()
+            self.end_headers()
+            return
+
+        start, end, status = 0, st.st_size - 1, 200
+        if range_header:
+            span = _byte_range(range_header, st.st_size)
+            if span == "invalid":
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{st.st_size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if span is not None:
+                (start, end), status = span, 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{st.st_size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        common_headers()
+        self.end_headers()
+        if not body:
+            return
+        with open(file_path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+    def log_message(self, format, *args):
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        print(f"[{timestamp}] {self.address_string()} - {format % args}")
+
+
+def make_server(port=PORT, prod=False, directory=None):
+    directory = str(directory or (DIST_DIR if prod else SOURCE_DIR))
+    handler = StaticRequestHandler if prod else NoCacheHTTPRequestHandler
+    return http.server.ThreadingHTTPServer(("", port), partial(handler, directory=directory))
+
+
 if __name__ == "__main__":
-    with socketserver.TCPServer(("", PORT), NoCacheHTTPRequestHandler) as httpd:
-        print(f"✅ Development server running on http://localhost:{PORT}")
-        print(f"📁 Serving files from: {httpd.server_address}")
-        print(f"🔄 Cache disabled - files will always refresh")
-        print(f"\n🌐 Open: http://localhost:{PORT}/index.html")
+    parser = argparse.ArgumentParser(description="Serve the RuralAssist frontend")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--prod", action="store_true", help="serve the fingerprinted build in dist/")
+    parser.add_argument("--build", action="store_true", help="run build.py first (implies --prod)")
+    args = parser.parse_args()
+    prod = args.prod or args.build
+    if args.build:
+        build()
+    if prod and not (DIST_DIR / "sw.js").exists():
+        raise SystemExit("dist/ is missing: run `python build.py` or pass --build")
+
+    with make_server(args.port, prod) as httpd:
+        if prod:
+            print(f"✅ Production server running on http://localhost:{args.port}")
+            print(f"📁 Serving files from: {DIST_DIR}")
+            print(f"📦 Fingerprinted assets are cached for a year; pages revalidate")
+        else:
+            print(f"✅ Development server running on http://localhost:{args.port}")
+            print(f"📁 Serving files from: {SOURCE_DIR}")
+            print(f"🔄 Cache disabled - files will always refresh")
+        print(f"\n🌐 Open: http://localhost:{args.port}/index.html")
         print(f"⏹️  Press Ctrl+C to stop\n")
         try:
             httpd.serve_forever()
@@ -1,5 +1,8 @@
 // Service Worker for RuralAssist Chatbot - Offline Support
 
+// precache:start
+// Development list. `python build.py` replaces this block with the
+// fingerprinted asset URLs and a CACHE_NAME derived from their hashes.
 const CACHE_NAME = 'ruralassist-chatbot-v6';
 const urlsToCache = [
   "/",
@@ -25,6 +28,7 @@ const urlsToCache = [
 
   "/assets/images/logo.png"
 ];
+// precache:end
 
 self.addEventListener("install", event => {
   event.waitUntil(
@@ -49,9 +53,104 @@ self.addEventListener("activate", event => {
 });
 
 self.addEventListener("fetch", event => {
+  const url = new URL(event.request.url);
+  const offline = OFFLINE_ROUTES[url.pathname];
+  if (event.request.method === "GET" && offline && !url.search) {
+    // Catalog API calls: network first, the IndexedDB replica when offline
+    event.respondWith(fetch(event.request).catch(() => replicaResponse(offline)));
+    return;
+  }
   event.respondWith(
     caches.match(event.request).then(cached => {
       return cached || fetch(event.request).catch(() => caches.match("/index.html"));
     })
   );
 });
+
+// ---------- Data replica (IndexedDB), updated incrementally through /sync ----------
+
+const DATA_DB = "ruralassist-data";
+const COLLECTIONS = ["schemes", "faqs", "common_scams"];
+// Unfiltered catalog endpoints rebuilt from the replica when offline
+const OFFLINE_ROUTES = {
+  "/schemes": data => data.schemes,
+  "/faq/": data => ({
+    count: data.faqs.length,
+    faqs: data.faqs,
+    categories: [...new Set(data.faqs.map(faq => faq.category || "general"))]
+  }),
+  "/scam/common-scams": data => ({ common_scams: data.common_scams })
+};
+
+function idbRequest(request) {
+  return new Promise((resolve, reject) => {
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+function openReplica() {
+  const request = indexedDB.open(DATA_DB, 1);
+  request.onupgradeneeded = () => {
+    COLLECTIONS.forEach(name => request.result.createObjectStore(name));
+    request.result.createObjectStore("meta");
+  };
+  return idbRequest(request);
+}
+
+async function replicaResponse(build) {
+  const db = await openReplica();
+  const tx = db.transaction(COLLECTIONS);
+  const data = {};
+  for (const name of COLLECTIONS) {
+    data[name] = await idbRequest(tx.objectStore(name).getAll());
+  }
+  return new Response(JSON.stringify(build(data)), {
+    headers: { "Content-Type": "application/json", "X-Served-By": "offline-replica" }
+  });
+}
+
+async function syncReplica(apiBase) {
+  const db = await openReplica();
+  const since = (await idbRequest(db.transaction("meta").objectStore("meta").get("version"))) || 0;
+  const response = await fetch(`${apiBase}/sync?since=${since}`);
+  if (!response.ok) return;
+  const delta = await response.json();
+  if (!delta.full && delta.version === since) return;
+
+  // Download before opening the transaction: IndexedDB commits idle transactions
+  let snapshot = null;
+  if (delta.full) {
+    const full = await fetch(`${apiBase}${delta.snapshot}`);
+    if (!full.ok) return;
+    snapshot = await full.json();
+  }
+
+  const tx = db.transaction([...COLLECTIONS, "meta"], "readwrite");
+  if (snapshot) {
+    for (const name of COLLECTIONS) {
+      const store = tx.objectStore(name);
+      store.clear();
+      Object.entries(snapshot.records[name] || {}).forEach(([key, record]) => store.put(record, key));
+    }
+  } else {
+    Object.entries(delta.changes).forEach(([name, change]) => {
+      if (!COLLECTIONS.includes(name)) return;
+      const store = tx.objectStore(name);
+      Object.entries({ ...change.added, ...change.changed }).forEach(([key, record]) => store.put(record, key));
+      change.removed.forEach(key => store.delete(key));
+    });
+  }
+  tx.objectStore("meta").put(snapshot ? snapshot.version : delta.version, "version");
+  await new Promise((resolve, reject) => {
+    tx.oncomplete = resolve;
+    tx.onerror = tx.onabort = () => reject(tx.error);
+  });
+}
+
+// Pages post {type: "sync", apiBase} on load (see assets/js/main.js)
+self.addEventListener("message", event => {
+  if (event.data && event.data.type === "sync" && event.data.apiBase) {
+    event.waitUntil(syncReplica(event.data.apiBase).catch(error => console.log("⚠️ Data sync failed:", error)));
+  }
+});